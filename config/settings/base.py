@@ -143,6 +143,10 @@ SESSION_COOKIE_SECURE = not DEBUG
 CSRF_COOKIE_SECURE = not DEBUG
 
 # Logging
+# La cartella dei log non è nel repository: viene creata all'avvio
+LOG_DIR = BASE_DIR / 'logs'
+LOG_DIR.mkdir(exist_ok=True)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -160,7 +164,7 @@ LOGGING = {
         'file': {
             'level': 'INFO',
             'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'logs' / 'ddt.log',
+            'filename': LOG_DIR / 'ddt.log',
             'formatter': 'verbose',
         },
         'console': {
@@ -183,17 +187,33 @@ LOGGING = {
     },
 }
 
-# Cache settings
+# Cache settings: LRU nella memoria del processo (L1) davanti a Redis o, se
+# REDIS_URL non è impostata (installazione desktop), a una cache su file (L2)
+REDIS_URL = get_env_variable('REDIS_URL', '')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': get_env_variable('REDIS_URL', 'redis://localhost:6379/1'),
+        'BACKEND': 'ddt_app.cache_backend.TieredCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'L2': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': REDIS_URL,
+            } if REDIS_URL else {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': BASE_DIR / 'tmp' / 'cache',
+            },
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 60,
+            'SYNC_INTERVAL': 1,
+        },
     }
 }
 
 # Celery settings
-CELERY_BROKER_URL = get_env_variable('CELERY_BROKER_URL', 'redis://localhost:6379/0')
-CELERY_RESULT_BACKEND = get_env_variable('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
+# Senza broker (default) la generazione anticipata dei PDF usa un thread del
+# processo web invece di un task Celery (ddt_app.pdf_pregeneration)
+CELERY_BROKER_URL = get_env_variable('CELERY_BROKER_URL', '')
+CELERY_RESULT_BACKEND = get_env_variable('CELERY_RESULT_BACKEND', '')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -216,6 +236,35 @@ FILE_UPLOAD_PERMISSIONS = 0o644
 PDF_OUTPUT_DIR = BASE_DIR / 'media' / 'pdfs'
 PDF_TEMP_DIR = BASE_DIR / 'tmp' / 'pdfs'
 
+# Cache dei PDF generati (ddt_app.pdf_cache): su disco con eliminazione LRU,
+# oppure 'ddt_app.pdf_cache.DjangoCachePDFStore' per usare CACHES
+DDT_PDF_CACHE = {
+    'BACKEND': 'ddt_app.pdf_cache.LocalDiskPDFStore',
+    'OPTIONS': {
+        'location': BASE_DIR / 'tmp' / 'pdf_cache',
+        'max_size': int(get_env_variable('PDF_CACHE_MAX_SIZE', str(200 * 1024 * 1024))),
+    },
+}
+
+# Pool di processi per la generazione dei PDF (ddt_app.pdf_workers):
+# WORKERS = 0 genera i PDF nel processo web. WORKERS e MAX_QUEUE valgono per
+# ogni processo web: con N processi (es: gunicorn --workers N) i processi di
+# stampa sono N × PDF_WORKERS e le stampe accettate N × (PDF_WORKERS + PDF_MAX_QUEUE)
+DDT_PDF_WORKERS = {
+    'WORKERS': int(get_env_variable('PDF_WORKERS', '2')),
+    'MAX_QUEUE': int(get_env_variable('PDF_MAX_QUEUE', '8')),
+    'TIMEOUT': 30,
+    'RETRY_AFTER': 5,
+    # DDT al massimo in una stampa cumulativa (le selezioni più grandi vanno esportate in ZIP)
+    'MAX_BATCH': int(get_env_variable('PDF_MAX_BATCH', '200')),
+}
+
+# Generazione anticipata dei PDF al salvataggio dei DDT (ddt_app.pdf_pregeneration)
+DDT_PDF_PREGENERATION = {
+    'ENABLED': True,
+    'DELAY': 2,
+}
+
 # Application specific settings
 DDT_APP = {
     'COMPANY_NAME': get_env_variable('COMPANY_NAME', 'Azienda Agricola BB&F'),
@@ -47,11 +47,17 @@ DATABASES = {
 # Cache
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': get_env_variable('REDIS_URL'),
+        'BACKEND': 'ddt_app.cache_backend.TieredCache',
+        'LOCATION': 'default',
         'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-        }
+            'L2': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': get_env_variable('REDIS_URL'),
+            },
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 60,
+            'SYNC_INTERVAL': 1,
+        },
     }
 }
 
@@ -27,6 +27,22 @@ CACHES = {
     }
 }
 
+# PDF cache in memoria
+DDT_PDF_CACHE = {
+    'BACKEND': 'ddt_app.pdf_cache.DjangoCachePDFStore',
+    'OPTIONS': {},
+}
+
+# PDF generati nel processo dei test
+DDT_PDF_WORKERS = {
+    'WORKERS': 0,
+}
+
+# Nessuna generazione dei PDF in background durante i test
+DDT_PDF_PREGENERATION = {
+    'ENABLED': False,
+}
+
 # Email backend for testing
 EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 
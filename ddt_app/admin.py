@@ -1,9 +1,16 @@
 from django.contrib import admin
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 from django.utils.html import format_html
 from .models import (
     Mittente, SedeMittente, Destinatario, Destinazione, Vettore, Autista, TargaVettore, Articolo, 
     DDT, DDTRiga, Configurazione, CausaleTrasporto
 )
+from .aggiornamento_ddt import aggiorna_ddt_una_volta
+from .forms import BaseDDTRigaFormSet
+from .numerazione_audit import audit_numerazione, has_anomalie
+from .querysets import DDTQuerySet
 
 
 class SedeMittenteInline(admin.TabularInline):
@@ -32,6 +39,9 @@ class SedeMittenteAdmin(admin.ModelAdmin):
     list_filter = ['sede_legale', 'attiva', 'provincia', 'created_at']
     search_fields = ['nome', 'mittente__nome', 'citta', 'codice_stalla']
     readonly_fields = ['created_at', 'updated_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_choices()
 
 
 class DestinazioneInline(admin.TabularInline):
@@ -68,6 +78,9 @@ class AutistaAdmin(admin.ModelAdmin):
     list_filter = ['attivo', 'vettore', 'created_at']
     search_fields = ['nome', 'cognome', 'patente', 'vettore__nome']
     readonly_fields = ['created_at', 'updated_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_choices()
 
 
 @admin.register(TargaVettore)
@@ -76,6 +89,9 @@ class TargaVettoreAdmin(admin.ModelAdmin):
     list_filter = ['attiva', 'tipo_veicolo', 'created_at']
     search_fields = ['targa', 'vettore__nome', 'tipo_veicolo']
     readonly_fields = ['created_at', 'updated_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_choices()
 
 
 @admin.register(Articolo)
@@ -88,8 +104,12 @@ class ArticoloAdmin(admin.ModelAdmin):
 
 class DDTRigaInline(admin.TabularInline):
     model = DDTRiga
+    formset = BaseDDTRigaFormSet
     extra = 1
     fields = ['ordine', 'articolo', 'quantita', 'descrizione']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_articolo()
 
 
 @admin.register(DDT)
@@ -97,9 +117,13 @@ class DDTAdmin(admin.ModelAdmin):
     list_display = ['numero', 'data_documento', 'mittente', 'destinatario', 'causale_trasporto', 'vettore', 'autista', 'targa_vettore', 'targa_vettore_2', 'created_at']
     list_filter = ['data_documento', 'causale_trasporto', 'mittente', 'destinatario', 'created_at']
     search_fields = ['numero', 'mittente__nome', 'destinatario__nome']
-    readonly_fields = ['created_at', 'updated_at', 'totale_quantita', 'totale_valore']
+    readonly_fields = ['created_at', 'updated_at', 'numero_righe', 'totale_quantita', 'totale_valore']
     inlines = [DDTRigaInline]
     date_hierarchy = 'data_documento'
+    change_list_template = 'admin/ddt_app/ddt/change_list.html'
+    # Con list_select_related=False la changelist userebbe select_related()
+    # senza argomenti, che non segue autista e targhe (nullable)
+    list_select_related = DDTQuerySet.RELAZIONI_ADMIN
     
     fieldsets = (
         ('Informazioni Generali', {
@@ -112,13 +136,55 @@ class DDTAdmin(admin.ModelAdmin):
             'fields': ('trasporto_mezzo', 'data_ritiro', 'vettore', 'autista', 'targa_vettore', 'targa_vettore_2')
         }),
         ('Note e Totali', {
-            'fields': ('annotazioni', 'totale_quantita', 'totale_valore')
+            'fields': ('annotazioni', 'numero_righe', 'totale_quantita', 'totale_valore')
         }),
         ('Metadati', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         })
     )
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_admin()
+    
+    def save_related(self, request, form, formsets, change):
+        # Le righe dell'inline aggiornano il DDT una volta sola
+        with aggiorna_ddt_una_volta():
+            super().save_related(request, form, formsets, change)
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # Sedi, destinazioni, autisti e targhe stampano il nome del proprietario
+        if db_field.name in ('sede_mittente', 'destinazione', 'autista', 'targa_vettore', 'targa_vettore_2'):
+            kwargs['queryset'] = db_field.related_model.objects.for_choices()
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+    
+    def get_urls(self):
+        urls = [
+            path(
+                'audit-numerazione/',
+                self.admin_site.admin_view(self.audit_numerazione_view),
+                name='ddt_app_ddt_audit_numerazione',
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def audit_numerazione_view(self, request):
+        """Report di buchi, duplicati e date fuori ordine della numerazione di un anno"""
+        try:
+            anno = int(request.GET.get('anno', ''))
+        except ValueError:
+            anno = timezone.now().year
+        report = audit_numerazione(anno)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f"Controllo numerazione DDT {anno}",
+            'anno': anno,
+            'anni': DDT.objects.exclude(anno=None).order_by('-anno').values_list('anno', flat=True).distinct(),
+            'report': report,
+            'anomalie': has_anomalie(report),
+        }
+        return TemplateResponse(request, 'admin/ddt_app/ddt/audit_numerazione.html', context)
 
 
 @admin.register(CausaleTrasporto)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Aggiornamento dei DDT quando cambiano le loro righe
+
+Totali, dati di stampa e documento di ricerca di un DDT sono ricalcolati
+dalle righe nella stessa transazione che le modifica, quindi chi legge il
+DDT vede sempre valori coerenti con le righe confermate.
+
+Salvare le righe una alla volta (es: il formset della modifica) ricalcola
+il DDT a ogni riga: dentro aggiorna_ddt_una_volta() i salvataggi raccolgono
+solo i DDT coinvolti, ricalcolati una volta sola all'uscita dal blocco,
+prima che la transazione venga confermata.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .dipendenze import invalida, tag
+from .models import DDT, DDTRiga
+from .pdf_data import aggiorna_dati_stampa
+from .pdf_pregeneration import schedule_pdf_pregeneration
+from .ricerca import aggiorna_documenti_ricerca
+
+
+_blocco = threading.local()
+
+
+def aggiorna_ddt(ddt_ids, using=None):
+    """
+    Ricalcola dalle righe totali, dati di stampa e documento di ricerca dei DDT
+
+    Va chiamata nella transazione che ha modificato le righe.
+
+    Args:
+        ddt_ids (iterable): ID dei DDT
+        using (str): Alias del database (default: quello dei DDT)
+    """
+    ddt_ids = set(ddt_ids)
+    if not ddt_ids:
+        return
+    DDT._default_manager.db_manager(using).filter(pk__in=ddt_ids).aggiorna_totali()
+    aggiorna_dati_stampa(ddt_ids)
+    # Durante l'eliminazione del DDT il documento può essere già eliminato:
+    # non va ricreato
+    aggiorna_documenti_ricerca(ddt_ids, crea=False)
+    invalida({tag(DDTRiga)} | {tag(DDT, pk) for pk in ddt_ids})
+
+
+@contextmanager
+def aggiorna_ddt_una_volta(using=None):
+    """
+    Ricalcola una volta sola i DDT delle righe salvate o eliminate nel blocco
+
+    Il blocco è una transazione: all'uscita i DDT raccolti sono aggiornati
+    prima del commit. Se il blocco termina con un'eccezione la transazione
+    viene annullata e i DDT raccolti scartati. I blocchi annidati sono
+    parte di quello esterno.
+
+    Args:
+        using (str): Alias del database (default: quello dei DDT)
+    """
+    with transaction.atomic(using=using):
+        if getattr(_blocco, 'ddt', None) is not None:
+            yield
+            return
+        _blocco.ddt = {}
+        try:
+            yield
+            ddt = _blocco.ddt
+            aggiorna_ddt(ddt, using)
+            _mostra_totali(ddt)
+            for pk in ddt:
+                schedule_pdf_pregeneration(pk)
+        finally:
+            _blocco.ddt = None
+
+
+def riga_modificata(riga):
+    """
+    Aggiorna il DDT di una riga salvata o eliminata
+
+    Dentro aggiorna_ddt_una_volta() il DDT viene solo raccolto.
+
+    Args:
+        riga (DDTRiga): Riga salvata o eliminata
+    """
+    # Il DDT collegato alla riga (es: l'istanza del formset) mostra i nuovi totali
+    istanza = riga.ddt if DDTRiga.ddt.is_cached(riga) else None
+    ddt = getattr(_blocco, 'ddt', None)
+    if ddt is not None:
+        istanze = ddt.setdefault(riga.ddt_id, [])
+        if istanza is not None and not any(i is istanza for i in istanze):
+            istanze.append(istanza)
+        return
+    aggiorna_ddt([riga.ddt_id])
+    _mostra_totali({riga.ddt_id: [istanza] if istanza is not None else []})
+    schedule_pdf_pregeneration(riga.ddt_id)
+
+
+def _mostra_totali(ddt):
+    """Copia i totali salvati nelle istanze dei DDT (ID -> istanze)"""
+    if not any(ddt.values()):
+        return
+    for pk, *valori in DDT.objects.filter(pk__in=ddt).values_list('pk', *DDT.CAMPI_TOTALI):
+        for istanza in ddt[pk]:
+            for campo, valore in zip(DDT.CAMPI_TOTALI, valori):
+                setattr(istanza, campo, valore)
@@ -6,3 +6,5 @@ class DdtAppConfig(AppConfig):
     name = 'ddt_app'
     verbose_name = 'DDT Management System'
 
+    def ready(self):
+        from . import signals  # noqa: F401
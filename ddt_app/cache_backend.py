@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Backend di cache a due livelli
+
+L1 è una cache LRU con TTL nella memoria del processo, condivisa dai suoi
+thread; L2 è la cache condivisa dai processi: Redis sui server, una cache su
+file nell'installazione desktop senza Redis. Le letture trovate in L1 non
+fanno round trip verso L2.
+
+Ogni chiave che L1 può contenere ha una versione in L2, letta insieme al
+valore e salvata con lui in L1. Le scritture (set, add, incr, ...) cambiano
+la versione delle sole chiavi scritte, le eliminazioni la tolgono; i valori
+troppo grandi per L1 non hanno versione. Ogni processo rilegge al più ogni
+SYNC_INTERVAL secondi, con una sola lettura multipla, le versioni delle
+chiavi nel suo L1 e scarta quelle cambiate: un valore modificato da un altro
+processo può essere letto da L1 per al più SYNC_INTERVAL secondi (0: le
+versioni sono rilette a ogni lettura), e una scrittura non tocca le altre
+chiavi degli L1. L1 è quindi adatto a valori letti spesso e scritti di rado.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'ddt_app.cache_backend.TieredCache',
+            'LOCATION': 'default',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'L2': {
+                    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                    'LOCATION': 'redis://localhost:6379/1',
+                },
+                'L1_MAX_ENTRIES': 1000,
+                'L1_TIMEOUT': 60,
+                'L1_MAX_VALUE_SIZE': 256 * 1024,
+                'SYNC_INTERVAL': 1,
+            },
+        },
+    }
+
+Senza L2 la cache resta nel solo processo (LocMemCache).
+"""
+
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+
+# Prefisso in L2 delle versioni delle chiavi
+VERSION_PREFIX = 'ddt-tiered-version:'
+
+DEFAULT_L2 = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+
+_MISSING = object()
+
+# L1 di ogni cache (LOCATION): Django crea un'istanza del backend per thread
+_livelli_1 = {}
+_livelli_1_lock = threading.Lock()
+
+
+def _chiave_versione(chiave):
+    return VERSION_PREFIX + chiave
+
+
+class _Livello1:
+    """Valori serializzati con scadenza e versione, in ordine di utilizzo (LRU)"""
+
+    def __init__(self):
+        self.valori = OrderedDict()
+        self.lock = threading.Lock()
+        self.sincronizzato = float('-inf')
+
+    def get(self, chiave):
+        with self.lock:
+            voce = self.valori.get(chiave)
+            if voce is None:
+                return _MISSING
+            scadenza, dati, _ = voce
+            if scadenza <= time.monotonic():
+                del self.valori[chiave]
+                return _MISSING
+            self.valori.move_to_end(chiave)
+        return pickle.loads(dati)
+
+    def set(self, chiave, dati, scadenza, versione, max_entries):
+        with self.lock:
+            self.valori[chiave] = (scadenza, dati, versione)
+            self.valori.move_to_end(chiave)
+            while len(self.valori) > max_entries:
+                self.valori.popitem(last=False)
+
+    def delete(self, chiave):
+        with self.lock:
+            self.valori.pop(chiave, None)
+
+    def versioni(self):
+        """Versione di ogni chiave in L1"""
+        with self.lock:
+            return {chiave: voce[2] for chiave, voce in self.valori.items()}
+
+    def scarta(self, versioni):
+        """Elimina le chiavi ancora salvate con la versione indicata"""
+        with self.lock:
+            for chiave, versione in versioni.items():
+                voce = self.valori.get(chiave)
+                if voce is not None and voce[2] == versione:
+                    del self.valori[chiave]
+
+    def clear(self):
+        with self.lock:
+            self.valori.clear()
+
+
+class TieredCache(BaseCache):
+    """Cache LRU del processo (L1) davanti a una cache condivisa (L2)"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self.l1_timeout = float(options.get('L1_TIMEOUT', 60))
+        self.l1_max_value_size = int(options.get('L1_MAX_VALUE_SIZE', 256 * 1024))
+        self.sync_interval = float(options.get('SYNC_INTERVAL', 1))
+
+        l2 = dict(options.get('L2') or DEFAULT_L2)
+        l2.setdefault('TIMEOUT', params.get('TIMEOUT', 300))
+        backend = import_string(l2.pop('BACKEND'))
+        self.l2 = backend(l2.pop('LOCATION', location), l2)
+
+        with _livelli_1_lock:
+            self._l1 = _livelli_1.setdefault(location, _Livello1())
+
+    # Le chiavi passate a L2 sono quelle complete di questa cache (prefisso e
+    # versione), così valori e versioni si leggono con un solo get_many
+
+    def get(self, key, default=None, version=None):
+        chiave = self.make_and_validate_key(key, version)
+        self._sincronizza()
+        valore = self._l1.get(chiave)
+        if valore is not _MISSING:
+            return valore
+        return self._leggi_l2([chiave]).get(chiave, default)
+
+    def get_many(self, keys, version=None):
+        self._sincronizza()
+        chiavi = {self.make_and_validate_key(key, version): key for key in keys}
+        trovati = {}
+        mancanti = []
+        for chiave, key in chiavi.items():
+            valore = self._l1.get(chiave)
+            if valore is _MISSING:
+                mancanti.append(chiave)
+            else:
+                trovati[key] = valore
+        if mancanti:
+            for chiave, valore in self._leggi_l2(mancanti).items():
+                trovati[chiavi[chiave]] = valore
+        return trovati
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        chiave = self.make_and_validate_key(key, version)
+        self.l2.set(chiave, value, timeout)
+        self._pubblica({chiave: value}, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        chiave = self.make_and_validate_key(key, version)
+        aggiunto = self.l2.add(chiave, value, timeout)
+        if aggiunto:
+            # L1 può avere ancora la chiave scaduta o eliminata da L2
+            self._pubblica({chiave: value}, timeout)
+        return aggiunto
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        chiavi = {key: self.make_and_validate_key(key, version) for key in data}
+        falliti = self.l2.set_many({chiavi[key]: value for key, value in data.items()}, timeout)
+        falliti = set(falliti)
+        self._pubblica({
+            chiave: data[key] for key, chiave in chiavi.items() if chiave not in falliti
+        }, timeout)
+        self._ritira([chiave for chiave in chiavi.values() if chiave in falliti])
+        return [key for key, chiave in chiavi.items() if chiave in falliti]
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        # La scadenza in L1 non supera mai L1_TIMEOUT: basta non prolungarla
+        chiave = self.make_and_validate_key(key, version)
+        toccato = self.l2.touch(chiave, timeout)
+        if not toccato or timeout == 0:
+            self._l1.delete(chiave)
+        return toccato
+
+    def delete(self, key, version=None):
+        chiave = self.make_and_validate_key(key, version)
+        eliminato = self.l2.delete(chiave)
+        self._ritira([chiave])
+        return eliminato
+
+    def delete_many(self, keys, version=None):
+        chiavi = [self.make_and_validate_key(key, version) for key in keys]
+        self.l2.delete_many(chiavi)
+        self._ritira(chiavi)
+
+    def incr(self, key, delta=1, version=None):
+        chiave = self.make_and_validate_key(key, version)
+        try:
+            valore = self.l2.incr(chiave, delta)
+        except ValueError:
+            self._l1.delete(chiave)
+            raise
+        self._pubblica({chiave: valore}, DEFAULT_TIMEOUT)
+        return valore
+
+    def clear(self):
+        # Spariscono anche le versioni: gli altri L1 si svuotano alla prossima verifica
+        self.l2.clear()
+        self._l1.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    def _serializza(self, valore):
+        """Valore serializzato per L1, o None se troppo grande"""
+        if self.l1_timeout <= 0:
+            return None
+        dati = pickle.dumps(valore, pickle.HIGHEST_PROTOCOL)
+        return dati if len(dati) <= self.l1_max_value_size else None
+
+    def _leggi_l2(self, chiavi):
+        """
+        Legge valori da L2 e li copia in L1 con la loro versione
+
+        La versione è letta prima del valore: una scrittura concorrente la
+        cambia dopo aver scritto il valore, quindi il valore salvato in L1 è
+        al più vecchio della versione, e viene scartato alla verifica.
+        """
+        letti = self.l2.get_many([_chiave_versione(chiave) for chiave in chiavi] + chiavi)
+        trovati = {}
+        for chiave in chiavi:
+            valore = letti.get(chiave, _MISSING)
+            if valore is _MISSING:
+                continue
+            trovati[chiave] = valore
+            dati = self._serializza(valore)
+            if dati is None:
+                continue
+            versione = letti.get(_chiave_versione(chiave))
+            if versione is None:
+                # Chiave senza versione (scaduta o scritta prima di questo
+                # backend): il valore letto potrebbe precederla, va in L1
+                # dalla prossima lettura
+                self.l2.add(_chiave_versione(chiave), uuid.uuid4().hex)
+                continue
+            self._salva_l1(chiave, dati, versione)
+        return trovati
+
+    def _salva_l1(self, chiave, dati, versione):
+        """Copia un valore in L1 per al più L1_TIMEOUT secondi"""
+        durata = self.l1_timeout
+        if self.default_timeout is not None:
+            durata = min(self.default_timeout, durata)
+        if durata <= 0:
+            return
+        self._l1.set(chiave, dati, time.monotonic() + durata, versione, self.l1_max_entries)
+
+    def _sincronizza(self):
+        """Scarta da L1 le chiavi scritte da un processo dopo la lettura"""
+        now = time.monotonic()
+        if now - self._l1.sincronizzato < self.sync_interval:
+            return
+        versioni = self._l1.versioni()
+        if versioni:
+            attuali = self.l2.get_many([_chiave_versione(chiave) for chiave in versioni])
+            self._l1.scarta({
+                chiave: versione for chiave, versione in versioni.items()
+                if attuali.get(_chiave_versione(chiave)) != versione
+            })
+        self._l1.sincronizzato = now
+
+    def _pubblica(self, valori, timeout):
+        """
+        Cambia in L2 la versione delle chiavi scritte
+
+        Gli L1 che le contengono le scartano alla prossima verifica. Anche il
+        processo corrente le rilegge da L2: la versione scritta qui potrebbe
+        seguire il valore di una scrittura concorrente. I valori troppo grandi
+        per L1 non ricevono una versione.
+        """
+        versioni = {}
+        senza_versione = []
+        for chiave, valore in valori.items():
+            self._l1.delete(chiave)
+            if timeout is not None and timeout is not DEFAULT_TIMEOUT and timeout <= 0:
+                senza_versione.append(chiave)
+            elif self._serializza(valore) is None:
+                senza_versione.append(chiave)
+            else:
+                versioni[_chiave_versione(chiave)] = uuid.uuid4().hex
+        if versioni:
+            self.l2.set_many(versioni, timeout)
+        self._ritira(senza_versione)
+
+    def _ritira(self, chiavi):
+        """Toglie da L2 la versione delle chiavi eliminate: gli L1 le scartano"""
+        for chiave in chiavi:
+            self._l1.delete(chiave)
+        if chiavi:
+            self.l2.delete_many([_chiave_versione(chiave) for chiave in chiavi])
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Cache nel processo delle impostazioni lette a ogni richiesta
+
+Il formato di numerazione attivo e i valori di Configurazione cambiano poche
+volte l'anno ma vengono letti a ogni numero proposto e a ogni DDT salvato:
+restano in memoria per TTL secondi e, scaduto il TTL, vengono riletti dal
+database solo se è cambiata la versione salvata nella cache condivisa
+(CACHES). I segnali di salvataggio ed eliminazione cambiano la versione al
+commit, quindi con una cache condivisa (Redis, Memcached) tutti i processi
+vedono la modifica entro TTL secondi.
+"""
+
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+
+from .models import Configurazione, FormatoNumerazioneDDT
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_CACHE = {
+    'TTL': 60,
+    'CACHE': 'default',
+}
+
+# Chiave della versione nella cache condivisa
+CONFIG_VERSION_KEY = 'ddt-config-version'
+
+VALORI_VERI = ('1', 'true', 'si', 'sì', 'yes', 'on')
+
+
+def get_config_cache_settings():
+    """Configurazione in settings.DDT_CONFIG_CACHE"""
+    return dict(DEFAULT_CONFIG_CACHE, **getattr(settings, 'DDT_CONFIG_CACHE', {}))
+
+
+class ConfigCache:
+    """
+    Valori in memoria con TTL, validati dalla versione nella cache condivisa
+
+    Una modifica ancora da confermare non è visibile agli altri processi:
+    finché la transazione che l'ha fatta è aperta, il thread che l'ha fatta
+    legge dal database senza usare né riempire la cache. Se la transazione
+    viene annullata la cache torna valida senza cambiare versione.
+    """
+
+    def __init__(self):
+        self._valori = {}
+        self._lock = threading.Lock()
+        self._stato = threading.local()
+
+    def get(self, chiave, loader):
+        """
+        Restituisce il valore in cache, caricandolo con loader() se necessario
+
+        Args:
+            chiave (str): Chiave del valore
+            loader (callable): Funzione che legge il valore dal database
+
+        Returns:
+            Valore in cache o appena caricato
+        """
+        if self._modifiche_in_sospeso():
+            return loader()
+
+        config = get_config_cache_settings()
+        now = time.monotonic()
+        voce = self._valori.get(chiave)
+        if voce is not None and voce[0] > now:
+            return voce[2]
+
+        # La versione è letta prima del valore: una modifica confermata nel
+        # frattempo cambia la versione e il valore viene riletto al prossimo TTL
+        versione = caches[config['CACHE']].get(CONFIG_VERSION_KEY)
+        if voce is not None and voce[1] == versione:
+            valore = voce[2]
+        else:
+            valore = loader()
+        with self._lock:
+            self._valori[chiave] = (now + config['TTL'], versione, valore)
+        return valore
+
+    def invalida(self):
+        """Segnala una modifica delle impostazioni, pubblicata al commit"""
+        self.svuota()
+        if self._modifiche_in_sospeso():
+            return
+
+        def pubblica():
+            self._stato.pubblica = None
+            config = get_config_cache_settings()
+            caches[config['CACHE']].set(CONFIG_VERSION_KEY, uuid.uuid4().hex, None)
+            self.svuota()
+
+        # Fuori da una transazione la callback viene eseguita subito e azzera lo stato
+        self._stato.pubblica = pubblica
+        transaction.on_commit(pubblica)
+
+    def svuota(self):
+        """Elimina i valori in memoria nel processo corrente"""
+        with self._lock:
+            self._valori.clear()
+
+    def _modifiche_in_sospeso(self):
+        """
+        True se il thread ha modifiche non ancora confermate né annullate
+
+        La modifica è in sospeso finché la transazione è aperta e la callback
+        del commit è ancora registrata: annullando la transazione, o solo il
+        savepoint in cui è stata fatta la modifica, Django scarta la callback.
+        """
+        pubblica = getattr(self._stato, 'pubblica', None)
+        if pubblica is None:
+            return False
+        connection = transaction.get_connection()
+        if connection.in_atomic_block and any(voce[1] is pubblica for voce in connection.run_on_commit):
+            return True
+        self._stato.pubblica = None
+        return False
+
+
+_config_cache = ConfigCache()
+
+
+@receiver(setting_changed)
+def _reset_config_cache(setting, **kwargs):
+    if setting in ('DDT_CONFIG_CACHE', 'CACHES'):
+        _config_cache.svuota()
+
+
+def invalida_config_cache():
+    """Segnala la modifica del formato di numerazione o di una Configurazione"""
+    _config_cache.invalida()
+
+
+def get_formato_numerazione_attivo():
+    """
+    Formato di numerazione attivo, dalla cache del processo
+
+    Returns:
+        FormatoNumerazioneDDT: Formato attivo o None. L'istanza è condivisa:
+        non va modificata
+    """
+    return _config_cache.get(
+        'formato_numerazione', lambda: FormatoNumerazioneDDT.objects.filter(attivo=True).first()
+    )
+
+
+def get_configurazione(chiave, default=None, tipo=str):
+    """
+    Valore di una Configurazione, dalla cache del processo
+
+    Args:
+        chiave (str): Chiave della configurazione
+        default: Valore restituito se la chiave manca o non è convertibile
+        tipo (callable): Conversione del valore (es: int, float, bool, json.loads).
+            bool accetta 1/true/si/sì/yes/on, senza distinguere maiuscole
+
+    Returns:
+        Valore convertito con tipo, o default
+    """
+    valori = _config_cache.get(
+        'configurazione', lambda: dict(Configurazione.objects.values_list('chiave', 'valore'))
+    )
+    if chiave not in valori:
+        return default
+    valore = valori[chiave]
+    if tipo is bool:
+        return valore.strip().lower() in VALORI_VERI
+    try:
+        return tipo(valore)
+    except (TypeError, ValueError):
+        logger.warning("Configurazione %s non valida: %r", chiave, valore)
+        return default
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Cache dei dati derivati dai DDT e dalle anagrafiche, invalidata per dipendenza
+
+Un valore in cache (JSON delle API, dati di una pagina, ...) dichiara le
+istanze da cui è costruito con i loro tag: tag(vettore) -> 'ddt_app.vettore:5'.
+Ogni tag ha una versione nella cache condivisa, salvata insieme al valore, e
+il valore è valido finché tutte le versioni sono invariate.
+
+I segnali di salvataggio ed eliminazione cambiano al commit le versioni:
+
+- del tag dell'istanza;
+- dei tag delle istanze che la contengono (PARENTI: una destinazione fa
+  parte del suo destinatario, una riga del suo DDT), anche quelle precedenti
+  se l'istanza è stata spostata;
+- del tag del modello (tag(Articolo)), per i valori costruiti da un elenco.
+
+Diventano quindi non validi esattamente i valori costruiti dalle istanze
+modificate: ad esempio quelli che dipendono da tag(vettore) quando cambia il
+vettore, un suo autista o una sua targa, e nient'altro.
+"""
+
+import hashlib
+import json
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import quote_etag
+
+from .models import (
+    Articolo, Autista, CausaleTrasporto, DDT, DDTRiga, Destinatario, Destinazione,
+    Mittente, SedeMittente, TargaVettore, Vettore,
+)
+
+
+DEFAULT_DEPENDENCY_CACHE = {
+    'CACHE': 'default',
+    'TIMEOUT': 3600,
+}
+
+# Modelli i cui salvataggi ed eliminazioni invalidano i valori dipendenti
+MODELLI = (
+    Mittente, SedeMittente, Destinatario, Destinazione, Vettore, Autista, TargaVettore,
+    CausaleTrasporto, Articolo, DDT, DDTRiga,
+)
+
+# Chiavi esterne verso le istanze che contengono quelle del modello
+PARENTI = {
+    SedeMittente: ('mittente',),
+    Destinazione: ('destinatario',),
+    Autista: ('vettore',),
+    TargaVettore: ('vettore',),
+    DDTRiga: ('ddt',),
+}
+
+
+def get_dependency_cache_settings():
+    """Configurazione in settings.DDT_DEPENDENCY_CACHE"""
+    return dict(DEFAULT_DEPENDENCY_CACHE, **getattr(settings, 'DDT_DEPENDENCY_CACHE', {}))
+
+
+def _cache():
+    return caches[get_dependency_cache_settings()['CACHE']]
+
+
+def tag(obj, pk=None):
+    """
+    Tag di un'istanza o di un intero modello
+
+    Args:
+        obj (Model | type): Istanza, oppure modello
+        pk: Chiave primaria, se obj è un modello. Senza: tag del modello
+
+    Returns:
+        str: Tag (es: 'ddt_app.vettore:5', 'ddt_app.articolo')
+    """
+    if not isinstance(obj, type):
+        obj, pk = type(obj), obj.pk
+    nome = obj._meta.label_lower
+    return nome if pk is None else f'{nome}:{pk}'
+
+
+def _attname_parenti(model):
+    """Colonne delle chiavi esterne verso i parenti del modello"""
+    return [model._meta.get_field(campo).attname for campo in PARENTI.get(model, ())]
+
+
+def _chiavi_parenti(instance):
+    """Chiavi primarie dei parenti dell'istanza, per chiave esterna"""
+    return tuple(getattr(instance, attname) for attname in _attname_parenti(type(instance)))
+
+
+def tags_istanza(instance):
+    """
+    Tag invalidati dalla modifica di un'istanza
+
+    Args:
+        instance (Model): Istanza salvata o eliminata
+
+    Returns:
+        set: Tag dell'istanza, del modello e dei parenti attuali e iniziali
+    """
+    tags = {tag(instance), tag(type(instance))}
+    campi = PARENTI.get(type(instance), ())
+    iniziali = getattr(instance, '_dipendenze_iniziali', ())
+    for valori in (_chiavi_parenti(instance), iniziali):
+        for campo, pk in zip(campi, valori):
+            if pk is not None:
+                tags.add(tag(instance._meta.get_field(campo).related_model, pk))
+    return tags
+
+
+def tags_ddt(ddt):
+    """
+    Tag da cui dipende un valore costruito da un DDT
+
+    Le righe sono lette da ddt.righe.all(), quindi dal prefetch se presente.
+
+    Args:
+        ddt (DDT): DDT
+
+    Returns:
+        set: Tag del DDT, delle anagrafiche collegate e degli articoli delle righe
+    """
+    tags = {tag(ddt)}
+    for campo in ddt._meta.concrete_fields:
+        pk = getattr(ddt, campo.attname) if campo.is_relation else None
+        if pk is not None:
+            tags.add(tag(campo.related_model, pk))
+    tags.update(tag(Articolo, riga.articolo_id) for riga in ddt.righe.all())
+    return tags
+
+
+def _chiave_versione(nome):
+    return f'ddt-dep-{nome}'
+
+
+class CacheDipendenze:
+    """
+    Valori validati dalle versioni dei tag da cui dipendono
+
+    Come per le impostazioni (config_cache), finché il thread ha modifiche
+    non confermate i valori sono letti dal database senza usare né riempire
+    la cache: una transazione annullata non lascia in cache dati mai salvati.
+    """
+
+    def __init__(self):
+        self._stato = threading.local()
+
+    def get_or_set(self, chiave, loader, dipendenze, timeout=None):
+        """
+        Restituisce il valore in cache, caricandolo con loader() se non è valido
+
+        Args:
+            chiave (str): Chiave del valore
+            loader (callable): Funzione che costruisce il valore dal database
+            dipendenze (iterable): Tag delle istanze e dei modelli da cui
+                dipende il valore
+            timeout (int): Durata in secondi (default: TIMEOUT della configurazione)
+
+        Returns:
+            Valore in cache o appena caricato
+        """
+        if self._modifiche_in_sospeso():
+            return loader()
+
+        cache = _cache()
+        voce = cache.get(chiave)
+        # Le versioni sono lette prima del valore: una modifica confermata nel
+        # frattempo le cambia e il valore viene ricaricato alla lettura successiva
+        versioni = self._versioni(cache, dipendenze)
+        if voce is not None and voce[0] == versioni:
+            return voce[1]
+
+        valore = loader()
+        if timeout is None:
+            timeout = get_dependency_cache_settings()['TIMEOUT']
+        cache.set(chiave, (versioni, valore), timeout)
+        return valore
+
+    def etag(self, chiave, dipendenze):
+        """
+        ETag di un valore, calcolato dalle sole versioni dei tag
+
+        Args:
+            chiave (str): Chiave del valore (es: URL o chiave di get_or_set)
+            dipendenze (iterable): Tag da cui dipende il valore
+
+        Returns:
+            str: ETag forte tra virgolette, che cambia quando cambia una delle
+            istanze; None se il thread ha modifiche non ancora confermate
+        """
+        if self._modifiche_in_sospeso():
+            return None
+        versioni = self._versioni(_cache(), dipendenze)
+        payload = json.dumps([chiave, sorted(versioni.items())])
+        return quote_etag(hashlib.sha256(payload.encode('utf-8')).hexdigest())
+
+    def invalida(self, tags):
+        """Segnala la modifica delle istanze dei tag, pubblicata al commit"""
+        tags = set(tags)
+        if not tags:
+            return
+        if self._modifiche_in_sospeso():
+            self._stato.tags.update(tags)
+            return
+
+        def pubblica():
+            tags_confermati = self._stato.tags
+            self._stato.pubblica = None
+            self._stato.tags = set()
+            _cache().set_many({
+                _chiave_versione(nome): uuid.uuid4().hex for nome in tags_confermati
+            }, None)
+
+        # Se la transazione viene annullata i tag raccolti sono sostituiti alla
+        # modifica successiva; fuori da una transazione la callback viene
+        # eseguita subito e azzera lo stato
+        self._stato.pubblica = pubblica
+        self._stato.tags = tags
+        transaction.on_commit(pubblica)
+
+    @staticmethod
+    def _versioni(cache, dipendenze):
+        """
+        Versioni attuali dei tag
+
+        I tag mai invalidati ricevono una versione, così una versione scaduta
+        non torna mai uguale a quella salvata con un valore.
+        """
+        chiavi = [_chiave_versione(nome) for nome in sorted(set(dipendenze))]
+        versioni = cache.get_many(chiavi)
+        mancanti = [k for k in chiavi if k not in versioni]
+        if mancanti:
+            for k in mancanti:
+                cache.add(k, uuid.uuid4().hex, None)
+            versioni = cache.get_many(chiavi)
+        return versioni
+
+    def _modifiche_in_sospeso(self):
+        """
+        True se il thread ha modifiche non ancora confermate né annullate
+
+        Come in config_cache: la modifica è in sospeso finché la transazione è
+        aperta e Django non ha scartato la callback del commit annullando la
+        transazione o il savepoint della modifica.
+        """
+        pubblica = getattr(self._stato, 'pubblica', None)
+        if pubblica is None:
+            return False
+        connection = transaction.get_connection()
+        if connection.in_atomic_block and any(voce[1] is pubblica for voce in connection.run_on_commit):
+            return True
+        self._stato.pubblica = None
+        return False
+
+
+_cache_dipendenze = CacheDipendenze()
+
+
+def get_or_set(chiave, loader, dipendenze, timeout=None):
+    """Valore in cache valido per le dipendenze (vedi CacheDipendenze.get_or_set)"""
+    return _cache_dipendenze.get_or_set(chiave, loader, dipendenze, timeout)
+
+
+def etag_dipendenze(chiave, dipendenze):
+    """ETag di un valore che dipende dai tag (vedi CacheDipendenze.etag)"""
+    return _cache_dipendenze.etag(chiave, dipendenze)
+
+
+def invalida(tags):
+    """
+    Invalida al commit i valori che dipendono dai tag
+
+    Args:
+        tags (iterable): Tag delle istanze o dei modelli modificati
+    """
+    _cache_dipendenze.invalida(tags)
+
+
+def ricorda_parenti(sender, instance, raw=False, using=None, **kwargs):
+    """
+    Ricorda i parenti salvati nel database, invalidati anche se l'istanza viene spostata
+
+    Collegata a pre_save e pre_delete: i parenti vengono letti solo quando
+    l'istanza sta per essere modificata, non a ogni caricamento.
+    """
+    if raw or instance._state.adding or instance.pk is None:
+        instance._dipendenze_iniziali = ()
+        return
+    instance._dipendenze_iniziali = sender._base_manager.using(using).filter(pk=instance.pk).values_list(
+        *_attname_parenti(sender)
+    ).first() or ()
+
+
+def invalida_istanza(sender, instance, raw=False, **kwargs):
+    """Invalida i valori che dipendono da un'istanza salvata o eliminata"""
+    if raw:
+        return
+    invalida(tags_istanza(instance))
@@ -1,5 +1,5 @@
 from django import forms
-from django.forms import inlineformset_factory
+from django.forms import BaseInlineFormSet, inlineformset_factory
 from .models import DDT, DDTRiga, Mittente, SedeMittente, Destinatario, Destinazione, Vettore, Autista, TargaVettore, Articolo, FormatoNumerazioneDDT, CausaleTrasporto
 
 
@@ -9,12 +9,20 @@ class DDTForm(forms.ModelForm):
     # Campo nascosto per gestire la destinazione
     destinazione_id = forms.CharField(widget=forms.HiddenInput(), required=False)
     
+    # Numero proposto dalla numerazione automatica: se l'utente non lo cambia
+    # il numero effettivo viene assegnato al salvataggio
+    numero_proposto = forms.CharField(widget=forms.HiddenInput(), required=False)
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Rimuovi il campo destinazione originale e usa solo il campo nascosto
         if 'destinazione' in self.fields:
             del self.fields['destinazione']
         
+        # Per un nuovo DDT il numero può essere lasciato alla numerazione automatica
+        if not self.instance.pk:
+            self.fields['numero'].required = False
+        
         # Configura le scelte per trasporto_mezzo
         self.fields['trasporto_mezzo'].widget = forms.RadioSelect(choices=[
             ('mittente', 'Mittente'),
@@ -23,7 +31,7 @@ class DDTForm(forms.ModelForm):
         ])
         
         # Filtra le sedi del mittente e le causali attive
-        self.fields['sede_mittente'].queryset = SedeMittente.objects.filter(attiva=True)
+        self.fields['sede_mittente'].queryset = SedeMittente.objects.for_choices().filter(attiva=True)
         self.fields['causale_trasporto'].queryset = CausaleTrasporto.objects.filter(attiva=True)
         
         # Aggiungi classi CSS ai campi select
@@ -42,16 +50,16 @@ class DDTForm(forms.ModelForm):
         
         # Se è una modifica, imposta i queryset basati sul vettore esistente
         if self.instance and self.instance.pk and self.instance.vettore:
-            self.fields['autista'].queryset = Autista.objects.filter(vettore=self.instance.vettore, attivo=True)
-            self.fields['targa_vettore'].queryset = TargaVettore.objects.filter(vettore=self.instance.vettore, attiva=True)
-            self.fields['targa_vettore_2'].queryset = TargaVettore.objects.filter(vettore=self.instance.vettore, attiva=True)
+            self.fields['autista'].queryset = Autista.objects.for_choices().filter(vettore=self.instance.vettore, attivo=True)
+            self.fields['targa_vettore'].queryset = TargaVettore.objects.for_choices().filter(vettore=self.instance.vettore, attiva=True)
+            self.fields['targa_vettore_2'].queryset = TargaVettore.objects.for_choices().filter(vettore=self.instance.vettore, attiva=True)
         elif 'vettore' in self.data:
             try:
                 vettore_id = int(self.data.get('vettore'))
                 if vettore_id:
-                    self.fields['autista'].queryset = Autista.objects.filter(vettore_id=vettore_id, attivo=True)
-                    self.fields['targa_vettore'].queryset = TargaVettore.objects.filter(vettore_id=vettore_id, attiva=True)
-                    self.fields['targa_vettore_2'].queryset = TargaVettore.objects.filter(vettore_id=vettore_id, attiva=True)
+                    self.fields['autista'].queryset = Autista.objects.for_choices().filter(vettore_id=vettore_id, attivo=True)
+                    self.fields['targa_vettore'].queryset = TargaVettore.objects.for_choices().filter(vettore_id=vettore_id, attiva=True)
+                    self.fields['targa_vettore_2'].queryset = TargaVettore.objects.for_choices().filter(vettore_id=vettore_id, attiva=True)
             except (ValueError, TypeError):
                 pass
         
@@ -67,7 +75,7 @@ class DDTForm(forms.ModelForm):
             
             # Carica le sedi del mittente esistente
             if self.instance.mittente:
-                self.fields['sede_mittente'].queryset = SedeMittente.objects.filter(
+                self.fields['sede_mittente'].queryset = SedeMittente.objects.for_choices().filter(
                     mittente=self.instance.mittente, 
                     attiva=True
                 )
@@ -84,8 +92,28 @@ class DDTForm(forms.ModelForm):
         except Destinazione.DoesNotExist:
             raise forms.ValidationError("Destinazione non valida.")
     
+    def clean_numero(self):
+        return (self.cleaned_data.get('numero') or '').strip()
+    
+    @property
+    def numerazione_automatica(self):
+        """True se il numero del nuovo DDT va assegnato dalla numerazione automatica"""
+        if self.instance.pk:
+            return False
+        numero = self.cleaned_data.get('numero')
+        return not numero or numero == self.cleaned_data.get('numero_proposto')
+    
+    @property
+    def numero_modificato(self):
+        """True se il numero del DDT o la data, che ne determina la serie, sono cambiati"""
+        return not self.instance.pk or bool({'numero', 'data_documento'} & set(self.changed_data))
+    
     def clean(self):
         cleaned_data = super().clean()
+        if self.numerazione_automatica:
+            # Il numero proposto può essere stato assegnato nel frattempo a un
+            # altro DDT: non va verificato, sarà sostituito al salvataggio
+            cleaned_data['numero'] = ''
         destinatario = cleaned_data.get('destinatario')
         destinazione = cleaned_data.get('destinazione_id')
         trasporto_mezzo = cleaned_data.get('trasporto_mezzo')
@@ -235,10 +263,29 @@ class DDTRigaForm(forms.ModelForm):
         self.fields['articolo'].queryset = Articolo.objects.all().order_by('categoria', 'nome')
 
 
+class BaseDDTRigaFormSet(BaseInlineFormSet):
+    """Formset delle righe che legge una sola volta gli articoli per tutte le select"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._scelte_articolo = None
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        campo = form.fields['articolo']
+        if self._scelte_articolo is None:
+            self._scelte_articolo = list(campo.choices)
+        campo.choices = self._scelte_articolo
+        # Nell'admin la select è dentro RelatedFieldWidgetWrapper
+        if hasattr(campo.widget, 'widget'):
+            campo.widget.widget.choices = self._scelte_articolo
+
+
 # Formset per le righe del DDT
 DDTRigaFormSet = inlineformset_factory(
     DDT, DDTRiga,
     form=DDTRigaForm,
+    formset=BaseDDTRigaFormSet,
     extra=1,
     can_delete=True,
     min_num=0,
@@ -413,3 +460,69 @@ class CausaleTrasportoForm(forms.ModelForm):
             'attiva': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'note': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
         }
+
+
+class DDTFiltroForm(forms.Form):
+    """Form per filtrare i DDT da esportare o stampare in blocco"""
+    
+    CAMPO_DATA_CHOICES = [
+        ('data_documento', 'Data Documento'),
+        ('data_ritiro', 'Data Ritiro'),
+    ]
+    
+    campo_data = forms.ChoiceField(choices=CAMPO_DATA_CHOICES, required=False, label="Filtra per")
+    data_da = forms.DateField(required=False, label="Dalla data")
+    data_a = forms.DateField(required=False, label="Alla data")
+    mittente = forms.ModelChoiceField(queryset=Mittente.objects.all(), required=False)
+    destinatario = forms.ModelChoiceField(queryset=Destinatario.objects.all(), required=False)
+    vettore = forms.ModelChoiceField(queryset=Vettore.objects.all(), required=False)
+    ids = forms.CharField(required=False, label="ID DDT", help_text="ID separati da virgola")
+    anno = forms.IntegerField(required=False, min_value=1, label="Anno")
+    numero_da = forms.IntegerField(required=False, min_value=0, label="Dal numero")
+    numero_a = forms.IntegerField(required=False, min_value=0, label="Al numero")
+    
+    def clean_ids(self):
+        ids = self.cleaned_data.get('ids')
+        if not ids:
+            return []
+        try:
+            return [int(ddt_id) for ddt_id in ids.split(',') if ddt_id.strip()]
+        except ValueError:
+            raise forms.ValidationError("Gli ID dei DDT devono essere numeri separati da virgola.")
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        data_da = cleaned_data.get('data_da')
+        data_a = cleaned_data.get('data_a')
+        if data_da and data_a and data_da > data_a:
+            raise forms.ValidationError("La data iniziale deve precedere la data finale.")
+        numero_da = cleaned_data.get('numero_da')
+        numero_a = cleaned_data.get('numero_a')
+        if numero_da is not None and numero_a is not None and numero_da > numero_a:
+            raise forms.ValidationError("Il numero iniziale deve precedere il numero finale.")
+        return cleaned_data
+    
+    def clean_campo_data(self):
+        return self.cleaned_data.get('campo_data') or 'data_documento'
+    
+    def filtra(self, queryset):
+        """Applica i filtri validati a un queryset di DDT"""
+        data = self.cleaned_data
+        campo_data = data['campo_data']
+        if data.get('data_da'):
+            queryset = queryset.filter(**{f'{campo_data}__gte': data['data_da']})
+        if data.get('data_a'):
+            queryset = queryset.filter(**{f'{campo_data}__lte': data['data_a']})
+        for campo in ('mittente', 'destinatario', 'vettore'):
+            if data.get(campo):
+                queryset = queryset.filter(**{campo: data[campo]})
+        if data.get('ids'):
+            queryset = queryset.filter(id__in=data['ids'])
+        # Intervalli numerici sul progressivo (es: DDT 120-340 del 2025)
+        if data.get('anno'):
+            queryset = queryset.filter(anno=data['anno'])
+        if data.get('numero_da') is not None:
+            queryset = queryset.filter(progressivo__gte=data['numero_da'])
+        if data.get('numero_a') is not None:
+            queryset = queryset.filter(progressivo__lte=data['numero_a'])
+        return queryset
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Comando per salvare i dati di stampa dei DDT
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from ddt_app.models import DDT
+from ddt_app.pdf_data import DATI_STAMPA_VERSION, aggiorna_dati_stampa
+
+
+class Command(BaseCommand):
+    help = (
+        'Salva i dati di stampa dei DDT che non li hanno (es: DDT creati prima della loro '
+        'introduzione o importati con bulk_create); con --tutti li ricalcola dalle anagrafiche '
+        'attuali anche per i DDT già emessi'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--anno',
+            type=int,
+            help='Anno dei DDT da aggiornare (default: tutti)'
+        )
+        parser.add_argument(
+            '--tutti',
+            action='store_true',
+            help='Ricalcola anche i dati di stampa già salvati'
+        )
+
+    def handle(self, *args, **options):
+        ddt = DDT.objects.order_by('id')
+        if options['anno']:
+            ddt = ddt.filter(data_documento__year=options['anno'])
+        if not options['tutti']:
+            ddt = ddt.filter(Q(dati_stampa__isnull=True) | ~Q(dati_stampa__versione=DATI_STAMPA_VERSION))
+
+        start = time.perf_counter()
+        scritti = aggiorna_dati_stampa(ddt.values_list('id', flat=True))
+        self.stdout.write(self.style.SUCCESS(
+            f"Dati di stampa di {scritti} DDT aggiornati in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Comando per ricalcolare i documenti di ricerca dei DDT
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from ddt_app.models import DDT
+from ddt_app.ricerca import aggiorna_documenti_ricerca
+
+
+class Command(BaseCommand):
+    help = (
+        'Ricalcola i documenti di ricerca dei DDT, ad esempio dopo un import con '
+        'bulk_create o update() che non invia i segnali'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--anno',
+            type=int,
+            help='Anno dei DDT da aggiornare (default: tutti)'
+        )
+
+    def handle(self, *args, **options):
+        ddt = DDT.objects.order_by('id')
+        if options['anno']:
+            ddt = ddt.filter(data_documento__year=options['anno'])
+
+        start = time.perf_counter()
+        scritti = aggiorna_documenti_ricerca(ddt.values_list('id', flat=True))
+        self.stdout.write(self.style.SUCCESS(
+            f"{scritti} documenti di ricerca aggiornati in {time.perf_counter() - start:.2f}s"
+        ))
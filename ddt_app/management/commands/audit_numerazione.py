@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Comando per controllare buchi, duplicati e date fuori ordine nella numerazione DDT
+"""
+
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from ddt_app.numerazione_audit import audit_numerazione, has_anomalie
+
+
+class Command(BaseCommand):
+    help = 'Controlla la numerazione dei DDT di un anno: buchi, progressivi duplicati e date fuori ordine'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--anno',
+            type=int,
+            default=timezone.now().year,
+            help='Anno dei DDT da controllare (default: anno corrente)'
+        )
+        parser.add_argument(
+            '--serie',
+            type=str,
+            help="Serie da controllare, es: '2024-{numero}' (default: tutte)"
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Scrive il report in formato JSON'
+        )
+        parser.add_argument(
+            '--errore',
+            action='store_true',
+            help='Termina con errore se ci sono anomalie'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        report = audit_numerazione(options['anno'], options['serie'])
+        secondi = time.perf_counter() - start
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.write_report(report, secondi)
+
+        if options['errore'] and has_anomalie(report):
+            raise CommandError(f'Numerazione {options["anno"]} non corretta')
+
+    def write_report(self, report, secondi):
+        if not report['serie']:
+            self.stdout.write(f'Nessun DDT numerato nel {report["anno"]}')
+            return
+
+        for voce in report['serie']:
+            self.stdout.write(
+                f'Serie {voce["serie"]}: {voce["documenti"]} DDT, '
+                f'progressivi {voce["primo"]}-{voce["ultimo"]}'
+            )
+            if voce['buchi']:
+                self.stdout.write(self.style.ERROR(
+                    f'  {voce["numeri_mancanti"]} numeri mancanti: ' + ', '.join(
+                        str(buco['da']) if buco['da'] == buco['a'] else f'{buco["da"]}-{buco["a"]}'
+                        for buco in voce['buchi']
+                    )
+                ))
+            for duplicato in voce['duplicati']:
+                self.stdout.write(self.style.ERROR(
+                    f'  Progressivo {duplicato["progressivo"]} duplicato: ' + ', '.join(duplicato['numeri'])
+                ))
+            for fuori_ordine in voce['date_fuori_ordine']:
+                self.stdout.write(self.style.WARNING(
+                    f'  {fuori_ordine["numero"]} del {fuori_ordine["data"]} ha una data precedente a '
+                    f'{fuori_ordine["numero_precedente"]} del {fuori_ordine["data_precedente"]}'
+                ))
+
+        if has_anomalie(report):
+            self.stdout.write(self.style.ERROR(f'Anomalie trovate ({secondi:.3f}s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Numerazione corretta ({secondi:.3f}s)'))
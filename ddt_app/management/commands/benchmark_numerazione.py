@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Comando per verificare la numerazione DDT con più creatori contemporanei
+"""
+
+import json
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from ddt_app.models import FormatoNumerazioneDDT
+from ddt_app.pdf_benchmark import SyntheticData, percentile
+
+
+def run_numbering_benchmark(creators, per_creator, anno=2099, mese=1):
+    """
+    Crea DDT da più thread contemporaneamente con la numerazione automatica
+
+    Ogni thread usa una propria connessione e assegna il numero e salva il
+    DDT nella stessa transazione, come la vista di creazione. I DDT, il
+    formato di prova e le anagrafiche vengono eliminati alla fine.
+
+    Args:
+        creators (int): Thread che creano DDT in parallelo
+        per_creator (int): DDT creati da ogni thread
+        anno (int): Anno della serie di prova
+        mese (int): Mese della serie di prova
+
+    Returns:
+        dict: Numeri creati, duplicati, buchi, errori e tempi
+    """
+    with tempfile.TemporaryDirectory() as media_root:
+        data = SyntheticData(media_root)
+        formato = FormatoNumerazioneDDT.objects.create(
+            formato='custom',
+            formato_personalizzato='BENCH-{anno}-{numero}',
+            numero_iniziale=1,
+            lunghezza_numero=6,
+            attivo=False,
+        )
+        numeri = []
+        timings = []
+        errori = []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(creators)
+
+        def creator():
+            try:
+                start_barrier.wait()
+                for _ in range(per_creator):
+                    ddt, _ = data.build_ddt('', 'base')
+                    start = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            ddt.numero = formato.genera_numero(anno, mese)
+                            ddt.save()
+                    except Exception as e:
+                        with lock:
+                            errori.append(f"{type(e).__name__}: {e}")
+                        continue
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        numeri.append(ddt.numero)
+                        timings.append(elapsed)
+            finally:
+                connection.close()
+
+        try:
+            threads = [threading.Thread(target=creator) for _ in range(creators)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            secondi = time.perf_counter() - start
+        finally:
+            data.delete()
+            formato.delete()
+
+    progressivi = {formato.estrai_progressivo(numero, anno, mese) for numero in numeri}
+    return {
+        'creatori': creators,
+        'ddt_per_creatore': per_creator,
+        'creati': len(numeri),
+        'duplicati': len(numeri) - len(set(numeri)),
+        'buchi': (max(progressivi) - len(progressivi)) if progressivi else 0,
+        'errori': len(errori),
+        'dettaglio_errori': sorted(set(errori))[:10],
+        'secondi': round(secondi, 3),
+        'ddt_al_secondo': round(len(numeri) / secondi, 1) if secondi else 0,
+        'p50_ms': round(percentile(timings, 50), 3) if timings else None,
+        'p95_ms': round(percentile(timings, 95), 3) if timings else None,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Crea DDT in parallelo con la numerazione automatica e verifica che non ci siano numeri duplicati'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--creatori',
+            type=int,
+            default=8,
+            help='Thread che creano DDT contemporaneamente (default: 8)'
+        )
+        parser.add_argument(
+            '--ddt',
+            type=int,
+            default=25,
+            help='DDT creati da ogni thread (default: 25)'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='File JSON in cui salvare i risultati'
+        )
+
+    def handle(self, *args, **options):
+        if options['creatori'] < 1 or options['ddt'] < 1:
+            raise CommandError('Creatori e DDT per creatore devono essere almeno 1')
+
+        results = run_numbering_benchmark(options['creatori'], options['ddt'])
+
+        self.stdout.write(
+            f'{results["creati"]} DDT creati da {results["creatori"]} creatori in {results["secondi"]:.2f}s '
+            f'({results["ddt_al_secondo"]} DDT/s, p50 {results["p50_ms"]} ms, p95 {results["p95_ms"]} ms)'
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+                f.write('\n')
+            self.stdout.write(f'Risultati salvati in {options["output"]}')
+
+        if results['duplicati'] or results['errori'] or results['buchi']:
+            raise CommandError(
+                f'Numerazione non corretta: {results["duplicati"]} duplicati, {results["buchi"]} buchi, '
+                f'{results["errori"]} errori\n' + '\n'.join(results['dettaglio_errori'])
+            )
+        self.stdout.write(self.style.SUCCESS('Nessun numero duplicato'))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Comando per misurare le prestazioni della generazione PDF dei DDT
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from ddt_app.pdf_benchmark import (
+    DEFAULT_BATCH_SIZES, DEFAULT_ITERATIONS, compare_with_baseline, run_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = 'Misura latenza, dimensione, operatori e query della generazione PDF su DDT sintetici'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='File JSON in cui salvare i risultati'
+        )
+        parser.add_argument(
+            '--baseline',
+            type=str,
+            help='File JSON di una esecuzione precedente da usare come riferimento'
+        )
+        parser.add_argument(
+            '--iterazioni',
+            type=int,
+            default=DEFAULT_ITERATIONS,
+            help=f'Stampe misurate per ogni forma di DDT (default: {DEFAULT_ITERATIONS})'
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            nargs='*',
+            default=list(DEFAULT_BATCH_SIZES),
+            help='Numero di DDT delle stampe in blocco (default: 100 1000)'
+        )
+        parser.add_argument(
+            '--tolleranza',
+            type=float,
+            default=0.5,
+            help='Aumento massimo ammesso delle latenze rispetto alla baseline (default: 0.5)'
+        )
+
+    def handle(self, *args, **options):
+        if options['iterazioni'] < 1:
+            raise CommandError('Il numero di iterazioni deve essere almeno 1')
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], 'r', encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Impossibile leggere la baseline {options["baseline"]}: {e}')
+
+        results = run_benchmark(iterations=options['iterazioni'], batch_sizes=options['batch'])
+
+        for shape, metrics in results['singoli'].items():
+            self.stdout.write(
+                f'{shape:<20} p50 {metrics["p50_ms"]:8.2f} ms  p95 {metrics["p95_ms"]:8.2f} ms  '
+                f'{metrics["byte"]:>8} byte  {metrics["operatori"]:>6} operatori  {metrics["query"]} query'
+            )
+        for size, metrics in results['batch'].items():
+            self.stdout.write(
+                f'{"batch " + size:<20} {metrics["ms_per_documento"]:8.2f} ms/documento  '
+                f'{metrics["byte_per_documento"]:>8} byte/documento  {metrics["query"]} query'
+            )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+                f.write('\n')
+            self.stdout.write(f'Risultati salvati in {options["output"]}')
+
+        if baseline is not None:
+            regressions = compare_with_baseline(results, baseline, options['tolleranza'])
+            if regressions:
+                raise CommandError('Peggioramenti rispetto alla baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Nessun peggioramento rispetto alla baseline'))
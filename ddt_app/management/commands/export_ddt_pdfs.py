@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Comando per esportare in blocco i PDF dei DDT in un archivio ZIP
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from ddt_app.forms import DDTFiltroForm
+from ddt_app.models import DDT
+from ddt_app.pdf_export import stream_ddt_zip
+from ddt_app.pdf_workers import PDFRenderPool, get_render_pool
+
+
+class Command(BaseCommand):
+    help = 'Esporta i PDF dei DDT filtrati in un archivio ZIP'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            type=str,
+            help='Percorso del file ZIP da creare'
+        )
+        parser.add_argument(
+            '--data-da',
+            type=str,
+            help='Data documento iniziale (AAAA-MM-GG)'
+        )
+        parser.add_argument(
+            '--data-a',
+            type=str,
+            help='Data documento finale (AAAA-MM-GG)'
+        )
+        parser.add_argument(
+            '--mittente',
+            type=int,
+            help='ID del mittente'
+        )
+        parser.add_argument(
+            '--destinatario',
+            type=int,
+            help='ID del destinatario'
+        )
+        parser.add_argument(
+            '--vettore',
+            type=int,
+            help='ID del vettore'
+        )
+        parser.add_argument(
+            '--ids',
+            type=str,
+            help='ID dei DDT separati da virgola'
+        )
+        parser.add_argument(
+            '--anno',
+            type=int,
+            help='Anno dei DDT'
+        )
+        parser.add_argument(
+            '--numero-da',
+            type=int,
+            help='Progressivo iniziale (es: 120)'
+        )
+        parser.add_argument(
+            '--numero-a',
+            type=int,
+            help='Progressivo finale (es: 340)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Numero di processi dedicati alla generazione (default: pool PDF condiviso)'
+        )
+
+    def handle(self, *args, **options):
+        form = DDTFiltroForm({
+            campo: options[campo]
+            for campo in ('data_da', 'data_a', 'mittente', 'destinatario', 'vettore', 'ids', 'anno', 'numero_da', 'numero_a')
+            if options[campo] is not None
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        ddt_ids = list(form.filtra(DDT.objects.all()).values_list('id', flat=True))
+        dedicated = options['workers'] is not None
+        if dedicated:
+            pool = PDFRenderPool(workers=options['workers'])
+            pool.start()
+        else:
+            pool = get_render_pool()
+
+        self.stdout.write(f'Esportazione di {len(ddt_ids)} DDT con {pool.workers or 1} processi...')
+
+        stats = {}
+        try:
+            with open(options['output'], 'wb') as output_file:
+                for chunk in stream_ddt_zip(ddt_ids, pool=pool, stats=stats):
+                    output_file.write(chunk)
+        finally:
+            if dedicated:
+                pool.shutdown()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Esportati {stats["documenti"]} DDT in {options["output"]} '
+                f'({stats["secondi"]:.2f}s, {stats["documenti_al_secondo"]:.1f} documenti/s)'
+            )
+        )
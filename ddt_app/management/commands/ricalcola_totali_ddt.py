@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Comando per ricalcolare i totali memorizzati dei DDT
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ddt_app.models import DDT
+
+
+class Command(BaseCommand):
+    help = (
+        'Ricalcola numero di righe, quantità e valore totali dei DDT dalle loro righe, '
+        'ad esempio dopo modifiche fatte direttamente sul database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--anno',
+            type=int,
+            help='Anno dei DDT da ricalcolare (default: tutti)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='DDT ricalcolati per transazione (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        ddt = DDT.objects.order_by('id')
+        if options['anno']:
+            ddt = ddt.filter(data_documento__year=options['anno'])
+        ddt_ids = list(ddt.values_list('id', flat=True))
+        chunk_size = max(options['chunk_size'], 1)
+
+        start = time.perf_counter()
+        aggiornati = 0
+        # Una transazione per blocco: le tabelle non restano bloccate per tutto il ricalcolo
+        for inizio in range(0, len(ddt_ids), chunk_size):
+            with transaction.atomic():
+                aggiornati += DDT.objects.filter(
+                    id__in=ddt_ids[inizio:inizio + chunk_size]
+                ).aggiorna_totali()
+        self.stdout.write(self.style.SUCCESS(
+            f"Totali di {aggiornati} DDT ricalcolati in {time.perf_counter() - start:.2f}s"
+        ))
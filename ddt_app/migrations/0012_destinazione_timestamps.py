@@ -0,0 +1,25 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ddt_app", "0011_mittente_logo"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="destinazione",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="destinazione",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ddt_app', '0012_destinazione_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContatoreNumerazioneDDT',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('serie', models.CharField(max_length=100, verbose_name='Serie')),
+                ('ultimo_numero', models.PositiveIntegerField(default=0, verbose_name='Ultimo Numero')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('formato', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contatori', to='ddt_app.formatonumerazioneddt')),
+                ('mittente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='ddt_app.mittente', verbose_name='Mittente')),
+            ],
+            options={
+                'verbose_name': 'Contatore Numerazione DDT',
+                'verbose_name_plural': 'Contatori Numerazione DDT',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='contatorenumerazioneddt',
+            constraint=models.UniqueConstraint(condition=models.Q(('mittente__isnull', False)), fields=('formato', 'serie', 'mittente'), name='contatore_ddt_serie_mittente_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='contatorenumerazioneddt',
+            constraint=models.UniqueConstraint(condition=models.Q(('mittente__isnull', True)), fields=('formato', 'serie'), name='contatore_ddt_serie_unico'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:41
+
+import re
+
+from django.db import migrations, models
+
+
+def _serie(formato, anno, mese):
+    """Copia di FormatoNumerazioneDDT.get_serie() al momento della migrazione"""
+    if formato.formato == 'custom' and formato.formato_personalizzato:
+        return formato.formato_personalizzato.format(anno=anno, mese=mese, numero='{numero}')
+    prefisso = {
+        'aaaa-num': str(anno),
+        'mmaa-num': f"{mese:02d}{str(anno)[-2:]}",
+        'aa-num': str(anno)[-2:],
+    }.get(formato.formato, '')
+    return f"{prefisso}-{{numero}}" if prefisso else "{numero}"
+
+
+def _scomponi(numero, data_documento, formato):
+    """Copia di scomponi_numero_ddt() al momento della migrazione"""
+    anno, mese = data_documento.year, data_documento.month
+    if formato is not None:
+        prima, _, dopo = _serie(formato, anno, mese).partition('{numero}')
+        match = re.fullmatch(re.escape(prima) + r'(\d+)' + re.escape(dopo), numero)
+        if match:
+            return _serie(formato, anno, mese), anno, int(match.group(1))
+    match = re.search(r'(\d+)$', numero)
+    if not match:
+        return '', anno, None
+    return numero[:match.start()] + '{numero}', anno, int(match.group(1))
+
+
+def popola_progressivi(apps, schema_editor):
+    DDT = apps.get_model('ddt_app', 'DDT')
+    FormatoNumerazioneDDT = apps.get_model('ddt_app', 'FormatoNumerazioneDDT')
+    formato = FormatoNumerazioneDDT.objects.filter(attivo=True).first()
+
+    blocco = []
+    for ddt in DDT.objects.only('id', 'numero', 'data_documento').iterator(chunk_size=500):
+        ddt.serie, ddt.anno, ddt.progressivo = _scomponi(ddt.numero, ddt.data_documento, formato)
+        blocco.append(ddt)
+        if len(blocco) == 500:
+            DDT.objects.bulk_update(blocco, ['serie', 'anno', 'progressivo'])
+            blocco = []
+    if blocco:
+        DDT.objects.bulk_update(blocco, ['serie', 'anno', 'progressivo'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ddt_app', '0013_contatorenumerazioneddt'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ddt',
+            options={'ordering': ['-data_documento', '-progressivo'], 'verbose_name': 'DDT', 'verbose_name_plural': 'DDT'},
+        ),
+        migrations.AddField(
+            model_name='ddt',
+            name='anno',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True, verbose_name='Anno'),
+        ),
+        migrations.AddField(
+            model_name='ddt',
+            name='progressivo',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Progressivo'),
+        ),
+        migrations.AddField(
+            model_name='ddt',
+            name='serie',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Serie'),
+        ),
+        migrations.RunPython(popola_progressivi, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ddt',
+            index=models.Index(fields=['data_documento', 'progressivo'], name='ddt_data_progressivo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ddt',
+            index=models.Index(fields=['anno', 'progressivo', 'data_documento'], name='ddt_anno_progressivo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ddt',
+            index=models.Index(fields=['serie', 'progressivo'], name='ddt_serie_progressivo_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ddt_app', '0014_ddt_serie_anno_progressivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrenotazioneNumeriDDT',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32, unique=True, verbose_name='Token')),
+                ('serie', models.CharField(max_length=100, verbose_name='Serie')),
+                ('anno', models.PositiveSmallIntegerField(verbose_name='Anno')),
+                ('mese', models.PositiveSmallIntegerField(verbose_name='Mese')),
+                ('primo', models.PositiveIntegerField(verbose_name='Primo Progressivo')),
+                ('ultimo', models.PositiveIntegerField(verbose_name='Ultimo Progressivo')),
+                ('scadenza', models.DateTimeField(db_index=True, verbose_name='Scadenza')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('formato', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prenotazioni', to='ddt_app.formatonumerazioneddt')),
+                ('mittente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='ddt_app.mittente', verbose_name='Mittente')),
+            ],
+            options={
+                'verbose_name': 'Prenotazione Numeri DDT',
+                'verbose_name_plural': 'Prenotazioni Numeri DDT',
+            },
+        ),
+        migrations.CreateModel(
+            name='NumeroLiberoDDT',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('serie', models.CharField(max_length=100, verbose_name='Serie')),
+                ('progressivo', models.PositiveIntegerField(verbose_name='Progressivo')),
+                ('formato', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='numeri_liberi', to='ddt_app.formatonumerazioneddt')),
+                ('mittente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='ddt_app.mittente', verbose_name='Mittente')),
+            ],
+            options={
+                'verbose_name': 'Numero Libero DDT',
+                'verbose_name_plural': 'Numeri Liberi DDT',
+                'ordering': ['progressivo'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='numeroliberoddt',
+            constraint=models.UniqueConstraint(condition=models.Q(('mittente__isnull', False)), fields=('formato', 'serie', 'mittente', 'progressivo'), name='numero_libero_ddt_mittente_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='numeroliberoddt',
+            constraint=models.UniqueConstraint(condition=models.Q(('mittente__isnull', True)), fields=('formato', 'serie', 'progressivo'), name='numero_libero_ddt_unico'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ddt_app', '0015_prenotazioni_numeri_ddt'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ddt',
+            index=models.Index(fields=['anno', 'serie', 'progressivo', 'data_documento'], name='ddt_anno_serie_progr_idx'),
+        ),
+    ]
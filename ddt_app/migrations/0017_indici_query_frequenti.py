@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ddt_app', '0016_ddt_audit_numerazione_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='autista',
+            index=models.Index(condition=models.Q(('attivo', True)), fields=['vettore', 'cognome', 'nome'], name='autista_vettore_attivo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='causaletrasporto',
+            index=models.Index(condition=models.Q(('attiva', True)), fields=['codice'], name='causale_attiva_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ddt',
+            index=models.Index(fields=['data_ritiro', 'progressivo'], name='ddt_ritiro_progressivo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ddt',
+            index=models.Index(fields=['mittente', 'data_documento', 'progressivo'], name='ddt_mittente_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ddt',
+            index=models.Index(fields=['destinatario', 'data_documento', 'progressivo'], name='ddt_destinatario_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ddt',
+            index=models.Index(fields=['created_at'], name='ddt_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sedemittente',
+            index=models.Index(condition=models.Q(('attiva', True)), fields=['mittente', 'nome'], name='sede_mittente_attiva_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sedemittente',
+            index=models.Index(condition=models.Q(('attiva', True)), fields=['nome'], name='sede_attiva_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='targavettore',
+            index=models.Index(condition=models.Q(('attiva', True)), fields=['vettore', 'targa'], name='targa_vettore_attiva_idx'),
+        ),
+    ]
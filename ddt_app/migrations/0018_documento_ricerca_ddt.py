@@ -0,0 +1,128 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:06
+
+from collections import defaultdict
+
+from django.db import OperationalError, migrations, models
+import django.db.models.deletion
+
+
+FTS_TABLE = 'ddt_app_ricerca_fts'
+DOCUMENTI_TABLE = 'ddt_app_documentoricercaddt'
+
+SQLITE_TRIGGERS = [
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOCUMENTI_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, testo) VALUES (new.ddt_id, new.testo);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOCUMENTI_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, testo) VALUES ('delete', old.ddt_id, old.testo);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOCUMENTI_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, testo) VALUES ('delete', old.ddt_id, old.testo);
+        INSERT INTO {FTS_TABLE}(rowid, testo) VALUES (new.ddt_id, new.testo);
+    END""",
+]
+
+POSTGRESQL_INDEXES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX ddt_ricerca_tsv_idx ON {DOCUMENTI_TABLE} USING GIN (to_tsvector('simple', testo))",
+    f"CREATE INDEX ddt_ricerca_trgm_idx ON {DOCUMENTI_TABLE} USING GIN (testo gin_trgm_ops)",
+]
+
+# Copia di ddt_app.ricerca.CAMPI_DOCUMENTO al momento della migrazione
+CAMPI_DOCUMENTO = (
+    'numero', 'mittente__nome', 'sede_mittente__nome', 'destinatario__nome', 'destinazione__nome',
+    'luogo_destinazione', 'vettore__nome', 'autista__nome', 'autista__cognome',
+    'targa_vettore__targa', 'targa_vettore_2__targa',
+    'causale_trasporto__codice', 'causale_trasporto__descrizione',
+)
+
+
+def crea_indice_ricerca(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        if schema_editor.connection.vendor == 'sqlite':
+            # Il tokenizer trigram richiede SQLite 3.34: senza, ricerca per prefisso di parola
+            for tokenizer in ('trigram', 'unicode61 remove_diacritics 2'):
+                try:
+                    cursor.execute(
+                        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(testo, "
+                        f"content='{DOCUMENTI_TABLE}', content_rowid='ddt_id', tokenize='{tokenizer}')"
+                    )
+                    break
+                except OperationalError:
+                    continue
+            else:
+                # SQLite senza FTS5: la ricerca usa LIKE sui documenti
+                return
+            for trigger in SQLITE_TRIGGERS:
+                cursor.execute(trigger)
+        elif schema_editor.connection.vendor == 'postgresql':
+            for sql in POSTGRESQL_INDEXES:
+                cursor.execute(sql)
+
+
+def elimina_indice_ricerca(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        if schema_editor.connection.vendor == 'sqlite':
+            for suffisso in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffisso}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif schema_editor.connection.vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS ddt_ricerca_tsv_idx")
+            cursor.execute("DROP INDEX IF EXISTS ddt_ricerca_trgm_idx")
+
+
+def popola_documenti_ricerca(apps, schema_editor):
+    """Copia di ddt_app.ricerca.aggiorna_documenti_ricerca() al momento della migrazione"""
+    DDT = apps.get_model('ddt_app', 'DDT')
+    DDTRiga = apps.get_model('ddt_app', 'DDTRiga')
+    DocumentoRicercaDDT = apps.get_model('ddt_app', 'DocumentoRicercaDDT')
+
+    ddt_ids = list(DDT.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ddt_ids), 500):
+        blocco = ddt_ids[start:start + 500]
+        righe = defaultdict(list)
+        for ddt_id, articolo, descrizione in DDTRiga.objects.filter(ddt_id__in=blocco).order_by(
+            'ordine', 'id'
+        ).values_list('ddt_id', 'articolo__nome', 'descrizione'):
+            righe[ddt_id].extend((articolo, descrizione))
+        documenti = []
+        for ddt_id, *valori in DDT.objects.filter(id__in=blocco).values_list('id', *CAMPI_DOCUMENTO):
+            parti = [str(valore) for valore in (*valori, *righe[ddt_id]) if valore]
+            documenti.append(DocumentoRicercaDDT(ddt_id=ddt_id, testo=' '.join(' '.join(parti).split())))
+        DocumentoRicercaDDT.objects.bulk_create(documenti)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ddt_app', '0017_indici_query_frequenti'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoRicercaDDT',
+            fields=[
+                ('ddt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='documento_ricerca', serialize=False, to='ddt_app.ddt')),
+                ('testo', models.TextField(verbose_name='Testo')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Documento Ricerca DDT',
+                'verbose_name_plural': 'Documenti Ricerca DDT',
+            },
+        ),
+        migrations.CreateModel(
+            name='IndiceRicercaDDT',
+            fields=[
+                ('ddt', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='indice_ricerca', serialize=False, to='ddt_app.ddt')),
+                ('testo', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'ddt_app_ricerca_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(crea_indice_ricerca, elimina_indice_ricerca),
+        migrations.RunPython(popola_documenti_ricerca, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ddt_app', '0018_documento_ricerca_ddt'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ddt',
+            index=models.Index(fields=['data_documento', 'numero', 'id'], name='ddt_data_numero_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destinatario',
+            index=models.Index(fields=['nome', 'id'], name='destinatario_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mittente',
+            index=models.Index(fields=['nome', 'id'], name='mittente_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vettore',
+            index=models.Index(fields=['nome', 'id'], name='vettore_nome_idx'),
+        ),
+    ]
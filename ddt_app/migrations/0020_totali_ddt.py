@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:19
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def calcola_totali(apps, schema_editor):
+    """Copia di DDTQuerySet.aggiorna_totali() al momento della migrazione"""
+    DDT = apps.get_model('ddt_app', 'DDT')
+    DDTRiga = apps.get_model('ddt_app', 'DDTRiga')
+    righe = DDTRiga.objects.filter(ddt=OuterRef('pk')).order_by().values('ddt')
+    decimale = models.DecimalField()
+    DDT.objects.update(
+        numero_righe=Coalesce(
+            Subquery(righe.annotate(n=Count('pk')).values('n'), output_field=models.IntegerField()), 0
+        ),
+        totale_quantita=Coalesce(
+            Subquery(righe.annotate(n=Sum('quantita')).values('n'), output_field=decimale),
+            Decimal('0'), output_field=decimale
+        ),
+        totale_valore=Coalesce(
+            Subquery(
+                righe.annotate(n=Sum(F('quantita') * F('articolo__prezzo_unitario'))).values('n'),
+                output_field=decimale
+            ),
+            Decimal('0'), output_field=decimale
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ddt_app', '0019_indici_paginazione_cursore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ddt',
+            name='numero_righe',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Numero Righe'),
+        ),
+        migrations.AddField(
+            model_name='ddt',
+            name='totale_quantita',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Totale Quantità'),
+        ),
+        migrations.AddField(
+            model_name='ddt',
+            name='totale_valore',
+            field=models.DecimalField(decimal_places=4, default=0, editable=False, max_digits=20, verbose_name='Totale Valore'),
+        ),
+        migrations.RunPython(calcola_totali, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:24
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ddt_app', '0020_totali_ddt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ddt',
+            name='dati_stampa',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Dati di Stampa'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:49
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def unifica_contatori(apps, schema_editor):
+    """
+    Elimina i contatori e i numeri liberi per mittente
+
+    I contatori globali vengono allineati all'ultimo numero dei DDT della
+    serie, compresi quelli assegnati dai contatori per mittente.
+    """
+    ContatoreNumerazioneDDT = apps.get_model('ddt_app', 'ContatoreNumerazioneDDT')
+    NumeroLiberoDDT = apps.get_model('ddt_app', 'NumeroLiberoDDT')
+    DDT = apps.get_model('ddt_app', 'DDT')
+
+    ContatoreNumerazioneDDT.objects.filter(mittente__isnull=False).delete()
+    NumeroLiberoDDT.objects.filter(mittente__isnull=False).delete()
+    for contatore in ContatoreNumerazioneDDT.objects.all():
+        ultimo = DDT.objects.filter(serie=contatore.serie).aggregate(ultimo=Max('progressivo'))['ultimo']
+        if ultimo is not None and ultimo > contatore.ultimo_numero:
+            contatore.ultimo_numero = ultimo
+            contatore.save(update_fields=['ultimo_numero'])
+        NumeroLiberoDDT.objects.filter(
+            formato_id=contatore.formato_id, serie=contatore.serie, progressivo__gt=contatore.ultimo_numero
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ddt_app', '0021_dati_stampa_ddt'),
+    ]
+
+    operations = [
+        migrations.RunPython(unifica_contatori, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='contatorenumerazioneddt',
+            name='contatore_ddt_serie_mittente_unico',
+        ),
+        migrations.RemoveConstraint(
+            model_name='contatorenumerazioneddt',
+            name='contatore_ddt_serie_unico',
+        ),
+        migrations.RemoveConstraint(
+            model_name='numeroliberoddt',
+            name='numero_libero_ddt_mittente_unico',
+        ),
+        migrations.RemoveConstraint(
+            model_name='numeroliberoddt',
+            name='numero_libero_ddt_unico',
+        ),
+        migrations.RemoveField(
+            model_name='contatorenumerazioneddt',
+            name='mittente',
+        ),
+        migrations.RemoveField(
+            model_name='numeroliberoddt',
+            name='mittente',
+        ),
+        migrations.RemoveField(
+            model_name='prenotazionenumeriddt',
+            name='mittente',
+        ),
+        migrations.AddConstraint(
+            model_name='contatorenumerazioneddt',
+            constraint=models.UniqueConstraint(fields=('formato', 'serie'), name='contatore_ddt_serie_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='numeroliberoddt',
+            constraint=models.UniqueConstraint(fields=('formato', 'serie', 'progressivo'), name='numero_libero_ddt_unico'),
+        ),
+    ]
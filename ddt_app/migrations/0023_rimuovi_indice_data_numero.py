@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ddt_app', '0022_numerazione_senza_mittente'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ddt',
+            name='ddt_data_numero_idx',
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copia_prezzi(apps, schema_editor):
+    """Le righe esistenti prendono il prezzo attuale dell'articolo, già usato per i totali"""
+    Articolo = apps.get_model('ddt_app', 'Articolo')
+    DDTRiga = apps.get_model('ddt_app', 'DDTRiga')
+    DDTRiga.objects.using(schema_editor.connection.alias).update(prezzo_unitario=Subquery(
+        Articolo.objects.filter(pk=OuterRef('articolo_id')).values('prezzo_unitario')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ddt_app', '0023_rimuovi_indice_data_numero'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ddtriga',
+            name='prezzo_unitario',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='Prezzo Unitario'),
+        ),
+        migrations.RunPython(copia_prezzi, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='ddtriga',
+            name='prezzo_unitario',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, verbose_name='Prezzo Unitario'),
+        ),
+    ]
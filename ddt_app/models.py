@@ -1,6 +1,17 @@
-from django.db import models
+import re
+import uuid
+from datetime import date
+
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import F, Max, OuterRef, Q, Subquery
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import RegexValidator
 
+from .querysets import (
+    AutistaQuerySet, DDTQuerySet, DDTRigaQuerySet, DestinatarioQuerySet, DestinazioneQuerySet,
+    MittenteQuerySet, SedeMittenteQuerySet, TargaVettoreQuerySet, VettoreQuerySet,
+)
+
 
 class Mittente(models.Model):
     """Modello per i mittenti dei DDT"""
@@ -15,10 +26,16 @@ class Mittente(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MittenteQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Mittente"
         verbose_name_plural = "Mittenti"
         ordering = ['nome']
+        indexes = [
+            # Lista paginata a cursore su (nome, id)
+            models.Index(fields=['nome', 'id'], name='mittente_nome_idx'),
+        ]
 
     def __str__(self):
         return self.nome
@@ -39,10 +56,17 @@ class SedeMittente(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SedeMittenteQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Sede Mittente"
         verbose_name_plural = "Sedi Mittente"
         ordering = ['nome']
+        indexes = [
+            # Sedi attive di un mittente (form DDT, API sedi) e di tutti i mittenti
+            models.Index(fields=['mittente', 'nome'], condition=Q(attiva=True), name='sede_mittente_attiva_idx'),
+            models.Index(fields=['nome'], condition=Q(attiva=True), name='sede_attiva_nome_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nome} - {self.mittente.nome}"
@@ -55,6 +79,10 @@ class Destinazione(models.Model):
     codice_stalla = models.CharField(max_length=50, blank=True, verbose_name="Codice Stalla")
     note = models.TextField(blank=True, verbose_name="Note")
     destinatario = models.ForeignKey('Destinatario', on_delete=models.CASCADE, related_name='destinazioni')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DestinazioneQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Destinazione"
@@ -79,10 +107,16 @@ class Destinatario(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = DestinatarioQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Destinatario"
         verbose_name_plural = "Destinatari"
         ordering = ['nome']
+        indexes = [
+            # Lista paginata a cursore su (nome, id)
+            models.Index(fields=['nome', 'id'], name='destinatario_nome_idx'),
+        ]
 
     def __str__(self):
         return self.nome
@@ -105,10 +139,16 @@ class Vettore(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = VettoreQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Vettore"
         verbose_name_plural = "Vettori"
         ordering = ['nome']
+        indexes = [
+            # Lista paginata a cursore su (nome, id)
+            models.Index(fields=['nome', 'id'], name='vettore_nome_idx'),
+        ]
 
     def __str__(self):
         return self.nome
@@ -125,10 +165,16 @@ class Autista(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AutistaQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Autista"
         verbose_name_plural = "Autisti"
         ordering = ['cognome', 'nome']
+        indexes = [
+            # Autisti attivi di un vettore (form DDT, API autisti)
+            models.Index(fields=['vettore', 'cognome', 'nome'], condition=Q(attivo=True), name='autista_vettore_attivo_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nome} {self.cognome} - {self.vettore.nome}"
@@ -144,10 +190,16 @@ class TargaVettore(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TargaVettoreQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Targa Vettore"
         verbose_name_plural = "Targhe Vettore"
         ordering = ['targa']
+        indexes = [
+            # Targhe attive di un vettore (form DDT, API targhe)
+            models.Index(fields=['vettore', 'targa'], condition=Q(attiva=True), name='targa_vettore_attiva_idx'),
+        ]
 
     def __str__(self):
         return f"{self.targa} - {self.vettore.nome}"
@@ -197,36 +249,96 @@ class DDT(models.Model):
     targa_vettore = models.ForeignKey(TargaVettore, on_delete=models.PROTECT, verbose_name="Targa Veicolo 1", null=True, blank=True, related_name='ddt_targa_1')
     targa_vettore_2 = models.ForeignKey(TargaVettore, on_delete=models.PROTECT, verbose_name="Targa Veicolo 2", null=True, blank=True, related_name='ddt_targa_2')
     annotazioni = models.TextField(blank=True, verbose_name="Annotazioni")
+    # Numero scomposto: serie (es: '2024-{numero}'), anno e progressivo numerico
+    serie = models.CharField(max_length=100, blank=True, editable=False, verbose_name="Serie")
+    anno = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, verbose_name="Anno")
+    progressivo = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Progressivo")
     # Campo per note centrali nelle righe della tabella
     note_centrali = models.TextField(
         blank=True, 
         verbose_name="Note Centrali",
         help_text="Note da inserire al centro delle righe della tabella prodotti"
     )
+    # Totali delle righe, aggiornati a ogni modifica delle righe (DDTQuerySet.aggiorna_totali)
+    numero_righe = models.PositiveIntegerField(default=0, editable=False, verbose_name="Numero Righe")
+    totale_quantita = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, editable=False, verbose_name="Totale Quantità"
+    )
+    totale_valore = models.DecimalField(
+        max_digits=20, decimal_places=4, default=0, editable=False, verbose_name="Totale Valore"
+    )
+    # Anagrafiche e righe come stampate al momento dell'emissione (pdf_data.DDTData)
+    dati_stampa = models.JSONField(
+        null=True, blank=True, editable=False, encoder=DjangoJSONEncoder, verbose_name="Dati di Stampa"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = DDTQuerySet.as_manager()
+
+    CAMPI_TOTALI = ('numero_righe', 'totale_quantita', 'totale_valore')
+
     class Meta:
         verbose_name = "DDT"
         verbose_name_plural = "DDT"
-        ordering = ['-data_documento', '-numero']
+        ordering = ['-data_documento', '-progressivo']
+        indexes = [
+            # Ordinamento delle stampe per data e lista della home, paginata a
+            # cursore su (data_documento, progressivo, id)
+            models.Index(fields=['data_documento', 'progressivo'], name='ddt_data_progressivo_idx'),
+            # Intervalli di numeri di un anno (es: DDT 120-340 del 2025)
+            models.Index(fields=['anno', 'progressivo', 'data_documento'], name='ddt_anno_progressivo_idx'),
+            # Ultimo numero e buchi di una serie
+            models.Index(fields=['serie', 'progressivo'], name='ddt_serie_progressivo_idx'),
+            # Controllo della numerazione di un anno, già ordinato per serie e progressivo
+            models.Index(fields=['anno', 'serie', 'progressivo', 'data_documento'], name='ddt_anno_serie_progr_idx'),
+            # Stampe ed esportazioni filtrate per data di ritiro, o per mittente/destinatario e data
+            models.Index(fields=['data_ritiro', 'progressivo'], name='ddt_ritiro_progressivo_idx'),
+            models.Index(fields=['mittente', 'data_documento', 'progressivo'], name='ddt_mittente_data_idx'),
+            models.Index(fields=['destinatario', 'data_documento', 'progressivo'], name='ddt_destinatario_data_idx'),
+            # Filtro per data di creazione dell'admin
+            models.Index(fields=['created_at'], name='ddt_created_at_idx'),
+        ]
 
     def __str__(self):
         return f"DDT {self.numero} - {self.destinatario.nome}"
 
-    @property
-    def totale_quantita(self):
-        """Calcola la quantità totale degli articoli nel DDT"""
-        return sum(riga.quantita for riga in self.righe.all())
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and self.pk is not None and not self._state.adding and not kwargs.get('force_insert'):
+            # I totali sono scritti solo dalle righe: un DDT letto prima di
+            # modificarle non deve sovrascriverli con i valori precedenti
+            esclusi = {*self.CAMPI_TOTALI, *self.get_deferred_fields()}
+            update_fields = kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in esclusi and field.attname not in esclusi
+            ]
+        if update_fields is None or 'numero' in update_fields or 'data_documento' in update_fields:
+            self.aggiorna_progressivo()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'serie', 'anno', 'progressivo'}
+        super().save(*args, **kwargs)
+
+    def aggiorna_progressivo(self, formato=None):
+        """
+        Ricava serie, anno e progressivo dal numero del DDT
+        
+        Il numero viene letto con il formato di numerazione attivo; se non
+        vi appartiene, il progressivo è la parte numerica finale del numero.
+        
+        Args:
+            formato (FormatoNumerazioneDDT, optional): Formato di numerazione.
+                Default: formato attivo
+        """
+        self.serie, self.anno, self.progressivo = scomponi_numero_ddt(
+            self.numero, self.data_documento, formato
+        )
 
-    @property
-    def totale_valore(self):
-        """Calcola il valore totale del DDT"""
-        return sum(riga.quantita * riga.articolo.prezzo_unitario for riga in self.righe.all())
-    
     @property
     def ha_righe_articoli(self):
         """Verifica se il DDT ha righe con articoli specifici"""
+        if 'righe' in getattr(self, '_prefetched_objects_cache', {}):
+            return bool(self.righe.all())
         return self.righe.exists()
     
     @property
@@ -235,6 +347,40 @@ class DDT(models.Model):
         return bool(self.note_centrali) and not self.ha_righe_articoli
 
 
+def scomponi_numero_ddt(numero, data_documento, formato=None):
+    """
+    Scompone un numero DDT in serie, anno e progressivo
+    
+    Args:
+        numero (str): Numero del DDT
+        data_documento (date): Data del documento, che determina anno e mese della serie
+        formato (FormatoNumerazioneDDT, optional): Formato di numerazione.
+            Default: formato attivo
+    
+    Returns:
+        tuple: (serie, anno, progressivo); progressivo è None se il numero
+        non contiene cifre finali
+    """
+    if not data_documento:
+        return '', None, None
+    if isinstance(data_documento, str):
+        data_documento = date.fromisoformat(data_documento)
+    anno, mese = data_documento.year, data_documento.month
+    
+    if formato is None:
+        from .config_cache import get_formato_numerazione_attivo
+        formato = get_formato_numerazione_attivo()
+    if formato is not None:
+        progressivo = formato.estrai_progressivo(numero, anno, mese)
+        if progressivo is not None:
+            return formato.get_serie(anno, mese), anno, progressivo
+    
+    match = re.search(r'(\d+)$', numero or '')
+    if not match:
+        return '', anno, None
+    return numero[:match.start()] + '{numero}', anno, int(match.group(1))
+
+
 class DDTRiga(models.Model):
     """Modello per le righe degli articoli nei DDT"""
     ddt = models.ForeignKey(DDT, on_delete=models.CASCADE, related_name='righe', verbose_name="DDT")
@@ -242,6 +388,13 @@ class DDTRiga(models.Model):
     quantita = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Quantità")
     descrizione = models.TextField(blank=True, verbose_name="Descrizione Aggiuntiva")
     ordine = models.PositiveIntegerField(default=0, verbose_name="Ordine")
+    # Prezzo dell'articolo quando la riga è stata creata o ha cambiato
+    # articolo: le modifiche successive del listino non cambiano i DDT emessi
+    prezzo_unitario = models.DecimalField(
+        max_digits=10, decimal_places=2, editable=False, verbose_name="Prezzo Unitario"
+    )
+
+    objects = DDTRigaQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Riga DDT"
@@ -251,10 +404,69 @@ class DDTRiga(models.Model):
     def __str__(self):
         return f"{self.articolo.nome} - {self.quantita} {self.articolo.um}"
 
+    def save(self, *args, **kwargs):
+        # Il DDT è aggiornato dal segnale post_save nella stessa transazione
+        # (una volta sola per DDT dentro aggiornamento_ddt.aggiorna_ddt_una_volta)
+        using = kwargs.get('using') or router.db_for_write(DDTRiga, instance=self)
+        with transaction.atomic(using=using):
+            if self.prezzo_unitario is None or self._articolo_cambiato(using):
+                self.prezzo_unitario = self.articolo.prezzo_unitario
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'prezzo_unitario'}
+            super().save(*args, **kwargs)
+
+    def _articolo_cambiato(self, using):
+        """True se la riga salvata aveva un altro articolo"""
+        if self._state.adding:
+            return False
+        salvato = DDTRiga._base_manager.using(using).filter(pk=self.pk).values_list('articolo_id', flat=True).first()
+        return salvato is not None and salvato != self.articolo_id
+
     @property
     def valore_totale(self):
-        """Calcola il valore totale della riga"""
-        return self.quantita * self.articolo.prezzo_unitario
+        """Calcola il valore totale della riga, al prezzo della riga"""
+        prezzo = self.prezzo_unitario if self.prezzo_unitario is not None else self.articolo.prezzo_unitario
+        return self.quantita * prezzo
+
+
+class DocumentoRicercaDDT(models.Model):
+    """
+    Testo su cui si cerca un DDT
+
+    Contiene numero, anagrafiche, trasporto e righe del DDT ed è aggiornato
+    dai segnali (ddt_app.ricerca). Su PostgreSQL è indicizzato con tsvector e
+    trigrammi, su SQLite dalla tabella FTS5 di IndiceRicercaDDT.
+    """
+    ddt = models.OneToOneField(DDT, on_delete=models.CASCADE, primary_key=True, related_name='documento_ricerca')
+    testo = models.TextField(verbose_name="Testo")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Documento Ricerca DDT"
+        verbose_name_plural = "Documenti Ricerca DDT"
+
+    def __str__(self):
+        return f"Ricerca DDT {self.ddt_id}"
+
+
+class IndiceRicercaDDT(models.Model):
+    """
+    Tabella FTS5 dei documenti di ricerca (solo SQLite)
+
+    La tabella virtuale è creata dalla migrazione e tenuta allineata a
+    DocumentoRicercaDDT da trigger del database; rank è il punteggio bm25
+    della ricerca in corso (più basso = più pertinente).
+    """
+    ddt = models.OneToOneField(
+        DDT, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='indice_ricerca'
+    )
+    testo = models.TextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'ddt_app_ricerca_fts'
 
 
 class Configurazione(models.Model):
@@ -286,6 +498,10 @@ class CausaleTrasporto(models.Model):
         verbose_name = "Causale di Trasporto"
         verbose_name_plural = "Causali di Trasporto"
         ordering = ['codice']
+        indexes = [
+            # Causali proposte nel form DDT
+            models.Index(fields=['codice'], condition=Q(attiva=True), name='causale_attiva_idx'),
+        ]
 
     def __str__(self):
         return f"{self.codice} - {self.descrizione}"
@@ -333,41 +549,104 @@ class FormatoNumerazioneDDT(models.Model):
     def __str__(self):
         return f"{self.get_formato_display()} - {self.numero_iniziale}"
 
-    def genera_numero(self, anno=None, mese=None):
-        """Genera il prossimo numero DDT secondo il formato configurato"""
+    def genera_numero(self, anno=None, mese=None, data=None):
+        """
+        Assegna il prossimo numero DDT secondo il formato configurato
+        
+        Il numero viene preso dal contatore della serie con un solo UPDATE
+        della riga del contatore: va chiamato nella stessa transazione che
+        salva il DDT, così due salvataggi contemporanei non ottengono mai lo
+        stesso numero e un salvataggio annullato non consuma il numero.
+        
+        Args:
+            anno (int, optional): Anno della numerazione. Default: anno corrente
+            mese (int, optional): Mese della numerazione. Default: mese corrente
+            data (date, optional): Data del DDT: un numero libero viene
+                assegnato solo se non inverte l'ordine delle date della serie
+        
+        Returns:
+            str: Numero DDT assegnato
+        """
+        anno, mese = self._anno_mese(anno, mese)
+        # Il contatore viene aggiornato per primo, prima di qualunque lettura:
+        # SQLite non attende il lock se una transazione che ha già letto passa
+        # alla scrittura, ma fallisce subito con "database is locked"
+        progressivo = ContatoreNumerazioneDDT.incrementa(self, anno, mese)
+        libero = NumeroLiberoDDT.preleva(self, anno, mese, data)
+        if libero is not None:
+            # Il numero libero ha la precedenza: il contatore, ancora bloccato, torna indietro
+            ContatoreNumerazioneDDT.incrementa(self, anno, mese, quantita=-1)
+            progressivo = libero
+        return self.formatta_numero(progressivo, anno, mese)
+    
+    def anteprima_numero(self, anno=None, mese=None):
+        """
+        Prossimo numero DDT della serie, senza assegnarlo
+        
+        Serve a proporre il numero nel form: il numero effettivo viene
+        assegnato da genera_numero() al salvataggio.
+        """
+        anno, mese = self._anno_mese(anno, mese)
+        chiave = ContatoreNumerazioneDDT.chiave(self, anno, mese)
+        libero = NumeroLiberoDDT.objects.filter(**chiave).order_by('progressivo').values_list(
+            'progressivo', flat=True
+        ).first()
+        if libero is not None:
+            return self.formatta_numero(libero, anno, mese)
+        ultimo = ContatoreNumerazioneDDT.objects.filter(**chiave).values_list('ultimo_numero', flat=True).first()
+        if ultimo is None:
+            ultimo = self.ultimo_numero_esistente(anno, mese)
+        return self.formatta_numero(ultimo + 1, anno, mese)
+    
+    def get_serie(self, anno, mese):
+        """
+        Modello dei numeri di una serie, con {numero} al posto del progressivo
+        
+        Es: '2024-{numero}' per il formato AAAA-NUM nel 2024
+        """
+        if self.formato == 'custom' and self.formato_personalizzato:
+            return self.formato_personalizzato.format(anno=anno, mese=mese, numero='{numero}')
+        prefisso = self.get_prefisso(anno, mese)
+        return f"{prefisso}-{{numero}}" if prefisso else "{numero}"
+    
+    def formatta_numero(self, progressivo, anno, mese):
+        """Numero DDT di un progressivo, con la lunghezza richiesta"""
+        numero_formattato = str(progressivo).zfill(self.lunghezza_numero)
+        return self.get_serie(anno, mese).replace('{numero}', numero_formattato, 1)
+    
+    def estrai_progressivo(self, numero, anno, mese):
+        """
+        Progressivo di un numero DDT della serie
+        
+        Returns:
+            int: Progressivo, o None se il numero non appartiene alla serie
+        """
+        prima, _, dopo = self.get_serie(anno, mese).partition('{numero}')
+        match = re.fullmatch(re.escape(prima) + r'(\d+)' + re.escape(dopo), numero or '')
+        return int(match.group(1)) if match else None
+    
+    def ultimo_numero_esistente(self, anno, mese):
+        """
+        Ultimo progressivo della serie tra i DDT già salvati
+        
+        Usato solo alla creazione del contatore di una serie, per proseguire
+        la numerazione dei DDT creati prima dei contatori. Il confronto è
+        numerico, quindi resta corretto oltre la lunghezza del numero.
+        """
+        ultimo = DDT.objects.filter(serie=self.get_serie(anno, mese)).aggregate(
+            ultimo=Max('progressivo')
+        )['ultimo']
+        return ultimo if ultimo is not None else self.numero_iniziale - 1
+    
+    @staticmethod
+    def _anno_mese(anno, mese):
         from datetime import datetime
         
         if not anno:
             anno = datetime.now().year
         if not mese:
             mese = datetime.now().month
-            
-        # Trova l'ultimo numero utilizzato per questo formato
-        ultimo_ddt = DDT.objects.filter(
-            numero__startswith=self.get_prefisso(anno, mese)
-        ).order_by('-numero').first()
-        
-        if ultimo_ddt:
-            # Estrai il numero dall'ultimo DDT
-            try:
-                ultimo_numero = int(ultimo_ddt.numero.split('-')[-1])
-                prossimo_numero = ultimo_numero + 1
-            except (ValueError, IndexError):
-                prossimo_numero = self.numero_iniziale
-        else:
-            prossimo_numero = self.numero_iniziale
-            
-        # Formatta il numero con la lunghezza richiesta
-        numero_formattato = str(prossimo_numero).zfill(self.lunghezza_numero)
-        
-        if self.formato == 'custom' and self.formato_personalizzato:
-            return self.formato_personalizzato.format(
-                anno=anno,
-                mese=mese,
-                numero=numero_formattato
-            )
-        else:
-            return f"{self.get_prefisso(anno, mese)}-{numero_formattato}"
+        return anno, mese
     
     def get_prefisso(self, anno, mese):
         """Ottiene il prefisso per il formato selezionato"""
@@ -382,3 +661,251 @@ class FormatoNumerazioneDDT(models.Model):
         else:
             return ""
 
+
+class ContatoreNumerazioneDDT(models.Model):
+    """
+    Ultimo progressivo assegnato in una serie di numerazione DDT
+    
+    Una riga per formato e serie (es: '2024-{numero}'): assegnare un numero
+    aggiorna solo questa riga, indipendentemente da quanti DDT esistono.
+    La serie non dipende dal mittente, come il numero formattato: tutti i
+    numeri, anche quelli prenotati, vengono dallo stesso contatore.
+    """
+    formato = models.ForeignKey(FormatoNumerazioneDDT, on_delete=models.CASCADE, related_name='contatori')
+    serie = models.CharField(max_length=100, verbose_name="Serie")
+    ultimo_numero = models.PositiveIntegerField(default=0, verbose_name="Ultimo Numero")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Contatore Numerazione DDT"
+        verbose_name_plural = "Contatori Numerazione DDT"
+        constraints = [
+            models.UniqueConstraint(fields=['formato', 'serie'], name='contatore_ddt_serie_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.serie} - {self.ultimo_numero}"
+
+    @staticmethod
+    def chiave(formato, anno, mese):
+        """Filtro della riga del contatore di una serie"""
+        return {
+            'formato': formato,
+            'serie': formato.get_serie(anno, mese),
+        }
+
+    @classmethod
+    def incrementa(cls, formato, anno, mese, quantita=1):
+        """
+        Incrementa il contatore di una serie e restituisce il nuovo valore
+        
+        L'UPDATE blocca la riga fino alla fine della transazione: gli altri
+        salvataggi della stessa serie attendono e leggono il valore aggiornato.
+        
+        Args:
+            formato (FormatoNumerazioneDDT): Formato di numerazione
+            anno (int): Anno della serie
+            mese (int): Mese della serie
+            quantita (int): Numeri da assegnare
+        
+        Returns:
+            int: Ultimo progressivo assegnato
+        """
+        chiave = cls.chiave(formato, anno, mese)
+        with transaction.atomic():
+            contatori = cls.objects.filter(**chiave)
+            if not contatori.update(ultimo_numero=F('ultimo_numero') + quantita):
+                # Primo numero della serie: il contatore parte dai DDT esistenti
+                try:
+                    with transaction.atomic():
+                        contatore = cls.objects.create(
+                            ultimo_numero=formato.ultimo_numero_esistente(anno, mese) + quantita,
+                            **chiave
+                        )
+                    return contatore.ultimo_numero
+                except IntegrityError:
+                    # Creato nel frattempo da un altro salvataggio
+                    contatori.update(ultimo_numero=F('ultimo_numero') + quantita)
+            return contatori.values_list('ultimo_numero', flat=True).get()
+
+    @classmethod
+    def registra_numero(cls, formato, numero, anno, mese):
+        """
+        Allinea il contatore a un numero inserito a mano
+        
+        Se il numero appartiene alla serie ed è oltre il contatore, la
+        numerazione automatica prosegue da quel numero invece di riproporlo.
+        """
+        progressivo = formato.estrai_progressivo(numero, anno, mese)
+        if progressivo is None:
+            return
+        chiave = cls.chiave(formato, anno, mese)
+        # Senza contatore non c'è nulla da allineare: alla creazione il
+        # contatore parte comunque dall'ultimo numero esistente
+        cls.objects.filter(ultimo_numero__lt=progressivo, **chiave).update(ultimo_numero=progressivo)
+        NumeroLiberoDDT.objects.filter(progressivo=progressivo, **chiave).delete()
+
+
+class NumeroLiberoDDT(models.Model):
+    """
+    Numero restituito da una prenotazione e non ancora usato
+    
+    La numerazione automatica assegna prima i numeri liberi, dal più basso,
+    e solo dopo incrementa il contatore: i numeri prenotati e non usati non
+    lasciano buchi nella serie. Un numero libero non viene assegnato a un DDT
+    datato dopo il DDT del progressivo successivo (o prima di quello del
+    precedente), perché il controllo della numerazione segnalerebbe le date
+    fuori ordine: resta un buco nella serie.
+    """
+    formato = models.ForeignKey(FormatoNumerazioneDDT, on_delete=models.CASCADE, related_name='numeri_liberi')
+    serie = models.CharField(max_length=100, verbose_name="Serie")
+    progressivo = models.PositiveIntegerField(verbose_name="Progressivo")
+
+    class Meta:
+        verbose_name = "Numero Libero DDT"
+        verbose_name_plural = "Numeri Liberi DDT"
+        ordering = ['progressivo']
+        constraints = [
+            models.UniqueConstraint(fields=['formato', 'serie', 'progressivo'], name='numero_libero_ddt_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.serie} - {self.progressivo}"
+
+    @classmethod
+    def preleva(cls, formato, anno, mese, data=None):
+        """
+        Prende il numero libero più basso di una serie
+        
+        Args:
+            formato (FormatoNumerazioneDDT): Formato di numerazione
+            anno (int): Anno della serie
+            mese (int): Mese della serie
+            data (date, optional): Data del DDT: solo i numeri liberi tra un DDT
+                datato non dopo e uno datato non prima. Default: tutti
+        
+        Returns:
+            int: Progressivo prelevato, o None se la serie non ha numeri liberi utilizzabili
+        """
+        liberi = cls.objects.filter(**ContatoreNumerazioneDDT.chiave(formato, anno, mese))
+        if data is not None:
+            # Date dei DDT con il progressivo più vicino prima e dopo il numero libero
+            vicini = DDT.objects.filter(serie=OuterRef('serie')).values('data_documento')
+            liberi = liberi.annotate(
+                data_precedente=Subquery(
+                    vicini.filter(progressivo__lt=OuterRef('progressivo')).order_by('-progressivo')[:1]
+                ),
+                data_successiva=Subquery(
+                    vicini.filter(progressivo__gt=OuterRef('progressivo')).order_by('progressivo')[:1]
+                ),
+            ).filter(
+                Q(data_precedente__isnull=True) | Q(data_precedente__lte=data),
+                Q(data_successiva__isnull=True) | Q(data_successiva__gte=data),
+            )
+        while True:
+            libero = liberi.order_by('progressivo').values_list('id', 'progressivo').first()
+            if libero is None:
+                return None
+            # Se un altro salvataggio l'ha preso nel frattempo si passa al successivo
+            if cls.objects.filter(id=libero[0]).delete()[0]:
+                return libero[1]
+
+
+class PrenotazioneNumeriDDT(models.Model):
+    """
+    Blocco di numeri DDT consecutivi riservato a un'importazione
+    
+    I numeri vengono usati creando DDT con quei numeri; quelli non usati
+    tornano disponibili con rilascia() o alla scadenza della prenotazione.
+    """
+    token = models.CharField(max_length=32, unique=True, verbose_name="Token")
+    formato = models.ForeignKey(FormatoNumerazioneDDT, on_delete=models.CASCADE, related_name='prenotazioni')
+    serie = models.CharField(max_length=100, verbose_name="Serie")
+    anno = models.PositiveSmallIntegerField(verbose_name="Anno")
+    mese = models.PositiveSmallIntegerField(verbose_name="Mese")
+    primo = models.PositiveIntegerField(verbose_name="Primo Progressivo")
+    ultimo = models.PositiveIntegerField(verbose_name="Ultimo Progressivo")
+    scadenza = models.DateTimeField(db_index=True, verbose_name="Scadenza")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Prenotazione Numeri DDT"
+        verbose_name_plural = "Prenotazioni Numeri DDT"
+
+    def __str__(self):
+        return f"{self.numeri[0]} - {self.numeri[-1]}"
+
+    @property
+    def numeri(self):
+        """Numeri DDT prenotati, formattati"""
+        return [
+            self.formato.formatta_numero(progressivo, self.anno, self.mese)
+            for progressivo in range(self.primo, self.ultimo + 1)
+        ]
+
+    @classmethod
+    def prenota(cls, formato, quantita, anno, mese, scadenza=None):
+        """
+        Riserva un blocco di numeri consecutivi con un solo aggiornamento del contatore
+        
+        Args:
+            formato (FormatoNumerazioneDDT): Formato di numerazione
+            quantita (int): Numeri da riservare
+            anno (int): Anno della serie
+            mese (int): Mese della serie
+            scadenza (datetime): Oltre questa data i numeri non usati vengono rilasciati
+        
+        Returns:
+            PrenotazioneNumeriDDT: Prenotazione creata
+        """
+        with transaction.atomic():
+            ultimo = ContatoreNumerazioneDDT.incrementa(formato, anno, mese, quantita=quantita)
+            return cls.objects.create(
+                token=uuid.uuid4().hex,
+                formato=formato,
+                serie=formato.get_serie(anno, mese),
+                anno=anno,
+                mese=mese,
+                primo=ultimo - quantita + 1,
+                ultimo=ultimo,
+                scadenza=scadenza,
+            )
+
+    def rilascia(self):
+        """
+        Restituisce i numeri prenotati non usati da nessun DDT
+        
+        I numeri in coda alla serie riportano indietro il contatore; gli altri
+        diventano numeri liberi, assegnati per primi dalla numerazione automatica.
+        
+        Returns:
+            int: Numeri restituiti
+        """
+        chiave = {'formato': self.formato, 'serie': self.serie}
+        with transaction.atomic():
+            contatore = ContatoreNumerazioneDDT.objects.select_for_update().get(**chiave)
+            usati = set(DDT.objects.filter(
+                serie=self.serie, progressivo__range=(self.primo, self.ultimo)
+            ).values_list('progressivo', flat=True))
+            liberi = [p for p in range(self.primo, self.ultimo + 1) if p not in usati]
+            
+            # Numeri in coda: nessuno ha preso numeri successivi
+            ultimo = contatore.ultimo_numero
+            while liberi and liberi[-1] == ultimo:
+                liberi.pop()
+                ultimo -= 1
+            if ultimo != contatore.ultimo_numero:
+                # Anche i numeri liberi rimasti in coda tornano al contatore
+                gia_liberi = set(NumeroLiberoDDT.objects.filter(**chiave).values_list('progressivo', flat=True))
+                while ultimo in gia_liberi:
+                    ultimo -= 1
+                NumeroLiberoDDT.objects.filter(progressivo__gt=ultimo, **chiave).delete()
+                ContatoreNumerazioneDDT.objects.filter(pk=contatore.pk).update(ultimo_numero=ultimo)
+            
+            NumeroLiberoDDT.objects.bulk_create(
+                [NumeroLiberoDDT(progressivo=progressivo, **chiave) for progressivo in liberi],
+                ignore_conflicts=True,
+            )
+            restituiti = self.ultimo - self.primo + 1 - len(usati)
+            self.delete()
+        return restituiti
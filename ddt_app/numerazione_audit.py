@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Controllo della numerazione DDT: buchi, duplicati e date fuori ordine
+
+Il controllo viene eseguito dal database sull'indice (anno, serie,
+progressivo, data_documento): un riepilogo per serie e un confronto di ogni
+DDT con quelli del progressivo precedente, senza funzioni finestra, che su
+centinaia di migliaia di DDT costano più della lettura dell'indice. Vengono
+caricate in Python solo le righe anomale.
+"""
+
+from collections import defaultdict
+
+from django.db import connections
+from django.db.models import Count, Max, Min
+
+from .models import DDT
+
+
+# Ogni DDT confrontato con i DDT del progressivo precedente: restituisce i DDT
+# senza precedente (dopo un buco, o il primo della serie) con l'ultimo
+# progressivo esistente prima di loro, e quelli datati prima di un DDT del
+# progressivo precedente. La sottoquery è valutata solo per le righe restituite.
+CONFRONTO_PRECEDENTI = """
+    SELECT d.serie, d.progressivo, d.id, p.id IS NULL,
+        CASE WHEN p.id IS NULL THEN (
+            SELECT MAX(q.progressivo) FROM {tabella} q
+            WHERE q.anno = d.anno AND q.serie = d.serie AND q.progressivo < d.progressivo
+        ) ELSE p.progressivo END
+    FROM {tabella} d
+    LEFT JOIN {tabella} p
+        ON p.anno = d.anno AND p.serie = d.serie AND p.progressivo = d.progressivo - 1
+    WHERE d.anno = %s {filtro_serie} AND d.progressivo IS NOT NULL
+        AND (p.id IS NULL OR p.data_documento > d.data_documento)
+"""
+
+
+def audit_numerazione(anno, serie=None):
+    """
+    Controlla la numerazione dei DDT di un anno
+
+    Per ogni serie i DDT vengono confrontati con quelli del progressivo
+    precedente: un DDT senza precedente segue un buco, due DDT con lo stesso
+    progressivo sono duplicati, un DDT datato prima di un DDT del progressivo
+    precedente ha la data fuori ordine. Il primo numero di ogni serie è
+    riportato nel riepilogo ma non controllato, perché le serie manuali
+    possono iniziare da qualsiasi numero.
+
+    Su centinaia di migliaia di DDT il controllo richiede meno di un secondo
+    (tests.test_numerazione.NumerazioneAuditBudgetTest).
+
+    Args:
+        anno (int): Anno dei DDT da controllare
+        serie (str, optional): Serie da controllare (es: '2024-{numero}').
+            Default: tutte le serie dell'anno
+
+    Returns:
+        dict: Anno e, per ogni serie, riepilogo, buchi, duplicati e date fuori ordine
+    """
+    ddt = DDT.objects.filter(anno=anno, progressivo__isnull=False)
+    if serie is not None:
+        ddt = ddt.filter(serie=serie)
+
+    report = {}
+    for riepilogo in ddt.values('serie').annotate(
+        documenti=Count('id'), primo=Min('progressivo'), ultimo=Max('progressivo')
+    ).order_by('serie'):
+        report[riepilogo['serie']] = {
+            **riepilogo,
+            'buchi': [],
+            'numeri_mancanti': 0,
+            'duplicati': [],
+            'date_fuori_ordine': [],
+        }
+
+    connection = connections[ddt.db]
+    sql = CONFRONTO_PRECEDENTI.format(
+        tabella=connection.ops.quote_name(DDT._meta.db_table),
+        filtro_serie='AND d.serie = %s' if serie is not None else '',
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [anno] if serie is None else [anno, serie])
+        # Un DDT può essere restituito per ogni duplicato del precedente;
+        # il primo DDT della serie non ha precedente
+        anomalie = sorted({riga for riga in cursor.fetchall() if riga[4] is not None})
+
+    buchi = {
+        (serie_ddt, progressivo): precedente
+        for serie_ddt, progressivo, _, senza_precedente, precedente in anomalie if senza_precedente
+    }
+    for (serie_ddt, progressivo), precedente in sorted(buchi.items()):
+        voce = report[serie_ddt]
+        voce['buchi'].append({'da': precedente + 1, 'a': progressivo - 1})
+        voce['numeri_mancanti'] += progressivo - precedente - 1
+
+    # Senza duplicati i documenti sono i progressivi tra il primo e l'ultimo,
+    # meno quelli dei buchi: solo altrimenti i duplicati vengono cercati
+    serie_con_duplicati = [
+        voce['serie'] for voce in report.values()
+        if voce['documenti'] != voce['ultimo'] - voce['primo'] + 1 - voce['numeri_mancanti']
+    ]
+    duplicati = []
+    if serie_con_duplicati:
+        duplicati = list(ddt.filter(serie__in=serie_con_duplicati).values('serie', 'progressivo').annotate(
+            documenti=Count('id')
+        ).filter(documenti__gt=1).order_by('serie', 'progressivo').values_list('serie', 'progressivo'))
+    if not anomalie and not duplicati:
+        return {'anno': anno, 'serie': list(report.values())}
+
+    # Numeri e date letti solo per i progressivi anomali e i loro precedenti
+    progressivi = {riga[1] for riga in anomalie} | {riga[4] for riga in anomalie} | {riga[1] for riga in duplicati}
+    numeri = defaultdict(list)
+    date = {}
+    numeri_ddt = {}
+    for id_ddt, serie_ddt, progressivo, numero, data in ddt.filter(
+        serie__in={riga[0] for riga in anomalie} | {riga[0] for riga in duplicati},
+        progressivo__in=progressivi,
+    ).order_by('data_documento', 'id').values_list('id', 'serie', 'progressivo', 'numero', 'data_documento'):
+        numeri[serie_ddt, progressivo].append(numero)
+        date[numero] = data
+        numeri_ddt[id_ddt] = numero
+
+    for serie_ddt, progressivo in duplicati:
+        report[serie_ddt]['duplicati'].append({
+            'progressivo': progressivo,
+            'numeri': numeri[serie_ddt, progressivo],
+        })
+
+    for serie_ddt, _, id_ddt, _, precedente in anomalie:
+        # Il DDT precedente è l'ultimo per data del progressivo precedente
+        numero = numeri_ddt[id_ddt]
+        numero_precedente = numeri[serie_ddt, precedente][-1]
+        if date[numero] < date[numero_precedente]:
+            report[serie_ddt]['date_fuori_ordine'].append({
+                'numero': numero,
+                'data': date[numero].isoformat(),
+                'numero_precedente': numero_precedente,
+                'data_precedente': date[numero_precedente].isoformat(),
+            })
+
+    return {'anno': anno, 'serie': list(report.values())}
+
+
+def has_anomalie(report):
+    """
+    Indica se un report di audit_numerazione contiene anomalie
+
+    Args:
+        report (dict): Report restituito da audit_numerazione
+
+    Returns:
+        bool: True se ci sono buchi, duplicati o date fuori ordine
+    """
+    return any(
+        voce['buchi'] or voce['duplicati'] or voce['date_fuori_ordine']
+        for voce in report['serie']
+    )
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Paginazione a cursore (keyset) delle liste
+
+Invece di COUNT(*) e OFFSET, ogni pagina riparte dai valori di ordinamento
+dell'ultimo (o del primo) elemento della pagina precedente: il costo di una
+pagina non dipende da quante pagine la precedono e la query usa l'indice
+dell'ordinamento. Il cursore è un token firmato e opaco da passare nel
+parametro GET 'cursore'.
+
+Il conteggio è facoltativo: esatto, stimato dal planner (PostgreSQL; sugli
+altri database è esatto) o assente.
+"""
+
+import datetime
+import json
+from decimal import Decimal
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.expressions import OrderBy
+from django.utils.functional import cached_property
+
+
+CURSOR_SALT = 'ddt_app.paginazione'
+
+# Direzioni del cursore: pagina successiva, precedente e ultima pagina
+AVANTI = 'a'
+INDIETRO = 'i'
+ULTIMA = 'u'
+
+CONTEGGIO_ESATTO = 'esatto'
+CONTEGGIO_STIMATO = 'stimato'
+
+
+def _serializza(valore):
+    """Valore di ordinamento in formato JSON"""
+    if isinstance(valore, (datetime.date, datetime.datetime, datetime.time)):
+        return valore.isoformat()
+    if isinstance(valore, Decimal):
+        return str(valore)
+    return valore
+
+
+def _campi_ordinamento(queryset):
+    """
+    Campi di ordinamento del queryset, con la chiave primaria come ultimo campo
+
+    Returns:
+        list: Coppie (campo, decrescente)
+    """
+    campi = []
+    for voce in queryset.query.order_by or queryset.model._meta.ordering:
+        if isinstance(voce, str):
+            campi.append((voce.lstrip('-'), voce.startswith('-')))
+        elif isinstance(voce, OrderBy) and isinstance(voce.expression, F):
+            campi.append((voce.expression.name, voce.descending))
+        else:
+            raise ValueError(f"Ordinamento non supportato dalla paginazione a cursore: {voce!r}")
+    pk = queryset.model._meta.pk.name
+    if not any(campo in ('pk', pk) for campo, _ in campi):
+        campi.append((pk, campi[-1][1] if campi else False))
+    return campi
+
+
+def _ammette_null(model, campo):
+    """True se campo è un campo del modello che ammette NULL"""
+    try:
+        return model._meta.get_field(campo).null
+    except FieldDoesNotExist:
+        return False
+
+
+class KeysetPaginator:
+    """
+    Paginatore a cursore per un queryset ordinato
+
+    L'ordinamento del queryset (campi del modello, campi collegati o
+    annotazioni) viene completato con la chiave primaria per rendere univoco
+    il cursore. Solo i campi del modello possono contenere NULL: NULL è
+    ordinato come il valore più piccolo (primo in ordine crescente, ultimo in
+    decrescente), come negli indici di SQLite.
+    """
+
+    def __init__(self, queryset, per_page, conteggio=None):
+        """
+        Args:
+            queryset (QuerySet): Queryset ordinato da paginare
+            per_page (int): Elementi per pagina
+            conteggio (str, optional): 'esatto', 'stimato' o None (nessun conteggio)
+        """
+        self.queryset = queryset
+        self.per_page = per_page
+        self.conteggio = conteggio
+        self.campi = _campi_ordinamento(queryset)
+        self.campi_null = {campo for campo, _ in self.campi if _ammette_null(queryset.model, campo)}
+
+    @cached_property
+    def count(self):
+        """Numero di elementi, stimato se conteggio='stimato'; None senza conteggio"""
+        if self.stimato:
+            return self._stima
+        if self.conteggio is None:
+            return None
+        return self.queryset.count()
+
+    @property
+    def stimato(self):
+        """True se count è una stima del planner"""
+        return self.conteggio == CONTEGGIO_STIMATO and self._stima is not None
+
+    @cached_property
+    def last_cursor(self):
+        """Cursore dell'ultima pagina"""
+        return signing.dumps({'d': ULTIMA}, salt=CURSOR_SALT)
+
+    def get_page(self, cursore=None):
+        """
+        Pagina indicata dal cursore; la prima se il cursore manca o non è valido
+
+        Args:
+            cursore (str, optional): Token ricevuto da next_cursor, previous_cursor o last_cursor
+
+        Returns:
+            KeysetPage: Pagina richiesta
+        """
+        stato = None
+        if cursore:
+            try:
+                stato = signing.loads(cursore, salt=CURSOR_SALT)
+            except signing.BadSignature:
+                stato = None
+        direzione = stato['d'] if stato else AVANTI
+        valori = stato.get('v') if stato else None
+        if valori is not None and len(valori) != len(self.campi):
+            direzione, valori = AVANTI, None
+
+        indietro = direzione in (INDIETRO, ULTIMA)
+        queryset = self.queryset
+        if valori is not None:
+            queryset = queryset.filter(self._dopo(valori, indietro))
+        queryset = queryset.order_by(*(
+            self._ordine(campo, decrescente != indietro) for campo, decrescente in self.campi
+        ))
+
+        queryset = queryset.annotate(**{
+            f'keyset_{i}': F(campo) for i, (campo, _) in enumerate(self.campi)
+        })
+        elementi = list(queryset[:self.per_page + 1])
+        altre = len(elementi) > self.per_page
+        elementi = elementi[:self.per_page]
+        if indietro:
+            elementi.reverse()
+            return KeysetPage(
+                elementi, self, has_previous=altre, has_next=direzione == INDIETRO
+            )
+        return KeysetPage(elementi, self, has_previous=valori is not None, has_next=altre)
+
+    def cursore(self, elemento, direzione):
+        """Token del cursore che riparte da un elemento della pagina"""
+        valori = [
+            _serializza(getattr(elemento, f'keyset_{i}')) for i in range(len(self.campi))
+        ]
+        return signing.dumps({'d': direzione, 'v': valori}, salt=CURSOR_SALT)
+
+    def _ordine(self, campo, decrescente):
+        """Ordinamento di un campo, con i NULL come valore più piccolo"""
+        if campo not in self.campi_null:
+            return f"{'-' if decrescente else ''}{campo}"
+        return F(campo).desc(nulls_last=True) if decrescente else F(campo).asc(nulls_first=True)
+
+    def _dopo(self, valori, indietro):
+        """Condizione degli elementi che seguono (o precedono) i valori del cursore"""
+        condizione = Q()
+        uguali = Q()
+        for (campo, decrescente), valore in zip(self.campi, valori):
+            condizione |= uguali & self._oltre(campo, valore, minori=decrescente != indietro)
+            # campo=None è tradotto in IS NULL
+            uguali &= Q(**{campo: valore})
+        return condizione
+
+    def _oltre(self, campo, valore, minori):
+        """Condizione dei valori minori (o maggiori) di valore, con NULL minore di tutti"""
+        if valore is None:
+            # Nessun valore è minore di NULL, tutti gli altri sono maggiori
+            return Q(pk__in=[]) if minori else Q(**{f'{campo}__isnull': False})
+        condizione = Q(**{f"{campo}__{'lt' if minori else 'gt'}": valore})
+        if minori and campo in self.campi_null:
+            condizione |= Q(**{f'{campo}__isnull': True})
+        return condizione
+
+    @cached_property
+    def _stima(self):
+        """Righe stimate dal planner (solo PostgreSQL), altrimenti None"""
+        connection = connections[self.queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = self.queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            piano = cursor.fetchone()[0]
+        if isinstance(piano, str):
+            piano = json.loads(piano)
+        return int(piano[0]['Plan']['Plan Rows'])
+
+
+class KeysetPage:
+    """Pagina di KeysetPaginator, iterabile come una Page di Django"""
+
+    def __init__(self, object_list, paginator, has_previous, has_next):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    @cached_property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.cursore(self.object_list[0], INDIETRO)
+
+    @cached_property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.cursore(self.object_list[-1], AVANTI)
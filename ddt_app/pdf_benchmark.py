@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Benchmark della generazione PDF dei DDT
+
+Crea DDT sintetici di forme diverse (senza righe, dieci righe, note
+centrali, logo grande o assente, luogo di destinazione lungo, vettore con
+due targhe) e misura per ogni forma latenza p50/p95, dimensione del PDF,
+numero di operatori reportlab e query per stampa, oltre alle stampe in
+blocco. I dati sintetici vengono creati in una transazione annullata alla
+fine, quindi il database non viene modificato.
+
+I risultati sono un dizionario serializzabile in JSON, confrontabile con
+una baseline salvata tramite compare_with_baseline().
+"""
+
+import contextlib
+import io
+import math
+import os
+import platform
+import re
+import tempfile
+import time
+import zlib
+from base64 import a85decode
+from datetime import date
+from decimal import Decimal
+
+import reportlab
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+
+from .models import (
+    Articolo, Autista, CausaleTrasporto, DDT, DDTRiga, Destinatario, Destinazione,
+    Mittente, SedeMittente, TargaVettore, Vettore,
+)
+from .pdf_data import aggiorna_dati_stampa
+from .pdf_generator_advanced import (
+    PDF_GENERATOR_VERSION, clear_logo_cache, create_ddt_batch_pdf, render_ddt_pdf,
+)
+
+
+SHAPES = (
+    'base',
+    'righe_0',
+    'righe_10',
+    'note_centrali',
+    'logo_grande',
+    'senza_logo',
+    'luogo_lungo',
+    'vettore_due_targhe',
+)
+
+DEFAULT_ITERATIONS = 20
+DEFAULT_BATCH_SIZES = (100, 1000)
+
+# Aumento massimo ammesso rispetto alla baseline per le metriche deterministiche;
+# le latenze usano la tolleranza passata a compare_with_baseline()
+FIXED_TOLERANCES = {
+    'query': 0.0,
+    'operatori': 0.0,
+    'byte': 0.02,
+}
+TIMING_METRICS = ('p50_ms', 'p95_ms', 'ms_per_documento')
+
+LARGE_LOGO_SIZE = (3000, 1500)
+LONG_LUOGO = (
+    "Azienda Agricola Fratelli Bianchi - Codice Stalla: 012RM345 - "
+    "Strada Provinciale per Castel Madama km 12,500 - Località Le Pratarelle - "
+    "00010 Vicovaro (RM) - consegna presso il capannone sul retro, "
+    "accesso dal cancello carrabile lato nord"
+)
+
+
+def percentile(values, percent):
+    """Percentile con il metodo nearest-rank"""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+_STREAM_RE = re.compile(rb'\bobj\s*<<(.*?)>>\s*stream\r?\n(.*?)endstream', re.DOTALL)
+_TOKEN_RE = re.compile(
+    rb'\((?:\\.|[^\\)])*\)'        # stringa letterale
+    rb'|<<|>>'                     # dizionario
+    rb'|<[0-9A-Fa-f\s]*>'          # stringa esadecimale
+    rb'|/[^\s/\[\]()<>{}%]*'       # nome
+    rb'|[^\s/\[\]()<>{}%]+'        # numero, parola chiave o operatore
+)
+_NUMBER_RE = re.compile(rb'^[-+]?(\d+\.?\d*|\.\d+)$')
+_KEYWORDS = {b'true', b'false', b'null'}
+
+
+def _decode_stream(header, data):
+    """Decodifica un content stream reportlab (ASCII85 e/o Flate)"""
+    data = data.strip()
+    if b'/ASCII85Decode' in header:
+        data = a85decode(data.removeprefix(b'<~').removesuffix(b'~>'))
+    if b'/FlateDecode' in header:
+        data = zlib.decompress(data)
+    return data
+
+
+def count_pdf_operators(pdf_bytes):
+    """
+    Conta gli operatori grafici nei content stream di un PDF
+
+    Sono conteggiati gli stream delle pagine e dei form XObject; immagini e
+    font sono esclusi.
+
+    Args:
+        pdf_bytes (bytes): Contenuto del PDF generato da reportlab
+
+    Returns:
+        int: Numero di operatori
+    """
+    operators = 0
+    for header, data in _STREAM_RE.findall(pdf_bytes):
+        if b'/Subtype /Image' in header or b'/FontFile' in header or b'/Length1' in header:
+            continue
+        content = _decode_stream(header, data)
+        for token in _TOKEN_RE.findall(content):
+            if token[:1] in b'(</>' or token in _KEYWORDS or _NUMBER_RE.match(token):
+                continue
+            operators += 1
+    return operators
+
+
+def _write_large_logo(media_root):
+    """Crea nel MEDIA_ROOT temporaneo un logo PNG ad alta risoluzione"""
+    os.makedirs(os.path.join(media_root, 'logos'), exist_ok=True)
+    image = Image.linear_gradient('L').resize(LARGE_LOGO_SIZE).convert('RGB')
+    image.save(os.path.join(media_root, 'logos', 'benchmark_grande.png'))
+    return 'logos/benchmark_grande.png'
+
+
+class SyntheticData:
+    """
+    Anagrafiche e DDT sintetici per il benchmark
+
+    Args:
+        media_root (str): Cartella in cui salvare il logo grande
+    """
+
+    def __init__(self, media_root):
+        self.mittente = Mittente.objects.create(
+            nome="Benchmark Mittente S.r.l.", piva="12345678901", cf="BNCMTT80A01H501U",
+            telefono="+39 06 1234567", email="mittente@example.com",
+        )
+        self.mittente_logo_grande = Mittente.objects.create(
+            nome="Benchmark Logo Grande S.r.l.", piva="12345678902", cf="BNCLGG80A01H501U",
+            telefono="+39 06 1234568", email="logo@example.com",
+            logo=_write_large_logo(media_root),
+        )
+        self.mittente_senza_logo = Mittente.objects.create(
+            nome="Benchmark Senza Logo S.r.l.", piva="12345678903", cf="BNCSLG80A01H501U",
+            telefono="+39 06 1234569", email="senzalogo@example.com",
+            logo='logos/benchmark_assente.png',
+        )
+        self.sede = SedeMittente.objects.create(
+            mittente=self.mittente, nome="Sede Principale", indirizzo="Via Roma, 123",
+            cap="00100", citta="Roma", provincia="RM", codice_stalla="123AB456", sede_legale=True,
+        )
+        self.destinatario = Destinatario.objects.create(
+            nome="Benchmark Destinatario", indirizzo="Via Test, 123", cap="00100",
+            citta="Roma", provincia="RM", piva="98765432109", cf="BNCDST80A01H501U",
+            telefono="+39 06 7654321", email="dest@example.com",
+        )
+        self.destinazione = Destinazione.objects.create(
+            destinatario=self.destinatario, nome="Stalla Nord", indirizzo="Via Campi, 1",
+            codice_stalla="999XY000",
+        )
+        self.vettore = Vettore.objects.create(
+            nome="Benchmark Vettore", indirizzo="Via Vettore, 789", cap="00100",
+            citta="Roma", provincia="RM", piva="11111111111", cf="BNCVTT80A01H501U",
+            telefono="+39 06 1111111", email="vettore@example.com", licenza_bdn="BDN-1",
+        )
+        self.autista = Autista.objects.create(
+            vettore=self.vettore, nome="Mario", cognome="Rossi", patente="B123456789",
+        )
+        self.targa = TargaVettore.objects.create(vettore=self.vettore, targa="AB123CD", tipo_veicolo="Motrice")
+        self.targa_2 = TargaVettore.objects.create(vettore=self.vettore, targa="EF456GH", tipo_veicolo="Rimorchio")
+        self.causale = CausaleTrasporto.objects.create(codice="BENCH", descrizione="Vendita")
+        self.articolo = Articolo.objects.create(
+            nome="Vitelli da ristallo", categoria="Bovini", um="capi", prezzo_unitario=Decimal('10.50'),
+        )
+
+    def delete(self):
+        """Elimina i DDT sintetici e le anagrafiche create"""
+        mittenti = [self.mittente, self.mittente_logo_grande, self.mittente_senza_logo]
+        DDT.objects.filter(mittente__in=mittenti).delete()
+        for instance in (self.articolo, self.causale, self.targa, self.targa_2, self.autista,
+                         self.vettore, self.destinazione, self.destinatario, self.sede, *mittenti):
+            instance.delete()
+
+    def build_ddt(self, numero, shape):
+        """DDT non salvato e sue righe (non salvate) per una forma"""
+        mittente = self.mittente
+        if shape == 'logo_grande':
+            mittente = self.mittente_logo_grande
+        elif shape == 'senza_logo':
+            mittente = self.mittente_senza_logo
+
+        ddt = DDT(
+            numero=numero,
+            data_documento=date(2024, 1, 15),
+            data_ritiro=date(2024, 1, 15),
+            mittente=mittente,
+            sede_mittente=self.sede if mittente is self.mittente else None,
+            destinatario=self.destinatario,
+            destinazione=self.destinazione,
+            causale_trasporto=self.causale,
+            luogo_destinazione=LONG_LUOGO if shape == 'luogo_lungo' else "Stalla Nord - Via Campi, 1",
+            trasporto_mezzo='vettore',
+            vettore=self.vettore,
+            autista=self.autista,
+            targa_vettore=self.targa,
+            targa_vettore_2=self.targa_2 if shape == 'vettore_due_targhe' else None,
+            annotazioni="Animali in buono stato di salute",
+            note_centrali="Trasporto di animali vivi\nNessun trattamento in corso" if shape == 'note_centrali' else '',
+        )
+
+        if shape in ('righe_0', 'note_centrali'):
+            numero_righe = 0
+        elif shape == 'righe_10':
+            numero_righe = 10
+        else:
+            numero_righe = 1
+        righe = [
+            DDTRiga(
+                ddt=ddt, articolo=self.articolo, quantita=Decimal(ordine + 1),
+                descrizione=f"Capo {ordine + 1} - razza frisona, marca auricolare IT0{ordine:08d}",
+                ordine=ordine,
+            )
+            for ordine in range(numero_righe)
+        ]
+        return ddt, righe
+
+    def create_ddts(self, prefix, shapes):
+        """Salva un DDT per ogni forma indicata e restituisce gli ID nell'ordine"""
+        built = [self.build_ddt(f"{prefix}-{i:06d}", shape) for i, shape in enumerate(shapes)]
+        ddts = DDT.objects.bulk_create([ddt for ddt, _ in built])
+        DDTRiga.objects.bulk_create([
+            riga for _, righe in built for riga in righe
+        ])
+        # bulk_create non invia i segnali: i dati di stampa vanno salvati come per un DDT emesso
+        ddt_ids = [ddt.pk for ddt in ddts]
+        aggiorna_dati_stampa(ddt_ids)
+        return ddt_ids
+
+
+def _measure_single(ddt_id, iterations):
+    """Latenza, dimensione, operatori e query della stampa di un DDT"""
+    # Prima stampa fuori misura: decodifica del logo e font
+    render_ddt_pdf(ddt_id)
+
+    with CaptureQueriesContext(connection) as queries:
+        pdf = render_ddt_pdf(ddt_id)
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        render_ddt_pdf(ddt_id)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'byte': len(pdf),
+        'operatori': count_pdf_operators(pdf),
+        'query': len(queries),
+    }
+
+
+def _measure_batch(ddt_ids):
+    """Tempo, dimensione, operatori e query di una stampa in blocco"""
+    queryset = DDT.objects.filter(id__in=ddt_ids).order_by('id')
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        pdf = create_ddt_batch_pdf(queryset)
+        secondi = time.perf_counter() - start
+
+    documenti = len(ddt_ids)
+    return {
+        'documenti': documenti,
+        'secondi': round(secondi, 3),
+        'ms_per_documento': round(secondi * 1000 / documenti, 3),
+        'byte': len(pdf),
+        'byte_per_documento': round(len(pdf) / documenti),
+        'operatori': count_pdf_operators(pdf),
+        'query': len(queries),
+    }
+
+
+def run_benchmark(iterations=DEFAULT_ITERATIONS, batch_sizes=DEFAULT_BATCH_SIZES, shapes=SHAPES):
+    """
+    Esegue il benchmark su DDT sintetici
+
+    Le stampe in blocco usano DDT di tutte le forme a rotazione.
+
+    Args:
+        iterations (int): Stampe misurate per ogni forma
+        batch_sizes (iterable): Numero di DDT delle stampe in blocco
+        shapes (iterable): Forme dei DDT da misurare singolarmente
+
+    Returns:
+        dict: Risultati serializzabili in JSON
+    """
+    batch_sizes = sorted(set(batch_sizes))
+    results = {
+        'versione_generatore': PDF_GENERATOR_VERSION,
+        'ambiente': {
+            'python': platform.python_version(),
+            'reportlab': reportlab.Version,
+            'database': connection.vendor,
+        },
+        'iterazioni': iterations,
+        'singoli': {},
+        'batch': {},
+    }
+
+    with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+        clear_logo_cache()
+        with transaction.atomic():
+            data = SyntheticData(media_root)
+            single_ids = data.create_ddts('BENCH-S', shapes)
+            batch_ids = data.create_ddts(
+                'BENCH-B', [SHAPES[i % len(SHAPES)] for i in range(max(batch_sizes, default=0))]
+            )
+
+            # Il logo assente viene segnalato a ogni stampa
+            with contextlib.redirect_stdout(io.StringIO()):
+                for shape, ddt_id in zip(shapes, single_ids):
+                    results['singoli'][shape] = _measure_single(ddt_id, iterations)
+                for size in batch_sizes:
+                    results['batch'][str(size)] = _measure_batch(batch_ids[:size])
+
+            transaction.set_rollback(True)
+        clear_logo_cache()
+
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance=0.5):
+    """
+    Confronta i risultati con una baseline
+
+    Args:
+        results (dict): Risultati di run_benchmark()
+        baseline (dict): Risultati salvati in precedenza
+        tolerance (float): Aumento massimo ammesso delle latenze (0.5 = +50%)
+
+    Returns:
+        list: Descrizione delle metriche peggiorate oltre la tolleranza
+    """
+    regressions = []
+    for section in ('singoli', 'batch'):
+        for name, expected in baseline.get(section, {}).items():
+            current = results.get(section, {}).get(name)
+            if current is None:
+                continue
+            for metric, expected_value in expected.items():
+                if metric in TIMING_METRICS:
+                    allowed = tolerance
+                elif metric in FIXED_TOLERANCES:
+                    allowed = FIXED_TOLERANCES[metric]
+                else:
+                    continue
+                value = current.get(metric)
+                if value is not None and value > expected_value * (1 + allowed):
+                    regressions.append(
+                        f"{section}/{name} {metric}: {value} (baseline {expected_value}, "
+                        f"tolleranza {allowed:.0%})"
+                    )
+    return regressions
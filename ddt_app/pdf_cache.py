@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Cache dei PDF DDT indirizzata per contenuto
+
+La chiave di un PDF è derivata dai dati di stampa salvati nel DDT (pdf_data),
+dal logo e dalla versione del generatore: se nessuno di questi cambia, il PDF
+già generato è identico e può essere servito senza ridisegnarlo. Le modifiche
+delle anagrafiche non cambiano i dati di stampa dei DDT già emessi, quindi non
+invalidano i loro PDF.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .pdf_data import ddt_data_to_json, load_ddt_data
+from .pdf_generator_advanced import PDF_GENERATOR_VERSION, get_logo_path
+from .pdf_workers import get_render_pool
+
+
+DEFAULT_PDF_CACHE = {
+    'BACKEND': 'ddt_app.pdf_cache.DjangoCachePDFStore',
+    'OPTIONS': {},
+}
+
+
+def ddt_pdf_cache_key(ddt):
+    """
+    Calcola la chiave di cache del PDF di un DDT
+
+    Args:
+        ddt (DDTData | DDT | int): Dati di stampa, DDT o ID del DDT
+
+    Returns:
+        str: Chiave che cambia quando cambia qualunque dato stampato nel PDF
+
+    Raises:
+        ValueError: Se il DDT non esiste
+    """
+    data = load_ddt_data(ddt)
+    try:
+        logo_mtime = os.stat(get_logo_path(data.logo_name)).st_mtime_ns
+    except OSError:
+        logo_mtime = None
+
+    payload = json.dumps(
+        [PDF_GENERATOR_VERSION, data.id, ddt_data_to_json(data), logo_mtime],
+        cls=DjangoJSONEncoder, sort_keys=True
+    )
+    return f"ddt-pdf-{data.id}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class DjangoCachePDFStore:
+    """Salva i PDF nella cache Django configurata (CACHES)"""
+
+    def __init__(self, alias='default', timeout=None):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, data):
+        self.cache.set(key, data, self.timeout)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class LocalDiskPDFStore:
+    """
+    Salva i PDF su disco con limite di spazio ed eliminazione LRU
+
+    L'ultimo accesso di ogni file è registrato nel suo mtime, così l'ordine
+    LRU è condiviso da tutti i processi che usano la stessa cartella.
+    """
+
+    def __init__(self, location, max_size=200 * 1024 * 1024):
+        self.location = str(location)
+        self.max_size = max_size
+
+    def _path(self, key):
+        return os.path.join(self.location, f"{key}.pdf")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as pdf_file:
+                data = pdf_file.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def set(self, key, data):
+        os.makedirs(self.location, exist_ok=True)
+        # Scrittura atomica: un lettore concorrente vede il file completo o nessun file
+        fd, tmp_path = tempfile.mkstemp(dir=self.location, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for entry in self._entries():
+            self.delete(entry.name[:-len('.pdf')])
+
+    def _entries(self):
+        try:
+            return [
+                entry for entry in os.scandir(self.location)
+                if entry.is_file() and entry.name.endswith('.pdf')
+            ]
+        except OSError:
+            return []
+
+    def _evict(self):
+        """Elimina i PDF usati meno di recente finché la cartella rientra nel limite"""
+        files = []
+        total_size = 0
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total_size += stat.st_size
+
+        if total_size <= self.max_size:
+            return
+
+        for _mtime, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+
+
+_pdf_store = None
+
+
+def get_pdf_store():
+    """Restituisce lo store dei PDF configurato in settings.DDT_PDF_CACHE"""
+    global _pdf_store
+    if _pdf_store is None:
+        config = getattr(settings, 'DDT_PDF_CACHE', DEFAULT_PDF_CACHE)
+        store_class = import_string(config['BACKEND'])
+        _pdf_store = store_class(**config.get('OPTIONS', {}))
+    return _pdf_store
+
+
+@receiver(setting_changed)
+def _reset_pdf_store(setting, **kwargs):
+    global _pdf_store
+    if setting in ('DDT_PDF_CACHE', 'CACHES'):
+        _pdf_store = None
+
+
+def get_ddt_pdf(ddt, pool=None):
+    """
+    Restituisce il PDF di un DDT dalla cache, generandolo solo se necessario
+
+    Args:
+        ddt (DDT | int): DDT (o ID del DDT)
+        pool (PDFRenderPool, optional): Pool che genera il PDF. Default: get_render_pool()
+
+    Returns:
+        bytes: Contenuto del PDF
+
+    Raises:
+        PDFPoolSaturated: Se il pool non accetta altri lavori
+        PDFRenderTimeout: Se la generazione supera il tempo massimo
+    """
+    data = load_ddt_data(ddt)
+    key = ddt_pdf_cache_key(data)
+    store = get_pdf_store()
+
+    pdf = store.get(key)
+    if pdf is None:
+        pool = pool or get_render_pool()
+        pdf = pool.render(data)
+        store.set(key, pdf)
+    return pdf
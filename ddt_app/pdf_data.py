@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Dati di stampa dei DDT per la generazione PDF
+
+Il DDT e tutte le anagrafiche stampate vengono copiati in oggetti immutabili
+(DDTData), con i testi già nella forma stampata: il disegno del PDF non
+accede al database e gli oggetti possono essere passati a processi separati.
+
+Il DDT è un documento fissato al momento dell'emissione: i dati di stampa
+sono salvati nel DDT (campo dati_stampa) a ogni salvataggio del DDT o delle
+sue righe e PDF ed esportazioni leggono solo quelli, con una sola riga per
+DDT. Le modifiche successive delle anagrafiche non cambiano i DDT già emessi.
+"""
+
+from dataclasses import asdict, dataclass
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+from typing import Optional
+
+from django.db.models import Prefetch
+
+from .models import DDT, DDTRiga
+
+
+# Versione del formato di dati_stampa: i dati di una versione diversa sono ricalcolati
+DATI_STAMPA_VERSION = 1
+
+
+@dataclass(frozen=True, slots=True)
+class EntityData:
+    """Anagrafica stampata in una casella (mittente, destinatario)"""
+    nome: str = ''
+    indirizzo: str = ''
+    cap: str = ''
+    citta: str = ''
+    provincia: str = ''
+    piva: str = ''
+    cf: str = ''
+
+
+@dataclass(frozen=True, slots=True)
+class SedeMittenteData:
+    """Sede del mittente con codice stalla"""
+    mittente: Optional[EntityData]
+    indirizzo: str
+    cap: str
+    citta: str
+    provincia: str
+    codice_stalla: str
+
+
+@dataclass(frozen=True, slots=True)
+class DestinazioneData:
+    """Destinazione del destinatario con codice stalla"""
+    destinatario: Optional[EntityData]
+    codice_stalla: str
+
+
+@dataclass(frozen=True, slots=True)
+class VettoreData:
+    """Vettore che effettua il trasporto"""
+    nome: str
+    indirizzo: str
+    cap: str
+    citta: str
+    provincia: str
+    piva: str
+    licenza_bdn: str
+
+
+@dataclass(frozen=True, slots=True)
+class AutistaData:
+    """Autista del vettore"""
+    nome: str
+    cognome: str
+    patente: str
+
+
+@dataclass(frozen=True, slots=True)
+class CausaleData:
+    """Causale di trasporto"""
+    codice: str
+    descrizione: str
+
+
+@dataclass(frozen=True, slots=True)
+class RigaData:
+    """Riga articolo del DDT"""
+    articolo_nome: str
+    articolo_um: str
+    descrizione: str
+    quantita: Decimal
+    prezzo_unitario: Decimal
+
+
+@dataclass(frozen=True, slots=True)
+class DDTData:
+    """Tutti i dati stampati nel PDF di un DDT"""
+    id: int
+    numero: str
+    data_documento: Optional[date]
+    data_ritiro: Optional[date]
+    luogo_righe: tuple
+    trasporto_mezzo: str
+    annotazioni: str
+    note_centrali: str
+    usa_note_centrali: bool
+    logo_name: Optional[str]
+    mittente: Optional[EntityData]
+    sede_mittente: Optional[SedeMittenteData]
+    destinatario: Optional[EntityData]
+    destinazione: Optional[DestinazioneData]
+    causale_trasporto: Optional[CausaleData]
+    vettore: Optional[VettoreData]
+    autista: Optional[AutistaData]
+    targa_vettore: Optional[str]
+    targa_vettore_2: Optional[str]
+    righe: tuple = ()
+
+
+def with_render_relations(queryset):
+    """Carica con un'unica query i DDT e tutte le anagrafiche stampate nel PDF"""
+    return queryset.select_related(
+        'mittente', 'sede_mittente__mittente', 'destinatario',
+        'destinazione__destinatario', 'causale_trasporto', 'vettore',
+        'autista', 'targa_vettore', 'targa_vettore_2',
+    ).prefetch_related(
+        Prefetch('righe', queryset=DDTRiga.objects.select_related('articolo').order_by('ordine'))
+    )
+
+
+def load_ddt_data(ddt):
+    """
+    Carica i dati di stampa di un DDT
+
+    Args:
+        ddt (DDTData | DDT | int): DDT (o ID del DDT); un DDTData è restituito così com'è
+
+    Returns:
+        DDTData: Dati di stampa salvati nel DDT, o calcolati dalle anagrafiche
+        se il DDT non li ha ancora
+
+    Raises:
+        ValueError: Se il DDT non esiste
+    """
+    if isinstance(ddt, DDTData):
+        return ddt
+    ddt_id = ddt.pk if isinstance(ddt, DDT) else ddt
+    try:
+        dati = DDT.objects.values_list('dati_stampa', flat=True).get(id=ddt_id)
+    except DDT.DoesNotExist:
+        raise ValueError(f"DDT con ID {ddt_id} non trovato")
+    if _dati_validi(dati):
+        return ddt_data_from_json(ddt_id, dati)
+    try:
+        instance = with_render_relations(DDT.objects.all()).get(id=ddt_id)
+    except DDT.DoesNotExist:
+        raise ValueError(f"DDT con ID {ddt_id} non trovato")
+    return ddt_data_from_instance(instance)
+
+
+def iter_ddt_data(queryset, chunk_size=500):
+    """
+    Dati di stampa dei DDT di un queryset, caricati a blocchi
+
+    I dati salvati nei DDT sono letti da un'unica query; solo i DDT che non
+    li hanno ancora vengono caricati con le anagrafiche, con due query per
+    blocco di chunk_size DDT.
+
+    Args:
+        queryset (QuerySet): DDT da caricare, nell'ordine del queryset
+        chunk_size (int): Numero di DDT caricati per blocco
+
+    Yields:
+        DDTData: Dati di stampa di ogni DDT
+    """
+    righe = queryset.values_list('id', 'dati_stampa').iterator(chunk_size=chunk_size)
+    while True:
+        blocco = list(islice(righe, chunk_size))
+        if not blocco:
+            return
+        mancanti = [ddt_id for ddt_id, dati in blocco if not _dati_validi(dati)]
+        calcolati = {}
+        if mancanti:
+            calcolati = {
+                instance.pk: ddt_data_from_instance(instance)
+                for instance in with_render_relations(DDT.objects.filter(id__in=mancanti))
+            }
+        for ddt_id, dati in blocco:
+            if _dati_validi(dati):
+                yield ddt_data_from_json(ddt_id, dati)
+            elif ddt_id in calcolati:
+                yield calcolati[ddt_id]
+
+
+def aggiorna_dati_stampa(ddt_ids, chunk_size=500):
+    """
+    Salva nei DDT i dati di stampa calcolati dalle anagrafiche attuali
+
+    Args:
+        ddt_ids (iterable): ID dei DDT
+        chunk_size (int): Numero di DDT aggiornati per blocco
+
+    Returns:
+        int: DDT aggiornati
+    """
+    ddt_ids = list(ddt_ids)
+    scritti = 0
+    for start in range(0, len(ddt_ids), chunk_size):
+        queryset = with_render_relations(DDT.objects.filter(id__in=ddt_ids[start:start + chunk_size]))
+        modificati = [
+            DDT(pk=instance.pk, dati_stampa=ddt_data_to_json(ddt_data_from_instance(instance)))
+            for instance in queryset
+        ]
+        DDT.objects.bulk_update(modificati, ['dati_stampa'])
+        scritti += len(modificati)
+    return scritti
+
+
+def ddt_data_to_json(data):
+    """
+    Dati di stampa in formato JSON, da salvare nel campo dati_stampa
+
+    Date e decimali restano oggetti Python e sono convertiti in testo
+    dall'encoder del campo.
+    """
+    dati = asdict(data)
+    del dati['id']
+    dati['versione'] = DATI_STAMPA_VERSION
+    return dati
+
+
+def ddt_data_from_json(ddt_id, dati):
+    """Ricostruisce un DDTData dai dati salvati nel campo dati_stampa"""
+    dati = dict(dati)
+    del dati['versione']
+    sede = dati['sede_mittente']
+    destinazione = dati['destinazione']
+    return DDTData(**{
+        **dati,
+        'id': ddt_id,
+        'data_documento': _data(dati['data_documento']),
+        'data_ritiro': _data(dati['data_ritiro']),
+        'luogo_righe': tuple(dati['luogo_righe']),
+        'mittente': _oggetto(EntityData, dati['mittente']),
+        'sede_mittente': sede and SedeMittenteData(**{
+            **sede, 'mittente': _oggetto(EntityData, sede['mittente'])
+        }),
+        'destinatario': _oggetto(EntityData, dati['destinatario']),
+        'destinazione': destinazione and DestinazioneData(**{
+            **destinazione, 'destinatario': _oggetto(EntityData, destinazione['destinatario'])
+        }),
+        'causale_trasporto': _oggetto(CausaleData, dati['causale_trasporto']),
+        'vettore': _oggetto(VettoreData, dati['vettore']),
+        'autista': _oggetto(AutistaData, dati['autista']),
+        'righe': tuple(
+            RigaData(**{
+                **riga,
+                'quantita': Decimal(riga['quantita']),
+                'prezzo_unitario': Decimal(riga['prezzo_unitario']),
+            })
+            for riga in dati['righe']
+        ),
+    })
+
+
+def _dati_validi(dati):
+    """True se i dati salvati esistono e hanno il formato attuale"""
+    return bool(dati) and dati.get('versione') == DATI_STAMPA_VERSION
+
+
+def _oggetto(cls, valori):
+    return cls(**valori) if valori is not None else None
+
+
+def _data(valore):
+    return date.fromisoformat(valore) if valore else None
+
+
+def ddt_data_from_instance(ddt):
+    """Copia in un DDTData un DDT caricato con with_render_relations"""
+    righe = tuple(
+        RigaData(
+            articolo_nome=_titolo(riga.articolo.nome),
+            articolo_um=_maiuscolo(riga.articolo.um),
+            descrizione=_titolo(riga.descrizione),
+            quantita=riga.quantita,
+            prezzo_unitario=riga.prezzo_unitario,
+        )
+        for riga in ddt.righe.all()
+    )
+
+    sede = ddt.sede_mittente
+    if sede and sede.mittente and sede.mittente.logo:
+        logo_name = sede.mittente.logo.name
+    elif ddt.mittente and ddt.mittente.logo:
+        logo_name = ddt.mittente.logo.name
+    else:
+        logo_name = None
+
+    return DDTData(
+        id=ddt.pk,
+        numero=ddt.numero,
+        data_documento=ddt.data_documento,
+        data_ritiro=ddt.data_ritiro,
+        luogo_righe=righe_luogo_destinazione(ddt.luogo_destinazione),
+        trasporto_mezzo=ddt.trasporto_mezzo,
+        annotazioni=_titolo(ddt.annotazioni),
+        note_centrali=_titolo(ddt.note_centrali),
+        usa_note_centrali=bool(ddt.note_centrali) and not righe,
+        logo_name=logo_name,
+        mittente=_mittente_data(ddt.mittente),
+        sede_mittente=_sede_mittente_data(sede),
+        destinatario=_destinatario_data(ddt.destinatario),
+        destinazione=_destinazione_data(ddt.destinazione),
+        causale_trasporto=_causale_data(ddt.causale_trasporto),
+        vettore=_vettore_data(ddt.vettore),
+        autista=_autista_data(ddt.autista),
+        targa_vettore=_maiuscolo(ddt.targa_vettore.targa) if ddt.targa_vettore else None,
+        targa_vettore_2=_maiuscolo(ddt.targa_vettore_2.targa) if ddt.targa_vettore_2 else None,
+        righe=righe,
+    )
+
+
+def righe_luogo_destinazione(testo):
+    """
+    Righe stampate del luogo di destinazione
+
+    Le righe ripetute vengono tolte; un testo su una sola riga viene diviso
+    prima di "Codice Stalla:" e di "Via". Il codice stalla è in maiuscolo,
+    il resto con le iniziali maiuscole.
+
+    Args:
+        testo (str): Luogo di destinazione del DDT
+
+    Returns:
+        tuple: Righe da stampare
+    """
+    unique_lines = []
+    for line in (testo or '').split('\n'):
+        line = line.strip()
+        if line and line not in unique_lines:
+            unique_lines.append(line)
+
+    # Se non ci sono caratteri di nuova riga, prova a dividere per altri separatori
+    if len(unique_lines) == 1 and ('Codice Stalla:' in unique_lines[0] or 'Via' in unique_lines[0]):
+        text = unique_lines[0]
+        parts = []
+
+        # Dividi per "Codice Stalla:"
+        if 'Codice Stalla:' in text:
+            before_codice = text.split('Codice Stalla:')[0]
+            after_codice = text.split('Codice Stalla:')[1]
+            if before_codice.strip():
+                parts.append(before_codice.strip())
+            if after_codice.strip():
+                # Dividi ulteriormente per "Via"
+                if 'Via' in after_codice:
+                    codice_part = after_codice.split('Via')[0].strip()
+                    via_part = 'Via' + after_codice.split('Via')[1]
+                    if codice_part:
+                        parts.append('Codice Stalla:' + codice_part)
+                    if via_part.strip():
+                        parts.append(via_part.strip())
+                else:
+                    parts.append('Codice Stalla:' + after_codice.strip())
+        else:
+            # Dividi per "Via"
+            before_via = text.split('Via')[0]
+            via_part = 'Via' + text.split('Via')[1]
+            if before_via.strip():
+                parts.append(before_via.strip())
+            if via_part.strip():
+                parts.append(via_part.strip())
+
+        unique_lines = parts
+
+    righe = []
+    for line in unique_lines:
+        if 'Codice Stalla:' in line:
+            # Gestisce il caso speciale del codice stalla
+            parts = line.split('Codice Stalla:')
+            if len(parts) == 2:
+                before = parts[0].strip().title()
+                after = parts[1].strip().upper()
+                line = f"{before} Codice Stalla: {after}" if before else f"Codice Stalla: {after}"
+            else:
+                line = line.title()
+        else:
+            line = line.title()
+        righe.append(line)
+    return tuple(righe)
+
+
+def _titolo(testo):
+    """Testo con le iniziali maiuscole, come stampato nel PDF"""
+    return (testo or '').title()
+
+
+def _maiuscolo(testo):
+    return (testo or '').upper()
+
+
+def _mittente_data(mittente):
+    if mittente is None:
+        return None
+    return EntityData(nome=_titolo(mittente.nome), piva=_maiuscolo(mittente.piva), cf=_maiuscolo(mittente.cf))
+
+
+def _destinatario_data(destinatario):
+    if destinatario is None:
+        return None
+    return EntityData(
+        nome=_titolo(destinatario.nome),
+        indirizzo=_titolo(destinatario.indirizzo),
+        cap=destinatario.cap,
+        citta=_titolo(destinatario.citta),
+        provincia=_maiuscolo(destinatario.provincia),
+        piva=_maiuscolo(destinatario.piva),
+        cf=_maiuscolo(destinatario.cf),
+    )
+
+
+def _sede_mittente_data(sede):
+    if sede is None:
+        return None
+    return SedeMittenteData(
+        mittente=_mittente_data(sede.mittente),
+        indirizzo=_titolo(sede.indirizzo),
+        cap=sede.cap,
+        citta=_titolo(sede.citta),
+        provincia=_maiuscolo(sede.provincia),
+        codice_stalla=_maiuscolo(sede.codice_stalla),
+    )
+
+
+def _destinazione_data(destinazione):
+    if destinazione is None:
+        return None
+    return DestinazioneData(
+        destinatario=_destinatario_data(destinazione.destinatario),
+        codice_stalla=_maiuscolo(destinazione.codice_stalla),
+    )
+
+
+def _causale_data(causale):
+    if causale is None:
+        return None
+    return CausaleData(codice=causale.codice, descrizione=causale.descrizione)
+
+
+def _vettore_data(vettore):
+    if vettore is None:
+        return None
+    return VettoreData(
+        nome=_titolo(vettore.nome),
+        indirizzo=_titolo(vettore.indirizzo),
+        cap=vettore.cap,
+        citta=_titolo(vettore.citta),
+        provincia=_maiuscolo(vettore.provincia),
+        piva=_maiuscolo(vettore.piva),
+        licenza_bdn=_maiuscolo(vettore.licenza_bdn),
+    )
+
+
+def _autista_data(autista):
+    if autista is None:
+        return None
+    return AutistaData(
+        nome=_titolo(autista.nome), cognome=_titolo(autista.cognome), patente=_maiuscolo(autista.patente)
+    )
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Esportazione in blocco dei PDF DDT in un archivio ZIP
+
+I PDF vengono generati in parallelo dal pool di processi PDF e scritti nello
+ZIP man mano che sono pronti: l'archivio viene prodotto a blocchi, quindi
+la memoria usata non dipende dal numero di DDT esportati.
+"""
+
+import logging
+import time
+import zipfile
+from collections import deque
+
+from .models import DDT
+from .pdf_cache import ddt_pdf_cache_key, get_pdf_store
+from .pdf_data import iter_ddt_data
+from .pdf_generator_advanced import ddt_pdf_filename, render_ddt_pdf
+from .pdf_workers import get_render_pool
+
+
+logger = logging.getLogger(__name__)
+
+# DDT caricati dal database per ogni blocco
+LOAD_CHUNK_SIZE = 100
+
+
+def render_ddt_pdfs(ddt_ids, pool=None):
+    """
+    Genera i PDF di più DDT, in parallelo sui processi del pool
+
+    I PDF già in cache non vengono rigenerati. I risultati sono restituiti
+    nell'ordine di ddt_ids; al massimo workers * 2 PDF sono in memoria
+    contemporaneamente. Se il pool è pieno l'esportazione attende un posto
+    libero invece di fallire.
+
+    Args:
+        ddt_ids (iterable): ID dei DDT da generare
+        pool (PDFRenderPool, optional): Pool che genera i PDF. Default: get_render_pool()
+
+    Yields:
+        tuple: (nome file, contenuto PDF)
+    """
+    pool = pool or get_render_pool()
+    store = get_pdf_store()
+    window = max(pool.workers, 1) * 2
+    pending = deque()
+
+    def collect():
+        filename, key, pdf = pending.popleft()
+        if key is not None:
+            # PDF non in cache: attende il risultato del pool e lo salva
+            pdf = pool.result(pdf)
+            store.set(key, pdf)
+        return filename, pdf
+
+    ddt_ids = list(ddt_ids)
+    for start in range(0, len(ddt_ids), LOAD_CHUNK_SIZE):
+        chunk = ddt_ids[start:start + LOAD_CHUNK_SIZE]
+        ddt_data = {data.id: data for data in iter_ddt_data(DDT.objects.filter(id__in=chunk))}
+
+        for ddt_id in chunk:
+            data = ddt_data.get(ddt_id)
+            if data is None:
+                continue
+
+            key = ddt_pdf_cache_key(data)
+            pdf = store.get(key)
+            if pdf is None:
+                pending.append((ddt_pdf_filename(data), key, pool.submit(render_ddt_pdf, data, block=True)))
+            else:
+                pending.append((ddt_pdf_filename(data), None, pdf))
+
+            if len(pending) >= window:
+                yield collect()
+
+    while pending:
+        yield collect()
+
+
+class _ZipStream:
+    """Destinazione non posizionabile per zipfile che accumula i byte scritti"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_ddt_zip(ddt_ids, pool=None, stats=None):
+    """
+    Produce a blocchi un archivio ZIP con i PDF dei DDT
+
+    Args:
+        ddt_ids (iterable): ID dei DDT da esportare
+        pool (PDFRenderPool, optional): Pool che genera i PDF
+        stats (dict, optional): Riempito a fine esportazione con
+            'documenti', 'secondi' e 'documenti_al_secondo'
+
+    Yields:
+        bytes: Porzioni consecutive dell'archivio ZIP
+    """
+    stats = stats if stats is not None else {}
+    start = time.perf_counter()
+    documenti = 0
+
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for filename, pdf in render_ddt_pdfs(ddt_ids, pool):
+            archive.writestr(filename, pdf)
+            documenti += 1
+            yield stream.pop()
+    yield stream.pop()
+
+    secondi = time.perf_counter() - start
+    stats.update({
+        'documenti': documenti,
+        'secondi': secondi,
+        'documenti_al_secondo': documenti / secondi if secondi else 0.0,
+    })
+    logger.info(
+        "Esportati %d PDF DDT in %.2fs (%.1f documenti/s)",
+        documenti, secondi, stats['documenti_al_secondo']
+    )
@@ -6,11 +6,167 @@ Generatore PDF avanzato per DDT con supporto per note centrali e numerazione aut
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.colors import black, white, Color
-from reportlab.lib.units import cm
+from reportlab.lib.units import cm, inch
 from reportlab.lib.utils import ImageReader
-from .models import DDT, DDTRiga
+from reportlab.pdfbase import pdfmetrics
+from .models import Mittente
+from .pdf_data import iter_ddt_data, load_ddt_data
 from django.conf import settings
+from django.db.models import QuerySet
+from collections import namedtuple
+from io import BytesIO
+from PIL import Image
 import os
+import threading
+
+
+# Versione del layout: va incrementata a ogni modifica che cambia il PDF prodotto,
+# così le copie in cache generate con il layout precedente non vengono più servite
+PDF_GENERATOR_VERSION = '5'
+
+
+# ===== GEOMETRIA DELLA PAGINA =====
+# Calcolata una sola volta all'import: le funzioni di disegno leggono le
+# posizioni delle caselle da LAYOUT invece di ricalcolarle a ogni pagina.
+
+Box = namedtuple('Box', ['x', 'y', 'width', 'height'])
+
+# Dimensioni A4
+PAGE_WIDTH, PAGE_HEIGHT = A4
+
+# Margini richiesti
+MARGIN_TOP = 1 * cm
+MARGIN_LEFT = 1 * cm
+MARGIN_RIGHT = 1 * cm
+
+# Area utilizzabile
+USABLE_WIDTH = PAGE_WIDTH - MARGIN_LEFT - MARGIN_RIGHT
+
+# Righe della tabella prodotti
+TABLE_ROWS = 10
+
+# Lato del logo stampato e risoluzione a cui viene ridotto
+LOGO_SIZE = 2.5 * cm
+LOGO_DPI = 300
+
+# Nome del Form XObject con le parti fisse della pagina
+SKELETON_FORM = 'DDTSkeleton'
+
+TITLE_TEXT = "DOCUMENTO DI TRASPORTO"
+
+
+def _compile_layout():
+    """Calcola la posizione di tutte le caselle della pagina"""
+    layout = {}
+    
+    # Striscia grigia scura dell'header
+    stripe_height = 1.5 * cm
+    stripe = Box(MARGIN_LEFT, PAGE_HEIGHT - MARGIN_TOP - stripe_height, USABLE_WIDTH, stripe_height)
+    layout['stripe'] = stripe
+    
+    # Caselle principali: due colonne affiancate
+    column_width = (USABLE_WIDTH / 2) - 0.05 * cm
+    layout['mittente'] = Box(MARGIN_LEFT, stripe.y - 1 * cm - 4.3 * cm, column_width, 4.3 * cm)
+    layout['causale'] = Box(MARGIN_LEFT, layout['mittente'].y - 0.1 * cm - 1.8 * cm, column_width, 1.8 * cm)
+    layout['numero_data'] = Box(
+        MARGIN_LEFT + column_width + 0.1 * cm, stripe.y - 1 * cm - 1.8 * cm, column_width, 1.8 * cm
+    )
+    layout['destinatario'] = Box(
+        layout['numero_data'].x, layout['numero_data'].y - 0.1 * cm - 4.3 * cm, column_width, 4.3 * cm
+    )
+    layout['luogo'] = Box(MARGIN_LEFT, layout['causale'].y - 0.1 * cm - 2.5 * cm, USABLE_WIDTH, 2.5 * cm)
+    
+    # Logo nell'angolo in alto a destra della casella MITTENTE
+    mittente = layout['mittente']
+    layout['logo'] = Box(
+        mittente.x + mittente.width - LOGO_SIZE - 5,
+        mittente.y + mittente.height - LOGO_SIZE - 5,
+        LOGO_SIZE, LOGO_SIZE
+    )
+    
+    # Tabella prodotti: header e righe sotto di esso
+    header_height = 1.2 * cm
+    riga_height = 0.8 * cm
+    header = Box(MARGIN_LEFT, layout['luogo'].y - 0.1 * cm - header_height, USABLE_WIDTH, header_height)
+    layout['tabella_header'] = header
+    layout['tabella'] = Box(MARGIN_LEFT, header.y - TABLE_ROWS * riga_height, USABLE_WIDTH, TABLE_ROWS * riga_height)
+    layout['riga_height'] = riga_height
+    layout['descrizione_width'] = USABLE_WIDTH * 0.75
+    layout['unita_quantita_width'] = USABLE_WIDTH * 0.125
+    
+    # Footer: trasporto, data ritiro, vettore e annotazioni
+    footer_y = layout['tabella'].y - 0.1 * cm - 1.8 * cm
+    small_width = (USABLE_WIDTH / 4) - 0.2 * cm  # Ridotte per dare spazio al vettore
+    layout['trasporto_mezzo'] = Box(MARGIN_LEFT, footer_y, small_width, 1.8 * cm)
+    layout['data_ritiro'] = Box(MARGIN_LEFT + small_width, footer_y, small_width, 1.8 * cm)
+    layout['trasporto'] = Box(
+        MARGIN_LEFT + 2 * small_width, footer_y - 2.2 * cm, USABLE_WIDTH - 2 * small_width, 4 * cm
+    )
+    layout['annotazioni'] = Box(MARGIN_LEFT, layout['trasporto'].y, 2 * small_width, 4 * cm - 1.8 * cm)
+    
+    # Caselle per le firme
+    firma_width = USABLE_WIDTH / 3
+    firme_y = layout['annotazioni'].y - 2 * cm
+    layout['firme'] = tuple(
+        Box(MARGIN_LEFT + i * firma_width, firme_y, firma_width, 2 * cm) for i in range(3)
+    )
+    
+    # Titolo con spaziatura tra le lettere: posizione di ogni carattere
+    char_spacing = 7
+    widths = [pdfmetrics.stringWidth(char, "Times-Bold", 14) for char in TITLE_TEXT]
+    total_width = sum(w if char == ' ' else w + char_spacing for char, w in zip(TITLE_TEXT, widths))
+    current_x = stripe.x + (stripe.width - total_width) / 2
+    title_y = stripe.y + (stripe.height - 14) / 2
+    title_glyphs = []
+    for char, char_width in zip(TITLE_TEXT, widths):
+        if char == ' ':
+            current_x += char_width
+        else:
+            title_glyphs.append((char, current_x))
+            current_x += char_width + char_spacing
+    layout['title_glyphs'] = tuple(title_glyphs)
+    layout['title_y'] = title_y
+    
+    # Etichette fisse delle caselle (titoli più piccoli)
+    labels = [
+        (text, box.x + 5, box.y + box.height - 12)
+        for text, box in (
+            ("MITTENTE", layout['mittente']),
+            ("CAUSALE DI TRASPORTO", layout['causale']),
+            ("NUMERO E DATA DOCUMENTO", layout['numero_data']),
+            ("DESTINATARIO", layout['destinatario']),
+            ("LUOGO DI DESTINAZIONE", layout['luogo']),
+            ("TRASPORTO A MEZZO", layout['trasporto_mezzo']),
+            ("DATA RITIRO", layout['data_ritiro']),
+            ("ANNOTAZIONI", layout['annotazioni']),
+            ("FIRMA MITTENTE", layout['firme'][0]),
+            ("FIRMA VETTORE", layout['firme'][1]),
+            ("FIRMA DESTINATARIO", layout['firme'][2]),
+        )
+    ]
+    
+    # Intestazioni delle colonne della tabella, centrate
+    column_starts = (
+        (header.x, layout['descrizione_width']),
+        (header.x + layout['descrizione_width'], layout['unita_quantita_width']),
+        (header.x + layout['descrizione_width'] + layout['unita_quantita_width'], layout['unita_quantita_width']),
+    )
+    for text, (column_x, column_width) in zip(("DESCRIZIONE DEI BENI", "U.M.", "QUANTITÀ"), column_starts):
+        text_width = pdfmetrics.stringWidth(text, "Times-Bold", 8)
+        labels.append((text, column_x + (column_width - text_width) / 2, header.y + (header.height - 8) / 2))
+    layout['labels'] = tuple(labels)
+    
+    # Caselle disegnate con il solo bordo
+    layout['frames'] = (
+        layout['mittente'], layout['causale'], layout['numero_data'], layout['destinatario'],
+        layout['luogo'], layout['trasporto_mezzo'], layout['data_ritiro'], layout['trasporto'],
+        layout['annotazioni'],
+    ) + layout['firme']
+    
+    return layout
+
+
+LAYOUT = _compile_layout()
 
 
 def create_ddt_pdf(ddt_id, output_path=None):
@@ -24,161 +180,201 @@ def create_ddt_pdf(ddt_id, output_path=None):
     Returns:
         str: Percorso del file PDF generato
     """
-    try:
-        ddt = DDT.objects.get(id=ddt_id)
-    except DDT.DoesNotExist:
-        raise ValueError(f"DDT con ID {ddt_id} non trovato")
+    ddt = load_ddt_data(ddt_id)
     
     if not output_path:
-        output_path = f"ddt_{ddt.numero.replace('/', '_')}.pdf"
+        output_path = ddt_pdf_filename(ddt, prefix='ddt_')
     
-    # Dimensioni A4
-    page_width, page_height = A4
+    with open(output_path, 'wb') as output_file:
+        render_ddt_pdf(ddt, output_file)
     
-    # Margini richiesti
-    margin_top = 1 * cm
-    margin_bottom = 1.5 * cm
-    margin_left = 1 * cm
-    margin_right = 1 * cm
+    return output_path
+
+
+def render_ddt_pdf(ddt, stream=None):
+    """
+    Disegna il PDF di un DDT in memoria o su uno stream scrivibile
     
-    # Area utilizzabile
-    usable_width = page_width - margin_left - margin_right
-    usable_height = page_height - margin_top - margin_bottom
+    Il disegno usa solo i dati di stampa (DDTData): passando un DDTData
+    già caricato la generazione non esegue query.
     
-    # Crea il PDF
-    c = canvas.Canvas(output_path, pagesize=A4)
+    Args:
+        ddt (DDTData | DDT | int): Dati di stampa, DDT o ID del DDT da generare
+        stream (file-like, optional): Stream su cui scrivere il PDF
+            (file, HttpResponse, ...). Default: BytesIO interno
     
-    # Disegna l'header
-    _draw_header(c, ddt, page_width, page_height, margin_top, margin_left, usable_width)
+    Returns:
+        bytes: Contenuto del PDF se stream non è specificato,
+        altrimenti lo stream passato
+    """
+    ddt = load_ddt_data(ddt)
     
-    # Disegna le caselle principali
-    _draw_main_boxes(c, ddt, page_width, page_height, margin_top, margin_left, usable_width)
+    buffer = stream if stream is not None else BytesIO()
     
-    # Disegna la tabella prodotti
-    _draw_products_table(c, ddt, page_width, page_height, margin_top, margin_left, usable_width)
+    # invariant: data e ID del documento fissi, quindi lo stesso DDT produce
+    # sempre gli stessi byte e l'ETag della vista (la chiave di cache) è forte
+    c = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    _draw_ddt(c, ddt)
+    c.save()
     
-    # Disegna il footer
-    _draw_footer(c, ddt, page_width, page_height, margin_top, margin_left, usable_width)
+    if stream is None:
+        return buffer.getvalue()
+    return stream
+
+
+def create_ddt_batch_pdf(queryset, stream=None):
+    """
+    Crea un unico PDF con una pagina per ogni DDT del queryset
+    
+    Tutti i DDT vengono disegnati sullo stesso canvas, così le risorse
+    condivise (font, logo) sono incluse una sola volta nel documento.
+    I dati sono caricati a blocchi con un numero fisso di query per blocco.
+    
+    Args:
+        queryset (QuerySet | iterable): DDT da stampare, nell'ordine del
+            queryset, oppure dati di stampa (DDTData) già caricati
+        stream (file-like, optional): Stream su cui scrivere il PDF.
+            Default: BytesIO interno
+    
+    Returns:
+        bytes: Contenuto del PDF se stream non è specificato,
+        altrimenti lo stream passato
+    """
+    buffer = stream if stream is not None else BytesIO()
+    
+    c = canvas.Canvas(buffer, pagesize=A4)
+    pagine = 0
+    ddt_list = iter_ddt_data(queryset) if isinstance(queryset, QuerySet) else queryset
+    for ddt in ddt_list:
+        _draw_ddt(c, ddt)
+        c.showPage()
+        pagine += 1
+    
+    if not pagine:
+        raise ValueError("Nessun DDT da stampare")
     
     c.save()
     
-    return output_path
+    if stream is None:
+        return buffer.getvalue()
+    return stream
+
+
+def ddt_pdf_filename(ddt, prefix='DDT_'):
+    """Nome del file PDF per un DDT (senza caratteri non validi nei percorsi)"""
+    return f"{prefix}{ddt.numero.replace('/', '_')}.pdf"
+
+
+def _draw_ddt(c, ddt):
+    """Disegna tutte le sezioni di un DDT sulla pagina corrente del canvas"""
+    # Parti fisse della pagina (caselle, etichette, griglia, titolo)
+    _draw_page_skeleton(c)
+    
+    c.setFillColor(black)
+    c.setStrokeColor(black)
+    c.setLineWidth(1)
+    
+    # Disegna i dati delle caselle principali
+    _draw_main_boxes(c, ddt)
+    
+    # Disegna la tabella prodotti
+    _draw_products_table(c, ddt)
+    
+    # Disegna il footer
+    _draw_footer(c, ddt)
 
 
-def _draw_header(c, ddt, page_width, page_height, margin_top, margin_left, usable_width):
+def _draw_page_skeleton(c):
+    """
+    Disegna le parti fisse della pagina
+    
+    Sono definite una sola volta per documento come Form XObject e
+    ogni pagina vi fa riferimento con un singolo operatore.
+    """
+    if not c.hasForm(SKELETON_FORM):
+        c.beginForm(SKELETON_FORM)
+        _draw_header(c)
+        _draw_frames(c)
+        c.endForm()
+    c.doForm(SKELETON_FORM)
+
+
+def _draw_header(c):
     """Disegna l'header del DDT"""
-    # Striscia grigia scura
-    stripe_height = 1.5 * cm
-    stripe_x = margin_left
-    stripe_y = page_height - margin_top - stripe_height
-    stripe_width = usable_width
+    stripe = LAYOUT['stripe']
     
     # Colore grigio scuro quasi nero
     dark_grey = Color(0.2, 0.2, 0.2)
     
     # Disegna la striscia grigia scura
     c.setFillColor(dark_grey)
-    c.rect(stripe_x, stripe_y, stripe_width, stripe_height, fill=1, stroke=0)
+    c.rect(stripe.x, stripe.y, stripe.width, stripe.height, fill=1, stroke=0)
     
-    # Posiziona il testo al centro della striscia
-    text = "DOCUMENTO DI TRASPORTO"
+    # Disegna il testo al centro della striscia con spaziatura maggiore tra le lettere
     c.setFillColor(white)
-    c.setFont("Times-Bold", 18)
-    
-    # Calcola la larghezza totale del testo con spaziatura
-    char_spacing = 7
-    total_width = 0
-    for char in text:
-        if char == ' ':
-            total_width += c.stringWidth(char, "Times-Bold", 14)
-        else:
-            total_width += c.stringWidth(char, "Times-Bold", 14) + char_spacing
-    
-    # Calcola la posizione del testo per centrarlo
-    text_x = stripe_x + (stripe_width - total_width) / 2
-    text_y = stripe_y + (stripe_height - 14) / 2
-    
-    # Disegna il testo con spaziatura maggiore tra le lettere
-    current_x = text_x
-    for char in text:
-        if char == ' ':
-            char_width = c.stringWidth(char, "Times-Bold", 14)
-            c.drawString(current_x, text_y, char)
-            current_x += char_width
-        else:
-            char_width = c.stringWidth(char, "Times-Bold", 14)
-            c.drawString(current_x, text_y, char)
-            current_x += char_width + char_spacing
+    title = c.beginText()
+    title.setFont("Times-Bold", 18)
+    for char, char_x in LAYOUT['title_glyphs']:
+        title.setTextOrigin(char_x, LAYOUT['title_y'])
+        title.textOut(char)
+    c.drawText(title)
 
 
-def _draw_main_boxes(c, ddt, page_width, page_height, margin_top, margin_left, usable_width):
-    """Disegna le caselle principali del DDT"""
-    stripe_height = 1.5 * cm
-    stripe_y = page_height - margin_top - stripe_height
-    
-    # Casella mittente
-    mittente_y = stripe_y - 1 * cm - 4.3 * cm
-    mittente_x = margin_left
-    mittente_width = (usable_width / 2) - 0.05 * cm
-    mittente_height = 4.3 * cm
-    
-    # Disegna la casella mittente
+def _draw_frames(c):
+    """Disegna i bordi delle caselle, la griglia della tabella e le etichette"""
     c.setFillColor(black)
-    c.rect(mittente_x, mittente_y, mittente_width, mittente_height, fill=0, stroke=1)
-    
-    # Aggiungi etichetta "MITTENTE" (titolo più piccolo)
-    c.setFont("Times-Bold", 8)
-    label_text = "MITTENTE"
-    label_x = mittente_x + 5
-    label_y = mittente_y + mittente_height - 12
-    c.drawString(label_x, label_y, label_text)
+    c.setStrokeColor(black)
     
+    for box in LAYOUT['frames']:
+        c.rect(box.x, box.y, box.width, box.height, fill=0, stroke=1)
+    
+    # Header e righe della tabella, divisi in 3 colonne
+    header = LAYOUT['tabella_header']
+    tabella = LAYOUT['tabella']
+    riga_height = LAYOUT['riga_height']
+    col1_x = tabella.x + LAYOUT['descrizione_width']
+    col2_x = col1_x + LAYOUT['unita_quantita_width']
+    
+    c.rect(header.x, header.y, header.width, header.height, fill=0, stroke=1)
+    c.line(col1_x, header.y, col1_x, header.y + header.height)
+    c.line(col2_x, header.y, col2_x, header.y + header.height)
+    
+    for i in range(TABLE_ROWS):
+        riga_y = tabella.y + (i * riga_height)
+        c.rect(tabella.x, riga_y, tabella.width, riga_height, fill=0, stroke=1)
+        c.line(col1_x, riga_y, col1_x, riga_y + riga_height)
+        c.line(col2_x, riga_y, col2_x, riga_y + riga_height)
+    
+    # Etichette in un unico blocco di testo
+    labels = c.beginText()
+    labels.setFont("Times-Bold", 8)
+    for text, x, y in LAYOUT['labels']:
+        labels.setTextOrigin(x, y)
+        labels.textOut(text)
+    c.drawText(labels)
+
+
+def _draw_main_boxes(c, ddt):
+    """Disegna i dati delle caselle principali del DDT"""
     # Inserisci il logo nell'angolo in alto a destra della casella MITTENTE
-    _draw_logo(c, ddt, mittente_x, mittente_y, mittente_width, mittente_height)
+    _draw_logo(c, ddt)
     
     # Aggiungi dati mittente
+    mittente = LAYOUT['mittente']
     if ddt.sede_mittente:
-        _draw_sede_mittente_data(c, ddt.sede_mittente, mittente_x + 5, mittente_y + 5, mittente_width - 10)
+        _draw_sede_mittente_data(c, ddt.sede_mittente, mittente.x + 5, mittente.y + 5, mittente.width - 10)
     elif ddt.mittente:
-        _draw_entity_data(c, ddt.mittente, mittente_x + 5, mittente_y + 5, mittente_width - 10)
-    
-    # Casella causale di trasporto
-    casella2_y = mittente_y - 0.1 * cm - 1.8 * cm
-    casella2_x = margin_left
-    casella2_width = mittente_width
-    casella2_height = 1.8 * cm
-    
-    c.rect(casella2_x, casella2_y, casella2_width, casella2_height, fill=0, stroke=1)
-    
-    # Aggiungi etichetta "CAUSALE DI TRASPORTO" (titolo più piccolo)
-    c.setFont("Times-Bold", 8)
-    label2_text = "CAUSALE DI TRASPORTO"
-    label2_x = casella2_x + 5
-    label2_y = casella2_y + casella2_height - 12
-    c.drawString(label2_x, label2_y, label2_text)
+        _draw_entity_data(c, ddt.mittente, mittente.x + 5, mittente.y + 5, mittente.width - 10)
     
     # Aggiungi causale
+    causale = LAYOUT['causale']
     if ddt.causale_trasporto:
         c.setFont("Times-Roman", 10)
         causale_text = f"{ddt.causale_trasporto.codice} - {ddt.causale_trasporto.descrizione}"
-        c.drawString(casella2_x + 5, casella2_y + 5, causale_text)
-    
-    # Casella numero e data
-    casella3_x = mittente_x + mittente_width + 0.1 * cm
-    casella3_y = stripe_y - 1 * cm - 1.8 * cm
-    casella3_width = (usable_width / 2) - 0.05 * cm
-    casella3_height = 1.8 * cm
-    
-    c.rect(casella3_x, casella3_y, casella3_width, casella3_height, fill=0, stroke=1)
-    
-    # Aggiungi etichetta "NUMERO E DATA DOCUMENTO" (titolo più piccolo)
-    c.setFont("Times-Bold", 8)
-    label3_text = "NUMERO E DATA DOCUMENTO"
-    label3_x = casella3_x + 5
-    label3_y = casella3_y + casella3_height - 12
-    c.drawString(label3_x, label3_y, label3_text)
+        c.drawString(causale.x + 5, causale.y + 5, causale_text)
     
     # Aggiungi numero e data sulla stessa riga
+    numero_data = LAYOUT['numero_data']
     if ddt.numero:
         c.setFont("Times-Roman", 10)
         # Rimuovi il trattino dal numero DDT se presente
@@ -187,186 +383,40 @@ def _draw_main_boxes(c, ddt, page_width, page_height, margin_top, margin_left, u
             numero_data_text = f"DDT N° {numero_pulito} - Data: {ddt.data_documento.strftime('%d/%m/%Y')}"
         else:
             numero_data_text = f"DDT N° {numero_pulito}"
-        c.drawString(casella3_x + 5, casella3_y + 8, numero_data_text)
-    
-    # Casella destinatario
-    casella4_x = casella3_x
-    casella4_y = casella3_y - 0.1 * cm - 4.3 * cm
-    casella4_width = casella3_width
-    casella4_height = 4.3 * cm
-    
-    c.rect(casella4_x, casella4_y, casella4_width, casella4_height, fill=0, stroke=1)
-    
-    # Aggiungi etichetta "DESTINATARIO" (titolo più piccolo)
-    c.setFont("Times-Bold", 8)
-    label4_text = "DESTINATARIO"
-    label4_x = casella4_x + 5
-    label4_y = casella4_y + casella4_height - 12
-    c.drawString(label4_x, label4_y, label4_text)
+        c.drawString(numero_data.x + 5, numero_data.y + 8, numero_data_text)
     
     # Aggiungi dati destinatario
+    destinatario = LAYOUT['destinatario']
     if ddt.destinazione:
-        _draw_destinazione_data(c, ddt.destinazione, casella4_x + 5, casella4_y + 5, casella4_width - 10)
+        _draw_destinazione_data(c, ddt.destinazione, destinatario.x + 5, destinatario.y + 5, destinatario.width - 10)
     elif ddt.destinatario:
-        _draw_entity_data(c, ddt.destinatario, casella4_x + 5, casella4_y + 5, casella4_width - 10)
-    
-    # Casella luogo di destinazione
-    casella5_x = margin_left
-    casella5_y = casella2_y - 0.1 * cm - 2.5 * cm
-    casella5_width = usable_width
-    casella5_height = 2.5 * cm
-    
-    c.rect(casella5_x, casella5_y, casella5_width, casella5_height, fill=0, stroke=1)
+        _draw_entity_data(c, ddt.destinatario, destinatario.x + 5, destinatario.y + 5, destinatario.width - 10)
     
-    # Aggiungi etichetta "LUOGO DI DESTINAZIONE" (titolo più piccolo)
-    c.setFont("Times-Bold", 8)
-    label5_text = "LUOGO DI DESTINAZIONE"
-    label5_x = casella5_x + 5
-    label5_y = casella5_y + casella5_height - 12
-    c.drawString(label5_x, label5_y, label5_text)
-    
-    # Aggiungi luogo di destinazione (gestisce più righe)
-    if ddt.luogo_destinazione:
+    # Aggiungi luogo di destinazione (righe già divise e standardizzate nei dati di stampa)
+    luogo = LAYOUT['luogo']
+    if ddt.luogo_righe:
         c.setFont("Times-Roman", 10)
-        
-        # Dividi il testo in righe e rimuovi duplicati
-        lines = ddt.luogo_destinazione.split('\n')
-        unique_lines = []
-        for line in lines:
-            line = line.strip()
-            if line and line not in unique_lines:
-                unique_lines.append(line)
-        
-        # Se non ci sono caratteri di nuova riga, prova a dividere per altri separatori
-        if len(unique_lines) == 1 and ('Codice Stalla:' in unique_lines[0] or 'Via' in unique_lines[0]):
-            # Prova a dividere per "Codice Stalla:" e "Via"
-            text = unique_lines[0]
-            parts = []
-            
-            # Dividi per "Codice Stalla:"
-            if 'Codice Stalla:' in text:
-                before_codice = text.split('Codice Stalla:')[0]
-                after_codice = text.split('Codice Stalla:')[1]
-                if before_codice.strip():
-                    parts.append(before_codice.strip())
-                if after_codice.strip():
-                    # Dividi ulteriormente per "Via"
-                    if 'Via' in after_codice:
-                        codice_part = after_codice.split('Via')[0].strip()
-                        via_part = 'Via' + after_codice.split('Via')[1]
-                        if codice_part:
-                            parts.append('Codice Stalla:' + codice_part)
-                        if via_part.strip():
-                            parts.append(via_part.strip())
-                    else:
-                        parts.append('Codice Stalla:' + after_codice.strip())
-            else:
-                # Dividi per "Via"
-                if 'Via' in text:
-                    before_via = text.split('Via')[0]
-                    via_part = 'Via' + text.split('Via')[1]
-                    if before_via.strip():
-                        parts.append(before_via.strip())
-                    if via_part.strip():
-                        parts.append(via_part.strip())
-                else:
-                    parts.append(text)
-            
-            unique_lines = parts
-        
-        # Disegna ogni riga (stessa distanza del mittente, standardizzato)
-        start_y = casella5_y + casella5_height - 40  # Stessa distanza del mittente
-        current_y = start_y
-        for line in unique_lines:
-            # Standardizza il testo del luogo destinazione
-            if 'Codice Stalla:' in line:
-                # Gestisce il caso speciale del codice stalla
-                parts = line.split('Codice Stalla:')
-                if len(parts) == 2:
-                    before = parts[0].strip().title()  # Prima parte con title case
-                    after = parts[1].strip().upper()   # Codice stalla in maiuscolo
-                    # Rimuovi spazio extra prima di "Codice Stalla:"
-                    if before:
-                        line = f"{before} Codice Stalla: {after}"
-                    else:
-                        line = f"Codice Stalla: {after}"
-                else:
-                    line = line.title()  # Fallback con title case
-            else:
-                line = line.title()  # Standardizza con title case
-            c.drawString(casella5_x + 5, current_y, line)
+        # Stessa distanza del mittente
+        current_y = luogo.y + luogo.height - 40
+        for line in ddt.luogo_righe:
+            c.drawString(luogo.x + 5, current_y, line)
             current_y -= 12  # Spaziatura tra le righe
 
 
-def _draw_products_table(c, ddt, page_width, page_height, margin_top, margin_left, usable_width):
-    """Disegna la tabella prodotti con supporto per note centrali"""
-    stripe_height = 1.5 * cm
-    stripe_y = page_height - margin_top - stripe_height
-    
-    # Posizione tabella
-    tabella_x = margin_left
-    # Calcola la posizione dell'header della tabella
-    header_y = stripe_y - 1 * cm - 4.3 * cm - 0.1 * cm - 1.8 * cm - 0.1 * cm - 2.5 * cm - 0.1 * cm - 1.2 * cm
-    # Le righe iniziano sotto l'header
-    tabella_y = header_y - 10 * 0.8 * cm
-    tabella_width = usable_width
-    header_height = 1.2 * cm
-    riga_height = 0.8 * cm
-    
-    # Calcola larghezza delle colonne
-    descrizione_width = tabella_width * 0.75
-    unita_quantita_width = tabella_width * 0.125
-    
-    # Disegna l'header della tabella
-    c.setFillColor(black)
-    c.rect(tabella_x, header_y, tabella_width, header_height, fill=0, stroke=1)
-    
-    # Linee verticali per dividere l'header in 3 colonne
-    c.line(tabella_x + descrizione_width, header_y, 
-           tabella_x + descrizione_width, header_y + header_height)
-    c.line(tabella_x + descrizione_width + unita_quantita_width, header_y, 
-           tabella_x + descrizione_width + unita_quantita_width, header_y + header_height)
-    
-    # Aggiungi testo header della tabella (titoli più piccoli)
-    c.setFont("Times-Bold", 8)
-    
-    # Colonna 1: DESCRIZIONE DEI BENI
-    text1 = "DESCRIZIONE DEI BENI"
-    text1_width = c.stringWidth(text1, "Times-Bold", 8)
-    text1_x = tabella_x + (descrizione_width - text1_width) / 2
-    text1_y = header_y + (header_height - 8) / 2
-    c.drawString(text1_x, text1_y, text1)
-    
-    # Colonna 2: U.M.
-    text2 = "U.M."
-    text2_width = c.stringWidth(text2, "Times-Bold", 8)
-    text2_x = tabella_x + descrizione_width + (unita_quantita_width - text2_width) / 2
-    text2_y = header_y + (header_height - 8) / 2
-    c.drawString(text2_x, text2_y, text2)
-    
-    # Colonna 3: QUANTITÀ
-    text3 = "QUANTITÀ"
-    text3_width = c.stringWidth(text3, "Times-Bold", 8)
-    text3_x = tabella_x + descrizione_width + unita_quantita_width + (unita_quantita_width - text3_width) / 2
-    text3_y = header_y + (header_height - 8) / 2
-    c.drawString(text3_x, text3_y, text3)
-    
-    # Disegna le 10 righe della tabella
-    for i in range(10):
-        riga_y = tabella_y + (i * riga_height)
-        c.rect(tabella_x, riga_y, tabella_width, riga_height, fill=0, stroke=1)
-        
-        # Linee verticali per dividere ogni riga in 3 colonne
-        c.line(tabella_x + descrizione_width, riga_y, tabella_x + descrizione_width, riga_y + riga_height)
-        c.line(tabella_x + descrizione_width + unita_quantita_width, riga_y, tabella_x + descrizione_width + unita_quantita_width, riga_y + riga_height)
+def _draw_products_table(c, ddt):
+    """Disegna il contenuto della tabella prodotti con supporto per note centrali"""
+    tabella = LAYOUT['tabella']
     
     # Gestione note centrali o righe articoli
     if ddt.usa_note_centrali and ddt.note_centrali:
         # Disegna le note centrali
-        _draw_central_notes(c, ddt.note_centrali, tabella_x, tabella_y, descrizione_width, riga_height)
+        _draw_central_notes(c, ddt.note_centrali, tabella.x, tabella.y, LAYOUT['descrizione_width'], LAYOUT['riga_height'])
     else:
         # Disegna le righe degli articoli
-        _draw_article_rows(c, ddt, tabella_x, tabella_y, descrizione_width, unita_quantita_width, riga_height, header_y)
+        _draw_article_rows(
+            c, ddt, tabella.x, tabella.y, LAYOUT['descrizione_width'], LAYOUT['unita_quantita_width'],
+            LAYOUT['riga_height'], LAYOUT['tabella_header'].y
+        )
 
 
 def _draw_central_notes(c, notes, tabella_x, tabella_y, descrizione_width, riga_height):
@@ -396,9 +446,7 @@ def _draw_central_notes(c, notes, tabella_x, tabella_y, descrizione_width, riga_
     
     for line in lines[:6]:  # Massimo 6 righe
         if y_offset > etichetta_y + 10:
-            # Standardizza il testo delle note centrali
-            line_standardized = line.title()  # Prima lettera maiuscola per ogni parola
-            c.drawString(etichetta_x + 10, y_offset, line_standardized[:50])  # Massimo 50 caratteri per riga
+            c.drawString(etichetta_x + 10, y_offset, line[:50])  # Massimo 50 caratteri per riga
             y_offset -= 12
 
 
@@ -406,14 +454,14 @@ def _draw_article_rows(c, ddt, tabella_x, tabella_y, descrizione_width, unita_qu
     """Disegna le righe degli articoli nella tabella"""
     c.setFont("Times-Roman", 10)
     
-    for i, riga in enumerate(ddt.righe.all().order_by('ordine')[:10]):  # Massimo 10 righe, ordinate per ordine
+    for i, riga in enumerate(ddt.righe[:10]):  # Massimo 10 righe, ordinate per ordine
         # Le righe sono posizionate sotto l'header della tabella, dall'alto verso il basso
         riga_y = header_y - ((i + 1) * riga_height)
         
-        # Descrizione articolo (standardizzata)
-        descrizione = f"{riga.articolo.nome.title()}"  # Nome articolo standardizzato
+        # Descrizione articolo
+        descrizione = riga.articolo_nome
         if riga.descrizione:
-            descrizione += f" - {riga.descrizione.title()}"  # Descrizione standardizzata
+            descrizione += f" - {riga.descrizione}"
         
         # Tronca la descrizione se troppo lunga
         if len(descrizione) > 60:
@@ -421,218 +469,160 @@ def _draw_article_rows(c, ddt, tabella_x, tabella_y, descrizione_width, unita_qu
         
         c.drawString(tabella_x + 5, riga_y + 5, descrizione)
         
-        # Unità di misura (standardizzata)
-        um_standardized = riga.articolo.um.upper()  # Unità di misura in maiuscolo
-        c.drawString(tabella_x + descrizione_width + 5, riga_y + 5, um_standardized)
+        # Unità di misura
+        c.drawString(tabella_x + descrizione_width + 5, riga_y + 5, riga.articolo_um)
         
         # Quantità
         quantita_text = f"{riga.quantita}"
         c.drawString(tabella_x + descrizione_width + unita_quantita_width + 5, riga_y + 5, quantita_text)
 
 
-def _draw_footer(c, ddt, page_width, page_height, margin_top, margin_left, usable_width):
-    """Disegna il footer del DDT"""
-    stripe_height = 1.5 * cm
-    stripe_y = page_height - margin_top - stripe_height
-    
-    # Calcola posizione footer
-    header_y = stripe_y - 1 * cm - 4.3 * cm - 0.1 * cm - 1.8 * cm - 0.1 * cm - 2.5 * cm - 0.1 * cm - 1.2 * cm
-    tabella_y = header_y - 10 * 0.8 * cm
-    footer_y = tabella_y - 0.1 * cm - 1.8 * cm
-    
-    # Prima casella - TRASPORTO A MEZZO (ridotta)
-    casella1_x = margin_left
-    casella1_y = footer_y
-    casella1_width = (usable_width / 4) - 0.2 * cm  # Ridotta per dare spazio al vettore
-    casella1_height = 1.8 * cm
-    
-    c.setFillColor(black)
-    c.rect(casella1_x, casella1_y, casella1_width, casella1_height, fill=0, stroke=1)
-    
-    # Aggiungi etichetta "TRASPORTO A MEZZO" (titolo più piccolo)
-    c.setFont("Times-Bold", 8)
-    label1_text = "TRASPORTO A MEZZO"
-    label1_x = casella1_x + 5
-    label1_y = casella1_y + casella1_height - 12
-    c.drawString(label1_x, label1_y, label1_text)
-    
+def _draw_footer(c, ddt):
+    """Disegna i dati del footer del DDT"""
     # Aggiungi mezzo di trasporto (standardizzato)
+    trasporto_mezzo = LAYOUT['trasporto_mezzo']
     if ddt.trasporto_mezzo:
         c.setFont("Times-Roman", 10)
         # Standardizza il testo del mezzo di trasporto
         trasporto_text = ddt.trasporto_mezzo.title()  # Prima lettera maiuscola
-        c.drawString(casella1_x + 5, casella1_y + 5, trasporto_text)
-    
-    # Seconda casella - DATA RITIRO (ridotta)
-    casella2_x = casella1_x + casella1_width
-    casella2_y = footer_y
-    casella2_width = (usable_width / 4) - 0.2 * cm  # Ridotta per dare spazio al vettore
-    casella2_height = 1.8 * cm
-    
-    c.rect(casella2_x, casella2_y, casella2_width, casella2_height, fill=0, stroke=1)
-    
-    # Aggiungi etichetta "DATA RITIRO" (titolo più piccolo)
-    c.setFont("Times-Bold", 8)
-    label2_text = "DATA RITIRO"
-    label2_x = casella2_x + 5
-    label2_y = casella2_y + casella2_height - 12
-    c.drawString(label2_x, label2_y, label2_text)
+        c.drawString(trasporto_mezzo.x + 5, trasporto_mezzo.y + 5, trasporto_text)
     
     # Aggiungi data ritiro
+    data_ritiro = LAYOUT['data_ritiro']
     if ddt.data_ritiro:
         c.setFont("Times-Roman", 10)
-        c.drawString(casella2_x + 5, casella2_y + 5, ddt.data_ritiro.strftime('%d/%m/%Y'))
-    
-    # Terza casella - VETTORE (aumentata)
-    casella3_x = casella2_x + casella2_width
-    casella3_y = footer_y - 2.2 * cm  # Più alta per contenere i dati del vettore
-    casella3_width = usable_width - casella1_width - casella2_width  # Aumentata automaticamente
-    casella3_height = 4 * cm
-    
-    c.rect(casella3_x, casella3_y, casella3_width, casella3_height, fill=0, stroke=1)
+        c.drawString(data_ritiro.x + 5, data_ritiro.y + 5, ddt.data_ritiro.strftime('%d/%m/%Y'))
     
     # Aggiungi etichetta dinamica per trasporto (titolo più piccolo)
+    trasporto = LAYOUT['trasporto']
     c.setFont("Times-Bold", 8)
     if ddt.trasporto_mezzo == 'vettore':
-        label3_text = "VETTORE:"
+        label_text = "VETTORE:"
     elif ddt.trasporto_mezzo == 'mittente':
-        label3_text = "MITTENTE:"
+        label_text = "MITTENTE:"
     elif ddt.trasporto_mezzo == 'destinatario':
-        label3_text = "DESTINATARIO:"
+        label_text = "DESTINATARIO:"
     else:
-        label3_text = "TRASPORTO:"
-    
-    label3_x = casella3_x + 5
-    label3_y = casella3_y + casella3_height - 12
-    c.drawString(label3_x, label3_y, label3_text)
+        label_text = "TRASPORTO:"
+    c.drawString(trasporto.x + 5, trasporto.y + trasporto.height - 12, label_text)
     
     # Aggiungi dati vettore/trasporto
     if ddt.trasporto_mezzo == 'vettore' and ddt.vettore:
-        _draw_vettore_data(c, ddt.vettore, ddt.targa_vettore, ddt.targa_vettore_2, ddt.autista, casella3_x + 5, casella3_y + 5, casella3_width - 10)
+        _draw_vettore_data(c, ddt.vettore, ddt.targa_vettore, ddt.targa_vettore_2, ddt.autista, trasporto.x + 5, trasporto.y + 5, trasporto.width - 10)
     elif ddt.trasporto_mezzo == 'mittente' and ddt.sede_mittente:
-        _draw_sede_mittente_data(c, ddt.sede_mittente, casella3_x + 5, casella3_y + 5, casella3_width - 10)
+        _draw_sede_mittente_data(c, ddt.sede_mittente, trasporto.x + 5, trasporto.y + 5, trasporto.width - 10)
     elif ddt.trasporto_mezzo == 'destinatario' and ddt.destinazione:
-        _draw_destinazione_data(c, ddt.destinazione, casella3_x + 5, casella3_y + 5, casella3_width - 10)
-    
-    # Casella ANNOTAZIONI (ridotta)
-    casella4_x = casella1_x
-    casella4_y = casella3_y
-    casella4_width = casella1_width + casella2_width  # Ora più piccola (TRASPORTO + DATA RITIRO ridotta)
-    casella4_height = casella3_height - 1.8 * cm
+        _draw_destinazione_data(c, ddt.destinazione, trasporto.x + 5, trasporto.y + 5, trasporto.width - 10)
     
-    c.rect(casella4_x, casella4_y, casella4_width, casella4_height, fill=0, stroke=1)
-    
-    # Aggiungi etichetta "ANNOTAZIONI" (titolo più piccolo)
-    c.setFont("Times-Bold", 8)
-    label4_text = "ANNOTAZIONI"
-    label4_x = casella4_x + 5
-    label4_y = casella4_y + casella4_height - 12
-    c.drawString(label4_x, label4_y, label4_text)
-    
-    # Aggiungi annotazioni (standardizzato)
+    # Aggiungi annotazioni (già standardizzate nei dati di stampa)
+    annotazioni = LAYOUT['annotazioni']
     if ddt.annotazioni:
         c.setFont("Times-Roman", 10)
         lines = ddt.annotazioni.split('\n')
-        y_offset = casella4_y + casella4_height - 25
+        y_offset = annotazioni.y + annotazioni.height - 25
         for line in lines[:8]:  # Massimo 8 righe
-            if y_offset > casella4_y + 5:
-                # Standardizza il testo delle annotazioni
-                line_standardized = line.title()  # Prima lettera maiuscola per ogni parola
-                c.drawString(casella4_x + 5, y_offset, line_standardized[:60])  # Massimo 60 caratteri per riga
+            if y_offset > annotazioni.y + 5:
+                c.drawString(annotazioni.x + 5, y_offset, line[:60])  # Massimo 60 caratteri per riga
                 y_offset -= 10
+
+
+def get_logo_path(logo_name=None):
+    """
+    Percorso su disco del logo da stampare
     
-    # Caselle per le firme
-    firme_y = casella4_y - 2 * cm
-    firme_height = 2 * cm
-    firme_width = usable_width / 3
-    
-    # Prima firma - FIRMA MITTENTE
-    firma1_x = margin_left
-    firma1_y = firme_y
-    firma1_width = firme_width
-    firma1_height = firme_height
-    
-    c.rect(firma1_x, firma1_y, firma1_width, firma1_height, fill=0, stroke=1)
-    
-    c.setFont("Times-Bold", 8)
-    firma1_text = "FIRMA MITTENTE"
-    firma1_text_x = firma1_x + 5
-    firma1_text_y = firma1_y + firma1_height - 12
-    c.drawString(firma1_text_x, firma1_text_y, firma1_text)
-    
-    # Seconda firma - FIRMA VETTORE
-    firma2_x = firma1_x + firma1_width
-    firma2_y = firme_y
-    firma2_width = firme_width
-    firma2_height = firme_height
+    Args:
+        logo_name (str, optional): Nome del file logo del mittente
     
-    c.rect(firma2_x, firma2_y, firma2_width, firma2_height, fill=0, stroke=1)
+    Returns:
+        str: Percorso del logo del mittente o del logo predefinito
+    """
+    if logo_name:
+        return Mittente._meta.get_field('logo').storage.path(logo_name)
+    return os.path.join(settings.BASE_DIR, 'static', 'images', 'logo1.png')
+
+
+# Loghi già decodificati e ridotti: percorso -> (mtime, ImageReader)
+_logo_cache = {}
+_logo_cache_lock = threading.Lock()
+
+
+def get_logo_image(logo_path):
+    """
+    Logo pronto per il disegno, decodificato e ridotto una sola volta per processo
     
-    c.setFont("Times-Bold", 8)
-    firma2_text = "FIRMA VETTORE"
-    firma2_text_x = firma2_x + 5
-    firma2_text_y = firma2_y + firma2_height - 12
-    c.drawString(firma2_text_x, firma2_text_y, firma2_text)
+    L'immagine resta in cache finché il file su disco non cambia; lo stesso
+    oggetto viene riusato da tutti i PDF, quindi reportlab lo riconosce e lo
+    include una sola volta per documento.
     
-    # Terza firma - FIRMA DESTINATARIO
-    firma3_x = firma2_x + firma2_width
-    firma3_y = firme_y
-    firma3_width = firme_width
-    firma3_height = firme_height
+    Args:
+        logo_path (str): Percorso del file logo
     
-    c.rect(firma3_x, firma3_y, firma3_width, firma3_height, fill=0, stroke=1)
+    Returns:
+        ImageReader: Logo ridotto alla risoluzione di stampa
     
-    c.setFont("Times-Bold", 8)
-    firma3_text = "FIRMA DESTINATARIO"
-    firma3_text_x = firma3_x + 5
-    firma3_text_y = firma3_y + firma3_height - 12
-    c.drawString(firma3_text_x, firma3_text_y, firma3_text)
+    Raises:
+        FileNotFoundError: Se il file del logo non esiste
+    """
+    try:
+        mtime = os.stat(logo_path).st_mtime_ns
+    except OSError:
+        raise FileNotFoundError(f"Logo non trovato: {logo_path}")
+    
+    cached = _logo_cache.get(logo_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    
+    logo_image = _load_logo_image(logo_path)
+    with _logo_cache_lock:
+        _logo_cache[logo_path] = (mtime, logo_image)
+    return logo_image
 
 
-def _draw_logo(c, ddt, x, y, width, height):
+def _load_logo_image(logo_path):
+    """Decodifica il logo e lo riduce al lato stampato a LOGO_DPI"""
+    max_pixels = round(LOGO_SIZE / inch * LOGO_DPI)
+    with Image.open(logo_path) as source:
+        # Mantiene la trasparenza per mask='auto'
+        has_alpha = 'A' in source.getbands() or 'transparency' in source.info
+        image = source.convert('RGBA' if has_alpha else 'RGB')
+    image.thumbnail((max_pixels, max_pixels), Image.LANCZOS)
+    
+    logo_image = ImageReader(image)
+    # Prepara subito i dati: l'oggetto è poi condiviso in sola lettura
+    logo_image.getRGBData()
+    return logo_image
+
+
+def clear_logo_cache(logo_path=None):
+    """Rimuove dalla cache un logo, o tutti i loghi se logo_path non è indicato"""
+    with _logo_cache_lock:
+        if logo_path is None:
+            _logo_cache.clear()
+        else:
+            _logo_cache.pop(logo_path, None)
+
+
+def _draw_logo(c, ddt):
     """Disegna il logo nell'angolo in alto a destra"""
-    logo_path = None
+    # Logo della sede mittente o del mittente; se non c'è, usa quello di default
+    logo_path = get_logo_path(ddt.logo_name)
     
-    # Cerca il logo personalizzato del mittente
-    if ddt.sede_mittente and ddt.sede_mittente.mittente and ddt.sede_mittente.mittente.logo:
-        logo_path = ddt.sede_mittente.mittente.logo.path
-    elif ddt.mittente and ddt.mittente.logo:
-        logo_path = ddt.mittente.logo.path
-    
-    # Se non c'è un logo personalizzato, usa quello di default
-    if not logo_path:
-        logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'logo1.png')
+    # Posizione e dimensioni del logo nell'angolo in alto a destra
+    logo = LAYOUT['logo']
     
     try:
-        # Carica il logo
-        if os.path.exists(logo_path):
-            img = ImageReader(logo_path)
-        else:
-            raise FileNotFoundError(f"Logo non trovato: {logo_path}")
-        
-        # Dimensioni del logo
-        logo_width = 2.5 * cm
-        logo_height = 2.5 * cm
-        
-        # Posizione del logo nell'angolo in alto a destra
-        logo_x = x + width - logo_width - 5
-        logo_y = y + height - logo_height - 5
-        
-        # Disegna il logo
-        c.drawImage(img, logo_x, logo_y, width=logo_width, height=logo_height, mask='auto')
+        # Disegna il logo (decodificato e ridotto una sola volta per processo)
+        logo_image = get_logo_image(logo_path)
+        c.drawImage(logo_image, logo.x, logo.y, width=logo.width, height=logo.height, mask='auto')
         
     except Exception as e:
         print(f"⚠️ Errore nel caricamento del logo: {e}")
         # Se c'è un errore, disegna un rettangolo placeholder
-        logo_width = 2.5 * cm
-        logo_height = 2.5 * cm
-        logo_x = x + width - logo_width - 5
-        logo_y = y + height - logo_height - 5
         c.setFillColor(Color(0.9, 0.9, 0.9))
-        c.rect(logo_x, logo_y, logo_width, logo_height, fill=1, stroke=0)
+        c.rect(logo.x, logo.y, logo.width, logo.height, fill=1, stroke=0)
         c.setFillColor(black)
         c.setFont("Times-Bold", 8)
-        c.drawString(logo_x + 10, logo_y + logo_height/2, "LOGO")
+        c.drawString(logo.x + 10, logo.y + logo.height/2, "LOGO")
 
 
 def _draw_entity_data(c, entity, x, y, max_width):
@@ -646,34 +636,32 @@ def _draw_entity_data(c, entity, x, y, max_width):
     
     current_y = start_y
     
-    # Nome (standardizzato)
-    if hasattr(entity, 'nome') and entity.nome:
-        nome_text = entity.nome.title()  # Prima lettera maiuscola per ogni parola
-        c.drawString(x, current_y, nome_text)
+    # Nome
+    if entity.nome:
+        c.drawString(x, current_y, entity.nome)
         current_y -= line_height
     
-    # Indirizzo (standardizzato)
-    if hasattr(entity, 'indirizzo') and entity.indirizzo:
-        indirizzo_text = entity.indirizzo.title()  # Prima lettera maiuscola per ogni parola
-        c.drawString(x, current_y, indirizzo_text)
+    # Indirizzo
+    if entity.indirizzo:
+        c.drawString(x, current_y, entity.indirizzo)
         current_y -= line_height
     
-    # Città, CAP, Provincia (standardizzato)
-    if hasattr(entity, 'citta') and entity.citta:
-        citta_text = entity.citta.title()  # Prima lettera maiuscola
-        if hasattr(entity, 'cap') and entity.cap:
+    # Città, CAP, Provincia
+    if entity.citta:
+        citta_text = entity.citta
+        if entity.cap:
             citta_text += f" ({entity.cap})"
-        if hasattr(entity, 'provincia') and entity.provincia:
-            citta_text += f" {entity.provincia.upper()}"  # Provincia in maiuscolo
+        if entity.provincia:
+            citta_text += f" {entity.provincia}"
         c.drawString(x, current_y, citta_text)
         current_y -= line_height
     
-    # P.IVA e CF (standardizzato)
-    if hasattr(entity, 'piva') and entity.piva:
-        c.drawString(x, current_y, f"P.IVA: {entity.piva.upper()}")  # P.IVA in maiuscolo
+    # P.IVA e CF
+    if entity.piva:
+        c.drawString(x, current_y, f"P.IVA: {entity.piva}")
         current_y -= line_height
-    if hasattr(entity, 'cf') and entity.cf:
-        c.drawString(x, current_y, f"CF: {entity.cf.upper()}")  # CF in maiuscolo
+    if entity.cf:
+        c.drawString(x, current_y, f"CF: {entity.cf}")
 
 
 def _draw_sede_mittente_data(c, sede, x, y, max_width):
@@ -687,35 +675,33 @@ def _draw_sede_mittente_data(c, sede, x, y, max_width):
     
     current_y = start_y
     
-    # Nome società (standardizzato)
+    # Nome società
     if sede.mittente and sede.mittente.nome:
-        nome_text = sede.mittente.nome.title()  # Prima lettera maiuscola per ogni parola
-        c.drawString(x, current_y, nome_text)
+        c.drawString(x, current_y, sede.mittente.nome)
         current_y -= line_height
     
-    # Indirizzo completo (standardizzato)
+    # Indirizzo completo
     if sede.indirizzo:
-        indirizzo_text = sede.indirizzo.title()  # Prima lettera maiuscola per ogni parola
-        c.drawString(x, current_y, indirizzo_text)
+        c.drawString(x, current_y, sede.indirizzo)
         current_y -= line_height
     
-    # Città, CAP, Provincia (standardizzato)
-    citta_text = sede.citta.title()  # Prima lettera maiuscola
+    # Città, CAP, Provincia
+    citta_text = sede.citta
     if sede.cap:
         citta_text += f" ({sede.cap})"
     if sede.provincia:
-        citta_text += f" {sede.provincia.upper()}"  # Provincia in maiuscolo
+        citta_text += f" {sede.provincia}"
     c.drawString(x, current_y, citta_text)
     current_y -= line_height
     
-    # P.IVA (standardizzato)
+    # P.IVA
     if sede.mittente and sede.mittente.piva:
-        c.drawString(x, current_y, f"P.IVA: {sede.mittente.piva.upper()}")  # P.IVA in maiuscolo
+        c.drawString(x, current_y, f"P.IVA: {sede.mittente.piva}")
         current_y -= line_height
     
-    # Codice stalla (standardizzato)
+    # Codice stalla
     if sede.codice_stalla:
-        c.drawString(x, current_y, f"Codice Stalla: {sede.codice_stalla.upper()}")  # Codice stalla in maiuscolo
+        c.drawString(x, current_y, f"Codice Stalla: {sede.codice_stalla}")
         current_y -= line_height
 
 
@@ -730,40 +716,38 @@ def _draw_destinazione_data(c, destinazione, x, y, max_width):
     
     current_y = start_y
     
-    # Nome destinatario (standardizzato)
+    # Nome destinatario
     if destinazione.destinatario and destinazione.destinatario.nome:
-        nome_text = destinazione.destinatario.nome.title()  # Prima lettera maiuscola per ogni parola
-        c.drawString(x, current_y, nome_text)
+        c.drawString(x, current_y, destinazione.destinatario.nome)
         current_y -= line_height
     
-    # Indirizzo destinatario (standardizzato)
+    # Indirizzo destinatario
     if destinazione.destinatario and destinazione.destinatario.indirizzo:
-        indirizzo_text = destinazione.destinatario.indirizzo.title()  # Prima lettera maiuscola per ogni parola
-        c.drawString(x, current_y, indirizzo_text)
+        c.drawString(x, current_y, destinazione.destinatario.indirizzo)
         current_y -= line_height
     
-    # CAP, Città, Provincia destinatario (standardizzato)
+    # CAP, Città, Provincia destinatario
     if destinazione.destinatario:
         destinatario = destinazione.destinatario
         citta_text = ""
         if destinatario.citta:
-            citta_text = destinatario.citta.title()  # Prima lettera maiuscola
+            citta_text = destinatario.citta
         if destinatario.cap:
             citta_text += f" ({destinatario.cap})"
         if destinatario.provincia:
-            citta_text += f" {destinatario.provincia.upper()}"  # Provincia in maiuscolo
+            citta_text += f" {destinatario.provincia}"
         if citta_text:
             c.drawString(x, current_y, citta_text)
             current_y -= line_height
     
-    # P.IVA destinatario (standardizzato)
+    # P.IVA destinatario
     if destinazione.destinatario and destinazione.destinatario.piva:
-        c.drawString(x, current_y, f"P.IVA: {destinazione.destinatario.piva.upper()}")  # P.IVA in maiuscolo
+        c.drawString(x, current_y, f"P.IVA: {destinazione.destinatario.piva}")
         current_y -= line_height
     
-    # Codice stalla destinazione (standardizzato)
+    # Codice stalla destinazione
     if destinazione.codice_stalla:
-        c.drawString(x, current_y, f"Codice Stalla: {destinazione.codice_stalla.upper()}")  # Codice stalla in maiuscolo
+        c.drawString(x, current_y, f"Codice Stalla: {destinazione.codice_stalla}")
         current_y -= line_height
 
 
@@ -778,54 +762,52 @@ def _draw_vettore_data(c, vettore, targa_vettore, targa_vettore_2, autista, x, y
     
     current_y = start_y
     
-    # Nome azienda (standardizzato)
+    # Nome azienda
     if vettore.nome:
-        nome_text = vettore.nome.title()  # Prima lettera maiuscola per ogni parola
-        c.drawString(x, current_y, nome_text)
+        c.drawString(x, current_y, vettore.nome)
         current_y -= line_height
     
-    # Indirizzo (standardizzato)
+    # Indirizzo
     if vettore.indirizzo:
-        indirizzo_text = vettore.indirizzo.title()  # Prima lettera maiuscola per ogni parola
-        c.drawString(x, current_y, indirizzo_text)
+        c.drawString(x, current_y, vettore.indirizzo)
         current_y -= line_height
     
-    # Città, CAP, Provincia (standardizzato)
+    # Città, CAP, Provincia
     if vettore.citta:
-        citta_text = vettore.citta.title()  # Prima lettera maiuscola
+        citta_text = vettore.citta
         if vettore.cap:
             citta_text += f" ({vettore.cap})"
         if vettore.provincia:
-            citta_text += f" {vettore.provincia.upper()}"  # Provincia in maiuscolo
+            citta_text += f" {vettore.provincia}"
         c.drawString(x, current_y, citta_text)
         current_y -= line_height
     
-    # P.IVA (standardizzato)
+    # P.IVA
     if vettore.piva:
-        c.drawString(x, current_y, f"P.IVA: {vettore.piva.upper()}")  # P.IVA in maiuscolo
+        c.drawString(x, current_y, f"P.IVA: {vettore.piva}")
         current_y -= line_height
     
-    # Licenza (standardizzato)
+    # Licenza
     if vettore.licenza_bdn:
-        c.drawString(x, current_y, f"Licenza: {vettore.licenza_bdn.upper()}")  # Licenza in maiuscolo
+        c.drawString(x, current_y, f"Licenza: {vettore.licenza_bdn}")
         current_y -= line_height
     
-    # Autista (standardizzato)
+    # Autista
     if autista:
-        nome_autista = f"{autista.nome.title()} {autista.cognome.title()}"  # Prima lettera maiuscola per nome e cognome
+        nome_autista = f"{autista.nome} {autista.cognome}"
         c.drawString(x, current_y, f"Autista: {nome_autista}")
         current_y -= line_height
         if autista.patente:
-            c.drawString(x, current_y, f"Patente: {autista.patente.upper()}")  # Patente in maiuscolo
+            c.drawString(x, current_y, f"Patente: {autista.patente}")
             current_y -= line_height
     
-    # Targhe sulla stessa riga (standardizzato)
+    # Targhe sulla stessa riga
     targhe_text = "Targhe: "
     targhe_list = []
-    if targa_vettore and targa_vettore.targa:
-        targhe_list.append(targa_vettore.targa.upper())  # Targa in maiuscolo
-    if targa_vettore_2 and targa_vettore_2.targa:
-        targhe_list.append(targa_vettore_2.targa.upper())  # Targa in maiuscolo
+    if targa_vettore:
+        targhe_list.append(targa_vettore)
+    if targa_vettore_2:
+        targhe_list.append(targa_vettore_2)
     
     if targhe_list:
         targhe_text += ", ".join(targhe_list)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Generazione anticipata dei PDF DDT dopo il salvataggio
+
+Quando un DDT o una sua riga vengono salvati, il PDF viene generato in
+background e salvato nella cache dei PDF: il download successivo è quasi
+sempre immediato. I salvataggi ravvicinati dello stesso DDT (il DDT e tutte
+le righe del formset) producono una sola generazione, eseguita DELAY secondi
+dopo l'ultimo salvataggio.
+
+Con Celery installato e CELERY_BROKER_URL configurato la generazione è un
+task Celery; altrimenti (installazione desktop), o se il broker non è
+raggiungibile, viene eseguita da un thread del processo corrente.
+"""
+
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from .pdf_cache import get_ddt_pdf
+from .pdf_workers import PDFPoolSaturated, PDFRenderTimeout
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PDF_PREGENERATION = {
+    'ENABLED': False,
+    'DELAY': 2,
+}
+
+
+def get_pregeneration_config():
+    """Configurazione in settings.DDT_PDF_PREGENERATION"""
+    return dict(DEFAULT_PDF_PREGENERATION, **getattr(settings, 'DDT_PDF_PREGENERATION', {}))
+
+
+def pregenerate_ddt_pdf(ddt_id):
+    """
+    Genera il PDF di un DDT e lo salva nella cache, se non è già presente
+
+    Le stampe richieste dagli utenti hanno la precedenza: se il pool PDF è
+    pieno la generazione anticipata viene saltata.
+    """
+    try:
+        get_ddt_pdf(ddt_id)
+    except ValueError:
+        # DDT eliminato prima della generazione
+        pass
+    except (PDFPoolSaturated, PDFRenderTimeout) as e:
+        logger.info("Generazione anticipata del PDF del DDT %s saltata: %s", ddt_id, e)
+
+
+class LocalPregenerationQueue:
+    """
+    Coda di generazione nel processo corrente
+
+    Ogni DDT ha al più un timer in attesa: un nuovo salvataggio lo riavvia.
+    Allo scadere la generazione passa a un unico thread, così le generazioni
+    in background non si sovrappongono tra loro.
+    """
+
+    def __init__(self):
+        self._timers = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ddt-pdf-pregen')
+
+    def schedule(self, ddt_id, delay):
+        with self._lock:
+            timer = self._timers.pop(ddt_id, None)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(delay, self._fire, args=(ddt_id,))
+            timer.daemon = True
+            self._timers[ddt_id] = timer
+            timer.start()
+
+    def pending(self):
+        with self._lock:
+            return set(self._timers)
+
+    def _fire(self, ddt_id):
+        with self._lock:
+            if self._timers.get(ddt_id) is not threading.current_thread():
+                return
+            del self._timers[ddt_id]
+        self._executor.submit(self._run, ddt_id)
+
+    @staticmethod
+    def _run(ddt_id):
+        try:
+            pregenerate_ddt_pdf(ddt_id)
+        except Exception:
+            logger.exception("Errore nella generazione anticipata del PDF del DDT %s", ddt_id)
+        finally:
+            # Le connessioni aperte da questo thread non vengono chiuse da Django
+            connections.close_all()
+
+
+_local_queue = LocalPregenerationQueue()
+
+
+def _get_celery_task():
+    """Task Celery di generazione, se Celery è installato e configurato"""
+    if not getattr(settings, 'CELERY_BROKER_URL', None):
+        return None
+    try:
+        from .tasks import pregenera_pdf_ddt
+    except ImportError:
+        return None
+    return pregenera_pdf_ddt
+
+
+def pregeneration_token_key(ddt_id):
+    return f"ddt-pdf-pregen-{ddt_id}"
+
+
+def schedule_pdf_pregeneration(ddt_id):
+    """
+    Pianifica la generazione anticipata del PDF di un DDT
+
+    La richiesta parte solo a transazione confermata, quindi il PDF
+    rispecchia sempre i dati salvati.
+    """
+    config = get_pregeneration_config()
+    if not config['ENABLED']:
+        return
+    transaction.on_commit(lambda: _enqueue(ddt_id, config['DELAY']))
+
+
+def _enqueue(ddt_id, delay):
+    task = _get_celery_task()
+    if task is None:
+        _local_queue.schedule(ddt_id, delay)
+        return
+
+    # Solo il task dell'ultimo salvataggio trova il proprio token e genera il PDF
+    token = uuid.uuid4().hex
+    cache.set(pregeneration_token_key(ddt_id), token, delay + 300)
+    try:
+        # Senza ritentativi: con il broker fermo il salvataggio non attende
+        task.apply_async((ddt_id, token), countdown=delay, retry=False)
+    except Exception as e:
+        # Broker non raggiungibile (kombu.exceptions.OperationalError, ...)
+        logger.warning("Broker Celery non raggiungibile, PDF del DDT %s generato nel processo: %s", ddt_id, e)
+        _local_queue.schedule(ddt_id, delay)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Pool di processi dedicato alla generazione dei PDF DDT
+
+Le viste e i comandi non disegnano i PDF nel proprio thread: inviano il
+lavoro a un pool di processi già avviati (Django, reportlab, font e logo
+predefinito caricati), con una coda limitata. Quando la coda è piena la
+richiesta viene rifiutata subito invece di occupare un worker web.
+
+Pool e coda sono del singolo processo web: con più processi (gunicorn
+--workers N) i processi di stampa e i posti in coda sono N volte quelli
+configurati in settings.DDT_PDF_WORKERS.
+
+I processi sono avviati con 'spawn': non ereditano connessioni al database
+né thread del processo web, e ricevono solo i dati di stampa (DDTData), quindi
+non accedono mai al database. Per questo il modulo non importa i modelli
+all'avvio: viene caricato dai processi figli prima di django.setup().
+"""
+
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PDF_WORKERS = {
+    'WORKERS': 0,
+    'MAX_QUEUE': 8,
+    'TIMEOUT': 30,
+    'RETRY_AFTER': 5,
+    # DDT al massimo in una stampa cumulativa, disegnata da un solo lavoro del
+    # pool entro TIMEOUT: le selezioni più grandi vanno esportate in ZIP
+    'MAX_BATCH': 200,
+}
+
+
+class PDFPoolSaturated(Exception):
+    """Tutti i worker sono occupati e la coda dei PDF è piena"""
+
+    def __init__(self, retry_after):
+        super().__init__("Troppe richieste di stampa in corso, riprovare tra qualche secondo")
+        self.retry_after = retry_after
+
+
+class PDFRenderTimeout(Exception):
+    """La generazione del PDF ha superato il tempo massimo"""
+
+
+def _init_worker():
+    """Prepara un processo del pool: Django configurato e risorse di stampa già caricate"""
+    import django
+    django.setup()
+
+    from reportlab.pdfbase import pdfmetrics
+    from .pdf_generator_advanced import get_logo_image, get_logo_path
+    for font_name in ("Times-Roman", "Times-Bold"):
+        pdfmetrics.getFont(font_name)
+    try:
+        get_logo_image(get_logo_path())
+    except FileNotFoundError:
+        pass
+
+
+def _ping():
+    return os.getpid()
+
+
+def _timed_call(fn, args):
+    """Esegue un lavoro del pool e ne misura la durata"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class PDFRenderPool:
+    """
+    Pool di processi per la generazione dei PDF
+
+    Con workers=0 i lavori vengono eseguiti nel processo chiamante
+    (test, installazioni a processo singolo).
+
+    Args:
+        workers (int): Numero di processi
+        max_queue (int): Lavori che possono attendere oltre a quelli in esecuzione
+        timeout (float): Secondi di attesa massima del risultato di un lavoro
+        retry_after (int): Secondi suggeriti al client quando la coda è piena
+    """
+
+    def __init__(self, workers=0, max_queue=8, timeout=30, retry_after=5):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(workers + max_queue) if workers else None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def inline(self):
+        return not self.workers
+
+    def start(self):
+        """Avvia i processi e attende che siano pronti"""
+        if self.inline:
+            return
+        executor = self._get_executor()
+        for future in [executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def submit(self, fn, *args, block=False):
+        """
+        Accoda un lavoro
+
+        Args:
+            fn (callable): Funzione di modulo (serializzabile con pickle)
+            *args: Argomenti della funzione
+            block (bool): Se True attende un posto libero in coda invece di
+                sollevare PDFPoolSaturated (esportazioni in blocco)
+
+        Returns:
+            Future: Risultato (valore, secondi di esecuzione)
+
+        Raises:
+            PDFPoolSaturated: Se la coda è piena e block è False
+        """
+        if self.inline:
+            future = Future()
+            future.submitted_at = time.perf_counter()
+            try:
+                future.set_result(_timed_call(fn, args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        if not self._slots.acquire(blocking=block):
+            raise PDFPoolSaturated(self.retry_after)
+
+        try:
+            try:
+                future = self._get_executor().submit(_timed_call, fn, args)
+            except BrokenProcessPool:
+                # Un processo è terminato in modo anomalo: il pool viene ricreato
+                logger.warning("Pool PDF interrotto, riavvio dei processi")
+                self.shutdown(wait=False)
+                future = self._get_executor().submit(_timed_call, fn, args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.submitted_at = time.perf_counter()
+        future.add_done_callback(lambda _future: self._slots.release())
+        return future
+
+    def result(self, future, timeout=None):
+        """
+        Attende il risultato di un lavoro accodato
+
+        Raises:
+            PDFRenderTimeout: Se il risultato non arriva entro il timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            value, secondi = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PDFRenderTimeout(f"Generazione PDF non completata entro {timeout} secondi")
+
+        totale = time.perf_counter() - future.submitted_at
+        logger.debug(
+            "Lavoro PDF completato: attesa %.3fs, esecuzione %.3fs",
+            max(totale - secondi, 0.0), secondi
+        )
+        return value
+
+    def run(self, fn, *args, block=False, timeout=None):
+        """Accoda un lavoro e ne attende il risultato"""
+        return self.result(self.submit(fn, *args, block=block), timeout=timeout)
+
+    def render(self, ddt_data, block=False, timeout=None):
+        """
+        Genera il PDF di un DDT in un processo del pool
+
+        Args:
+            ddt_data (DDTData): Dati di stampa del DDT
+
+        Returns:
+            bytes: Contenuto del PDF
+        """
+        from .pdf_generator_advanced import render_ddt_pdf
+        return self.run(render_ddt_pdf, ddt_data, block=block, timeout=timeout)
+
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def get_pdf_workers_settings():
+    """Configurazione in settings.DDT_PDF_WORKERS"""
+    return dict(DEFAULT_PDF_WORKERS, **getattr(settings, 'DDT_PDF_WORKERS', {}))
+
+
+def get_render_pool():
+    """Restituisce il pool PDF configurato in settings.DDT_PDF_WORKERS, avviandolo al primo uso"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            config = get_pdf_workers_settings()
+            pool = PDFRenderPool(
+                workers=config['WORKERS'],
+                max_queue=config['MAX_QUEUE'],
+                timeout=config['TIMEOUT'],
+                retry_after=config['RETRY_AFTER'],
+            )
+            pool.start()
+            atexit.register(pool.shutdown)
+            _render_pool = pool
+        return _render_pool
+
+
+@receiver(setting_changed)
+def _reset_render_pool(setting, **kwargs):
+    global _render_pool
+    if setting == 'DDT_PDF_WORKERS':
+        with _render_pool_lock:
+            pool, _render_pool = _render_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
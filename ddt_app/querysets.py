@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+QuerySet dei modelli con i caricamenti usati da viste, form e admin
+
+Le liste e le select dei form stampano anagrafiche collegate (il __str__ di
+sedi, destinazioni, autisti e targhe contiene il nome del proprietario) e i
+conteggi di sedi, targhe, autisti e DDT: questi QuerySet caricano tutto con
+un numero costante di query, indipendente dalle righe mostrate.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Prefetch, QuerySet, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def conta_collegati(model, relazione):
+    """
+    Conteggio degli oggetti collegati con una relazione inversa
+
+    Una subquery per relazione evita il prodotto tra più JOIN che si avrebbe
+    con Count su più relazioni.
+
+    Args:
+        model (Model): Modello annotato
+        relazione (str): Nome della relazione inversa (es: 'sedi', 'ddt')
+
+    Returns:
+        Expression: Numero di oggetti collegati, 0 se nessuno
+    """
+    campo = model._meta.get_field(relazione).field.name
+    collegati = model._meta.get_field(relazione).related_model._base_manager.filter(
+        **{campo: OuterRef('pk')}
+    ).order_by().values(campo).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(collegati, output_field=IntegerField()), 0)
+
+
+def totali_righe(model):
+    """
+    Totali di un DDT calcolati dalle sue righe
+
+    Args:
+        model (Model): Modello DDT
+
+    Returns:
+        dict: Campo del totale -> subquery sulle righe del DDT
+    """
+    righe = model._meta.get_field('righe').related_model._base_manager.filter(
+        ddt=OuterRef('pk')
+    ).order_by().values('ddt')
+    decimale = DecimalField()
+    return {
+        'numero_righe': Coalesce(
+            Subquery(righe.annotate(n=Count('pk')).values('n'), output_field=IntegerField()), 0
+        ),
+        'totale_quantita': Coalesce(
+            Subquery(righe.annotate(n=Sum('quantita')).values('n'), output_field=decimale),
+            Decimal('0'), output_field=decimale
+        ),
+        'totale_valore': Coalesce(
+            Subquery(
+                righe.annotate(n=Sum(F('quantita') * F('prezzo_unitario'))).values('n'),
+                output_field=decimale
+            ),
+            Decimal('0'), output_field=decimale
+        ),
+    }
+
+
+class ConteggiQuerySet(QuerySet):
+    """QuerySet con i conteggi delle relazioni inverse in CONTEGGI"""
+
+    # Annotazione -> relazione inversa contata
+    CONTEGGI = {}
+
+    def with_counts(self):
+        """Annota i conteggi mostrati da liste, dettagli e conferme di eliminazione"""
+        return self.annotate(**{
+            nome: conta_collegati(self.model, relazione) for nome, relazione in self.CONTEGGI.items()
+        })
+
+
+class MittenteQuerySet(ConteggiQuerySet):
+    CONTEGGI = {'num_sedi': 'sedi', 'num_ddt': 'ddt'}
+
+
+class DestinatarioQuerySet(ConteggiQuerySet):
+    CONTEGGI = {'num_destinazioni': 'destinazioni', 'num_ddt': 'ddt'}
+
+
+class VettoreQuerySet(ConteggiQuerySet):
+    CONTEGGI = {'num_targhe': 'targhe', 'num_autisti': 'autisti', 'num_ddt': 'ddt'}
+
+
+class SedeMittenteQuerySet(QuerySet):
+    def for_choices(self):
+        """Sedi per select e liste: __str__ contiene il nome del mittente"""
+        return self.select_related('mittente')
+
+
+class DestinazioneQuerySet(QuerySet):
+    def for_choices(self):
+        """Destinazioni per select e liste: __str__ contiene il nome del destinatario"""
+        return self.select_related('destinatario')
+
+
+class AutistaQuerySet(QuerySet):
+    def for_choices(self):
+        """Autisti per select e liste: __str__ contiene il nome del vettore"""
+        return self.select_related('vettore')
+
+
+class TargaVettoreQuerySet(QuerySet):
+    def for_choices(self):
+        """Targhe per select e liste: __str__ contiene il nome del vettore"""
+        return self.select_related('vettore')
+
+
+class DDTRigaQuerySet(QuerySet):
+    """
+    Righe dei DDT
+
+    Le operazioni di massa che non inviano i segnali (bulk_create,
+    bulk_update e update) aggiornano totali, dati di stampa e documento di
+    ricerca dei DDT coinvolti nella stessa transazione e ne invalidano i
+    valori in cache (aggiornamento_ddt.aggiorna_ddt).
+    """
+
+    # Campi della riga da cui dipendono i totali e i dati di stampa del DDT
+    CAMPI_DDT = {'ddt', 'articolo', 'quantita', 'descrizione', 'ordine', 'prezzo_unitario'}
+
+    def with_articolo(self):
+        """Righe con l'articolo, usato da __str__"""
+        return self.select_related('articolo')
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            self._imposta_prezzi([riga for riga in objs if riga.prezzo_unitario is None])
+            objs = super().bulk_create(objs, *args, **kwargs)
+            self._aggiorna_ddt({riga.ddt_id for riga in objs})
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if not self._cambia_ddt(fields):
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            salvate = {
+                pk: (ddt_id, articolo_id) for pk, ddt_id, articolo_id in
+                self.filter(pk__in=[riga.pk for riga in objs]).values_list('pk', 'ddt_id', 'articolo_id')
+            }
+            ddt_ids = {ddt_id for ddt_id, _ in salvate.values()}
+            if any(self.model._meta.get_field(campo).name == 'articolo' for campo in fields):
+                # Le righe che cambiano articolo ne prendono il prezzo attuale
+                self._imposta_prezzi([
+                    riga for riga in objs if riga.pk in salvate and salvate[riga.pk][1] != riga.articolo_id
+                ])
+                fields = [*fields, 'prezzo_unitario']
+            aggiornate = super().bulk_update(objs, fields, *args, **kwargs)
+            self._aggiorna_ddt(ddt_ids | {riga.ddt_id for riga in objs})
+        return aggiornate
+
+    def update(self, **kwargs):
+        articolo = kwargs.get('articolo', kwargs.get('articolo_id'))
+        if articolo is not None and 'prezzo_unitario' not in kwargs:
+            kwargs['prezzo_unitario'] = self._articoli()._base_manager.using(self.db).values_list(
+                'prezzo_unitario', flat=True
+            ).get(pk=getattr(articolo, 'pk', articolo))
+        if not self._cambia_ddt(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            ddt_ids = set(self.values_list('ddt_id', flat=True))
+            aggiornate = super().update(**kwargs)
+            nuovo = kwargs.get('ddt', kwargs.get('ddt_id'))
+            if nuovo is not None:
+                ddt_ids.add(getattr(nuovo, 'pk', nuovo))
+            self._aggiorna_ddt(ddt_ids)
+        return aggiornate
+
+    def _cambia_ddt(self, campi):
+        """True se tra i campi modificati ce n'è uno da cui dipende il DDT"""
+        return any(self.model._meta.get_field(campo).name in self.CAMPI_DDT for campo in campi)
+
+    def _articoli(self):
+        return self.model._meta.get_field('articolo').related_model
+
+    def _imposta_prezzi(self, righe):
+        """Imposta nelle righe il prezzo attuale del loro articolo"""
+        if not righe:
+            return
+        prezzi = dict(self._articoli()._base_manager.using(self.db).filter(
+            pk__in={riga.articolo_id for riga in righe}
+        ).values_list('pk', 'prezzo_unitario'))
+        for riga in righe:
+            riga.prezzo_unitario = prezzi[riga.articolo_id]
+
+    def _aggiorna_ddt(self, ddt_ids):
+        from .aggiornamento_ddt import aggiorna_ddt
+        aggiorna_ddt(ddt_ids, using=self.db)
+
+
+class DDTQuerySet(QuerySet):
+    # Relazioni mostrate nel dettaglio, nella modifica e nelle conferme
+    RELAZIONI_DETTAGLIO = (
+        'mittente', 'sede_mittente', 'destinatario', 'destinazione', 'causale_trasporto',
+        'vettore', 'autista', 'targa_vettore', 'targa_vettore_2',
+    )
+    # Relazioni stampate dalla lista dell'admin: autisti e targhe stampano anche il vettore
+    RELAZIONI_ADMIN = (
+        'mittente', 'destinatario', 'causale_trasporto', 'vettore',
+        'autista__vettore', 'targa_vettore__vettore', 'targa_vettore_2__vettore',
+    )
+
+    def for_list(self):
+        """DDT della home: solo le colonne mostrate, con mittente, destinatario e causale"""
+        return self.select_related('mittente', 'destinatario', 'causale_trasporto').only(
+            'numero', 'data_documento',
+            'mittente__nome',
+            'destinatario__nome',
+            'causale_trasporto__codice', 'causale_trasporto__descrizione',
+        )
+
+    def for_detail(self):
+        """DDT con tutte le anagrafiche e le righe con l'articolo"""
+        righe = self.model._meta.get_field('righe').related_model
+        return self.select_related(*self.RELAZIONI_DETTAGLIO).prefetch_related(
+            Prefetch('righe', queryset=righe.objects.with_articolo())
+        )
+
+    def for_admin(self):
+        """DDT della lista e delle pagine dell'admin"""
+        return self.select_related(*self.RELAZIONI_ADMIN)
+
+    def aggiorna_totali(self):
+        """
+        Ricalcola dalle righe i totali memorizzati dei DDT, con un solo UPDATE
+
+        Returns:
+            int: DDT aggiornati
+        """
+        return self.update(**totali_righe(self.model))
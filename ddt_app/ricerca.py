@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Ricerca a testo libero dei DDT
+
+Ogni DDT ha un documento di ricerca (DocumentoRicercaDDT) con numero,
+anagrafiche, trasporto e righe, aggiornato dai segnali quando cambia il DDT,
+una sua riga o un'anagrafica stampata nel DDT. Il documento è indicizzato:
+
+- PostgreSQL: indice GIN su to_tsvector('simple', testo) per le parole
+  intere e indice GIN a trigrammi (pg_trgm) per le parti di parola;
+- SQLite: tabella FTS5 con tokenizer trigram, allineata da trigger;
+- altri database: ricerca con LIKE sul solo documento.
+"""
+
+import operator
+from collections import defaultdict
+from functools import reduce
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Func, Lookup, Q, Value
+from django.utils import timezone
+
+from .models import (
+    Articolo, Autista, CausaleTrasporto, DDT, DDTRiga, Destinatario, Destinazione,
+    DocumentoRicercaDDT, IndiceRicercaDDT, Mittente, SedeMittente, TargaVettore, Vettore,
+)
+
+
+# Campi del DDT e delle anagrafiche collegate inclusi nel documento di ricerca
+CAMPI_DOCUMENTO = (
+    'numero',
+    'mittente__nome',
+    'sede_mittente__nome',
+    'destinatario__nome',
+    'destinazione__nome',
+    'luogo_destinazione',
+    'vettore__nome',
+    'autista__nome',
+    'autista__cognome',
+    'targa_vettore__targa',
+    'targa_vettore_2__targa',
+    'causale_trasporto__codice',
+    'causale_trasporto__descrizione',
+)
+
+# Campi del DDT che collegano ogni anagrafica ai DDT in cui è stampata
+CAMPI_ANAGRAFICHE = {
+    Mittente: ('mittente',),
+    SedeMittente: ('sede_mittente',),
+    Destinatario: ('destinatario',),
+    Destinazione: ('destinazione',),
+    Vettore: ('vettore',),
+    Autista: ('autista',),
+    TargaVettore: ('targa_vettore', 'targa_vettore_2'),
+    CausaleTrasporto: ('causale_trasporto',),
+    Articolo: ('righe__articolo',),
+}
+
+FTS_TABLE = 'ddt_app_ricerca_fts'
+# Lunghezza minima di un termine cercato con il tokenizer trigram
+LUNGHEZZA_MINIMA_TRIGRAM = 3
+CHUNK_SIZE = 500
+
+_tokenizer_fts = {}
+
+
+class Match(Lookup):
+    """Lookup FTS5 di SQLite: indice_ricerca__testo__match='"parola"'"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+IndiceRicercaDDT._meta.get_field('testo').register_lookup(Match)
+
+
+def testi_ricerca(ddt_ids):
+    """
+    Compone il testo di ricerca di più DDT con due query
+
+    Args:
+        ddt_ids (iterable): ID dei DDT
+
+    Returns:
+        dict: Testo di ricerca per ID del DDT; i DDT inesistenti sono omessi
+    """
+    righe = defaultdict(list)
+    for ddt_id, articolo, descrizione in DDTRiga.objects.filter(ddt_id__in=ddt_ids).order_by(
+        'ordine', 'id'
+    ).values_list('ddt_id', 'articolo__nome', 'descrizione'):
+        righe[ddt_id].extend((articolo, descrizione))
+
+    testi = {}
+    for ddt_id, *valori in DDT.objects.filter(id__in=ddt_ids).values_list('id', *CAMPI_DOCUMENTO):
+        parti = [str(valore) for valore in (*valori, *righe[ddt_id]) if valore]
+        testi[ddt_id] = ' '.join(' '.join(parti).split())
+    return testi
+
+
+def aggiorna_documenti_ricerca(ddt_ids, crea=True):
+    """
+    Ricalcola i documenti di ricerca di più DDT
+
+    Vengono scritti solo i documenti il cui testo è cambiato.
+
+    Args:
+        ddt_ids (iterable): ID dei DDT
+        crea (bool): Se False aggiorna solo i documenti esistenti, ad esempio
+            durante l'eliminazione di un DDT
+
+    Returns:
+        int: Documenti scritti
+    """
+    ddt_ids = list(ddt_ids)
+    scritti = 0
+    for start in range(0, len(ddt_ids), CHUNK_SIZE):
+        testi = testi_ricerca(ddt_ids[start:start + CHUNK_SIZE])
+        esistenti = dict(
+            DocumentoRicercaDDT.objects.filter(ddt_id__in=testi).values_list('ddt_id', 'testo')
+        )
+        now = timezone.now()
+        modificati = [
+            DocumentoRicercaDDT(ddt_id=ddt_id, testo=testo, updated_at=now)
+            for ddt_id, testo in testi.items()
+            if ddt_id in esistenti and esistenti[ddt_id] != testo
+        ]
+        DocumentoRicercaDDT.objects.bulk_update(modificati, ['testo', 'updated_at'])
+        scritti += len(modificati)
+        if crea:
+            nuovi = [
+                DocumentoRicercaDDT(ddt_id=ddt_id, testo=testo)
+                for ddt_id, testo in testi.items() if ddt_id not in esistenti
+            ]
+            DocumentoRicercaDDT.objects.bulk_create(nuovi, ignore_conflicts=True)
+            scritti += len(nuovi)
+    return scritti
+
+
+def aggiorna_documenti_anagrafica(instance):
+    """Ricalcola i documenti dei DDT in cui è stampata un'anagrafica modificata"""
+    campi = CAMPI_ANAGRAFICHE[type(instance)]
+    filtro = reduce(operator.or_, (Q(**{campo: instance.pk}) for campo in campi))
+    ddt_ids = DDT.objects.filter(filtro).values_list('id', flat=True).distinct()
+    return aggiorna_documenti_ricerca(ddt_ids, crea=False)
+
+
+def tokenizer_fts(connection):
+    """
+    Tokenizer della tabella FTS5 dei documenti di ricerca
+
+    Returns:
+        str: 'trigram', 'unicode61', o None se la tabella non esiste
+    """
+    chiave = (connection.alias, connection.settings_dict['NAME'])
+    if chiave not in _tokenizer_fts:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+            riga = cursor.fetchone()
+        if riga is None:
+            _tokenizer_fts[chiave] = None
+        else:
+            _tokenizer_fts[chiave] = 'trigram' if 'trigram' in riga[0] else 'unicode61'
+    return _tokenizer_fts[chiave]
+
+
+def cerca_ddt(queryset, testo):
+    """
+    Filtra i DDT che contengono tutte le parole cercate, dal più pertinente
+
+    Args:
+        queryset (QuerySet): DDT su cui cercare
+        testo (str): Parole da cercare, anche parziali (es: '0012', 'ross')
+
+    Returns:
+        QuerySet: DDT trovati, ordinati per pertinenza e poi con l'ordinamento
+        del queryset
+    """
+    termini = testo.split()
+    if not termini:
+        return queryset
+
+    connection = connections[queryset.db]
+    ordinamento = list(queryset.query.order_by or DDT._meta.ordering)
+
+    if connection.vendor == 'sqlite':
+        tokenizer = tokenizer_fts(connection)
+        if tokenizer == 'trigram' and min(map(len, termini)) >= LUNGHEZZA_MINIMA_TRIGRAM:
+            match = ' '.join('"%s"' % termine.replace('"', '""') for termine in termini)
+        elif tokenizer == 'unicode61':
+            match = ' '.join('"%s"*' % termine.replace('"', '""') for termine in termini)
+        else:
+            match = None
+        if match is not None:
+            return queryset.filter(indice_ricerca__testo__match=match).order_by(
+                'indice_ricerca__rank', *ordinamento
+            )
+
+    elif connection.vendor == 'postgresql':
+        documento = F('documento_ricerca__testo')
+        # Le espressioni coincidono con quelle degli indici creati dalla migrazione
+        vettore = Func(documento, template="to_tsvector('simple', %(expressions)s)")
+        query = Func(Value(testo), template="plainto_tsquery('simple', %(expressions)s)")
+        parole = Func(
+            vettore, query, template='%(expressions)s', arg_joiner=' @@ ', output_field=BooleanField()
+        )
+        parti = reduce(operator.and_, (
+            Q(Func(
+                documento, Value(f'%{connection.ops.prep_for_like_query(termine)}%'),
+                template='%(expressions)s', arg_joiner=' ILIKE ', output_field=BooleanField()
+            ))
+            for termine in termini
+        ))
+        return queryset.filter(Q(parole) | parti).annotate(
+            pertinenza=Func(vettore, query, function='ts_rank', output_field=FloatField())
+        ).order_by(F('pertinenza').desc(), *ordinamento)
+
+    # Senza indice di ricerca (o termini troppo corti per i trigrammi)
+    for termine in termini:
+        queryset = queryset.filter(documento_ricerca__testo__icontains=termine)
+    return queryset
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Segnali dell'applicazione DDT
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .aggiornamento_ddt import riga_modificata
+from .config_cache import invalida_config_cache
+from .dipendenze import MODELLI as MODELLI_DIPENDENZE, PARENTI, invalida_istanza, ricorda_parenti
+from .models import Configurazione, DDT, DDTRiga, FormatoNumerazioneDDT, Mittente
+from .pdf_data import aggiorna_dati_stampa
+from .pdf_generator_advanced import clear_logo_cache
+from .pdf_pregeneration import schedule_pdf_pregeneration
+from .ricerca import CAMPI_ANAGRAFICHE, aggiorna_documenti_anagrafica, aggiorna_documenti_ricerca
+
+
+@receiver(post_save, sender=Mittente)
+@receiver(post_delete, sender=Mittente)
+def invalida_logo_mittente(sender, instance, **kwargs):
+    """Elimina dalla cache i loghi decodificati quando cambia un mittente"""
+    # Il logo precedente non è più noto dopo il salvataggio: la cache contiene
+    # pochi loghi, quindi viene svuotata del tutto
+    clear_logo_cache()
+
+
+@receiver(post_save, sender=FormatoNumerazioneDDT)
+@receiver(post_delete, sender=FormatoNumerazioneDDT)
+@receiver(post_save, sender=Configurazione)
+@receiver(post_delete, sender=Configurazione)
+def invalida_impostazioni(sender, instance, **kwargs):
+    """Fa rileggere a tutti i processi il formato di numerazione e le configurazioni"""
+    invalida_config_cache()
+
+
+@receiver(post_save, sender=DDT)
+def aggiorna_dati_stampa_ddt(sender, instance, raw=False, **kwargs):
+    """Salva i dati di stampa del DDT emesso o modificato"""
+    # Registrato prima della generazione anticipata del PDF, che li legge
+    if not raw:
+        aggiorna_dati_stampa([instance.pk])
+
+
+@receiver(post_save, sender=DDT)
+def pregenera_pdf_ddt(sender, instance, raw=False, **kwargs):
+    """Genera in background il PDF del DDT appena salvato"""
+    if not raw:
+        schedule_pdf_pregeneration(instance.pk)
+
+
+@receiver(post_save, sender=DDTRiga)
+@receiver(post_delete, sender=DDTRiga)
+def aggiorna_ddt_riga(sender, instance, raw=False, **kwargs):
+    """Aggiorna totali, dati di stampa, ricerca e PDF del DDT di una riga modificata"""
+    if not raw:
+        riga_modificata(instance)
+
+
+@receiver(post_save, sender=DDT)
+def aggiorna_ricerca_ddt(sender, instance, raw=False, **kwargs):
+    """Crea o aggiorna il documento di ricerca del DDT salvato"""
+    if not raw:
+        aggiorna_documenti_ricerca([instance.pk])
+
+
+def aggiorna_ricerca_anagrafica(sender, instance, created=False, raw=False, **kwargs):
+    """Aggiorna i documenti di ricerca dei DDT in cui è stampata un'anagrafica modificata"""
+    if not created and not raw:
+        aggiorna_documenti_anagrafica(instance)
+
+
+for model in CAMPI_ANAGRAFICHE:
+    post_save.connect(
+        aggiorna_ricerca_anagrafica, sender=model,
+        dispatch_uid=f'aggiorna_ricerca_{model._meta.model_name}'
+    )
+
+
+for model in MODELLI_DIPENDENZE:
+    for segnale in (post_save, post_delete):
+        segnale.connect(
+            invalida_istanza, sender=model,
+            dispatch_uid=f'invalida_dipendenze_{model._meta.model_name}'
+        )
+
+for model in PARENTI:
+    for segnale in (pre_save, pre_delete):
+        segnale.connect(
+            ricorda_parenti, sender=model,
+            dispatch_uid=f'ricorda_parenti_{model._meta.model_name}'
+        )
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Task Celery dell'applicazione DDT
+
+Caricato solo se Celery è installato (vedi ddt_app.pdf_pregeneration).
+"""
+
+from celery import shared_task
+from django.core.cache import cache
+
+from .pdf_pregeneration import pregenerate_ddt_pdf, pregeneration_token_key
+
+
+@shared_task(ignore_result=True)
+def pregenera_pdf_ddt(ddt_id, token):
+    """Genera in anticipo il PDF di un DDT, salvo salvataggi più recenti"""
+    if cache.get(pregeneration_token_key(ddt_id)) != token:
+        # Il DDT è stato salvato di nuovo: provvede il task successivo
+        return
+    pregenerate_ddt_pdf(ddt_id)
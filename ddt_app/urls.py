@@ -13,6 +13,8 @@ urlpatterns = [
     path('ddt/<int:ddt_id>/edit/', views.ddt_edit, name='ddt_edit'),
     path('ddt/<int:ddt_id>/delete/', views.ddt_delete, name='ddt_delete'),
     path('ddt/<int:ddt_id>/pdf/', views.ddt_pdf, name='ddt_pdf'),
+    path('ddt/export/zip/', views.ddt_export_zip, name='ddt_export_zip'),
+    path('ddt/stampa/', views.ddt_batch_pdf, name='ddt_batch_pdf'),
     
     # API endpoints
     path('api/destinazioni/<int:destinatario_id>/', views.get_destinazioni, name='get_destinazioni'),
@@ -21,6 +23,9 @@ urlpatterns = [
     path('api/autisti/<int:vettore_id>/', views.get_autisti, name='get_autisti'),
     path('api/targhe/<int:vettore_id>/', views.get_targhe, name='get_targhe'),
     path('api/next-ddt-number/', views.generate_next_ddt_number, name='next_ddt_number'),
+    path('api/ddt-form-context/', views.get_ddt_form_context, name='ddt_form_context'),
+    path('api/ddt-numbers/reserve/', views.api_reserve_ddt_numbers, name='reserve_ddt_numbers'),
+    path('api/ddt-numbers/release/', views.api_release_ddt_numbers, name='release_ddt_numbers'),
     path('api/health/', views.health_check, name='health_check'),
     
     # Destinazioni
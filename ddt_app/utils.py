@@ -3,23 +3,38 @@
 Utility per la gestione dei DDT
 """
 
-from .models import FormatoNumerazioneDDT, DDT
-from datetime import datetime
+from .config_cache import get_formato_numerazione_attivo
+from .models import ContatoreNumerazioneDDT, FormatoNumerazioneDDT, DDT, PrenotazioneNumeriDDT
+from datetime import datetime, timedelta
+from django.utils import timezone
+
+
+# Limite dei numeri riservabili con una sola prenotazione
+MAX_NUMERI_PRENOTABILI = 10000
+DURATA_PRENOTAZIONE = timedelta(hours=24)
 
 
 def genera_numero_ddt(anno=None, mese=None):
     """
-    Genera il prossimo numero DDT secondo il formato configurato
+    Assegna il prossimo numero DDT secondo il formato configurato
+    
+    Il numero viene consumato: la funzione va chiamata nella transazione che
+    salva il DDT. Per mostrare il numero senza assegnarlo usare
+    get_prossimo_numero_ddt().
     
     Args:
         anno (int, optional): Anno per la numerazione. Default: anno corrente
         mese (int, optional): Mese per la numerazione. Default: mese corrente
     
     Returns:
-        str: Prossimo numero DDT
+        str: Numero DDT assegnato
     """
-    # Ottieni il formato attivo
-    formato_config = FormatoNumerazioneDDT.objects.filter(attivo=True).first()
+    return _get_formato_numerazione().genera_numero(anno, mese)
+
+
+def _get_formato_numerazione():
+    """Formato di numerazione attivo, creato con i valori predefiniti se manca"""
+    formato_config = get_formato_numerazione_attivo()
     
     if not formato_config:
         # Se non c'è configurazione, usa il formato predefinito
@@ -30,17 +45,7 @@ def genera_numero_ddt(anno=None, mese=None):
             attivo=True
         )
     
-    return formato_config.genera_numero(anno, mese)
-
-
-def get_formato_numerazione_attivo():
-    """
-    Ottiene la configurazione del formato di numerazione attivo
-    
-    Returns:
-        FormatoNumerazioneDDT: Configurazione attiva o None
-    """
-    return FormatoNumerazioneDDT.objects.filter(attivo=True).first()
+    return formato_config
 
 
 def valida_numero_ddt(numero):
@@ -65,14 +70,95 @@ def valida_numero_ddt(numero):
     return True
 
 
-def get_prossimo_numero_ddt():
+def get_prossimo_numero_ddt(anno=None, mese=None):
     """
-    Ottiene il prossimo numero DDT disponibile
+    Ottiene il prossimo numero DDT disponibile, senza assegnarlo
+    
+    Args:
+        anno (int, optional): Anno per la numerazione. Default: anno corrente
+        mese (int, optional): Mese per la numerazione. Default: mese corrente
     
     Returns:
         str: Prossimo numero DDT
     """
-    return genera_numero_ddt()
+    return _get_formato_numerazione().anteprima_numero(anno, mese)
+
+
+def assegna_numero_ddt(ddt, automatico):
+    """
+    Imposta il numero di un DDT nuovo o rinumerato prima del salvataggio
+    
+    Con la numerazione automatica il numero viene preso dal contatore della
+    serie; un numero inserito a mano, anche modificando un DDT, viene
+    registrato nel contatore, così la numerazione automatica non lo
+    ripropone. Va chiamata nella transazione che salva il DDT.
+    
+    Args:
+        ddt (DDT): DDT da salvare, con data_documento impostata
+        automatico (bool): True per assegnare il prossimo numero della serie
+    """
+    formato_config = _get_formato_numerazione()
+    anno, mese = ddt.data_documento.year, ddt.data_documento.month
+    if automatico:
+        ddt.numero = formato_config.genera_numero(anno, mese, ddt.data_documento)
+    else:
+        ContatoreNumerazioneDDT.registra_numero(formato_config, ddt.numero, anno, mese)
+
+
+def reserve_ddt_numbers(n, anno=None, mese=None, durata=DURATA_PRENOTAZIONE):
+    """
+    Riserva un blocco di numeri DDT consecutivi
+    
+    Il blocco viene preso dal contatore della serie con un solo
+    aggiornamento, indipendentemente da quanti numeri vengono riservati.
+    Il contatore è lo stesso della numerazione automatica, quindi i numeri
+    riservati non si sovrappongono mai a quelli già assegnati.
+    I numeri non usati vanno restituiti con release_ddt_numbers(); alla
+    scadenza vengono restituiti alla prenotazione successiva.
+    
+    Args:
+        n (int): Numeri da riservare
+        anno (int, optional): Anno per la numerazione. Default: anno corrente
+        mese (int, optional): Mese per la numerazione. Default: mese corrente
+        durata (timedelta): Validità della prenotazione
+    
+    Returns:
+        PrenotazioneNumeriDDT: Prenotazione con token e numeri formattati
+    
+    Raises:
+        ValueError: Se n non è compreso tra 1 e MAX_NUMERI_PRENOTABILI
+    """
+    if not 1 <= n <= MAX_NUMERI_PRENOTABILI:
+        raise ValueError(f"Si possono riservare da 1 a {MAX_NUMERI_PRENOTABILI} numeri")
+    
+    for scaduta in PrenotazioneNumeriDDT.objects.filter(scadenza__lt=timezone.now()):
+        scaduta.rilascia()
+    
+    anno = anno or datetime.now().year
+    mese = mese or datetime.now().month
+    return PrenotazioneNumeriDDT.prenota(
+        _get_formato_numerazione(), n, anno, mese, scadenza=timezone.now() + durata
+    )
+
+
+def release_ddt_numbers(token):
+    """
+    Restituisce i numeri di una prenotazione non usati da nessun DDT
+    
+    Args:
+        token (str): Token della prenotazione
+    
+    Returns:
+        int: Numeri restituiti
+    
+    Raises:
+        ValueError: Se la prenotazione non esiste
+    """
+    try:
+        prenotazione = PrenotazioneNumeriDDT.objects.select_related('formato').get(token=token)
+    except PrenotazioneNumeriDDT.DoesNotExist:
+        raise ValueError(f"Prenotazione {token} non trovata")
+    return prenotazione.rilascia()
 
 
 def reset_numerazione_ddt(formato_config):
@@ -1,36 +1,41 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
 import json
 import os
 from .models import DDT, DDTRiga, Mittente, SedeMittente, Destinatario, Destinazione, Vettore, Autista, TargaVettore, Articolo, FormatoNumerazioneDDT, CausaleTrasporto
-from .forms import DDTForm, DDTRigaFormSet, DestinazioneForm, FormatoNumerazioneDDTForm, MittenteForm, DestinatarioForm, VettoreForm, AutistaForm, CausaleTrasportoForm
-from .pdf_generator_advanced import create_ddt_pdf as generate_ddt_pdf
-from .utils import genera_numero_ddt, get_prossimo_numero_ddt
+from .aggiornamento_ddt import aggiorna_ddt_una_volta
+from .dipendenze import etag_dipendenze, get_or_set, tag
+from .forms import DDTForm, DDTRigaFormSet, DestinazioneForm, FormatoNumerazioneDDTForm, MittenteForm, DestinatarioForm, VettoreForm, AutistaForm, CausaleTrasportoForm, DDTFiltroForm
+from .paginazione import CONTEGGIO_STIMATO, KeysetPaginator
+from .pdf_generator_advanced import create_ddt_batch_pdf, ddt_pdf_filename
+from .pdf_cache import ddt_pdf_cache_key, get_ddt_pdf
+from .pdf_data import iter_ddt_data, load_ddt_data
+from .pdf_export import stream_ddt_zip
+from .pdf_workers import PDFPoolSaturated, PDFRenderTimeout, get_pdf_workers_settings, get_render_pool
+from .ricerca import cerca_ddt
+from .utils import assegna_numero_ddt, get_prossimo_numero_ddt, release_ddt_numbers, reserve_ddt_numbers
 
 
 def home(request):
     """Homepage con lista dei DDT"""
-    ddt_list = DDT.objects.all().order_by('-data_documento', '-numero')
+    ddt_list = DDT.objects.for_list().order_by('-data_documento', '-progressivo', '-id')
     
     # Filtri
     search = request.GET.get('search', '')
     if search:
-        ddt_list = ddt_list.filter(
-            Q(numero__icontains=search) |
-            Q(mittente__nome__icontains=search) |
-            Q(destinatario__nome__icontains=search)
-        )
+        # Indice a testo libero: numero, anagrafiche, trasporto e righe
+        ddt_list = cerca_ddt(ddt_list, search)
     
     # Paginazione
-    paginator = Paginator(ddt_list, 20)
-    page_number = request.GET.get('page')
-    ddt_page = paginator.get_page(page_number)
+    paginator = KeysetPaginator(ddt_list, 20, conteggio=CONTEGGIO_STIMATO)
+    ddt_page = paginator.get_page(request.GET.get('cursore'))
     
     context = {
         'ddt_list': ddt_page,
@@ -41,7 +46,7 @@ def home(request):
 
 def ddt_detail(request, ddt_id):
     """Dettaglio di un DDT"""
-    ddt = get_object_or_404(DDT, id=ddt_id)
+    ddt = get_object_or_404(DDT.objects.for_detail(), id=ddt_id)
     context = {
         'ddt': ddt,
     }
@@ -71,7 +76,9 @@ def ddt_create(request):
                         luogo_destinazione += '\n' + ddt.destinazione.indirizzo
                         ddt.luogo_destinazione = luogo_destinazione
                     
-                    ddt.save()
+                    with transaction.atomic():
+                        assegna_numero_ddt(ddt, form.numerazione_automatica)
+                        ddt.save()
                     
                     # Non salvare il formset se si usano note centrali
                     
@@ -113,20 +120,23 @@ def ddt_create(request):
                         luogo_destinazione += '\n' + ddt.destinazione.indirizzo
                         ddt.luogo_destinazione = luogo_destinazione
                     
-                    ddt.save()
-                    
-                    formset.instance = ddt
-                    # Filtra le righe vuote e imposta l'ordine corretto
-                    for i, form_data in enumerate(formset.forms):
-                        if form_data.cleaned_data and not form_data.cleaned_data.get('DELETE', False):
-                            articolo = form_data.cleaned_data.get('articolo')
-                            quantita = form_data.cleaned_data.get('quantita')
-                            if not articolo or not quantita or quantita <= 0:
-                                form_data.cleaned_data['DELETE'] = True
-                            else:
-                                # Imposta l'ordine in base alla posizione nel formset
-                                form_data.cleaned_data['ordine'] = i + 1
-                    formset.save()
+                    with transaction.atomic():
+                        assegna_numero_ddt(ddt, form.numerazione_automatica)
+                        ddt.save()
+                        
+                        formset.instance = ddt
+                        # Filtra le righe vuote e imposta l'ordine corretto
+                        for i, form_data in enumerate(formset.forms):
+                            if form_data.cleaned_data and not form_data.cleaned_data.get('DELETE', False):
+                                articolo = form_data.cleaned_data.get('articolo')
+                                quantita = form_data.cleaned_data.get('quantita')
+                                if not articolo or not quantita or quantita <= 0:
+                                    form_data.cleaned_data['DELETE'] = True
+                                else:
+                                    # Imposta l'ordine in base alla posizione nel formset
+                                    form_data.cleaned_data['ordine'] = i + 1
+                        with aggiorna_ddt_una_volta():
+                            formset.save()
                     
                     messages.success(request, f'DDT {ddt.numero} creato con successo!')
                     return redirect('ddt_app:ddt_detail', ddt_id=ddt.id)
@@ -139,7 +149,7 @@ def ddt_create(request):
         
         # Genera automaticamente il numero DDT se non specificato
         if not form.initial.get('numero'):
-            form.initial['numero'] = get_prossimo_numero_ddt()
+            form.initial['numero'] = form.initial['numero_proposto'] = get_prossimo_numero_ddt()
         
         # Inizializza il campo destinazione_id
         form.fields['destinazione_id'].initial = ''
@@ -154,7 +164,7 @@ def ddt_create(request):
 
 def ddt_edit(request, ddt_id):
     """Modifica di un DDT esistente"""
-    ddt = get_object_or_404(DDT, id=ddt_id)
+    ddt = get_object_or_404(DDT.objects.for_detail(), id=ddt_id)
     
     if request.method == 'POST':
         form = DDTForm(request.POST, instance=ddt)
@@ -176,7 +186,10 @@ def ddt_edit(request, ddt_id):
                     luogo_destinazione += '\n' + ddt.destinazione.indirizzo
                     ddt.luogo_destinazione = luogo_destinazione
                 
-                ddt.save()
+                with transaction.atomic():
+                    if form.numero_modificato:
+                        assegna_numero_ddt(ddt, form.numerazione_automatica)
+                    ddt.save()
                 # Non salvare il formset se si usano note centrali
                 
                 messages.success(request, f'DDT {ddt.numero} aggiornato con successo!')
@@ -215,19 +228,24 @@ def ddt_edit(request, ddt_id):
                     luogo_destinazione += '\n' + ddt.destinazione.indirizzo
                     ddt.luogo_destinazione = luogo_destinazione
                 
-                ddt.save()
-                formset.instance = ddt
-                # Filtra le righe vuote e imposta l'ordine corretto
-                for i, form_data in enumerate(formset.forms):
-                    if form_data.cleaned_data and not form_data.cleaned_data.get('DELETE', False):
-                        articolo = form_data.cleaned_data.get('articolo')
-                        quantita = form_data.cleaned_data.get('quantita')
-                        if not articolo or not quantita or quantita <= 0:
-                            form_data.cleaned_data['DELETE'] = True
-                        else:
-                            # Imposta l'ordine in base alla posizione nel formset
-                            form_data.cleaned_data['ordine'] = i + 1
-                formset.save()
+                with transaction.atomic():
+                    if form.numero_modificato:
+                        assegna_numero_ddt(ddt, form.numerazione_automatica)
+                    ddt.save()
+                    
+                    formset.instance = ddt
+                    # Filtra le righe vuote e imposta l'ordine corretto
+                    for i, form_data in enumerate(formset.forms):
+                        if form_data.cleaned_data and not form_data.cleaned_data.get('DELETE', False):
+                            articolo = form_data.cleaned_data.get('articolo')
+                            quantita = form_data.cleaned_data.get('quantita')
+                            if not articolo or not quantita or quantita <= 0:
+                                form_data.cleaned_data['DELETE'] = True
+                            else:
+                                # Imposta l'ordine in base alla posizione nel formset
+                                form_data.cleaned_data['ordine'] = i + 1
+                    with aggiorna_ddt_una_volta():
+                        formset.save()
                 
                 messages.success(request, f'DDT {ddt.numero} aggiornato con successo!')
                 return redirect('ddt_app:ddt_detail', ddt_id=ddt.id)
@@ -250,7 +268,7 @@ def ddt_edit(request, ddt_id):
 
 def ddt_delete(request, ddt_id):
     """Eliminazione di un DDT"""
-    ddt = get_object_or_404(DDT, id=ddt_id)
+    ddt = get_object_or_404(DDT.objects.for_detail(), id=ddt_id)
     
     if request.method == 'POST':
         numero = ddt.numero
@@ -266,19 +284,211 @@ def ddt_delete(request, ddt_id):
 
 def ddt_pdf(request, ddt_id):
     """Generazione PDF del DDT"""
-    ddt = get_object_or_404(DDT, id=ddt_id)
+    # Legge solo i dati di stampa salvati nel DDT
+    try:
+        ddt = load_ddt_data(ddt_id)
+    except ValueError:
+        raise Http404("DDT non trovato")
+    
+    # La chiave del PDF in cache cambia con il suo contenuto: è l'ETag, e un
+    # client che ha già il PDF attuale riceve un 304 senza generarlo né leggerlo
+    etag = quote_etag(ddt_pdf_cache_key(ddt))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            # Usa il generatore avanzato che supporta le note centrali;
+            # il PDF viene ridisegnato solo se i dati di stampa del DDT sono cambiati
+            response = HttpResponse(get_ddt_pdf(ddt), content_type='application/pdf')
+            response['Content-Disposition'] = f'attachment; filename="{ddt_pdf_filename(ddt)}"'
+        except PDFPoolSaturated as e:
+            return _pdf_pool_saturated_response(e)
+        except Exception as e:
+            messages.error(request, f'Errore nella generazione del PDF: {str(e)}')
+            return redirect('ddt_app:ddt_detail', ddt_id=ddt_id)
+    return _con_validatore(response, etag)
+
+
+def _pdf_pool_saturated_response(error):
+    """Risposta 503 quando il pool PDF non accetta altri lavori"""
+    response = HttpResponse(str(error), status=503, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+@require_http_methods(["GET"])
+def ddt_export_zip(request):
+    """Esportazione in blocco dei PDF DDT filtrati in un archivio ZIP"""
+    form = DDTFiltroForm(request.GET)
+    if not form.is_valid():
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(request, f'Esportazione non valida: {error}')
+        return redirect('ddt_app:home')
+    
+    ddt_ids = list(form.filtra(DDT.objects.all()).values_list('id', flat=True))
+    
+    response = StreamingHttpResponse(stream_ddt_zip(ddt_ids), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="DDT_{timezone.localtime():%Y%m%d_%H%M%S}.zip"'
+    return response
+
+
+@require_http_methods(["GET"])
+def ddt_batch_pdf(request):
+    """Stampa cumulativa: un unico PDF con una pagina per ogni DDT filtrato"""
+    form = DDTFiltroForm(request.GET)
+    if not form.is_valid():
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(request, f'Stampa non valida: {error}')
+        return redirect('ddt_app:home')
+    
+    campo_data = form.cleaned_data['campo_data']
+    ddt_list = form.filtra(DDT.objects.all()).order_by(campo_data, 'progressivo')
+    
+    # Tutti i DDT sono disegnati da un solo lavoro del pool: oltre il limite
+    # la stampa non finirebbe entro il timeout
+    max_batch = get_pdf_workers_settings()['MAX_BATCH']
+    numero_ddt = ddt_list.count()
+    if numero_ddt > max_batch:
+        messages.error(
+            request,
+            f'Troppi DDT per una stampa cumulativa ({numero_ddt}, massimo {max_batch}): '
+            f'restringere i filtri o usare l\'esportazione ZIP.'
+        )
+        return redirect('ddt_app:home')
     
     try:
-        # Usa il generatore avanzato che supporta le note centrali
-        pdf_path = generate_ddt_pdf(ddt_id)
-        
-        with open(pdf_path, 'rb') as pdf_file:
-            response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="DDT_{ddt.numero}.pdf"'
-            return response
-    except Exception as e:
-        messages.error(request, f'Errore nella generazione del PDF: {str(e)}')
-        return redirect('ddt_app:ddt_detail', ddt_id=ddt_id)
+        # Il PDF viene disegnato dal pool PDF, non nel worker web
+        pdf = get_render_pool().run(create_ddt_batch_pdf, list(iter_ddt_data(ddt_list)))
+    except PDFPoolSaturated as e:
+        return _pdf_pool_saturated_response(e)
+    except (ValueError, PDFRenderTimeout) as e:
+        messages.error(request, str(e))
+        return redirect('ddt_app:home')
+    
+    response = HttpResponse(pdf, content_type='application/pdf')
+    
+    filename = 'DDT'
+    for campo in ('data_da', 'data_a'):
+        if form.cleaned_data.get(campo):
+            filename += f"_{form.cleaned_data[campo]:%Y%m%d}"
+    response['Content-Disposition'] = f'inline; filename="{filename}.pdf"'
+    return response
+
+
+def _dati_sedi_mittente(mittente_id):
+    """Sedi attive di un mittente per le select del form DDT"""
+    sedi = SedeMittente.objects.filter(mittente_id=mittente_id, attiva=True).order_by('nome')
+    return [{
+        'id': sede.id,
+        'nome': sede.nome,
+        'indirizzo': sede.indirizzo,
+        'citta': sede.citta,
+        'provincia': sede.provincia,
+        'codice_stalla': sede.codice_stalla,
+        'sede_legale': sede.sede_legale
+    } for sede in sedi]
+
+
+def _dati_destinazioni(destinatario_id):
+    """Destinazioni di un destinatario per le select del form DDT"""
+    destinazioni = [{
+        'id': dest.id,
+        'nome': dest.nome,
+        'indirizzo': dest.indirizzo,
+        'codice_stalla': dest.codice_stalla,
+        'note': dest.note
+    } for dest in Destinazione.objects.filter(destinatario_id=destinatario_id)]
+    # Solo un elenco vuoto può essere di un destinatario inesistente
+    if not destinazioni and not Destinatario.objects.filter(id=destinatario_id).exists():
+        raise Http404("Destinatario non trovato")
+    return destinazioni
+
+
+def _dati_autisti(vettore_id):
+    """Autisti attivi di un vettore per le select del form DDT"""
+    autisti = [{
+        'id': autista.id,
+        'nome': autista.nome,
+        'cognome': autista.cognome,
+        'patente': autista.patente,
+        'note': autista.note
+    } for autista in Autista.objects.filter(vettore_id=vettore_id, attivo=True)]
+    if not autisti and not Vettore.objects.filter(id=vettore_id).exists():
+        raise Http404("Vettore non trovato")
+    return autisti
+
+
+def _dati_targhe(vettore_id):
+    """Targhe attive di un vettore per le select del form DDT"""
+    targhe = [{
+        'id': targa.id,
+        'targa': targa.targa,
+        'tipo_veicolo': targa.tipo_veicolo,
+        'note': targa.note
+    } for targa in TargaVettore.objects.filter(vettore_id=vettore_id, attiva=True)]
+    if not targhe and not Vettore.objects.filter(id=vettore_id).exists():
+        raise Http404("Vettore non trovato")
+    return targhe
+
+
+# Elenchi delle select del form DDT: parametro del contesto, chiave in cache,
+# anagrafica da cui dipendono (anche tramite i figli, vedi dipendenze.PARENTI)
+# e caricamento. Le API dei singoli elenchi e il contesto condividono la cache
+ELENCHI_FORM_DDT = {
+    'sedi': ('mittente_id', 'api-sedi-mittente-{}', Mittente, _dati_sedi_mittente),
+    'destinazioni': ('destinatario_id', 'api-destinazioni-{}', Destinatario, _dati_destinazioni),
+    'autisti': ('vettore_id', 'api-autisti-{}', Vettore, _dati_autisti),
+    'targhe': ('vettore_id', 'api-targhe-{}', Vettore, _dati_targhe),
+}
+
+
+def _elenco_form_ddt(nome, pk):
+    """
+    Chiave, caricamento e dipendenze di un elenco del form DDT
+
+    Args:
+        nome (str): Nome dell'elenco in ELENCHI_FORM_DDT
+        pk (int): ID dell'anagrafica (mittente, destinatario o vettore)
+
+    Returns:
+        tuple: (chiave, carica, dipendenze) per get_or_set
+    """
+    _, chiave, model, carica = ELENCHI_FORM_DDT[nome]
+    return chiave.format(pk), lambda: carica(pk), [tag(model, pk)]
+
+
+def _risposta_json_dipendente(request, chiave, carica, dipendenze, in_cache=True):
+    """
+    Risposta JSON di un'API di ricerca, con ETag e rivalidazione
+
+    L'ETag è calcolato dalle sole versioni delle dipendenze, senza query: se
+    il client ha già la risposta attuale riceve un 304 senza corpo.
+
+    Args:
+        request (HttpRequest): Richiesta
+        chiave (str): Chiave della risposta in cache
+        carica (callable): Funzione che costruisce i dati dal database
+        dipendenze (list): Tag da cui dipendono i dati
+        in_cache (bool): Se False i dati non sono salvati in cache
+
+    Returns:
+        HttpResponse: JSON dei dati, oppure 304
+    """
+    etag = etag_dipendenze(chiave, dipendenze)
+    response = get_conditional_response(request, etag=etag) if etag else None
+    if response is None:
+        data = get_or_set(chiave, carica, dipendenze) if in_cache else carica()
+        response = JsonResponse(data, safe=False)
+    return _con_validatore(response, etag)
+
+
+def _con_validatore(response, etag):
+    """Aggiunge l'ETag: il client riusa la risposta solo dopo averla rivalidata"""
+    if etag:
+        response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 @csrf_exempt
@@ -286,18 +496,7 @@ def ddt_pdf(request, ddt_id):
 def get_destinazioni(request, destinatario_id):
     """API per ottenere le destinazioni di un destinatario"""
     try:
-        destinatario = get_object_or_404(Destinatario, id=destinatario_id)
-        destinazioni = destinatario.destinazioni.all()
-        
-        data = [{
-            'id': dest.id,
-            'nome': dest.nome,
-            'indirizzo': dest.indirizzo,
-            'codice_stalla': dest.codice_stalla,
-            'note': dest.note
-        } for dest in destinazioni]
-        
-        return JsonResponse(data, safe=False)
+        return _risposta_json_dipendente(request, *_elenco_form_ddt('destinazioni', destinatario_id))
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -308,24 +507,28 @@ def get_articoli(request):
     """API per ottenere la lista degli articoli"""
     try:
         search = request.GET.get('search', '')
-        articoli = Articolo.objects.all()
-        
-        if search:
-            articoli = articoli.filter(
-                Q(nome__icontains=search) |
-                Q(categoria__icontains=search)
-            )
-        
-        data = [{
-            'id': art.id,
-            'nome': art.nome,
-            'categoria': art.categoria,
-            'um': art.um,
-            'prezzo_unitario': float(art.prezzo_unitario),
-            'note': art.note
-        } for art in articoli]
-        
-        return JsonResponse(data, safe=False)
+
+        def carica():
+            articoli = Articolo.objects.all()
+            if search:
+                articoli = articoli.filter(
+                    Q(nome__icontains=search) |
+                    Q(categoria__icontains=search)
+                )
+            return [{
+                'id': art.id,
+                'nome': art.nome,
+                'categoria': art.categoria,
+                'um': art.um,
+                'prezzo_unitario': float(art.prezzo_unitario),
+                'note': art.note
+            } for art in articoli]
+
+        # Solo l'elenco completo è in cache: le ricerche sono troppo varie
+        return _risposta_json_dipendente(
+            request, f'api-articoli?{search}' if search else 'api-articoli', carica, [tag(Articolo)],
+            in_cache=not search
+        )
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -335,18 +538,7 @@ def get_articoli(request):
 def get_autisti(request, vettore_id):
     """API per ottenere gli autisti di un vettore"""
     try:
-        vettore = get_object_or_404(Vettore, id=vettore_id)
-        autisti = vettore.autisti.filter(attivo=True)
-        
-        data = [{
-            'id': autista.id,
-            'nome': autista.nome,
-            'cognome': autista.cognome,
-            'patente': autista.patente,
-            'note': autista.note
-        } for autista in autisti]
-        
-        return JsonResponse(data, safe=False)
+        return _risposta_json_dipendente(request, *_elenco_form_ddt('autisti', vettore_id))
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -356,17 +548,7 @@ def get_autisti(request, vettore_id):
 def get_targhe(request, vettore_id):
     """API per ottenere le targhe di un vettore"""
     try:
-        vettore = get_object_or_404(Vettore, id=vettore_id)
-        targhe = vettore.targhe.filter(attiva=True)
-        
-        data = [{
-            'id': targa.id,
-            'targa': targa.targa,
-            'tipo_veicolo': targa.tipo_veicolo,
-            'note': targa.note
-        } for targa in targhe]
-        
-        return JsonResponse(data, safe=False)
+        return _risposta_json_dipendente(request, *_elenco_form_ddt('targhe', vettore_id))
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -375,19 +557,46 @@ def get_targhe(request, vettore_id):
 def get_sedi_mittente(request, mittente_id):
     """API endpoint per ottenere le sedi di un mittente"""
     try:
-        sedi = SedeMittente.objects.filter(mittente_id=mittente_id, attiva=True).order_by('nome')
-        data = []
-        for sede in sedi:
-            data.append({
-                'id': sede.id,
-                'nome': sede.nome,
-                'indirizzo': sede.indirizzo,
-                'citta': sede.citta,
-                'provincia': sede.provincia,
-                'codice_stalla': sede.codice_stalla,
-                'sede_legale': sede.sede_legale
-            })
-        return JsonResponse(data, safe=False)
+        return _risposta_json_dipendente(request, *_elenco_form_ddt('sedi', mittente_id))
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_ddt_form_context(request):
+    """
+    API con i dati delle select del form DDT, in una sola richiesta
+
+    Parametri GET, tutti facoltativi: mittente_id (sedi), destinatario_id
+    (destinazioni) e vettore_id (autisti e targhe). Il prossimo numero DDT è
+    incluso, salvo con numero=0. Ogni elenco costa al più una query (due se
+    vuoto) e di solito nessuna: è letto dalla cache condivisa con le API dei
+    singoli elenchi.
+    """
+    try:
+        ids = {}
+        for parametro in ('mittente_id', 'destinatario_id', 'vettore_id'):
+            valore = request.GET.get(parametro)
+            if valore:
+                try:
+                    ids[parametro] = int(valore)
+                except ValueError:
+                    return JsonResponse({'error': f'{parametro} non valido'}, status=400)
+
+        data = {}
+        for nome, (parametro, *_) in ELENCHI_FORM_DDT.items():
+            if parametro in ids:
+                data[nome] = get_or_set(*_elenco_form_ddt(nome, ids[parametro]))
+        if request.GET.get('numero') != '0':
+            data['numero'] = get_prossimo_numero_ddt()
+
+        # Il numero proposto cambia a ogni DDT: la risposta va sempre riletta
+        response = JsonResponse(data)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    except Http404 as e:
+        return JsonResponse({'error': str(e)}, status=404)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -434,6 +643,40 @@ def generate_next_ddt_number(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_reserve_ddt_numbers(request):
+    """API per riservare un blocco di numeri DDT consecutivi (importazioni)"""
+    try:
+        data = json.loads(request.body or '{}')
+        prenotazione = reserve_ddt_numbers(
+            int(data.get('n', 0)),
+            anno=int(data['anno']) if data.get('anno') else None,
+            mese=int(data['mese']) if data.get('mese') else None,
+        )
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'token': prenotazione.token,
+        'numeri': prenotazione.numeri,
+        'scadenza': prenotazione.scadenza.isoformat(),
+    }, status=201)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_release_ddt_numbers(request):
+    """API per restituire i numeri non usati di una prenotazione"""
+    try:
+        data = json.loads(request.body or '{}')
+        rilasciati = release_ddt_numbers(str(data.get('token', '')))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=404)
+    
+    return JsonResponse({'rilasciati': rilasciati})
+
+
 def destinazione_create(request, destinatario_id):
     """Creazione di una nuova destinazione per un destinatario"""
     destinatario = get_object_or_404(Destinatario, id=destinatario_id)
@@ -531,7 +774,7 @@ def formato_numerazione_manage(request):
 
 def mittente_list(request):
     """Lista dei mittenti"""
-    mittenti = Mittente.objects.all().order_by('nome')
+    mittenti = Mittente.objects.with_counts().order_by('nome')
     
     # Filtri
     search = request.GET.get('search', '')
@@ -543,9 +786,8 @@ def mittente_list(request):
         )
     
     # Paginazione
-    paginator = Paginator(mittenti, 10)
-    page_number = request.GET.get('page')
-    mittenti = paginator.get_page(page_number)
+    paginator = KeysetPaginator(mittenti, 10, conteggio=CONTEGGIO_STIMATO)
+    mittenti = paginator.get_page(request.GET.get('cursore'))
     
     context = {
         'mittenti': mittenti,
@@ -633,7 +875,7 @@ def autista_create(request, vettore_id):
 
 def mittente_detail(request, mittente_id):
     """Dettaglio mittente con sedi"""
-    mittente = get_object_or_404(Mittente, id=mittente_id)
+    mittente = get_object_or_404(Mittente.objects.with_counts(), id=mittente_id)
     sedi = mittente.sedi.all().order_by('nome')
     
     context = {
@@ -666,7 +908,7 @@ def mittente_edit(request, mittente_id):
 
 def mittente_delete(request, mittente_id):
     """Elimina mittente"""
-    mittente = get_object_or_404(Mittente, id=mittente_id)
+    mittente = get_object_or_404(Mittente.objects.with_counts(), id=mittente_id)
     
     if request.method == 'POST':
         try:
@@ -770,7 +1012,7 @@ def sede_mittente_delete(request, sede_id):
 
 def destinatario_list(request):
     """Lista dei destinatari"""
-    destinatari = Destinatario.objects.all().order_by('nome')
+    destinatari = Destinatario.objects.with_counts().order_by('nome')
     
     # Filtri
     search = request.GET.get('search', '')
@@ -782,9 +1024,8 @@ def destinatario_list(request):
         )
     
     # Paginazione
-    paginator = Paginator(destinatari, 10)
-    page_number = request.GET.get('page')
-    destinatari = paginator.get_page(page_number)
+    paginator = KeysetPaginator(destinatari, 10, conteggio=CONTEGGIO_STIMATO)
+    destinatari = paginator.get_page(request.GET.get('cursore'))
     
     context = {
         'destinatari': destinatari,
@@ -795,7 +1036,7 @@ def destinatario_list(request):
 
 def destinatario_detail(request, destinatario_id):
     """Dettaglio destinatario con destinazioni"""
-    destinatario = get_object_or_404(Destinatario, id=destinatario_id)
+    destinatario = get_object_or_404(Destinatario.objects.with_counts(), id=destinatario_id)
     destinazioni = destinatario.destinazioni.all().order_by('nome')
     
     context = {
@@ -828,7 +1069,7 @@ def destinatario_edit(request, destinatario_id):
 
 def destinatario_delete(request, destinatario_id):
     """Elimina destinatario"""
-    destinatario = get_object_or_404(Destinatario, id=destinatario_id)
+    destinatario = get_object_or_404(Destinatario.objects.with_counts(), id=destinatario_id)
     
     if request.method == 'POST':
         try:
@@ -853,7 +1094,7 @@ def destinatario_delete(request, destinatario_id):
 
 def vettore_list(request):
     """Lista dei vettori"""
-    vettori = Vettore.objects.all().order_by('nome')
+    vettori = Vettore.objects.with_counts().order_by('nome')
     
     # Filtri
     search = request.GET.get('search', '')
@@ -865,9 +1106,8 @@ def vettore_list(request):
         )
     
     # Paginazione
-    paginator = Paginator(vettori, 10)
-    page_number = request.GET.get('page')
-    vettori = paginator.get_page(page_number)
+    paginator = KeysetPaginator(vettori, 10, conteggio=CONTEGGIO_STIMATO)
+    vettori = paginator.get_page(request.GET.get('cursore'))
     
     context = {
         'vettori': vettori,
@@ -878,7 +1118,7 @@ def vettore_list(request):
 
 def vettore_detail(request, vettore_id):
     """Dettaglio vettore con targhe e autisti"""
-    vettore = get_object_or_404(Vettore, id=vettore_id)
+    vettore = get_object_or_404(Vettore.objects.with_counts(), id=vettore_id)
     targhe = vettore.targhe.all().order_by('targa')
     autisti = vettore.autisti.all().order_by('cognome', 'nome')
     
@@ -913,7 +1153,7 @@ def vettore_edit(request, vettore_id):
 
 def vettore_delete(request, vettore_id):
     """Elimina vettore"""
-    vettore = get_object_or_404(Vettore, id=vettore_id)
+    vettore = get_object_or_404(Vettore.objects.with_counts(), id=vettore_id)
     
     if request.method == 'POST':
         try:
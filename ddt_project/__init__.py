@@ -1,6 +1,9 @@
 # DDT Project
 
-# Celery configuration (optional)
-# Uncomment the following lines if you need Celery
-# from .celery import app as celery_app
-# __all__ = ('celery_app',)
+# Celery configuration (optional): attiva solo se Celery è installato
+try:
+    from .celery import app as celery_app
+except ImportError:
+    celery_app = None
+
+__all__ = ('celery_app',)
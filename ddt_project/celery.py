@@ -0,0 +1,13 @@
+"""
+Configurazione Celery per il progetto DDT (opzionale)
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ddt_project.settings')
+
+app = Celery('ddt_project')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
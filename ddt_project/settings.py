@@ -98,10 +98,68 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache: L1 nel processo davanti a una cache su file condivisa dai processi
+# (ddt_app.cache_backend)
+CACHES = {
+    'default': {
+        'BACKEND': 'ddt_app.cache_backend.TieredCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'L2': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': BASE_DIR / 'tmp' / 'cache',
+            },
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 60,
+            'SYNC_INTERVAL': 1,
+        },
+    }
+}
+
+# Cache dei PDF generati (ddt_app.pdf_cache)
+DDT_PDF_CACHE = {
+    'BACKEND': 'ddt_app.pdf_cache.LocalDiskPDFStore',
+    'OPTIONS': {
+        'location': BASE_DIR / 'tmp' / 'pdf_cache',
+        'max_size': 200 * 1024 * 1024,
+    },
+}
+
+# Pool di processi per la generazione dei PDF (ddt_app.pdf_workers).
+# WORKERS e MAX_QUEUE valgono per ogni processo web: con N processi
+# (es: gunicorn --workers N) i processi di stampa sono N × WORKERS e le
+# stampe accettate N × (WORKERS + MAX_QUEUE)
+DDT_PDF_WORKERS = {
+    'WORKERS': 2,
+    'MAX_QUEUE': 8,
+    'TIMEOUT': 30,
+    'RETRY_AFTER': 5,
+    'MAX_BATCH': 200,
+}
+
+# Generazione anticipata dei PDF al salvataggio dei DDT (ddt_app.pdf_pregeneration)
+DDT_PDF_PREGENERATION = {
+    'ENABLED': True,
+    'DELAY': 2,
+}
+
+# Cache nel processo del formato di numerazione e delle configurazioni (ddt_app.config_cache)
+DDT_CONFIG_CACHE = {
+    'TTL': 60,
+    'CACHE': 'default',
+}
+
+# Test con cache in memoria, PDF nel processo e nessuna generazione in background
+TEST_RUNNER = 'ddt_project.test_runner.DDTTestRunner'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Logging
+# La cartella dei log non è nel repository: viene creata all'avvio
+LOG_DIR = BASE_DIR / 'logs'
+LOG_DIR.mkdir(exist_ok=True)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -109,7 +167,7 @@ LOGGING = {
         'file': {
             'level': 'INFO',
             'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'logs' / 'ddt.log',
+            'filename': LOG_DIR / 'ddt.log',
         },
     },
     'loggers': {
@@ -0,0 +1,41 @@
+"""
+Runner dei test del progetto ddt_project
+"""
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+# Impostazioni dei test, come in config/settings/testing.py: nessuna scrittura
+# in tmp/ del progetto, PDF disegnati nel processo dei test e nessun timer di
+# generazione anticipata. I test che li usano li riattivano con override_settings
+IMPOSTAZIONI_TEST = {
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    },
+    'DDT_PDF_CACHE': {
+        'BACKEND': 'ddt_app.pdf_cache.DjangoCachePDFStore',
+        'OPTIONS': {},
+    },
+    'DDT_PDF_WORKERS': {
+        'WORKERS': 0,
+    },
+    'DDT_PDF_PREGENERATION': {
+        'ENABLED': False,
+    },
+}
+
+
+class DDTTestRunner(DiscoverRunner):
+    """DiscoverRunner che applica IMPOSTAZIONI_TEST per tutta l'esecuzione"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._impostazioni_test = override_settings(**IMPOSTAZIONI_TEST)
+        self._impostazioni_test.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._impostazioni_test.disable()
+        super().teardown_test_environment(**kwargs)
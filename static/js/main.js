@@ -328,107 +328,101 @@ function showNotification(message, type = 'info') {
 
 // DDT Form variables
 var ddtForm = null;
-var destinazioniUrl = null;
-var sediMittenteUrl = null;
-var autistiUrl = null;
-var targheUrl = null;
+var formContextUrl = null;
 
-// Gestione filtraggio sedi mittente
-function loadSediMittente(mittenteId) {
+// Dati delle select del form DDT (sedi, destinazioni, autisti, targhe e
+// prossimo numero) con una sola richiesta
+function loadFormContext(params) {
+    return $.get(formContextUrl, params).fail(function() {
+        console.error('Errore nel caricamento dei dati del form DDT');
+    });
+}
+
+function populateSediMittente(sedi) {
     var sedeMittenteSelect = $('#id_sede_mittente');
+    sedeMittenteSelect.empty();
+    sedeMittenteSelect.append('<option value="">Seleziona sede mittente...</option>');
+    
+    sedi.forEach(function(sede) {
+        var optionText = sede.nome;
+        if (sede.codice_stalla) {
+            optionText += ' (' + sede.codice_stalla + ')';
+        }
+        if (sede.sede_legale) {
+            optionText += ' [Sede Legale]';
+        }
+        sedeMittenteSelect.append('<option value="' + sede.id + '">' + optionText + '</option>');
+    });
+}
+
+function populateAutistiTarghe(autisti, targhe) {
+    var autistaSelect = $('#id_autista');
+    var targaSelect = $('#id_targa_vettore');
+    var targaSelect2 = $('#id_targa_vettore_2');
+    
+    autistaSelect.empty();
+    autistaSelect.append('<option value="">Seleziona autista...</option>');
+    autisti.forEach(function(autista) {
+        var optionText = autista.nome + ' ' + autista.cognome;
+        if (autista.patente) {
+            optionText += ' (' + autista.patente + ')';
+        }
+        autistaSelect.append('<option value="' + autista.id + '">' + optionText + '</option>');
+    });
     
+    // Popola entrambi i campi targa
+    targaSelect.empty();
+    targaSelect.append('<option value="">Seleziona targa 1...</option>');
+    targaSelect2.empty();
+    targaSelect2.append('<option value="">Seleziona targa 2...</option>');
+    targhe.forEach(function(targa) {
+        var optionText = targa.targa;
+        if (targa.tipo_veicolo) {
+            optionText += ' - ' + targa.tipo_veicolo;
+        }
+        if (targa.note && targa.note.trim() !== '') {
+            optionText += ' (' + targa.note + ')';
+        }
+        targaSelect.append('<option value="' + targa.id + '">' + optionText + '</option>');
+        targaSelect2.append('<option value="' + targa.id + '">' + optionText + '</option>');
+    });
+}
+
+function populateDestinazioni(destinazioni, selectedId) {
+    var destinazioneSelect = $('#id_destinazione');
+    destinazioneSelect.empty();
+    destinazioneSelect.append('<option value="">Seleziona destinazione...</option>');
+    $.each(destinazioni, function(index, destinazione) {
+        var optionText = destinazione.nome;
+        if (destinazione.codice_stalla) {
+            optionText += ' (' + destinazione.codice_stalla + ')';
+        }
+        var isSelected = selectedId && destinazione.id == selectedId;
+        destinazioneSelect.append('<option value="' + destinazione.id + '" data-indirizzo="' + destinazione.indirizzo + '" data-codice-stalla="' + (destinazione.codice_stalla || '') + '"' + (isSelected ? ' selected' : '') + '>' + optionText + '</option>');
+    });
+}
+
+// Gestione filtraggio sedi mittente
+function loadSediMittente(mittenteId) {
     if (mittenteId) {
-        $.ajax({
-            url: sediMittenteUrl + mittenteId + '/',
-            method: 'GET',
-            success: function(data) {
-                sedeMittenteSelect.empty();
-                sedeMittenteSelect.append('<option value="">Seleziona sede mittente...</option>');
-                
-                data.forEach(function(sede) {
-                    var optionText = sede.nome;
-                    if (sede.codice_stalla) {
-                        optionText += ' (' + sede.codice_stalla + ')';
-                    }
-                    if (sede.sede_legale) {
-                        optionText += ' [Sede Legale]';
-                    }
-                    sedeMittenteSelect.append('<option value="' + sede.id + '">' + optionText + '</option>');
-                });
-            },
-            error: function() {
-                console.error('Errore nel caricamento delle sedi del mittente');
-            }
+        loadFormContext({ mittente_id: mittenteId, numero: 0 }).done(function(data) {
+            populateSediMittente(data.sedi);
         });
     } else {
-        sedeMittenteSelect.empty();
-        sedeMittenteSelect.append('<option value="">Seleziona prima un mittente</option>');
+        $('#id_sede_mittente').empty().append('<option value="">Seleziona prima un mittente</option>');
     }
 }
 
 // Gestione caricamento autisti e targhe
 function loadAutistiTarghe(vettoreId) {
-    var autistaSelect = $('#id_autista');
-    var targaSelect = $('#id_targa_vettore');
-    var targaSelect2 = $('#id_targa_vettore_2');
-    
     if (vettoreId) {
-        // Carica autisti
-        $.ajax({
-            url: autistiUrl + vettoreId + '/',
-            method: 'GET',
-            success: function(data) {
-                autistaSelect.empty();
-                autistaSelect.append('<option value="">Seleziona autista...</option>');
-                
-                data.forEach(function(autista) {
-                    var optionText = autista.nome + ' ' + autista.cognome;
-                    if (autista.patente) {
-                        optionText += ' (' + autista.patente + ')';
-                    }
-                    autistaSelect.append('<option value="' + autista.id + '">' + optionText + '</option>');
-                });
-            },
-            error: function() {
-                console.error('Errore nel caricamento degli autisti');
-            }
-        });
-        
-        // Carica targhe per entrambi i campi
-        $.ajax({
-            url: targheUrl + vettoreId + '/',
-            method: 'GET',
-            success: function(data) {
-                // Popola primo campo targa
-                targaSelect.empty();
-                targaSelect.append('<option value="">Seleziona targa 1...</option>');
-                
-                // Popola secondo campo targa
-                targaSelect2.empty();
-                targaSelect2.append('<option value="">Seleziona targa 2...</option>');
-                
-                data.forEach(function(targa) {
-                    var optionText = targa.targa;
-                    if (targa.tipo_veicolo) {
-                        optionText += ' - ' + targa.tipo_veicolo;
-                    }
-                    if (targa.note && targa.note.trim() !== '') {
-                        optionText += ' (' + targa.note + ')';
-                    }
-                    
-                    // Aggiungi a entrambi i select
-                    targaSelect.append('<option value="' + targa.id + '">' + optionText + '</option>');
-                    targaSelect2.append('<option value="' + targa.id + '">' + optionText + '</option>');
-                });
-            },
-            error: function() {
-                console.error('Errore nel caricamento delle targhe');
-            }
+        loadFormContext({ vettore_id: vettoreId, numero: 0 }).done(function(data) {
+            populateAutistiTarghe(data.autisti, data.targhe);
         });
     } else {
-        autistaSelect.empty().append('<option value="">Seleziona prima un vettore</option>');
-        targaSelect.empty().append('<option value="">Seleziona prima un vettore</option>');
-        targaSelect2.empty().append('<option value="">Seleziona prima un vettore</option>');
+        $('#id_autista').empty().append('<option value="">Seleziona prima un vettore</option>');
+        $('#id_targa_vettore').empty().append('<option value="">Seleziona prima un vettore</option>');
+        $('#id_targa_vettore_2').empty().append('<option value="">Seleziona prima un vettore</option>');
     }
 }
 
@@ -486,69 +480,64 @@ function restoreSedeMittente() {
 function initializeExistingValues() {
     console.log('Initializing existing values...');
     
-    // Carica le sedi se c'è già un mittente selezionato
+    // Sedi, autisti, targhe e destinazioni delle anagrafiche già selezionate,
+    // con una sola richiesta; i valori salvati sono ripristinati all'arrivo
     var mittenteId = $('#id_mittente').val();
-    console.log('Mittente ID:', mittenteId);
+    var vettoreId = $('#id_vettore').val();
+    var destinatarioId = $('#id_destinatario').val();
+    var destinazioneId = $('#id_destinazione_id').val();
+    var params = { numero: 0 };
     if (mittenteId) {
-        loadSediMittente(mittenteId);
-        setTimeout(restoreSedeMittente, 500);
+        params.mittente_id = mittenteId;
     }
-    
-    // Carica autisti e targhe se c'è già un vettore selezionato
-    var vettoreId = $('#id_vettore').val();
-    console.log('Vettore ID:', vettoreId);
     if (vettoreId) {
-        loadAutistiTarghe(vettoreId);
+        params.vettore_id = vettoreId;
         $('#autista-targa-fields').show();
-        setTimeout(restoreAutistaTargaValues, 1000);
+    }
+    if (destinatarioId && destinazioneId) {
+        params.destinatario_id = destinatarioId;
+    }
+    console.log('Form context params:', params);
+    
+    if (mittenteId || vettoreId || params.destinatario_id) {
+        loadFormContext(params).done(function(data) {
+            if (data.sedi) {
+                populateSediMittente(data.sedi);
+                restoreSedeMittente();
+            }
+            if (data.autisti) {
+                populateAutistiTarghe(data.autisti, data.targhe);
+                restoreAutistaTargaValues();
+            }
+            if (data.destinazioni) {
+                populateDestinazioni(data.destinazioni, destinazioneId);
+                updateLuogoDestinazionePreview();
+            }
+        });
     }
     
     // Ripristina le date
     setTimeout(restoreDateValues, 100);
-    
-    // Ripristina la destinazione se esiste
-    var destinazioneId = $('#id_destinazione_id').val();
-    if (destinazioneId) {
-        var destinatarioId = $('#id_destinatario').val();
-        if (destinatarioId) {
-            var url = destinazioniUrl.replace('0', destinatarioId);
-            $.get(url, function(data) {
-                var destinazioneSelect = $('#id_destinazione');
-                destinazioneSelect.empty();
-                destinazioneSelect.append('<option value="">Seleziona destinazione...</option>');
-                $.each(data, function(index, destinazione) {
-                    var optionText = destinazione.nome;
-                    if (destinazione.codice_stalla) {
-                        optionText += ' (' + destinazione.codice_stalla + ')';
-                    }
-                    var isSelected = destinazione.id == destinazioneId;
-                    destinazioneSelect.append('<option value="' + destinazione.id + '" data-indirizzo="' + destinazione.indirizzo + '" data-codice-stalla="' + (destinazione.codice_stalla || '') + '"' + (isSelected ? ' selected' : '') + '">' + optionText + '</option>');
-                });
-                
-                // Se c'è una selezione, aggiorna l'anteprima
-                if (destinazioneId) {
-                    var selectedOption = destinazioneSelect.find('option:selected');
-                    var indirizzo = selectedOption.data('indirizzo');
-                    var codiceStalla = selectedOption.data('codice-stalla');
-                    var nome = selectedOption.text();
-                    
-                    if (indirizzo && nome !== 'Seleziona destinazione...') {
-                        // Rimuovi il codice stalla tra parentesi dal nome se presente
-                        var nomePulito = nome.replace(/\s*\([^)]*\)\s*$/, '').trim();
-                        var luogoDestinazione = nomePulito;
-                        
-                        // Aggiungi sempre il codice stalla se presente
-                        if (codiceStalla) {
-                            luogoDestinazione += '\nCodice Stalla: ' + codiceStalla;
-                        }
-                        luogoDestinazione += '\n' + indirizzo;
-                        $('#luogo-destinazione-preview').html(luogoDestinazione.replace(/\n/g, '<br>'));
-                    }
-                }
-            }).fail(function() {
-                console.error('Errore nel caricamento delle destinazioni');
-            });
+}
+
+// Anteprima del luogo di destinazione dalla destinazione selezionata
+function updateLuogoDestinazionePreview() {
+    var selectedOption = $('#id_destinazione').find('option:selected');
+    var indirizzo = selectedOption.data('indirizzo');
+    var codiceStalla = selectedOption.data('codice-stalla');
+    var nome = selectedOption.text();
+    
+    if (indirizzo && nome !== 'Seleziona destinazione...') {
+        // Rimuovi il codice stalla tra parentesi dal nome se presente
+        var nomePulito = nome.replace(/\s*\([^)]*\)\s*$/, '').trim();
+        var luogoDestinazione = nomePulito;
+        
+        // Aggiungi sempre il codice stalla se presente
+        if (codiceStalla) {
+            luogoDestinazione += '\nCodice Stalla: ' + codiceStalla;
         }
+        luogoDestinazione += '\n' + indirizzo;
+        $('#luogo-destinazione-preview').html(luogoDestinazione.replace(/\n/g, '<br>'));
     }
 }
 
@@ -557,37 +546,31 @@ function initDDTForm() {
     console.log('Initializing DDT Form...');
     
     ddtForm = $('.ddt-form');
-    destinazioniUrl = ddtForm.data('destinazioni-url');
-    sediMittenteUrl = ddtForm.data('sedi-mittente-url');
-    autistiUrl = ddtForm.data('autisti-url');
-    targheUrl = ddtForm.data('targhe-url');
-    
-    console.log('URLs loaded:', { destinazioniUrl, sediMittenteUrl, autistiUrl, targheUrl });
+    formContextUrl = ddtForm.data('form-context-url') || '/api/ddt-form-context/';
     
     // Genera numero DDT automatico
     $('#generate-number').click(function() {
-        var url = $('#generate-number').data('url') || '/api/next-ddt-number/';
-        $.get(url, function(data) {
+        loadFormContext({}).done(function(data) {
             $('#id_numero').val(data.numero);
+            $('#id_numero_proposto').val(data.numero);
         });
     });
 
+    // Carica sedi, autisti e targhe quando cambiano mittente e vettore
+    $('#id_mittente').change(function() {
+        loadSediMittente($(this).val());
+    });
+    $('#id_vettore').change(function() {
+        loadAutistiTarghe($(this).val());
+    });
+
     // Carica destinazioni quando cambia il destinatario
     $('#id_destinatario').change(function() {
         var destinatarioId = $(this).val();
         if (destinatarioId) {
-            var url = destinazioniUrl.replace('0', destinatarioId);
-            $.get(url, function(data) {
+            loadFormContext({ destinatario_id: destinatarioId, numero: 0 }).done(function(data) {
                 var destinazioneSelect = $('#id_destinazione');
-                destinazioneSelect.empty();
-                destinazioneSelect.append('<option value="">Seleziona destinazione...</option>');
-                $.each(data, function(index, destinazione) {
-                    var optionText = destinazione.nome;
-                    if (destinazione.codice_stalla) {
-                        optionText += ' (' + destinazione.codice_stalla + ')';
-                    }
-                    destinazioneSelect.append('<option value="' + destinazione.id + '" data-indirizzo="' + destinazione.indirizzo + '" data-codice-stalla="' + (destinazione.codice_stalla || '') + '">' + optionText + '</option>');
-                });
+                populateDestinazioni(data.destinazioni);
                 
                 // Se c'è un errore di validazione, mantieni la selezione precedente
                 var selectedValue = destinazioneSelect.data('selected-value');
@@ -0,0 +1,149 @@
+"""
+Test two-level cache backend for DDT Application.
+"""
+import time
+import uuid
+from unittest import mock
+from django.test import SimpleTestCase
+from ddt_app.cache_backend import TieredCache
+
+
+class TieredCacheTest(SimpleTestCase):
+    """Test L1 del processo davanti a una cache condivisa."""
+
+    def setUp(self):
+        self.l2 = f'l2-{uuid.uuid4().hex}'
+
+    def make_cache(self, **options):
+        """Cache con un proprio L1 (un processo) e L2 condiviso dai test"""
+        options.setdefault('SYNC_INTERVAL', 0)
+        return TieredCache(f'l1-{uuid.uuid4().hex}', {
+            'OPTIONS': {
+                'L2': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': self.l2},
+                **options,
+            },
+        })
+
+    def test_lettura_da_l1(self):
+        cache = self.make_cache(SYNC_INTERVAL=60)
+        cache.set('formato', {'lunghezza': 4})
+        # La prima lettura copia il valore da L2
+        cache.get('formato')
+        with mock.patch.object(cache.l2, 'get_many', wraps=cache.l2.get_many) as l2_get_many:
+            self.assertEqual(cache.get('formato'), {'lunghezza': 4})
+            self.assertEqual(cache.get_many(['formato']), {'formato': {'lunghezza': 4}})
+        l2_get_many.assert_not_called()
+
+    def test_valore_copiato(self):
+        cache = self.make_cache()
+        cache.set('lista', [1])
+        cache.get('lista').append(2)
+        self.assertEqual(cache.get('lista'), [1])
+
+    def test_lettura_da_l2_popola_l1(self):
+        scrittore, lettore = self.make_cache(), self.make_cache(SYNC_INTERVAL=60)
+        scrittore.set('chiave', 'valore')
+        self.assertEqual(lettore.get('chiave'), 'valore')
+        with mock.patch.object(lettore.l2, 'get_many') as l2_get_many:
+            self.assertEqual(lettore.get('chiave'), 'valore')
+        l2_get_many.assert_not_called()
+        self.assertIsNone(lettore.get('mancante'))
+
+    def test_invalidazione_tra_processi(self):
+        primo, secondo = self.make_cache(), self.make_cache()
+        primo.set('chiave', 1)
+        self.assertEqual(secondo.get('chiave'), 1)
+        primo.set('chiave', 2)
+        self.assertEqual(secondo.get('chiave'), 2)
+        primo.delete('chiave')
+        self.assertIsNone(secondo.get('chiave'))
+        secondo.set_many({'a': 1, 'b': 2})
+        self.assertEqual(primo.get_many(['a', 'b']), {'a': 1, 'b': 2})
+        secondo.delete_many(['a'])
+        self.assertEqual(primo.get_many(['a', 'b']), {'b': 2})
+        primo.set('contatore', 1)
+        self.assertEqual(secondo.get('contatore'), 1)
+        secondo.incr('contatore')
+        self.assertEqual(primo.get('contatore'), 2)
+        secondo.clear()
+        self.assertIsNone(primo.get('b'))
+
+    def test_intervallo_di_sincronizzazione(self):
+        primo, secondo = self.make_cache(), self.make_cache(SYNC_INTERVAL=60)
+        primo.set('chiave', 1)
+        self.assertEqual(secondo.get('chiave'), 1)
+        primo.set('chiave', 2)
+        # Il secondo processo non rilegge ancora la versione
+        self.assertEqual(secondo.get('chiave'), 1)
+        secondo.sync_interval = 0
+        self.assertEqual(secondo.get('chiave'), 2)
+
+    def test_scrittura_invalida_solo_la_chiave(self):
+        primo, secondo = self.make_cache(), self.make_cache()
+        primo.set_many({'a': 1, 'b': 2})
+        self.assertEqual(secondo.get_many(['a', 'b']), {'a': 1, 'b': 2})
+        primo.set('a', 3)
+        primo.set('grande', b'x' * 1000, version=2)
+        primo.delete('mancante')
+        self.assertEqual(list(secondo._l1.valori), [secondo.make_key('a'), secondo.make_key('b')])
+        secondo._sincronizza()
+        self.assertEqual(list(secondo._l1.valori), [secondo.make_key('b')])
+        self.assertEqual(secondo.get('a'), 3)
+
+    def test_scritture_di_massa_una_richiesta(self):
+        cache = self.make_cache()
+        with mock.patch.object(cache.l2, 'set_many', wraps=cache.l2.set_many) as l2_set_many:
+            cache.set_many({f'k{i}': i for i in range(10)})
+        # Valori e versioni
+        self.assertEqual(l2_set_many.call_count, 2)
+        with mock.patch.object(cache.l2, 'delete_many', wraps=cache.l2.delete_many) as l2_delete_many:
+            cache.delete_many([f'k{i}' for i in range(10)])
+        self.assertEqual(l2_delete_many.call_count, 2)
+
+    def test_valori_senza_versione(self):
+        cache = self.make_cache(L1_MAX_VALUE_SIZE=100)
+        cache.l2.set(cache.make_key('vecchio'), 'valore')
+        # Il valore scritto senza versione va in L1 dalla seconda lettura
+        self.assertEqual(cache.get('vecchio'), 'valore')
+        self.assertFalse(cache._l1.valori)
+        self.assertEqual(cache.get('vecchio'), 'valore')
+        self.assertIn(cache.make_key('vecchio'), cache._l1.valori)
+        # I valori troppo grandi per L1 non hanno versione
+        cache.set('pdf', b'x' * 1000)
+        cache.get('pdf')
+        self.assertIsNone(cache.l2.get(f"ddt-tiered-version:{cache.make_key('pdf')}"))
+
+    def test_lru_limitato(self):
+        cache = self.make_cache(L1_MAX_ENTRIES=2, SYNC_INTERVAL=60)
+        cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        cache.get('a')
+        cache.get('b')
+        cache.get('a')
+        cache.get('c')
+        self.assertEqual(list(cache._l1.valori), [cache.make_key('a'), cache.make_key('c')])
+        # Il valore uscito da L1 resta in L2
+        self.assertEqual(cache.get('b'), 2)
+
+    def test_scadenza_l1(self):
+        cache = self.make_cache(L1_TIMEOUT=10, SYNC_INTERVAL=60)
+        cache.set('chiave', 'valore')
+        cache.get('chiave')
+        with mock.patch('ddt_app.cache_backend.time.monotonic', return_value=time.monotonic() + 11):
+            with mock.patch.object(cache.l2, 'get_many', wraps=cache.l2.get_many) as l2_get_many:
+                self.assertEqual(cache.get('chiave'), 'valore')
+        l2_get_many.assert_called_once()
+
+    def test_valori_grandi_solo_in_l2(self):
+        cache = self.make_cache(L1_MAX_VALUE_SIZE=100)
+        cache.set('pdf', b'x' * 1000)
+        self.assertEqual(cache.get('pdf'), b'x' * 1000)
+        self.assertFalse(cache._l1.valori)
+
+    def test_add_e_timeout(self):
+        cache = self.make_cache()
+        self.assertTrue(cache.add('lock', 1))
+        self.assertFalse(cache.add('lock', 2))
+        self.assertEqual(cache.get('lock'), 1)
+        cache.set('scaduto', 1, timeout=0)
+        self.assertIsNone(cache.get('scaduto'))
+        self.assertTrue(cache.has_key('lock'))
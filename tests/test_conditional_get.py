@@ -0,0 +1,90 @@
+"""
+Test conditional GET on PDFs and lookup APIs for DDT Application.
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from ddt_app.models import Autista, TargaVettore, Vettore
+from ddt_app.pdf_data import load_ddt_data
+from ddt_app.pdf_generator_advanced import render_ddt_pdf
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin
+
+
+class ConditionalGetTest(DDTPDFTestMixin, TestCase):
+    """Test ETag, 304 e Cache-Control."""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_ddt_data()
+
+    def assertRivalidazione(self, response):
+        self.assertIn('ETag', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_api_304_senza_query(self):
+        url = reverse('ddt_app:get_autisti', args=[self.vettore.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertRivalidazione(response)
+        with self.assertNumQueries(0):
+            non_modificata = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(non_modificata.status_code, 304)
+        self.assertEqual(non_modificata['ETag'], response['ETag'])
+        self.assertFalse(non_modificata.content)
+
+    def test_api_etag_cambia_con_i_dati(self):
+        url = reverse('ddt_app:get_targhe', args=[self.vettore.pk])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            TargaVettore.objects.create(vettore=self.vettore, targa="ZZ999ZZ")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        # Le API degli altri vettori non cambiano
+        with self.captureOnCommitCallbacks(execute=True):
+            altro_vettore = Vettore.objects.create(nome="Altro Vettore")
+        altro = reverse('ddt_app:get_autisti', args=[altro_vettore.pk])
+        etag = self.client.get(altro)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Autista.objects.create(vettore=self.vettore, nome="Luigi", cognome="Verdi")
+        self.assertEqual(self.client.get(altro, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_api_etag_diverso_per_url(self):
+        etags = {
+            self.client.get(reverse('ddt_app:get_autisti', args=[self.vettore.pk]))['ETag'],
+            self.client.get(reverse('ddt_app:get_targhe', args=[self.vettore.pk]))['ETag'],
+            self.client.get(reverse('ddt_app:get_articoli'))['ETag'],
+            self.client.get(reverse('ddt_app:get_articoli'), {'search': 'vit'})['ETag'],
+            self.client.get(reverse('ddt_app:get_destinazioni', args=[self.destinatario.pk]))['ETag'],
+            self.client.get(reverse('ddt_app:get_sedi_mittente', args=[self.mittente.pk]))['ETag'],
+        }
+        self.assertEqual(len(etags), 6)
+
+    def test_pdf_304_senza_generazione(self):
+        url = reverse('ddt_app:ddt_pdf', args=[self.ddt.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertRivalidazione(response)
+        cache.clear()
+        with self.assertNumQueries(1):
+            non_modificata = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(non_modificata.status_code, 304)
+        self.assertEqual(non_modificata['ETag'], response['ETag'])
+
+    def test_pdf_etag_cambia_con_il_ddt(self):
+        url = reverse('ddt_app:ddt_pdf', args=[self.ddt.pk])
+        etag = self.client.get(url)['ETag']
+        self.ddt.annotazioni = "Nuove annotazioni"
+        self.ddt.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pdf_deterministico(self):
+        # L'ETag è forte: lo stesso DDT produce sempre gli stessi byte
+        primo = render_ddt_pdf(load_ddt_data(self.ddt.pk))
+        secondo = render_ddt_pdf(load_ddt_data(self.ddt.pk))
+        self.assertTrue(primo.startswith(b'%PDF'))
+        self.assertEqual(primo, secondo)
@@ -0,0 +1,95 @@
+"""
+Test process-local settings cache for DDT Application.
+"""
+import json
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from ddt_app.config_cache import (
+    CONFIG_VERSION_KEY, get_configurazione, get_formato_numerazione_attivo,
+)
+from ddt_app.models import Configurazione, FormatoNumerazioneDDT
+from ddt_app.utils import get_prossimo_numero_ddt
+
+
+@override_settings(DDT_CONFIG_CACHE={'TTL': 60, 'CACHE': 'default'})
+class ConfigCacheTest(TestCase):
+    """Test cache del formato di numerazione attivo e delle configurazioni."""
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.formato = FormatoNumerazioneDDT.objects.create(
+                formato='aaaa-num', lunghezza_numero=4, attivo=True
+            )
+
+    def test_formato_cached(self):
+        self.assertEqual(get_formato_numerazione_attivo(), self.formato)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_formato_numerazione_attivo(), self.formato)
+
+    def test_next_number_skips_format_query(self):
+        get_prossimo_numero_ddt(2024, 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_prossimo_numero_ddt(2024, 1), "2024-0001")
+        self.assertFalse([q for q in queries if '"ddt_app_formatonumerazioneddt"' in q['sql']])
+
+    def test_save_invalidates_on_commit(self):
+        get_formato_numerazione_attivo()
+        self.formato.lunghezza_numero = 6
+        with self.captureOnCommitCallbacks(execute=True):
+            self.formato.save()
+        self.assertEqual(get_formato_numerazione_attivo().lunghezza_numero, 6)
+
+    def test_uncommitted_change_bypasses_cache(self):
+        get_formato_numerazione_attivo()
+        self.formato.lunghezza_numero = 6
+        self.formato.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_formato_numerazione_attivo().lunghezza_numero, 6)
+
+    def test_rolled_back_change_not_cached(self):
+        get_formato_numerazione_attivo()
+        try:
+            with transaction.atomic():
+                self.formato.lunghezza_numero = 6
+                self.formato.save()
+                self.assertEqual(get_formato_numerazione_attivo().lunghezza_numero, 6)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(get_formato_numerazione_attivo().lunghezza_numero, 4)
+        with self.assertNumQueries(0):
+            get_formato_numerazione_attivo()
+
+    @override_settings(DDT_CONFIG_CACHE={'TTL': 0, 'CACHE': 'default'})
+    def test_shared_version_change_reloads(self):
+        get_formato_numerazione_attivo()
+        with self.assertNumQueries(0):
+            get_formato_numerazione_attivo()
+        # Modifica confermata da un altro processo
+        cache.set(CONFIG_VERSION_KEY, 'altro-processo', None)
+        with self.assertNumQueries(1):
+            get_formato_numerazione_attivo()
+
+    def test_configurazione_typed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Configurazione.objects.create(chiave='giorni', valore='30')
+            Configurazione.objects.create(chiave='stampa_logo', valore='Sì')
+            Configurazione.objects.create(chiave='unita_misura', valore=json.dumps(['kg', 'capi']))
+            Configurazione.objects.create(chiave='soglia', valore='molta')
+
+        self.assertEqual(get_configurazione('giorni', tipo=int), 30)
+        with self.assertNumQueries(0):
+            self.assertTrue(get_configurazione('stampa_logo', tipo=bool))
+            self.assertEqual(get_configurazione('unita_misura', tipo=json.loads), ['kg', 'capi'])
+            self.assertEqual(get_configurazione('soglia', default=5, tipo=int), 5)
+            self.assertIsNone(get_configurazione('mancante'))
+
+    def test_configurazione_delete_invalidates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            config = Configurazione.objects.create(chiave='giorni', valore='30')
+        self.assertEqual(get_configurazione('giorni'), '30')
+        with self.captureOnCommitCallbacks(execute=True):
+            config.delete()
+        self.assertEqual(get_configurazione('giorni', default='7'), '7')
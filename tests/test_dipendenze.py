@@ -0,0 +1,121 @@
+"""
+Test dependency-tracked cache invalidation for DDT Application.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+from ddt_app.dipendenze import get_or_set, tag, tags_ddt
+from ddt_app.models import Articolo, Autista, DDTRiga, Destinatario, Vettore
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin
+
+
+class DipendenzeTest(DDTPDFTestMixin, TestCase):
+    """Test valori in cache invalidati dalle istanze da cui sono costruiti."""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_ddt_data()
+            self.altro_vettore = Vettore.objects.create(nome="Altro Vettore", licenza_bdn="BDN-2")
+        self.caricamenti = []
+
+    def cached(self, chiave, dipendenze):
+        def loader():
+            self.caricamenti.append(chiave)
+            return len(self.caricamenti)
+        return get_or_set(chiave, loader, dipendenze)
+
+    def test_valore_in_cache(self):
+        self.assertEqual(self.cached('v', [tag(self.vettore)]), 1)
+        self.assertEqual(self.cached('v', [tag(self.vettore)]), 1)
+        self.assertEqual(self.caricamenti, ['v'])
+
+    def test_invalida_solo_i_dipendenti(self):
+        self.cached('pdf-1', tags_ddt(self.ddt))
+        self.cached('altro', [tag(self.altro_vettore)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vettore.licenza_bdn = "BDN-NUOVA"
+            self.vettore.save()
+        self.cached('pdf-1', tags_ddt(self.ddt))
+        self.cached('altro', [tag(self.altro_vettore)])
+        self.assertEqual(self.caricamenti, ['pdf-1', 'altro', 'pdf-1'])
+
+    def test_figli_invalidano_i_parenti(self):
+        self.cached('autisti', [tag(self.vettore)])
+        self.cached('destinatario', [tag(self.destinatario)])
+        with self.captureOnCommitCallbacks(execute=True):
+            Autista.objects.create(vettore=self.vettore, nome="Luigi", cognome="Verdi")
+        self.cached('autisti', [tag(self.vettore)])
+        self.cached('destinatario', [tag(self.destinatario)])
+        self.assertEqual(self.caricamenti, ['autisti', 'destinatario', 'autisti'])
+
+    def test_figlio_spostato_invalida_il_parente_precedente(self):
+        autista = Autista.objects.get(pk=self.autista.pk)
+        self.cached('autisti', [tag(self.vettore)])
+        with self.captureOnCommitCallbacks(execute=True):
+            autista.vettore = self.altro_vettore
+            autista.save()
+        self.cached('autisti', [tag(self.vettore)])
+        self.assertEqual(self.caricamenti, ['autisti', 'autisti'])
+
+    def test_parenti_letti_dal_database_al_salvataggio(self):
+        with self.assertNumQueries(1):
+            autisti = list(Autista.objects.filter(vettore=self.vettore))
+        self.assertFalse(hasattr(autisti[0], '_dipendenze_iniziali'))
+        with self.captureOnCommitCallbacks(execute=True):
+            autista = Autista.objects.create(vettore=self.altro_vettore, nome="Luigi", cognome="Verdi")
+        self.cached('autisti', [tag(self.altro_vettore)])
+        with self.captureOnCommitCallbacks(execute=True):
+            autista.vettore = self.vettore
+            autista.save()
+        self.cached('autisti', [tag(self.altro_vettore)])
+        self.assertEqual(self.caricamenti, ['autisti', 'autisti'])
+
+    def test_righe_e_articoli_invalidano_il_ddt(self):
+        self.cached('ddt', tags_ddt(self.ddt))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.articolo.prezzo_unitario = 20
+            self.articolo.save()
+        self.cached('ddt', tags_ddt(self.ddt))
+        with self.captureOnCommitCallbacks(execute=True):
+            DDTRiga.objects.filter(ddt=self.ddt).update(quantita=7)
+        self.cached('ddt', tags_ddt(self.ddt))
+        self.assertEqual(self.caricamenti, ['ddt', 'ddt', 'ddt'])
+
+    def test_modifiche_non_confermate_non_usano_la_cache(self):
+        self.cached('v', [tag(self.vettore)])
+        with transaction.atomic():
+            self.vettore.save()
+            # Il valore letto prima del commit non va in cache
+            self.assertEqual(self.cached('v', [tag(self.vettore)]), 2)
+            self.assertEqual(self.cached('v', [tag(self.vettore)]), 3)
+            transaction.set_rollback(True)
+        # Annullata la transazione la cache torna valida
+        self.assertEqual(self.cached('v', [tag(self.vettore)]), 1)
+
+    def test_api_autisti_invalidate(self):
+        url = reverse('ddt_app:get_autisti', args=[self.vettore.pk])
+        self.assertEqual(len(self.client.get(url).json()), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.client.get(url).json()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Autista.objects.create(vettore=self.vettore, nome="Luigi", cognome="Verdi")
+        self.assertEqual(len(self.client.get(url).json()), 2)
+
+    def test_api_articoli(self):
+        url = reverse('ddt_app:get_articoli')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Articolo.objects.create(nome="Agnelli", categoria="Ovini", um="capi", prezzo_unitario=2)
+        self.assertEqual(len(self.client.get(url).json()), 2)
+        self.assertEqual(len(self.client.get(url, {'search': 'agn'}).json()), 1)
+
+    def test_api_destinazioni_inesistente_non_in_cache(self):
+        url = reverse('ddt_app:get_destinazioni', args=[self.destinatario.pk + 100])
+        self.assertNotEqual(self.client.get(url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            Destinatario.objects.create(pk=self.destinatario.pk + 100, nome="Nuovo")
+        self.assertEqual(self.client.get(url).json(), [])
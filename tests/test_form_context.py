@@ -0,0 +1,71 @@
+"""
+Test DDT form context endpoint for DDT Application.
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from ddt_app.models import Autista
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin
+
+
+class FormContextTest(DDTPDFTestMixin, TestCase):
+    """Test dati delle select del form DDT in una sola richiesta."""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_ddt_data()
+        self.url = reverse('ddt_app:ddt_form_context')
+        self.params = {
+            'mittente_id': self.mittente.pk,
+            'destinatario_id': self.destinatario.pk,
+            'vettore_id': self.vettore.pk,
+        }
+
+    def test_tutti_gli_elenchi(self):
+        data = self.client.get(self.url, self.params).json()
+        self.assertEqual([sede['id'] for sede in data['sedi']], [self.sede_mittente.pk])
+        self.assertEqual([dest['id'] for dest in data['destinazioni']], [self.destinazione.pk])
+        self.assertEqual([autista['id'] for autista in data['autisti']], [self.autista.pk])
+        self.assertEqual(
+            {targa['id'] for targa in data['targhe']},
+            {self.targa_vettore.pk, self.targa_vettore_2.pk}
+        )
+        self.assertIn('numero', data)
+
+    def test_stessi_dati_delle_api(self):
+        data = self.client.get(self.url, self.params).json()
+        self.assertEqual(data['sedi'], self.client.get(
+            reverse('ddt_app:get_sedi_mittente', args=[self.mittente.pk])).json())
+        self.assertEqual(data['destinazioni'], self.client.get(
+            reverse('ddt_app:get_destinazioni', args=[self.destinatario.pk])).json())
+        self.assertEqual(data['autisti'], self.client.get(
+            reverse('ddt_app:get_autisti', args=[self.vettore.pk])).json())
+        self.assertEqual(data['targhe'], self.client.get(
+            reverse('ddt_app:get_targhe', args=[self.vettore.pk])).json())
+
+    def test_numero_di_query_fisso(self):
+        params = dict(self.params, numero=0)
+        with self.assertNumQueries(4):
+            self.client.get(self.url, params)
+        # Gli elenchi sono poi letti dalla cache
+        with self.assertNumQueries(0):
+            self.client.get(self.url, params)
+        with self.captureOnCommitCallbacks(execute=True):
+            Autista.objects.create(vettore=self.vettore, nome="Luigi", cognome="Verdi")
+        with self.assertNumQueries(2):
+            data = self.client.get(self.url, params).json()
+        self.assertEqual(len(data['autisti']), 2)
+
+    def test_sottoinsieme(self):
+        data = self.client.get(self.url, {'vettore_id': self.vettore.pk, 'numero': 0}).json()
+        self.assertEqual(set(data), {'autisti', 'targhe'})
+        data = self.client.get(self.url).json()
+        self.assertEqual(set(data), {'numero'})
+
+    def test_parametri_non_validi(self):
+        response = self.client.get(self.url, {'vettore_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+        response = self.client.get(self.url, {'vettore_id': self.vettore.pk + 100})
+        self.assertEqual(response.status_code, 404)
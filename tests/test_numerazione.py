@@ -0,0 +1,382 @@
+"""
+Test DDT numbering counters for DDT Application.
+"""
+import json
+import time
+from datetime import date, timedelta
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from ddt_app.forms import DDTFiltroForm
+from ddt_app.models import (
+    ContatoreNumerazioneDDT, DDT, FormatoNumerazioneDDT, Mittente, NumeroLiberoDDT, PrenotazioneNumeriDDT,
+)
+from ddt_app.numerazione_audit import audit_numerazione, has_anomalie
+from ddt_app.utils import release_ddt_numbers, reserve_ddt_numbers
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin, INLINE_PDF_WORKERS
+
+
+class ContatoreNumerazioneTest(DDTPDFTestMixin, TestCase):
+    """Test contatori della numerazione DDT."""
+
+    def setUp(self):
+        self.formato = FormatoNumerazioneDDT.objects.create(
+            formato='aaaa-num', numero_iniziale=1, lunghezza_numero=4, attivo=True
+        )
+
+    def test_genera_numero_consumes_number(self):
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0001")
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0002")
+        self.assertEqual(self.formato.genera_numero(2025, 1), "2025-0001")
+        self.assertEqual(ContatoreNumerazioneDDT.objects.count(), 2)
+
+    def test_anteprima_does_not_consume(self):
+        self.assertEqual(self.formato.anteprima_numero(2024, 1), "2024-0001")
+        self.assertEqual(self.formato.anteprima_numero(2024, 1), "2024-0001")
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0001")
+        self.assertEqual(self.formato.anteprima_numero(2024, 1), "2024-0002")
+
+    def test_single_row_update_per_number(self):
+        self.formato.genera_numero(2024, 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.formato.genera_numero(2024, 1)
+        sql = [query['sql'] for query in queries]
+        self.assertEqual(len([q for q in sql if q.startswith('UPDATE')]), 1)
+        self.assertFalse([q for q in sql if '"ddt_app_ddt"' in q])
+
+    def test_counter_continues_existing_numbers_numerically(self):
+        self.create_ddt_data()
+        self.create_ddt("2024-9999")
+        self.create_ddt("2024-10000")
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-10001")
+
+    def test_registra_numero_manuale(self):
+        self.formato.genera_numero(2024, 1)
+        ContatoreNumerazioneDDT.registra_numero(self.formato, "2024-0050", 2024, 1)
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0051")
+        # Numeri più bassi o di altre serie non spostano il contatore
+        ContatoreNumerazioneDDT.registra_numero(self.formato, "2024-0010", 2024, 1)
+        ContatoreNumerazioneDDT.registra_numero(self.formato, "2023-0100", 2024, 1)
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0052")
+
+    def test_custom_series(self):
+        formato = FormatoNumerazioneDDT.objects.create(
+            formato='custom', formato_personalizzato='{mese:02d}/{anno}-{numero}', lunghezza_numero=3
+        )
+        self.assertEqual(formato.genera_numero(2024, 3), "03/2024-001")
+        self.assertEqual(formato.estrai_progressivo("03/2024-017", 2024, 3), 17)
+        self.assertIsNone(formato.estrai_progressivo("04/2024-017", 2024, 3))
+
+
+@override_settings(DDT_PDF_WORKERS=INLINE_PDF_WORKERS)
+class DDTCreateNumerazioneTest(DDTPDFTestMixin, TestCase):
+    """Test assegnazione del numero alla creazione di un DDT."""
+
+    def setUp(self):
+        self.create_ddt_data()
+        self.formato = FormatoNumerazioneDDT.objects.create(formato='aaaa-num', lunghezza_numero=4, attivo=True)
+
+    def post_ddt(self, numero, numero_proposto, url=None):
+        return self.client.post(url or reverse('ddt_app:ddt_create'), {
+            'numero': numero,
+            'numero_proposto': numero_proposto,
+            'data_documento': '2024-01-15',
+            'data_ritiro': '2024-01-15',
+            'mittente': self.mittente.id,
+            'destinatario': self.destinatario.id,
+            'destinazione_id': self.destinazione.id,
+            'causale_trasporto': self.causale.id,
+            'luogo_destinazione': 'Stalla Nord',
+            'trasporto_mezzo': 'mittente',
+            'vettore': self.vettore.id,
+            'note_centrali': 'Note',
+            'tipo_articoli': 'note',
+            'righe-TOTAL_FORMS': '0',
+            'righe-INITIAL_FORMS': '0',
+        })
+
+    def test_proposed_number_taken_meanwhile(self):
+        # Il numero proposto al primo utente viene usato da un altro DDT
+        self.create_ddt("2024-0002")
+        response = self.post_ddt("2024-0002", "2024-0002")
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(DDT.objects.filter(numero="2024-0003").exists())
+
+    def test_manual_number_kept(self):
+        response = self.post_ddt("2024-0100", "2024-0002")
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(DDT.objects.filter(numero="2024-0100").exists())
+
+    def test_edited_number_registered(self):
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0002")
+        response = self.post_ddt("2024-0100", "", url=reverse('ddt_app:ddt_edit', args=[self.ddt.pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(DDT.objects.get(pk=self.ddt.pk).progressivo, 100)
+        # La numerazione automatica prosegue dal numero assegnato a mano
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0101")
+
+
+class PrenotazioneNumeriTest(DDTPDFTestMixin, TestCase):
+    """Test prenotazione di blocchi di numeri DDT."""
+
+    def setUp(self):
+        self.formato = FormatoNumerazioneDDT.objects.create(
+            formato='aaaa-num', numero_iniziale=1, lunghezza_numero=4, attivo=True
+        )
+
+    def test_reserve_contiguous_block(self):
+        self.formato.genera_numero(2024, 1)
+        prenotazione = reserve_ddt_numbers(3, anno=2024, mese=1)
+        self.assertEqual(prenotazione.numeri, ["2024-0002", "2024-0003", "2024-0004"])
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0005")
+
+    def test_reserve_after_issuance_by_other_mittenti(self):
+        self.create_ddt_data()
+        altro_mittente = Mittente.objects.create(nome="Altro", piva="22222222222", cf="ALTMRA80A01H501U")
+        for numero in ("2024-0002", "2024-0003"):
+            self.create_ddt(numero, mittente=altro_mittente)
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0004")
+        # La serie è unica per tutti i mittenti: il blocco segue i numeri assegnati
+        prenotazione = reserve_ddt_numbers(3, anno=2024, mese=1)
+        self.assertEqual(prenotazione.numeri, ["2024-0005", "2024-0006", "2024-0007"])
+        self.assertFalse(DDT.objects.filter(numero__in=prenotazione.numeri).exists())
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0008")
+
+    def test_reserve_invalid_quantity(self):
+        with self.assertRaises(ValueError):
+            reserve_ddt_numbers(0, anno=2024, mese=1)
+
+    def test_release_tail_returns_to_counter(self):
+        self.create_ddt_data()
+        prenotazione = reserve_ddt_numbers(5, anno=2024, mese=1)
+        self.create_ddt("2024-0002")
+        self.assertEqual(release_ddt_numbers(prenotazione.token), 4)
+        self.assertFalse(PrenotazioneNumeriDDT.objects.exists())
+        # Il numero libero prima di quello usato viene riassegnato per primo
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0003")
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0004")
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0005")
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0006")
+
+    def test_release_middle_block_fills_gaps(self):
+        prenotazione = reserve_ddt_numbers(3, anno=2024, mese=1)
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0004")
+        self.assertEqual(release_ddt_numbers(prenotazione.token), 3)
+        self.assertEqual(NumeroLiberoDDT.objects.count(), 3)
+        self.assertEqual(self.formato.anteprima_numero(2024, 1), "2024-0001")
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0001")
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0002")
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0003")
+        self.assertEqual(self.formato.genera_numero(2024, 1), "2024-0005")
+
+    def test_released_numbers_keep_date_order(self):
+        self.create_ddt_data()
+        prenotazione = reserve_ddt_numbers(3, anno=2024, mese=1)
+        self.create_ddt(self.formato.genera_numero(2024, 1), data_documento=date(2024, 1, 25))
+        self.assertEqual(release_ddt_numbers(prenotazione.token), 3)
+
+        # Un DDT datato dopo il 2024-0005 non riceve un numero precedente
+        numero = self.formato.genera_numero(2024, 1, date(2024, 1, 30))
+        self.assertEqual(numero, "2024-0006")
+        self.create_ddt(numero, data_documento=date(2024, 1, 30))
+        # Uno datato tra il 2024-0001 e il 2024-0005 sì
+        numero = self.formato.genera_numero(2024, 1, date(2024, 1, 20))
+        self.assertEqual(numero, "2024-0002")
+        self.create_ddt(numero, data_documento=date(2024, 1, 20))
+
+        voce = audit_numerazione(2024)['serie'][0]
+        self.assertEqual(voce['date_fuori_ordine'], [])
+        self.assertEqual(voce['buchi'], [{'da': 3, 'a': 4}])
+        self.assertEqual(NumeroLiberoDDT.objects.count(), 2)
+
+    def test_expired_reservations_released(self):
+        scaduta = reserve_ddt_numbers(2, anno=2024, mese=1, durata=timedelta(0))
+        PrenotazioneNumeriDDT.objects.filter(pk=scaduta.pk).update(scadenza=timezone.now() - timedelta(minutes=1))
+        prenotazione = reserve_ddt_numbers(2, anno=2024, mese=1)
+        self.assertEqual(prenotazione.numeri, ["2024-0001", "2024-0002"])
+        self.assertFalse(PrenotazioneNumeriDDT.objects.filter(pk=scaduta.pk).exists())
+
+    def test_release_unknown_token(self):
+        with self.assertRaises(ValueError):
+            release_ddt_numbers('inesistente')
+
+    def test_api_reserve_and_release(self):
+        response = self.client.post(
+            reverse('ddt_app:reserve_ddt_numbers'),
+            json.dumps({'n': 2, 'anno': 2024, 'mese': 1}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['numeri'], ["2024-0001", "2024-0002"])
+
+        response = self.client.post(
+            reverse('ddt_app:release_ddt_numbers'),
+            json.dumps({'token': data['token']}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json(), {'rilasciati': 2})
+
+        response = self.client.post(
+            reverse('ddt_app:reserve_ddt_numbers'), json.dumps({'n': 'molti'}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class NumerazioneAuditBudgetTest(DDTPDFTestMixin, TestCase):
+    """Test durata del controllo della numerazione su molti DDT."""
+
+    DOCUMENTI = 300000
+    BUDGET = 1.0
+
+    def setUp(self):
+        FormatoNumerazioneDDT.objects.create(formato='aaaa-num', lunghezza_numero=4, attivo=True)
+        self.create_ddt_data()
+        # Copie del DDT di prova inserite dal database, con numeri consecutivi
+        # e date crescenti nell'anno
+        colonne = [
+            campo.column for campo in DDT._meta.concrete_fields
+            if campo.column not in ('id', 'numero', 'progressivo', 'data_documento', 'dati_stampa')
+        ]
+        elenco = ', '.join(colonne)
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH RECURSIVE progressivi(n) AS (
+                    SELECT 2 UNION ALL SELECT n + 1 FROM progressivi WHERE n < %s
+                )
+                INSERT INTO ddt_app_ddt (numero, progressivo, data_documento, {elenco})
+                SELECT '2024-' || printf('%%06d', n), n, date('2024-01-01', '+' || (n * 365 / %s) || ' days'), {elenco}
+                FROM progressivi, ddt_app_ddt WHERE ddt_app_ddt.id = %s
+            """, [self.DOCUMENTI, self.DOCUMENTI + 1, self.ddt.pk])
+            cursor.execute("ANALYZE")
+        DDT.objects.filter(pk=self.ddt.pk).update(numero='2024-000001', progressivo=1, data_documento=date(2024, 1, 1))
+
+    def misura(self):
+        """Durata migliore di tre controlli, per non misurare i disturbi della macchina"""
+        durate = []
+        for _ in range(3):
+            inizio = time.perf_counter()
+            report = audit_numerazione(2024)
+            durate.append(time.perf_counter() - inizio)
+        return report, min(durate)
+
+    def test_budget(self):
+        report, durata = self.misura()
+        self.assertEqual(report['serie'][0]['documenti'], self.DOCUMENTI)
+        self.assertFalse(has_anomalie(report))
+        self.assertLess(durata, self.BUDGET)
+
+        DDT.objects.filter(progressivo__range=(1000, 1099)).delete()
+        DDT.objects.filter(progressivo=5000).update(data_documento=date(2024, 1, 1))
+        self.create_ddt("2024-7000", data_documento=date(2024, 1, 5))
+        report, durata = self.misura()
+        voce = report['serie'][0]
+        self.assertEqual(voce['buchi'], [{'da': 1000, 'a': 1099}])
+        self.assertEqual(voce['duplicati'], [{'progressivo': 7000, 'numeri': ["2024-7000", "2024-007000"]}])
+        self.assertEqual([d['numero'] for d in voce['date_fuori_ordine']], ["2024-005000", "2024-7000"])
+        self.assertLess(durata, self.BUDGET)
+
+
+class NumerazioneConcorrenteTest(TransactionTestCase):
+    """Test numerazione con più creatori contemporanei."""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Il database SQLite in memoria non attende i lock tra connessioni")
+
+    def test_no_duplicates(self):
+        out = StringIO()
+        call_command('benchmark_numerazione', '--creatori', '4', '--ddt', '5', stdout=out)
+        self.assertIn('20 DDT creati', out.getvalue())
+        self.assertFalse(DDT.objects.exists())
+
+
+class DDTProgressivoTest(DDTPDFTestMixin, TestCase):
+    """Test serie, anno e progressivo ricavati dal numero del DDT."""
+
+    def setUp(self):
+        FormatoNumerazioneDDT.objects.create(formato='aaaa-num', lunghezza_numero=4, attivo=True)
+        self.create_ddt_data()
+
+    def test_save_sets_progressivo(self):
+        ddt = self.create_ddt("2024-0123")
+        self.assertEqual((ddt.serie, ddt.anno, ddt.progressivo), ("2024-{numero}", 2024, 123))
+
+        ddt.numero = "2024-0124"
+        ddt.save(update_fields=['numero'])
+        ddt.refresh_from_db()
+        self.assertEqual(ddt.progressivo, 124)
+
+    def test_manual_number_outside_series(self):
+        ddt = self.create_ddt("BOLLA/77")
+        self.assertEqual((ddt.serie, ddt.progressivo), ("BOLLA/{numero}", 77))
+        ddt = self.create_ddt("MANUALE")
+        self.assertEqual((ddt.serie, ddt.progressivo), ("", None))
+
+    def test_ordering_numeric_past_padding(self):
+        self.create_ddt("2024-9999")
+        self.create_ddt("2024-10000")
+        numeri = list(DDT.objects.values_list('numero', flat=True))
+        self.assertEqual(numeri[:3], ["2024-10000", "2024-9999", "2024-0001"])
+
+    def test_filter_numeric_range(self):
+        for numero in ("2024-0120", "2024-0340", "2024-0341", "2024-1000"):
+            self.create_ddt(numero)
+        form = DDTFiltroForm({'anno': 2024, 'numero_da': 120, 'numero_a': 340})
+        self.assertTrue(form.is_valid())
+        numeri = set(form.filtra(DDT.objects.all()).values_list('numero', flat=True))
+        self.assertEqual(numeri, {"2024-0120", "2024-0340"})
+
+
+class NumerazioneAuditTest(DDTPDFTestMixin, TestCase):
+    """Test controllo di buchi, duplicati e date fuori ordine."""
+
+    def setUp(self):
+        FormatoNumerazioneDDT.objects.create(formato='aaaa-num', lunghezza_numero=4, attivo=True)
+        self.create_ddt_data()
+
+    def test_correct_numbering(self):
+        self.create_ddt("2024-0002", data_documento=date(2024, 1, 16))
+        report = audit_numerazione(2024)
+        self.assertFalse(has_anomalie(report))
+        self.assertEqual(report['serie'][0]['documenti'], 2)
+
+    def test_detects_anomalies(self):
+        self.create_ddt("2024-0002", data_documento=date(2024, 1, 20))
+        self.create_ddt("2024-0003", data_documento=date(2024, 1, 18))
+        self.create_ddt("2024-0007", data_documento=date(2024, 1, 21))
+        self.create_ddt("2024-7", data_documento=date(2024, 1, 21))
+        self.create_ddt("2024-0009", data_documento=date(2024, 1, 22))
+        self.create_ddt("2023-0005", data_documento=date(2023, 12, 1))
+
+        # Riepilogo, confronto con i precedenti, duplicati e numeri dei soli DDT anomali
+        with self.assertNumQueries(4):
+            report = audit_numerazione(2024)
+        self.assertEqual(len(report['serie']), 1)
+        voce = report['serie'][0]
+        self.assertEqual((voce['primo'], voce['ultimo']), (1, 9))
+        self.assertEqual(voce['buchi'], [{'da': 4, 'a': 6}, {'da': 8, 'a': 8}])
+        self.assertEqual(voce['numeri_mancanti'], 4)
+        self.assertEqual(voce['duplicati'], [{'progressivo': 7, 'numeri': ["2024-0007", "2024-7"]}])
+        self.assertEqual([d['numero'] for d in voce['date_fuori_ordine']], ["2024-0003"])
+
+    def test_command(self):
+        self.create_ddt("2024-0003")
+        out = StringIO()
+        call_command('audit_numerazione', '--anno', '2024', stdout=out)
+        self.assertIn('1 numeri mancanti: 2', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('audit_numerazione', '--anno', '2024', '--errore', stdout=StringIO())
+
+    def test_admin_view(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        self.create_ddt("2024-0003")
+        response = self.client.get(reverse('admin:ddt_app_ddt_audit_numerazione'), {'anno': 2024})
+        self.assertContains(response, 'Numeri mancanti (1)')
@@ -0,0 +1,129 @@
+"""
+Test keyset pagination for DDT Application.
+"""
+from datetime import date, timedelta
+from django.test import TestCase
+from django.urls import reverse
+from ddt_app.models import DDT, DDTRiga, Mittente
+from ddt_app.paginazione import CONTEGGIO_ESATTO, CONTEGGIO_STIMATO, KeysetPaginator
+from ddt_app.ricerca import cerca_ddt
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin
+
+
+class KeysetPaginatorTest(DDTPDFTestMixin, TestCase):
+    """Test paginazione a cursore."""
+
+    def setUp(self):
+        self.create_ddt_data()
+        # Tre DDT per giorno: l'ordinamento deve proseguire anche a parità di data
+        for i in range(2, 26):
+            self.create_ddt(f"2024-{i:04d}", data_documento=date(2024, 2, 1) + timedelta(days=i // 3))
+        self.ordinati = list(DDT.objects.order_by('-data_documento', '-progressivo', '-id'))
+
+    def paginator(self, per_page=7, **kwargs):
+        return KeysetPaginator(DDT.objects.order_by('-data_documento', '-progressivo', '-id'), per_page, **kwargs)
+
+    def test_pagine_successive_e_precedenti(self):
+        paginator = self.paginator()
+        pagine = [paginator.get_page()]
+        while pagine[-1].has_next():
+            pagine.append(paginator.get_page(pagine[-1].next_cursor))
+        self.assertEqual([len(pagina) for pagina in pagine], [7, 7, 7, 4])
+        self.assertEqual([ddt for pagina in pagine for ddt in pagina], self.ordinati)
+        self.assertFalse(pagine[0].has_previous())
+        self.assertTrue(pagine[-1].has_previous())
+
+        indietro = paginator.get_page(pagine[2].previous_cursor)
+        self.assertEqual(list(indietro), list(pagine[1]))
+        self.assertTrue(indietro.has_next())
+        prima = paginator.get_page(indietro.previous_cursor)
+        self.assertEqual(list(prima), list(pagine[0]))
+        self.assertFalse(prima.has_previous())
+
+    def test_progressivo_null(self):
+        # Numeri senza cifre finali: NULL è ordinato come il progressivo più piccolo
+        data = self.ordinati[10].data_documento
+        senza_numero = [self.create_ddt(numero, data_documento=data) for numero in ("BOZZA-A", "BOZZA-B")]
+        self.assertIsNone(senza_numero[0].progressivo)
+        attesi = [ddt for ddt in self.ordinati if ddt.data_documento > data]
+        attesi += [ddt for ddt in self.ordinati if ddt.data_documento == data]
+        attesi += senza_numero[::-1]
+        attesi += [ddt for ddt in self.ordinati if ddt.data_documento < data]
+        for per_page in (1, 2, 3, 7):
+            paginator = self.paginator(per_page)
+            pagine = [paginator.get_page()]
+            while pagine[-1].has_next():
+                pagine.append(paginator.get_page(pagine[-1].next_cursor))
+            self.assertEqual([ddt for pagina in pagine for ddt in pagina], attesi)
+            # A ritroso dall'ultima pagina
+            pagina = paginator.get_page(paginator.last_cursor)
+            indietro = list(pagina)
+            while pagina.has_previous():
+                pagina = paginator.get_page(pagina.previous_cursor)
+                indietro = list(pagina) + indietro
+            self.assertEqual(indietro, attesi)
+
+    def test_ultima_pagina(self):
+        paginator = self.paginator()
+        ultima = paginator.get_page(paginator.last_cursor)
+        self.assertEqual(list(ultima), self.ordinati[-7:])
+        self.assertFalse(ultima.has_next())
+        self.assertEqual(list(paginator.get_page(ultima.previous_cursor)), self.ordinati[-14:-7])
+
+    def test_cursore_non_valido(self):
+        pagina = self.paginator().get_page('non-valido')
+        self.assertEqual(list(pagina), self.ordinati[:7])
+        self.assertFalse(pagina.has_previous())
+
+    def test_query_per_pagina(self):
+        paginator = self.paginator()
+        cursore = paginator.get_page().next_cursor
+        with self.assertNumQueries(1):
+            pagina = paginator.get_page(cursore)
+            self.assertEqual(list(pagina), self.ordinati[7:14])
+
+    def test_conteggio(self):
+        self.assertIsNone(self.paginator().count)
+        self.assertEqual(self.paginator(conteggio=CONTEGGIO_ESATTO).count, 25)
+        stimato = self.paginator(conteggio=CONTEGGIO_STIMATO)
+        # Senza PostgreSQL la stima non è disponibile e il conteggio è esatto
+        self.assertFalse(stimato.stimato)
+        self.assertEqual(stimato.count, 25)
+
+    def test_ordinamento_per_pertinenza(self):
+        DDTRiga.objects.create(ddt=self.ordinati[5], articolo=self.articolo, quantita=1, descrizione="Vitelli", ordine=2)
+        queryset = cerca_ddt(DDT.objects.order_by('-data_documento', '-progressivo', '-id'), 'vitelli')
+        attesi = list(queryset)
+        self.assertEqual(attesi[0], self.ordinati[5])
+        paginator = KeysetPaginator(queryset, 4)
+        pagine = [paginator.get_page()]
+        while pagine[-1].has_next():
+            pagine.append(paginator.get_page(pagine[-1].next_cursor))
+        self.assertEqual([ddt for pagina in pagine for ddt in pagina], attesi)
+
+    def test_home(self):
+        url = reverse('ddt_app:home')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        pagina = response.context['ddt_list']
+        self.assertEqual(list(pagina), self.ordinati[:20])
+        self.assertContains(response, f'?cursore={pagina.next_cursor}')
+        self.assertContains(response, '20 di 25')
+
+        response = self.client.get(url, {'cursore': pagina.next_cursor})
+        self.assertEqual(list(response.context['ddt_list']), self.ordinati[20:])
+
+    def test_home_ricerca(self):
+        response = self.client.get(reverse('ddt_app:home'), {'search': '2024-001'})
+        pagina = response.context['ddt_list']
+        self.assertEqual(len(pagina), 10)
+        self.assertFalse(pagina.has_other_pages())
+
+    def test_mittente_list(self):
+        for i in range(12):
+            Mittente.objects.create(nome="Mittente %02d" % i, piva="%011d" % i, cf="RSSMRA80A01H501U")
+        url = reverse('ddt_app:mittente_list')
+        prima = self.client.get(url).context['mittenti']
+        seconda = self.client.get(url, {'cursore': prima.next_cursor}).context['mittenti']
+        nomi = [mittente.nome for mittente in [*prima, *seconda]]
+        self.assertEqual(nomi, sorted(Mittente.objects.values_list('nome', flat=True)))
@@ -0,0 +1,79 @@
+"""
+Test PDF generation benchmark for DDT Application.
+"""
+import json
+import os
+import tempfile
+from io import BytesIO, StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+from reportlab.pdfgen import canvas
+from ddt_app.models import DDT
+from ddt_app.pdf_benchmark import SHAPES, compare_with_baseline, count_pdf_operators, percentile
+
+
+class PDFBenchmarkCommandTest(TestCase):
+    """Test comando benchmark_pdf."""
+
+    def run_command(self, *args):
+        call_command('benchmark_pdf', '--iterazioni', '1', '--batch', '3', *args, stdout=StringIO())
+
+    def test_writes_results(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'risultati.json')
+            self.run_command('--output', output)
+            with open(output, encoding='utf-8') as f:
+                results = json.load(f)
+
+        self.assertEqual(list(results['singoli']), list(SHAPES))
+        for metrics in results['singoli'].values():
+            # Numero di query indipendente dalla forma del DDT
+            self.assertEqual(metrics['query'], 1)
+            self.assertGreater(metrics['operatori'], 0)
+        self.assertGreater(results['singoli']['righe_10']['operatori'], results['singoli']['righe_0']['operatori'])
+        self.assertGreater(results['singoli']['logo_grande']['byte'], results['singoli']['senza_logo']['byte'])
+        self.assertEqual(results['batch']['3']['documenti'], 3)
+        # I dati sintetici non restano nel database
+        self.assertFalse(DDT.objects.exists())
+
+    def test_regression_against_baseline(self):
+        baseline = {'singoli': {'base': {'query': 0}}}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'baseline.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(baseline, f)
+            with self.assertRaisesMessage(CommandError, 'singoli/base query'):
+                self.run_command('--baseline', path)
+
+
+class PDFBenchmarkHelpersTest(SimpleTestCase):
+    """Test funzioni di misura del benchmark."""
+
+    def draw(self, page_compression):
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pageCompression=page_compression)
+        c.setFont("Times-Roman", 10)
+        c.drawString(10, 10, "DDT (prova)")
+        c.rect(10, 20, 100, 50)
+        c.save()
+        return buffer.getvalue()
+
+    def test_count_operators_ignores_compression(self):
+        self.assertGreater(count_pdf_operators(self.draw(0)), 0)
+        self.assertEqual(count_pdf_operators(self.draw(0)), count_pdf_operators(self.draw(1)))
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_compare_with_baseline(self):
+        baseline = {'singoli': {'base': {'p50_ms': 10, 'byte': 1000, 'query': 2}}}
+        results = {'singoli': {'base': {'p50_ms': 14, 'byte': 1010, 'query': 2}}}
+        self.assertEqual(compare_with_baseline(results, baseline, tolerance=0.5), [])
+
+        results['singoli']['base'].update(p50_ms=16, byte=1100, query=3)
+        regressions = compare_with_baseline(results, baseline, tolerance=0.5)
+        self.assertEqual(len(regressions), 3)
@@ -0,0 +1,100 @@
+"""
+Test PDF cache for DDT Application.
+"""
+import os
+import tempfile
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from ddt_app import pdf_cache, pdf_generator_advanced
+from ddt_app.models import DDTRiga
+from ddt_app.pdf_cache import LocalDiskPDFStore, ddt_pdf_cache_key, get_ddt_pdf
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin, INLINE_PDF_WORKERS, MEMORY_PDF_CACHE
+
+
+@override_settings(DDT_PDF_CACHE=MEMORY_PDF_CACHE, DDT_PDF_WORKERS=INLINE_PDF_WORKERS)
+class DDTPDFCacheKeyTest(DDTPDFTestMixin, TestCase):
+    """Test cache key derivation."""
+
+    def setUp(self):
+        self.create_ddt_data()
+        cache.clear()
+
+    def test_key_is_stable(self):
+        self.assertEqual(ddt_pdf_cache_key(self.ddt), ddt_pdf_cache_key(self.ddt.id))
+
+    def test_key_changes_with_ddt(self):
+        key = ddt_pdf_cache_key(self.ddt)
+        self.ddt.annotazioni = "Nuove annotazioni"
+        self.ddt.save()
+        self.assertNotEqual(ddt_pdf_cache_key(self.ddt), key)
+
+    def test_key_ignores_later_changes_of_related_entities(self):
+        # Il DDT emesso conserva le anagrafiche stampate: le modifiche successive
+        # non cambiano il PDF, finché il DDT non viene salvato di nuovo
+        key = ddt_pdf_cache_key(self.ddt)
+        self.vettore.nome = "Nuovo Vettore"
+        self.articolo.nome = "Manzette"
+        for entity in (self.vettore, self.destinazione, self.autista, self.targa_vettore_2,
+                       self.sede_mittente, self.causale, self.articolo):
+            entity.save()
+            self.assertEqual(ddt_pdf_cache_key(self.ddt), key, entity)
+        self.ddt.save()
+        self.assertNotEqual(ddt_pdf_cache_key(self.ddt), key)
+
+    def test_key_changes_with_righe(self):
+        key = ddt_pdf_cache_key(self.ddt)
+        DDTRiga.objects.filter(ddt=self.ddt).update(quantita=7)
+        self.assertNotEqual(ddt_pdf_cache_key(self.ddt), key)
+
+    def test_key_changes_with_generator_version(self):
+        key = ddt_pdf_cache_key(self.ddt)
+        with mock.patch.object(pdf_cache, 'PDF_GENERATOR_VERSION', 'test'):
+            self.assertNotEqual(ddt_pdf_cache_key(self.ddt), key)
+
+    def test_repeat_download_skips_render(self):
+        with mock.patch.object(pdf_generator_advanced, 'render_ddt_pdf', wraps=pdf_generator_advanced.render_ddt_pdf) as render:
+            first = get_ddt_pdf(self.ddt)
+            second = get_ddt_pdf(self.ddt)
+            response = self.client.get(reverse('ddt_app:ddt_pdf', args=[self.ddt.id]))
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(response.content, first)
+
+
+class LocalDiskPDFStoreTest(TestCase):
+    """Test local disk store with LRU eviction."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_set_get_delete(self):
+        store = LocalDiskPDFStore(self.tmp_dir.name)
+        self.assertIsNone(store.get('a'))
+        store.set('a', b'%PDF-a')
+        self.assertEqual(store.get('a'), b'%PDF-a')
+        store.delete('a')
+        self.assertIsNone(store.get('a'))
+
+    def test_evicts_least_recently_used(self):
+        store = LocalDiskPDFStore(self.tmp_dir.name, max_size=25)
+        store.set('a', b'a' * 10)
+        store.set('b', b'b' * 10)
+        os.utime(os.path.join(self.tmp_dir.name, 'a.pdf'), ns=(1, 1))
+        os.utime(os.path.join(self.tmp_dir.name, 'b.pdf'), ns=(2, 2))
+        store.set('c', b'c' * 10)
+        self.assertIsNone(store.get('a'))
+        self.assertEqual(store.get('b'), b'b' * 10)
+        self.assertEqual(store.get('c'), b'c' * 10)
+
+    def test_configured_from_settings(self):
+        config = {
+            'BACKEND': 'ddt_app.pdf_cache.LocalDiskPDFStore',
+            'OPTIONS': {'location': self.tmp_dir.name, 'max_size': 1024},
+        }
+        with override_settings(DDT_PDF_CACHE=config):
+            store = pdf_cache.get_pdf_store()
+            self.assertIsInstance(store, LocalDiskPDFStore)
+            self.assertEqual(store.max_size, 1024)
@@ -0,0 +1,124 @@
+"""
+Test dati di stampa dei DDT per la generazione PDF.
+"""
+import dataclasses
+import pickle
+from datetime import date
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from ddt_app.models import DDT, DDTRiga
+from ddt_app.pdf_data import (
+    DATI_STAMPA_VERSION, DDTData, ddt_data_from_instance, iter_ddt_data, load_ddt_data,
+    righe_luogo_destinazione, with_render_relations,
+)
+from ddt_app.pdf_generator_advanced import render_ddt_pdf
+
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin, INLINE_PDF_WORKERS, MEMORY_PDF_CACHE
+
+
+@override_settings(DDT_PDF_CACHE=MEMORY_PDF_CACHE, DDT_PDF_WORKERS=INLINE_PDF_WORKERS)
+class DDTDataTest(DDTPDFTestMixin, TestCase):
+    """Test caricamento dei dati di stampa."""
+
+    def setUp(self):
+        self.create_ddt_data()
+
+    def test_load_ddt_data(self):
+        # Solo i dati di stampa salvati nel DDT
+        with self.assertNumQueries(1):
+            data = load_ddt_data(self.ddt.id)
+        self.assertEqual(data.numero, "2024-0001")
+        self.assertEqual(data.sede_mittente.mittente.nome, "Test Mittente")
+        self.assertEqual(data.destinazione.destinatario.nome, "Test Destinatario")
+        self.assertEqual((data.targa_vettore, data.targa_vettore_2), ("AB123CD", "EF456GH"))
+        self.assertEqual(data.righe[0].articolo_um, "CAPI")
+        self.assertFalse(data.usa_note_centrali)
+
+    def test_load_missing_ddt(self):
+        with self.assertRaises(ValueError):
+            load_ddt_data(999999)
+
+    def test_data_is_immutable_and_picklable(self):
+        data = load_ddt_data(self.ddt)
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            data.numero = "altro"
+        self.assertEqual(pickle.loads(pickle.dumps(data)), data)
+
+    def test_render_from_data_runs_no_queries(self):
+        data = load_ddt_data(self.ddt)
+        with self.assertNumQueries(0):
+            pdf = render_ddt_pdf(data)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+
+    def test_note_centrali_without_righe(self):
+        ddt = self.create_ddt("2024-0002", note_centrali="Note")
+        self.assertTrue(load_ddt_data(ddt).usa_note_centrali)
+
+    def test_iter_ddt_data_in_chunks(self):
+        for numero in ("2024-0002", "2024-0003", "2024-0004"):
+            ddt = self.create_ddt(numero, data_ritiro=date(2024, 1, 16))
+            DDTRiga.objects.create(ddt=ddt, articolo=self.articolo, quantita=1, ordine=1)
+        # Una sola query per i dati di stampa di tutti i DDT
+        with self.assertNumQueries(1):
+            data = list(iter_ddt_data(DDT.objects.order_by('numero'), chunk_size=2))
+        self.assertEqual([d.numero for d in data], ["2024-0001", "2024-0002", "2024-0003", "2024-0004"])
+        self.assertTrue(all(isinstance(d, DDTData) for d in data))
+
+
+class DatiStampaDDTTest(DDTPDFTestMixin, TestCase):
+    """Test dati di stampa salvati nel DDT al momento dell'emissione."""
+
+    def setUp(self):
+        self.create_ddt_data()
+
+    def test_salvati_con_il_ddt(self):
+        dati = DDT.objects.get(pk=self.ddt.pk).dati_stampa
+        self.assertEqual(dati['versione'], DATI_STAMPA_VERSION)
+        self.assertEqual(dati['vettore']['nome'], "Test Vettore")
+        self.assertEqual(dati['luogo_righe'], ["Stalla Nord", "Codice Stalla: 999XY000", "Via Campi, 1"])
+        self.assertEqual(dati['righe'][0]['prezzo_unitario'], "10.50")
+        self.assertEqual(load_ddt_data(self.ddt), ddt_data_from_instance(
+            with_render_relations(DDT.objects.all()).get(pk=self.ddt.pk)
+        ))
+
+    def test_anagrafiche_modificate_dopo_l_emissione(self):
+        self.vettore.nome = "Nuovo Vettore"
+        self.vettore.save()
+        self.articolo.nome = "Manzette"
+        self.articolo.save()
+        data = load_ddt_data(self.ddt)
+        self.assertEqual(data.vettore.nome, "Test Vettore")
+        self.assertEqual(data.righe[0].articolo_nome, "Vitelli")
+        # Salvare di nuovo il DDT riemette il documento con i dati attuali
+        self.ddt.save()
+        self.assertEqual(load_ddt_data(self.ddt).vettore.nome, "Nuovo Vettore")
+
+    def test_righe_aggiornano_i_dati(self):
+        riga = DDTRiga.objects.create(ddt=self.ddt, articolo=self.articolo, quantita=2, descrizione="manze", ordine=2)
+        self.assertEqual([r.descrizione for r in load_ddt_data(self.ddt).righe], ["Razza Frisona", "Manze"])
+        DDTRiga.objects.filter(pk=riga.pk).update(descrizione="giovenche")
+        self.assertEqual(load_ddt_data(self.ddt).righe[1].descrizione, "Giovenche")
+        riga.delete()
+        self.assertEqual(len(load_ddt_data(self.ddt).righe), 1)
+
+    def test_ddt_senza_dati_salvati(self):
+        DDT.objects.filter(pk=self.ddt.pk).update(dati_stampa=None)
+        with self.assertNumQueries(3):
+            data = load_ddt_data(self.ddt)
+        self.assertEqual(data.vettore.nome, "Test Vettore")
+        self.assertEqual([d.id for d in iter_ddt_data(DDT.objects.all())], [self.ddt.pk])
+
+        out = StringIO()
+        call_command('aggiorna_dati_stampa_ddt', stdout=out)
+        self.assertIn('Dati di stampa di 1 DDT aggiornati', out.getvalue())
+        with self.assertNumQueries(1):
+            self.assertEqual(load_ddt_data(self.ddt), data)
+
+    def test_righe_luogo_destinazione(self):
+        self.assertEqual(
+            righe_luogo_destinazione("stalla sud Codice Stalla: 123ab Via dei campi, 2"),
+            ("Stalla Sud", "Codice Stalla: 123AB", "Via Dei Campi, 2")
+        )
+        self.assertEqual(righe_luogo_destinazione("roma\nroma\n"), ("Roma",))
+        self.assertEqual(righe_luogo_destinazione(""), ())
@@ -0,0 +1,70 @@
+"""
+Test bulk PDF export for DDT Application.
+"""
+import os
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from ddt_app.pdf_export import stream_ddt_zip
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin, INLINE_PDF_WORKERS, MEMORY_PDF_CACHE
+
+
+@override_settings(DDT_PDF_CACHE=MEMORY_PDF_CACHE, DDT_PDF_WORKERS=INLINE_PDF_WORKERS)
+class DDTZipExportTest(DDTPDFTestMixin, TestCase):
+    """Test ZIP export of many DDT."""
+
+    def setUp(self):
+        self.create_ddt_data()
+        self.ddt_2 = self.create_ddt("2024-0002")
+        self.altro_vettore = self.create_ddt(
+            "2024-0003", vettore=self.vettore.__class__.objects.create(
+                nome="Altro Vettore", indirizzo="Via Altra, 1", cap="00100", citta="Roma",
+                provincia="RM", piva="22222222222", cf="ALTMRA80A01H501U",
+                telefono="+39 06 2222222", email="altro@example.com"
+            ), autista=None, targa_vettore=None, targa_vettore_2=None
+        )
+
+    def test_stream_zip_contains_one_pdf_per_ddt(self):
+        stats = {}
+        chunks = list(stream_ddt_zip([self.ddt.id, self.ddt_2.id], stats=stats))
+        self.assertGreater(len(chunks), 2)
+        with zipfile.ZipFile(BytesIO(b''.join(chunks))) as archive:
+            self.assertEqual(archive.namelist(), ['DDT_2024-0001.pdf', 'DDT_2024-0002.pdf'])
+            self.assertTrue(archive.read('DDT_2024-0001.pdf').startswith(b'%PDF'))
+        self.assertEqual(stats['documenti'], 2)
+        self.assertGreater(stats['documenti_al_secondo'], 0)
+
+    def test_export_view_filters_by_vettore(self):
+        response = self.client.get(reverse('ddt_app:ddt_export_zip'), {'vettore': self.vettore.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertEqual(sorted(archive.namelist()), ['DDT_2024-0001.pdf', 'DDT_2024-0002.pdf'])
+
+    def test_export_view_filters_by_ids(self):
+        response = self.client.get(reverse('ddt_app:ddt_export_zip'), {'ids': f'{self.ddt_2.id}'})
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertEqual(archive.namelist(), ['DDT_2024-0002.pdf'])
+
+    def test_export_view_invalid_filter_redirects(self):
+        response = self.client.get(reverse('ddt_app:ddt_export_zip'), {'ids': 'abc'})
+        self.assertRedirects(response, reverse('ddt_app:home'))
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, 'ddt.zip')
+            out = StringIO()
+            call_command('export_ddt_pdfs', output, '--data-da', '2024-01-01',
+                         '--data-a', '2024-01-31', '--workers', '0', stdout=out)
+            with zipfile.ZipFile(output) as archive:
+                self.assertEqual(len(archive.namelist()), 3)
+        self.assertIn('documenti/s', out.getvalue())
+
+    def test_export_command_invalid_range(self):
+        with self.assertRaises(CommandError):
+            call_command('export_ddt_pdfs', 'out.zip', '--data-da', '2024-02-01',
+                         '--data-a', '2024-01-01', stdout=StringIO())
@@ -0,0 +1,263 @@
+"""
+Test advanced PDF generator for DDT Application.
+"""
+import os
+import tempfile
+from datetime import date
+from io import BytesIO
+from django.test import TestCase, override_settings
+from PIL import Image
+from django.urls import reverse
+from ddt_app.models import (
+    Mittente, SedeMittente, Destinatario, Destinazione, Vettore, Autista,
+    TargaVettore, Articolo, DDT, DDTRiga, CausaleTrasporto
+)
+from ddt_app.pdf_data import aggiorna_dati_stampa
+from ddt_app.pdf_generator_advanced import (
+    clear_logo_cache, create_ddt_batch_pdf, create_ddt_pdf, get_logo_image, render_ddt_pdf
+)
+
+
+class DDTPDFTestMixin:
+    """Dati di test condivisi dai test PDF."""
+
+    def create_ddt_data(self):
+        self.mittente = Mittente.objects.create(
+            nome="Test Mittente",
+            piva="12345678901",
+            cf="RSSMRA80A01H501U",
+            telefono="+39 06 1234567",
+            email="test@example.com"
+        )
+        self.sede_mittente = SedeMittente.objects.create(
+            mittente=self.mittente,
+            nome="Sede Principale",
+            indirizzo="Via Roma, 123",
+            cap="00100",
+            citta="Roma",
+            provincia="RM",
+            codice_stalla="123AB456",
+            sede_legale=True
+        )
+        self.destinatario = Destinatario.objects.create(
+            nome="Test Destinatario",
+            indirizzo="Via Test, 123",
+            cap="00100",
+            citta="Roma",
+            provincia="RM",
+            piva="98765432109",
+            cf="BNCMRA80A01H501U",
+            telefono="+39 06 7654321",
+            email="dest@example.com"
+        )
+        self.destinazione = Destinazione.objects.create(
+            destinatario=self.destinatario,
+            nome="Stalla Nord",
+            indirizzo="Via Campi, 1",
+            codice_stalla="999XY000"
+        )
+        self.vettore = Vettore.objects.create(
+            nome="Test Vettore",
+            indirizzo="Via Vettore, 789",
+            cap="00100",
+            citta="Roma",
+            provincia="RM",
+            piva="11111111111",
+            cf="VTTMRA80A01H501U",
+            telefono="+39 06 1111111",
+            email="vettore@example.com",
+            licenza_bdn="BDN-1"
+        )
+        self.autista = Autista.objects.create(
+            vettore=self.vettore,
+            nome="Mario",
+            cognome="Rossi",
+            patente="B123456789"
+        )
+        self.targa_vettore = TargaVettore.objects.create(
+            vettore=self.vettore,
+            targa="AB123CD",
+            tipo_veicolo="Motrice"
+        )
+        self.targa_vettore_2 = TargaVettore.objects.create(
+            vettore=self.vettore,
+            targa="EF456GH",
+            tipo_veicolo="Rimorchio"
+        )
+        self.causale = CausaleTrasporto.objects.create(
+            codice="VEN",
+            descrizione="Vendita"
+        )
+        self.articolo = Articolo.objects.create(
+            nome="Vitelli",
+            categoria="Bovini",
+            um="capi",
+            prezzo_unitario=10.50
+        )
+        self.ddt = self.create_ddt("2024-0001")
+        DDTRiga.objects.create(
+            ddt=self.ddt,
+            articolo=self.articolo,
+            quantita=5,
+            descrizione="Razza frisona",
+            ordine=1
+        )
+
+    def create_ddt(self, numero, **kwargs):
+        data = {
+            'numero': numero,
+            'data_documento': date(2024, 1, 15),
+            'mittente': self.mittente,
+            'sede_mittente': self.sede_mittente,
+            'destinatario': self.destinatario,
+            'destinazione': self.destinazione,
+            'causale_trasporto': self.causale,
+            'luogo_destinazione': "Stalla Nord\nCodice Stalla: 999XY000\nVia Campi, 1",
+            'trasporto_mezzo': "vettore",
+            'data_ritiro': date(2024, 1, 15),
+            'vettore': self.vettore,
+            'autista': self.autista,
+            'targa_vettore': self.targa_vettore,
+            'targa_vettore_2': self.targa_vettore_2,
+            'annotazioni': "Test annotazioni",
+        }
+        data.update(kwargs)
+        return DDT.objects.create(**data)
+
+
+MEMORY_PDF_CACHE = {'BACKEND': 'ddt_app.pdf_cache.DjangoCachePDFStore', 'OPTIONS': {}}
+INLINE_PDF_WORKERS = {'WORKERS': 0}
+
+
+@override_settings(DDT_PDF_CACHE=MEMORY_PDF_CACHE, DDT_PDF_WORKERS=INLINE_PDF_WORKERS)
+class RenderDDTPDFTest(DDTPDFTestMixin, TestCase):
+    """Test rendering PDF in memoria."""
+
+    def setUp(self):
+        self.create_ddt_data()
+
+    def test_render_returns_bytes(self):
+        pdf = render_ddt_pdf(self.ddt)
+        self.assertIsInstance(pdf, bytes)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+
+    def test_render_accepts_id(self):
+        pdf = render_ddt_pdf(self.ddt.id)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+
+    def test_render_into_stream(self):
+        stream = BytesIO()
+        result = render_ddt_pdf(self.ddt, stream)
+        self.assertIs(result, stream)
+        self.assertTrue(stream.getvalue().startswith(b'%PDF'))
+
+    def test_render_missing_ddt(self):
+        with self.assertRaises(ValueError):
+            render_ddt_pdf(999999)
+
+    def test_create_ddt_pdf_writes_output_path(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = os.path.join(tmp_dir, 'ddt.pdf')
+            self.assertEqual(create_ddt_pdf(self.ddt.id, output_path), output_path)
+            with open(output_path, 'rb') as pdf_file:
+                self.assertTrue(pdf_file.read().startswith(b'%PDF'))
+
+    def test_ddt_pdf_view_leaves_no_files(self):
+        files_before = set(os.listdir(os.getcwd()))
+        response = self.client.get(reverse('ddt_app:ddt_pdf', args=[self.ddt.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('DDT_2024-0001.pdf', response['Content-Disposition'])
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertEqual(set(os.listdir(os.getcwd())), files_before)
+
+
+@override_settings(DDT_PDF_CACHE=MEMORY_PDF_CACHE, DDT_PDF_WORKERS=INLINE_PDF_WORKERS)
+class BatchDDTPDFTest(DDTPDFTestMixin, TestCase):
+    """Test stampa cumulativa di più DDT in un unico PDF."""
+
+    def setUp(self):
+        self.create_ddt_data()
+        for numero in ("2024-0002", "2024-0003"):
+            ddt = self.create_ddt(numero, data_ritiro=date(2024, 1, 16))
+            DDTRiga.objects.create(ddt=ddt, articolo=self.articolo, quantita=1, ordine=1)
+        self.create_ddt("2024-0004", data_ritiro=date(2024, 1, 17), note_centrali="Note")
+
+    def test_one_page_per_ddt(self):
+        pdf = create_ddt_batch_pdf(DDT.objects.all())
+        self.assertEqual(pdf.count(b'/Type /Page\n'), 4)
+
+    def test_fixed_query_count(self):
+        with self.assertNumQueries(1):
+            create_ddt_batch_pdf(DDT.objects.all())
+
+    def test_empty_queryset(self):
+        with self.assertRaises(ValueError):
+            create_ddt_batch_pdf(DDT.objects.none())
+
+    def test_batch_view_filters_by_data_ritiro(self):
+        response = self.client.get(reverse('ddt_app:ddt_batch_pdf'), {
+            'campo_data': 'data_ritiro', 'data_da': '2024-01-16', 'data_a': '2024-01-16',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('DDT_20240116_20240116.pdf', response['Content-Disposition'])
+        self.assertEqual(response.content.count(b'/Type /Page\n'), 2)
+
+    def test_batch_view_limited(self):
+        with override_settings(DDT_PDF_WORKERS=dict(INLINE_PDF_WORKERS, MAX_BATCH=3)):
+            response = self.client.get(reverse('ddt_app:ddt_batch_pdf'), {'data_da': '2024-01-01'}, follow=True)
+        self.assertRedirects(response, reverse('ddt_app:home'))
+        self.assertIn('Troppi DDT per una stampa cumulativa (4, massimo 3)', str(list(response.context['messages'])[0]))
+
+    def test_batch_view_without_results_redirects(self):
+        response = self.client.get(reverse('ddt_app:ddt_batch_pdf'), {'data_da': '2030-01-01'})
+        self.assertRedirects(response, reverse('ddt_app:home'))
+
+    def test_logo_embedded_once(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            os.makedirs(os.path.join(media_root, 'logos'))
+            Image.new('RGB', (600, 600), 'red').save(os.path.join(media_root, 'logos', 'logo.png'))
+            Mittente.objects.filter(pk=self.mittente.pk).update(logo='logos/logo.png')
+            aggiorna_dati_stampa(DDT.objects.values_list('id', flat=True))
+            pdf = create_ddt_batch_pdf(DDT.objects.all())
+        self.assertEqual(pdf.count(b'/Subtype /Image'), 1)
+
+    def test_page_skeleton_shared_by_all_pages(self):
+        pdf = create_ddt_batch_pdf(DDT.objects.all())
+        self.assertEqual(pdf.count(b'/Subtype /Form'), 1)
+        self.assertEqual(pdf.count(b'/FormXob.DDTSkeleton '), 4)
+
+
+class LogoCacheTest(TestCase):
+    """Test cache dei loghi decodificati."""
+
+    def setUp(self):
+        clear_logo_cache()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.logo_path = os.path.join(self.tmp_dir.name, 'logo.png')
+        Image.new('RGBA', (2000, 1000), 'red').save(self.logo_path)
+
+    def test_logo_downscaled_to_print_size(self):
+        width, height = get_logo_image(self.logo_path).getSize()
+        self.assertLessEqual(max(width, height), 300)
+        self.assertAlmostEqual(width / height, 2, places=1)
+
+    def test_logo_decoded_once(self):
+        self.assertIs(get_logo_image(self.logo_path), get_logo_image(self.logo_path))
+
+    def test_logo_reloaded_when_file_changes(self):
+        logo = get_logo_image(self.logo_path)
+        stat = os.stat(self.logo_path)
+        os.utime(self.logo_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertIsNot(get_logo_image(self.logo_path), logo)
+
+    def test_mittente_save_clears_cache(self):
+        logo = get_logo_image(self.logo_path)
+        Mittente.objects.create(nome="Altro Mittente", piva="22222222222")
+        self.assertIsNot(get_logo_image(self.logo_path), logo)
+
+    def test_missing_logo(self):
+        with self.assertRaises(FileNotFoundError):
+            get_logo_image(os.path.join(self.tmp_dir.name, 'missing.png'))
@@ -0,0 +1,82 @@
+"""
+Test eager PDF pre-generation for DDT Application.
+"""
+import time
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from ddt_app import pdf_pregeneration
+from ddt_app.models import DDTRiga
+from ddt_app.pdf_cache import ddt_pdf_cache_key, get_pdf_store
+from ddt_app.pdf_pregeneration import pregenerate_ddt_pdf, pregeneration_token_key
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin, INLINE_PDF_WORKERS, MEMORY_PDF_CACHE
+
+
+PREGENERATION = {'ENABLED': True, 'DELAY': 0.1}
+
+
+@override_settings(DDT_PDF_CACHE=MEMORY_PDF_CACHE, DDT_PDF_WORKERS=INLINE_PDF_WORKERS,
+                   DDT_PDF_PREGENERATION=PREGENERATION)
+class PDFPregenerationTest(DDTPDFTestMixin, TestCase):
+    """Test generazione anticipata dei PDF."""
+
+    def setUp(self):
+        self.create_ddt_data()
+        cache.clear()
+
+    def wait_for(self, condition):
+        for _ in range(50):
+            if condition():
+                return
+            time.sleep(0.05)
+        self.fail("Condizione non verificata entro il tempo massimo")
+
+    def test_formset_save_renders_once(self):
+        with mock.patch.object(pdf_pregeneration, 'pregenerate_ddt_pdf') as pregenerate:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.ddt.save()
+                for ordine in range(2, 5):
+                    DDTRiga.objects.create(ddt=self.ddt, articolo=self.articolo, quantita=1, ordine=ordine)
+            self.assertEqual(len(callbacks), 4)
+            self.wait_for(lambda: pregenerate.called and not pdf_pregeneration._local_queue.pending())
+            time.sleep(0.2)
+        pregenerate.assert_called_once_with(self.ddt.id)
+
+    def test_riga_delete_schedules_render(self):
+        with mock.patch.object(pdf_pregeneration, '_enqueue') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.ddt.righe.first().delete()
+        enqueue.assert_called_once_with(self.ddt.id, PREGENERATION['DELAY'])
+
+    @override_settings(DDT_PDF_PREGENERATION={'ENABLED': False})
+    def test_disabled(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.ddt.save()
+        self.assertEqual(callbacks, [])
+
+    def test_pregenerate_fills_pdf_cache(self):
+        pregenerate_ddt_pdf(self.ddt.id)
+        self.assertIsNotNone(get_pdf_store().get(ddt_pdf_cache_key(self.ddt)))
+
+    def test_pregenerate_missing_ddt(self):
+        pregenerate_ddt_pdf(999999)
+
+    def test_celery_task_debounced_by_token(self):
+        task = mock.Mock()
+        with mock.patch.object(pdf_pregeneration, '_get_celery_task', return_value=task):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.ddt.save()
+                self.ddt.save()
+        self.assertEqual(task.apply_async.call_count, 2)
+        last_args = task.apply_async.call_args
+        self.assertEqual(last_args.kwargs['countdown'], PREGENERATION['DELAY'])
+        self.assertEqual(cache.get(pregeneration_token_key(self.ddt.id)), last_args.args[0][1])
+
+    def test_broker_unreachable_falls_back_to_local_queue(self):
+        task = mock.Mock()
+        task.apply_async.side_effect = ConnectionRefusedError("Connection refused")
+        with mock.patch.object(pdf_pregeneration, '_get_celery_task', return_value=task), \
+                mock.patch.object(pdf_pregeneration._local_queue, 'schedule') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.ddt.save()
+        schedule.assert_called_once_with(self.ddt.id, PREGENERATION['DELAY'])
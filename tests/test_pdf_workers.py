@@ -0,0 +1,68 @@
+"""
+Test PDF render worker pool for DDT Application.
+"""
+import time
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from ddt_app import pdf_cache
+from ddt_app.pdf_data import load_ddt_data
+from ddt_app.pdf_workers import PDFPoolSaturated, PDFRenderPool, PDFRenderTimeout
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin, INLINE_PDF_WORKERS, MEMORY_PDF_CACHE
+
+
+class PDFRenderPoolTest(SimpleTestCase):
+    """Test pool di processi con un worker reale."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pool = PDFRenderPool(workers=1, max_queue=0, timeout=10, retry_after=7)
+        cls.pool.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+        super().tearDownClass()
+
+    def test_run_returns_result(self):
+        self.assertEqual(self.pool.run(max, 1, 3), 3)
+
+    def test_saturated_pool_rejects_jobs(self):
+        future = self.pool.submit(time.sleep, 0.5)
+        with self.assertRaises(PDFPoolSaturated) as context:
+            self.pool.submit(max, 1, 2)
+        self.assertEqual(context.exception.retry_after, 7)
+        self.pool.result(future)
+        self.assertEqual(self.pool.run(max, 1, 2), 2)
+
+    def test_timeout(self):
+        with self.assertRaises(PDFRenderTimeout):
+            self.pool.run(time.sleep, 1, timeout=0.1)
+        # Il posto in coda torna libero quando il lavoro termina
+        time.sleep(1)
+        self.assertEqual(self.pool.run(max, 1, 2), 2)
+
+
+@override_settings(DDT_PDF_CACHE=MEMORY_PDF_CACHE, DDT_PDF_WORKERS=INLINE_PDF_WORKERS)
+class PDFRenderPoolDDTTest(DDTPDFTestMixin, TestCase):
+    """Test generazione dei PDF DDT tramite il pool."""
+
+    def setUp(self):
+        self.create_ddt_data()
+        # La chiave dei PDF dipende solo dal contenuto: svuota i PDF dei test precedenti
+        cache.clear()
+
+    def test_render_in_worker_process(self):
+        pool = PDFRenderPool(workers=1)
+        self.addCleanup(pool.shutdown)
+        self.assertTrue(pool.render(load_ddt_data(self.ddt)).startswith(b'%PDF'))
+
+    def test_ddt_pdf_view_saturated(self):
+        pool = mock.Mock()
+        pool.render.side_effect = PDFPoolSaturated(5)
+        with mock.patch.object(pdf_cache, 'get_render_pool', return_value=pool):
+            response = self.client.get(reverse('ddt_app:ddt_pdf', args=[self.ddt.id]))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
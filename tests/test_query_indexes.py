@@ -0,0 +1,163 @@
+"""
+Test index usage of the hot queries for DDT Application.
+"""
+from datetime import date, datetime
+from django.db import connection
+from django.db.models import F, Q
+from django.test import TestCase
+from django.utils import timezone
+from ddt_app.forms import DDTFiltroForm, DDTForm
+from ddt_app.models import (
+    Autista, CausaleTrasporto, DDT, Destinatario, Mittente, SedeMittente, TargaVettore, Vettore,
+)
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin
+
+RIGHE = 100000
+ANAGRAFICHE = 1000
+
+
+def moltiplica(model, template, n, valori):
+    """Inserisce n copie di template con una sola query; valori: colonna -> espressione SQL di n"""
+    qn = connection.ops.quote_name
+    colonne = [field.column for field in model._meta.concrete_fields if not field.primary_key]
+    select = ', '.join(valori.get(colonna, f't.{qn(colonna)}') for colonna in colonne)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {qn(model._meta.db_table)} ({', '.join(qn(c) for c in colonne)}) "
+            f"WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s) "
+            f"SELECT {select} FROM seq, {qn(model._meta.db_table)} t WHERE t.{qn('id')} = %s",
+            [n, template.pk]
+        )
+    return model.objects.exclude(pk=template.pk).order_by('pk').values_list('pk', flat=True).first()
+
+
+def giorni(espressione):
+    """Data 2024-01-01 più espressione giorni, nella sintassi del database"""
+    if connection.vendor == 'postgresql':
+        return f"(DATE '2024-01-01' + ({espressione}))"
+    return f"date('2024-01-01', '+' || ({espressione}) || ' days')"
+
+
+def minuti(espressione):
+    """Istante 2024-01-01 00:00 più espressione minuti, nella sintassi del database"""
+    if connection.vendor == 'postgresql':
+        return f"(TIMESTAMP WITH TIME ZONE '2024-01-01 00:00+00' + ({espressione}) * INTERVAL '1 minute')"
+    return f"datetime('2024-01-01', '+' || ({espressione}) || ' minutes')"
+
+
+class QueryIndexTest(TestCase):
+    """Test che le query più frequenti di viste e form usino un indice."""
+
+    @classmethod
+    def setUpTestData(cls):
+        dati = DDTPDFTestMixin()
+        dati.create_ddt_data()
+        cls.mittente_id = moltiplica(Mittente, dati.mittente, ANAGRAFICHE, {
+            'nome': "'Mittente ' || n",
+        })
+        cls.destinatario_id = moltiplica(Destinatario, dati.destinatario, ANAGRAFICHE, {
+            'nome': "'Destinatario ' || n",
+        })
+        cls.vettore_id = moltiplica(Vettore, dati.vettore, ANAGRAFICHE, {
+            'nome': "'Vettore ' || n",
+        })
+        attivo = "(n %% 10 <> 0)"
+        moltiplica(SedeMittente, dati.sede_mittente, RIGHE, {
+            'mittente_id': f"{cls.mittente_id} + n %% {ANAGRAFICHE}",
+            'nome': "'Sede ' || n",
+            'attiva': attivo,
+        })
+        moltiplica(Autista, dati.autista, RIGHE, {
+            'vettore_id': f"{cls.vettore_id} + n %% {ANAGRAFICHE}",
+            'cognome': "'Autista ' || n",
+            'attivo': attivo,
+        })
+        moltiplica(TargaVettore, dati.targa_vettore, RIGHE, {
+            'vettore_id': f"{cls.vettore_id} + n %% {ANAGRAFICHE}",
+            'targa': "'T' || n",
+            'attiva': attivo,
+        })
+        moltiplica(CausaleTrasporto, dati.causale, RIGHE, {
+            'codice': "'C' || n",
+            'attiva': attivo,
+        })
+        moltiplica(DDT, dati.ddt, RIGHE, {
+            'numero': "'B-' || n",
+            'serie': "'B-{numero}'",
+            'progressivo': "n",
+            'data_documento': giorni("n %% 365"),
+            'data_ritiro': giorni("(n + 1) %% 365"),
+            'mittente_id': f"{cls.mittente_id} + n %% {ANAGRAFICHE}",
+            'destinatario_id': f"{cls.destinatario_id} + n %% {ANAGRAFICHE}",
+            'created_at': minuti("n"),
+        })
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset, *indici):
+        piano = queryset.explain()
+        self.assertTrue(
+            any(indice in piano for indice in indici),
+            f"Nessun indice tra {indici} nel piano:\n{piano}"
+        )
+        self.assertNotIn('Seq Scan', piano)
+
+    def filtra(self, **dati):
+        form = DDTFiltroForm(dati)
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.filtra(DDT.objects.all()).order_by(form.cleaned_data['campo_data'], 'progressivo')
+
+    def test_home_list(self):
+        ordine = ('-data_documento', F('progressivo').desc(nulls_last=True), '-id')
+        self.assertUsesIndex(DDT.objects.order_by(*ordine)[:21], 'ddt_data_progressivo_idx')
+        # Pagina successiva della paginazione a cursore
+        self.assertUsesIndex(DDT.objects.filter(
+            Q(data_documento__lt=date(2024, 3, 1))
+            | Q(data_documento=date(2024, 3, 1), progressivo__lt=500)
+            | Q(data_documento=date(2024, 3, 1), progressivo__isnull=True)
+        ).order_by(*ordine)[:21], 'ddt_data_progressivo_idx')
+
+    def test_batch_filters(self):
+        self.assertUsesIndex(
+            self.filtra(data_da=date(2024, 3, 1), data_a=date(2024, 3, 7)), 'ddt_data_progressivo_idx'
+        )
+        self.assertUsesIndex(
+            self.filtra(campo_data='data_ritiro', data_da=date(2024, 3, 1), data_a=date(2024, 3, 7)),
+            'ddt_ritiro_progressivo_idx'
+        )
+        self.assertUsesIndex(
+            self.filtra(mittente=self.mittente_id, data_da=date(2024, 3, 1)), 'ddt_mittente_data_idx'
+        )
+        self.assertUsesIndex(
+            self.filtra(destinatario=self.destinatario_id, data_da=date(2024, 3, 1)), 'ddt_destinatario_data_idx'
+        )
+        # Ordinato per data: il piano può anche scorrere l'indice della data per ogni giorno
+        self.assertUsesIndex(
+            self.filtra(anno=2024, numero_da=120, numero_a=340),
+            'ddt_anno_progressivo_idx', 'ddt_anno_serie_progr_idx', 'ddt_data_progressivo_idx'
+        )
+
+    def test_admin_created_at_filter(self):
+        # "Ultimi 7 giorni" del filtro dell'admin, nell'ordinamento predefinito
+        self.assertUsesIndex(DDT.objects.filter(
+            created_at__gte=timezone.make_aware(datetime(2024, 3, 3)),
+            created_at__lt=timezone.make_aware(datetime(2024, 3, 11)),
+        ), 'ddt_created_at_idx')
+
+    def test_form_querysets(self):
+        form = DDTForm(data={'vettore': str(self.vettore_id)})
+        self.assertUsesIndex(form.fields['autista'].queryset, 'autista_vettore_attivo_idx')
+        self.assertUsesIndex(form.fields['targa_vettore'].queryset, 'targa_vettore_attiva_idx')
+        self.assertUsesIndex(form.fields['sede_mittente'].queryset, 'sede_attiva_nome_idx')
+        self.assertUsesIndex(form.fields['causale_trasporto'].queryset, 'causale_attiva_idx')
+
+    def test_api_sedi_mittente(self):
+        self.assertUsesIndex(
+            SedeMittente.objects.filter(mittente_id=self.mittente_id, attiva=True).order_by('nome'),
+            'sede_mittente_attiva_idx'
+        )
+
+    def test_anagrafiche_list(self):
+        self.assertUsesIndex(Mittente.objects.order_by('nome', 'id')[:11], 'mittente_nome_idx')
+        self.assertUsesIndex(Destinatario.objects.order_by('nome', 'id')[:11], 'destinatario_nome_idx')
+        self.assertUsesIndex(Vettore.objects.order_by('nome', 'id')[:11], 'vettore_nome_idx')
@@ -0,0 +1,129 @@
+"""
+Test constant query counts of lists, details and forms for DDT Application.
+"""
+from datetime import date
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from ddt_app.models import (
+    Autista, DDT, DDTRiga, Destinatario, Destinazione, Mittente, SedeMittente, TargaVettore, Vettore,
+)
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin
+
+
+class QuerySetQueryCountTest(DDTPDFTestMixin, TestCase):
+    """Test che le pagine facciano lo stesso numero di query con poche o molte righe."""
+
+    def setUp(self):
+        self.create_ddt_data()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.aggiunte = 0
+
+    def conta_query(self, url):
+        # La prima richiesta riempie le cache del processo (numerazione, configurazioni)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def aggiungi_anagrafiche(self, n):
+        for i in range(self.aggiunte, self.aggiunte + n):
+            mittente = Mittente.objects.create(nome=f"Mittente {i}", piva="%011d" % i, cf="RSSMRA80A01H501U")
+            SedeMittente.objects.create(mittente=mittente, nome=f"Sede {i}", indirizzo="Via Roma, 1")
+            destinatario = Destinatario.objects.create(nome=f"Destinatario {i}", indirizzo="Via Test, 1")
+            Destinazione.objects.create(destinatario=destinatario, nome=f"Stalla {i}", indirizzo="Via Campi, 1")
+            vettore = Vettore.objects.create(nome=f"Vettore {i}", indirizzo="Via Vettore, 1")
+            Autista.objects.create(vettore=vettore, nome="Luigi", cognome=f"Verdi {i}")
+            TargaVettore.objects.create(vettore=vettore, targa=f"ZZ{i:03d}ZZ")
+            Autista.objects.create(vettore=self.vettore, nome="Anna", cognome=f"Neri {i}")
+            TargaVettore.objects.create(vettore=self.vettore, targa=f"YY{i:03d}YY")
+            SedeMittente.objects.create(mittente=self.mittente, nome=f"Filiale {i}", indirizzo="Via Roma, 2")
+        self.aggiunte += n
+
+    def aggiungi_ddt(self, n):
+        for i in range(self.aggiunte, self.aggiunte + n):
+            ddt = self.create_ddt(f"2024-{i + 100:04d}", data_documento=date(2024, 2, 1))
+            DDTRiga.objects.create(ddt=ddt, articolo=self.articolo, quantita=1, ordine=1)
+        self.aggiunte += n
+
+    def aggiungi_righe(self, n):
+        for i in range(n):
+            DDTRiga.objects.create(ddt=self.ddt, articolo=self.articolo, quantita=i + 1, ordine=i + 2)
+
+    def assertQueryCostanti(self, url, aggiungi, n=8):
+        poche = self.conta_query(url)
+        aggiungi(n)
+        self.assertEqual(self.conta_query(url), poche)
+
+    def test_home(self):
+        self.assertQueryCostanti(reverse('ddt_app:home'), self.aggiungi_ddt)
+
+    def test_home_ricerca(self):
+        url = reverse('ddt_app:home') + '?search=Vitelli'
+        self.assertQueryCostanti(url, self.aggiungi_ddt)
+
+    def test_ddt_detail(self):
+        self.assertQueryCostanti(reverse('ddt_app:ddt_detail', args=[self.ddt.id]), self.aggiungi_righe)
+
+    def test_ddt_delete(self):
+        self.assertQueryCostanti(reverse('ddt_app:ddt_delete', args=[self.ddt.id]), self.aggiungi_righe)
+
+    def test_ddt_edit(self):
+        url = reverse('ddt_app:ddt_edit', args=[self.ddt.id])
+        self.assertQueryCostanti(url, lambda n: (self.aggiungi_righe(n), self.aggiungi_anagrafiche(n)))
+
+    def test_ddt_create(self):
+        self.assertQueryCostanti(reverse('ddt_app:ddt_create'), self.aggiungi_anagrafiche)
+
+    def test_anagrafiche_list(self):
+        for nome in ('mittente_list', 'destinatario_list', 'vettore_list'):
+            with self.subTest(nome):
+                self.assertQueryCostanti(reverse(f'ddt_app:{nome}'), self.aggiungi_anagrafiche, n=4)
+
+    def test_anagrafiche_detail(self):
+        for nome, oggetto in (
+            ('mittente_detail', self.mittente), ('destinatario_detail', self.destinatario),
+            ('vettore_detail', self.vettore), ('mittente_delete', self.mittente),
+            ('destinatario_delete', self.destinatario), ('vettore_delete', self.vettore),
+        ):
+            with self.subTest(nome):
+                self.assertQueryCostanti(
+                    reverse(f'ddt_app:{nome}', args=[oggetto.id]),
+                    lambda n: (self.aggiungi_anagrafiche(n), self.aggiungi_ddt(n)), n=2
+                )
+
+    def test_conteggi(self):
+        self.aggiungi_anagrafiche(2)
+        vettore = Vettore.objects.with_counts().get(pk=self.vettore.pk)
+        self.assertEqual((vettore.num_autisti, vettore.num_targhe, vettore.num_ddt), (3, 4, 1))
+        mittente = Mittente.objects.with_counts().get(pk=self.mittente.pk)
+        self.assertEqual((mittente.num_sedi, mittente.num_ddt), (3, 1))
+        destinatario = Destinatario.objects.with_counts().get(nome="Destinatario 0")
+        self.assertEqual((destinatario.num_destinazioni, destinatario.num_ddt), (1, 0))
+
+    def test_admin(self):
+        self.client.force_login(self.user)
+        self.assertQueryCostanti(reverse('admin:ddt_app_ddt_changelist'), self.aggiungi_ddt)
+        self.assertQueryCostanti(
+            reverse('admin:ddt_app_ddt_change', args=[self.ddt.id]),
+            lambda n: (self.aggiungi_righe(n), self.aggiungi_anagrafiche(n))
+        )
+        for nome in ('sedemittente', 'autista', 'targavettore'):
+            with self.subTest(nome):
+                self.assertQueryCostanti(
+                    reverse(f'admin:ddt_app_{nome}_changelist'), self.aggiungi_anagrafiche, n=3
+                )
+
+    def test_for_list_carica_solo_le_colonne_mostrate(self):
+        ddt = DDT.objects.for_list().get(pk=self.ddt.pk)
+        self.assertEqual(
+            ddt.get_deferred_fields() & {'numero', 'data_documento', 'mittente_id', 'destinatario_id'}, set()
+        )
+        self.assertIn('annotazioni', ddt.get_deferred_fields())
+        with self.assertNumQueries(0):
+            str(ddt)
+            str(ddt.causale_trasporto)
+            ddt.mittente.nome
@@ -0,0 +1,89 @@
+"""
+Test full-text DDT search for DDT Application.
+"""
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from ddt_app.models import DDT, DDTRiga, DocumentoRicercaDDT
+from ddt_app.ricerca import aggiorna_documenti_ricerca, cerca_ddt, tokenizer_fts
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin
+
+
+class RicercaDDTTest(DDTPDFTestMixin, TestCase):
+    """Test documento di ricerca e ricerca a testo libero dei DDT."""
+
+    def setUp(self):
+        self.create_ddt_data()
+
+    def cerca(self, testo):
+        return list(cerca_ddt(DDT.objects.order_by('-data_documento', '-progressivo'), testo))
+
+    def test_documento_creato_al_salvataggio(self):
+        testo = DocumentoRicercaDDT.objects.get(ddt=self.ddt).testo
+        for parola in ('2024-0001', 'Test Mittente', 'Sede Principale', 'Test Destinatario',
+                       'Stalla Nord', 'Test Vettore', 'Mario', 'Rossi', 'AB123CD', 'EF456GH',
+                       'VEN', 'Vendita', 'Vitelli', 'Razza frisona'):
+            self.assertIn(parola, testo)
+        self.assertNotIn('\n', testo)
+
+    def test_ricerca_per_campi_del_documento(self):
+        altro = self.create_ddt("2024-0002", targa_vettore=None, targa_vettore_2=None)
+        self.assertEqual(self.cerca('AB123'), [self.ddt])
+        self.assertEqual(self.cerca('frisona'), [self.ddt])
+        self.assertEqual(self.cerca('0002'), [altro])
+        self.assertCountEqual(self.cerca('mittente rossi'), [altro, self.ddt])
+        self.assertEqual(self.cerca('mittente inesistente'), [])
+
+    def test_righe_aggiornano_il_documento(self):
+        riga = DDTRiga.objects.create(ddt=self.ddt, articolo=self.articolo, quantita=1, descrizione="Manzette limousine", ordine=2)
+        self.assertEqual(self.cerca('limousine'), [self.ddt])
+        riga.delete()
+        self.assertEqual(self.cerca('limousine'), [])
+
+    def test_modifica_anagrafica_aggiorna_i_documenti(self):
+        self.mittente.nome = "Azienda Agricola Bianchi"
+        self.mittente.save()
+        self.targa_vettore_2.targa = "ZZ999ZZ"
+        self.targa_vettore_2.save()
+        self.assertEqual(self.cerca('bianchi ZZ999'), [self.ddt])
+        self.assertEqual(self.cerca('Test Mittente'), [])
+
+    def test_eliminazione_ddt(self):
+        self.ddt.delete()
+        self.assertFalse(DocumentoRicercaDDT.objects.exists())
+        self.assertEqual(self.cerca('frisona'), [])
+
+    def test_termini_corti(self):
+        # Sotto i tre caratteri il tokenizer trigram non trova nulla: si usa LIKE
+        self.assertEqual(self.cerca('AB 1'), [self.ddt])
+
+    def test_ordinamento_per_pertinenza(self):
+        if connection.vendor != 'sqlite' or tokenizer_fts(connection) is None:
+            self.skipTest("Indice FTS5 non disponibile")
+        meno = self.create_ddt("2024-0002", annotazioni="")
+        DDTRiga.objects.create(ddt=meno, articolo=self.articolo, quantita=1, descrizione="Pecore", ordine=1)
+        piu = self.create_ddt("2024-0003", data_documento=self.ddt.data_documento.replace(day=1))
+        for ordine in range(3):
+            DDTRiga.objects.create(ddt=piu, articolo=self.articolo, quantita=1, descrizione="Pecore sarde", ordine=ordine)
+        self.assertEqual(self.cerca('pecore'), [piu, meno])
+
+    def test_aggiorna_documenti_solo_se_cambiati(self):
+        DocumentoRicercaDDT.objects.all().delete()
+        self.assertEqual(aggiorna_documenti_ricerca([self.ddt.pk], crea=False), 0)
+        self.assertEqual(aggiorna_documenti_ricerca([self.ddt.pk]), 1)
+        self.assertEqual(aggiorna_documenti_ricerca([self.ddt.pk]), 0)
+
+    def test_home_search(self):
+        self.create_ddt("2024-0002", targa_vettore=None, targa_vettore_2=None)
+        response = self.client.get(reverse('ddt_app:home'), {'search': 'AB123CD'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([ddt.numero for ddt in response.context['ddt_list']], ['2024-0001'])
+
+    def test_comando_aggiorna_ricerca(self):
+        DocumentoRicercaDDT.objects.all().delete()
+        out = StringIO()
+        call_command('aggiorna_ricerca_ddt', stdout=out)
+        self.assertIn('1 documenti di ricerca aggiornati', out.getvalue())
+        self.assertEqual(self.cerca('frisona'), [self.ddt])
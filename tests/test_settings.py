@@ -104,8 +104,9 @@ class SettingsTest(TestCase):
         self.assertTrue(CSRF_COOKIE_HTTPONLY)
         
         # Check cache
-        self.assertEqual(CACHES['default']['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
-        self.assertEqual(CACHES['default']['LOCATION'], 'redis://localhost:6379/1')
+        self.assertEqual(CACHES['default']['BACKEND'], 'ddt_app.cache_backend.TieredCache')
+        self.assertEqual(CACHES['default']['OPTIONS']['L2']['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
+        self.assertEqual(CACHES['default']['OPTIONS']['L2']['LOCATION'], 'redis://localhost:6379/1')
         
         # Check email settings
         self.assertEqual(EMAIL_BACKEND, 'django.core.mail.backends.smtp.EmailBackend')
@@ -231,13 +232,16 @@ class SettingsTest(TestCase):
         self.assertIn('ddt_app', LOGGING['loggers'])
         self.assertIn('django', LOGGING['loggers'])
         
-        # Check cache
-        self.assertEqual(CACHES['default']['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
-        self.assertEqual(CACHES['default']['LOCATION'], 'redis://localhost:6379/1')
+        # Check cache: Redis come L2 solo se REDIS_URL è impostata
+        self.assertEqual(CACHES['default']['BACKEND'], 'ddt_app.cache_backend.TieredCache')
+        self.assertIn(CACHES['default']['OPTIONS']['L2']['BACKEND'], (
+            'django.core.cache.backends.redis.RedisCache',
+            'django.core.cache.backends.filebased.FileBasedCache',
+        ))
         
         # Check Celery
-        self.assertEqual(CELERY_BROKER_URL, 'redis://localhost:6379/0')
-        self.assertEqual(CELERY_RESULT_BACKEND, 'redis://localhost:6379/0')
+        self.assertEqual(CELERY_BROKER_URL, '')
+        self.assertEqual(CELERY_RESULT_BACKEND, '')
         self.assertEqual(CELERY_ACCEPT_CONTENT, ['json'])
         self.assertEqual(CELERY_TASK_SERIALIZER, 'json')
         self.assertEqual(CELERY_RESULT_SERIALIZER, 'json')
@@ -0,0 +1,132 @@
+"""
+Test stored DDT totals for DDT Application.
+"""
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase
+from ddt_app.aggiornamento_ddt import aggiorna_ddt_una_volta
+from ddt_app.forms import DDTRigaFormSet
+from ddt_app.models import Articolo, DDT, DDTRiga
+from ddt_app.pdf_data import aggiorna_dati_stampa, load_ddt_data
+from tests.test_pdf_generator_advanced import DDTPDFTestMixin
+
+
+class TotaliDDTTest(DDTPDFTestMixin, TestCase):
+    """Test totali dei DDT memorizzati e aggiornati dalle righe."""
+
+    def setUp(self):
+        self.create_ddt_data()
+        self.altro_articolo = Articolo.objects.create(nome="Agnelli", categoria="Ovini", um="capi", prezzo_unitario=2)
+
+    def assertTotali(self, ddt, numero_righe, quantita, valore):
+        ddt = DDT.objects.get(pk=ddt.pk)
+        self.assertEqual(
+            (ddt.numero_righe, ddt.totale_quantita, ddt.totale_valore),
+            (numero_righe, Decimal(quantita), Decimal(valore))
+        )
+
+    def test_righe_create_modificate_eliminate(self):
+        self.assertTotali(self.ddt, 1, '5', '52.5')
+        riga = DDTRiga.objects.create(ddt=self.ddt, articolo=self.altro_articolo, quantita=3, ordine=2)
+        # Il DDT collegato alla riga è aggiornato senza rileggerlo
+        self.assertEqual(riga.ddt.totale_quantita, 8)
+        self.assertTotali(self.ddt, 2, '8', '58.5')
+        riga.quantita = 4
+        riga.save()
+        self.assertTotali(self.ddt, 2, '9', '60.5')
+        riga.delete()
+        self.assertTotali(self.ddt, 1, '5', '52.5')
+        self.ddt.righe.all().delete()
+        self.assertTotali(self.ddt, 0, '0', '0')
+
+    def test_operazioni_di_massa(self):
+        altro = self.create_ddt("2024-0002")
+        righe = DDTRiga.objects.bulk_create([
+            DDTRiga(ddt=altro, articolo=self.altro_articolo, quantita=i, ordine=i) for i in range(1, 4)
+        ])
+        self.assertTotali(altro, 3, '6', '12')
+        DDTRiga.objects.filter(ddt=altro).update(quantita=2)
+        self.assertTotali(altro, 3, '6', '12')
+        for riga in righe:
+            riga.articolo = self.articolo
+        DDTRiga.objects.bulk_update(righe, ['articolo'])
+        self.assertTotali(altro, 3, '6', '63')
+        DDTRiga.objects.filter(ddt=altro).update(ddt=self.ddt)
+        self.assertTotali(altro, 0, '0', '0')
+        self.assertTotali(self.ddt, 4, '11', '115.5')
+
+    def test_formset(self):
+        riga = self.ddt.righe.get()
+        formset = DDTRigaFormSet({
+            'righe-TOTAL_FORMS': '2', 'righe-INITIAL_FORMS': '1',
+            'righe-MIN_NUM_FORMS': '0', 'righe-MAX_NUM_FORMS': '1000',
+            'righe-0-id': riga.pk, 'righe-0-articolo': self.articolo.pk, 'righe-0-quantita': '2', 'righe-0-ordine': '1',
+            'righe-1-articolo': self.altro_articolo.pk, 'righe-1-quantita': '10', 'righe-1-ordine': '2',
+        }, instance=self.ddt)
+        self.assertTrue(formset.is_valid(), formset.errors)
+        formset.save()
+        self.assertEqual(self.ddt.totale_valore, 41)
+        self.assertTotali(self.ddt, 2, '12', '41')
+
+    def test_righe_aggiornano_il_ddt_una_volta(self):
+        with mock.patch('ddt_app.aggiornamento_ddt.aggiorna_dati_stampa', wraps=aggiorna_dati_stampa) as dati_stampa:
+            with aggiorna_ddt_una_volta():
+                riga = DDTRiga.objects.create(ddt=self.ddt, articolo=self.altro_articolo, quantita=1, ordine=2)
+                DDTRiga.objects.create(ddt=self.ddt, articolo=self.altro_articolo, quantita=2, ordine=3)
+                self.ddt.righe.get(ordine=1).delete()
+                # Il DDT è aggiornato all'uscita dal blocco
+                self.assertTotali(self.ddt, 1, '5', '52.5')
+            dati_stampa.assert_called_once()
+        # Nella stessa transazione, senza attendere il commit
+        self.assertTotali(self.ddt, 2, '3', '6')
+        self.assertEqual(riga.ddt.totale_quantita, 3)
+
+    def test_blocco_annullato(self):
+        with self.assertRaises(RuntimeError):
+            with aggiorna_ddt_una_volta():
+                DDTRiga.objects.create(ddt=self.ddt, articolo=self.altro_articolo, quantita=3, ordine=2)
+                raise RuntimeError
+        self.assertTotali(self.ddt, 1, '5', '52.5')
+        # I DDT raccolti sono scartati: la riga successiva aggiorna subito il DDT
+        DDTRiga.objects.create(ddt=self.ddt, articolo=self.altro_articolo, quantita=1, ordine=2)
+        self.assertTotali(self.ddt, 2, '6', '54.5')
+
+    def test_salvataggio_ddt_non_sovrascrive_i_totali(self):
+        letto = DDT.objects.get(pk=self.ddt.pk)
+        DDTRiga.objects.create(ddt=self.ddt, articolo=self.altro_articolo, quantita=3, ordine=2)
+        letto.annotazioni = "Modificate"
+        letto.save()
+        self.assertTotali(self.ddt, 2, '8', '58.5')
+
+    def test_prezzo_articolo(self):
+        self.articolo.prezzo_unitario = 20
+        self.articolo.save()
+        # Il DDT emesso mantiene il prezzo delle sue righe, come i dati di stampa
+        self.assertTotali(self.ddt, 1, '5', '52.5')
+        self.assertEqual(load_ddt_data(self.ddt).righe[0].prezzo_unitario, Decimal('10.50'))
+        riga = DDTRiga.objects.create(ddt=self.ddt, articolo=self.articolo, quantita=1, ordine=2)
+        self.assertEqual(riga.prezzo_unitario, 20)
+        self.assertTotali(self.ddt, 2, '6', '72.5')
+        # Cambiando articolo la riga ne prende il prezzo attuale
+        riga.articolo = self.altro_articolo
+        riga.save()
+        self.assertTotali(self.ddt, 2, '6', '54.5')
+        DDTRiga.objects.filter(pk=riga.pk).update(articolo=self.articolo)
+        self.assertTotali(self.ddt, 2, '6', '72.5')
+        riga.articolo = self.altro_articolo
+        DDTRiga.objects.bulk_update([riga], ['articolo'])
+        self.assertTotali(self.ddt, 2, '6', '54.5')
+
+    def test_ordinamento_per_totale(self):
+        altro = self.create_ddt("2024-0002")
+        DDTRiga.objects.create(ddt=altro, articolo=self.articolo, quantita=10, ordine=1)
+        self.assertEqual(list(DDT.objects.order_by('-totale_valore')), [altro, self.ddt])
+
+    def test_comando_ricalcola_totali(self):
+        DDT.objects.update(numero_righe=0, totale_quantita=0, totale_valore=0)
+        out = StringIO()
+        call_command('ricalcola_totali_ddt', '--chunk-size', '1', stdout=out)
+        self.assertIn('Totali di 1 DDT ricalcolati', out.getvalue())
+        self.assertTotali(self.ddt, 1, '5', '52.5')